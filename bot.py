@@ -8,7 +8,7 @@ import telebot
 
 from config import BOT_TOKEN, DB_PATH, BACKUP_DIR, LOG_FILE
 from utils import init_logging
-from db import get_conn, ensure_tables
+from db import get_conn, ensure_tables, load_notification_settings_cache
 from scheduler import SchedulerManager
 from auto_init_schedules import auto_init_schedules
 
@@ -100,9 +100,26 @@ def shutdown_gracefully(signum=None, frame=None, exit_code=0):
             logger.info("Shutting down scheduler...")
             sch_mgr.scheduler.shutdown(wait=True)
             logger.info("Scheduler stopped.")
+        if sch_mgr and getattr(sch_mgr, 'next_due', None):
+            sch_mgr.next_due.shutdown(wait=True)
+            logger.info("Next-due dispatcher stopped.")
+        if sch_mgr and getattr(sch_mgr, 'outbox', None):
+            # الرسائل غير المرسلة تبقى pending في outbox وتُستأنف عند التشغيل التالي
+            sch_mgr.outbox.stop()
+            logger.info("Outbox dispatcher stopped.")
+        from broadcast import shutdown_broadcast_engines
+        shutdown_broadcast_engines()
+        logger.info("Broadcast workers stopped.")
     except Exception as e:
         logger.error(f"Error shutting down scheduler: {e}")
-    
+
+    try:
+        # حفظ المحادثات الجارية (إن كان STATE_PERSIST مفعّلاً) وإيقاف منظّف الحالات
+        from bot_handlers.base import stop_state_sweeper
+        stop_state_sweeper()
+    except Exception as e:
+        logger.error(f"Error stopping state sweeper: {e}")
+
     if exit_code == 0:
         logger.info("Bot stopped gracefully.")
     else:
@@ -115,11 +132,13 @@ def print_startup_banner():
     """طباعة رسالة بداية احترافية."""
     from datetime import datetime
     try:
-        from pytz import timezone
-        algiers_tz = timezone('Africa/Algiers')
-        current_time = datetime.now(algiers_tz)
+        from db_adapter import get_app_timezone, APP_TIMEZONE
+        app_tz = get_app_timezone()
+        if app_tz is None:
+            raise ImportError("pytz not available")
+        current_time = datetime.now(app_tz)
         time_str = current_time.strftime('%Y-%m-%d %H:%M:%S %Z')
-        tz_str = "Africa/Algiers"
+        tz_str = APP_TIMEZONE
     except Exception as e:
         logger.warning(f"Could not load timezone: {e}")
         current_time = datetime.now()
@@ -160,6 +179,8 @@ if __name__ == "__main__":
         conn = get_conn(DB_PATH)
         ensure_tables(conn)
         logger.info("Database connection ready.")
+        loaded = load_notification_settings_cache(conn)
+        logger.info(f"Notification settings cached for {loaded} users.")
         
         # Auto-initialize schedule data if needed (critical for cloud platforms)
         logger.info("Checking schedule data...")
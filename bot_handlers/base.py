@@ -1,17 +1,29 @@
 # handlers/base.py
 """Base classes and state management for bot handlers."""
+import json
 import logging
+import os
 import threading
+import weakref
 from enum import Enum
 from dataclasses import dataclass, field
 from typing import Optional, Dict, Any
-from collections import defaultdict
-from time import time
+from collections import OrderedDict
+from time import time, monotonic
 
 import telebot
 
 logger = logging.getLogger(__name__)
 
+# حالات المحادثات متعددة الخطوات: تنتهي بعد STATE_TTL ثانية من آخر نشاط، وبحد أقصى STATE_MAX_SIZE لكل مخزن
+STATE_TTL = float(os.getenv("STATE_TTL") or "1800")
+STATE_MAX_SIZE = int(os.getenv("STATE_MAX_SIZE") or "10000")
+STATE_SWEEP_INTERVAL = float(os.getenv("STATE_SWEEP_INTERVAL") or "60")
+# حفظ المحادثات الجارية في جدول conversation_state لتستمر بعد إعادة التشغيل (معطّل افتراضياً)
+STATE_PERSIST = (os.getenv("STATE_PERSIST") or "false").lower() in ("1", "true", "yes")
+# الحد الأقصى لعدد المفاتيح (مستخدمين/محادثات) التي يتتبعها كل RateLimiter
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS") or "10000")
+
 
 class StateType(Enum):
     """Types of user states."""
@@ -20,6 +32,197 @@ class StateType(Enum):
     NICKNAME = "nickname"
 
 
+class ExpiringStateStore:
+    """
+    Dict-like chat_id -> state store with TTL expiry and a max size.
+    
+    Every read or write through get()/[] refreshes the entry's TTL; when the store
+    is full the least recently used entry is evicted. Expired entries are dropped
+    lazily on access and by the background sweeper (start_state_sweeper()).
+    
+    With persist=True, writes and deletes also go to the conversation_state table
+    (values must be JSON-serialisable), and restore() reloads the live rows at startup.
+    Callers that mutate a stored dict must write it back (store[chat_id] = state)
+    so the change is persisted; the store's own lock makes external locks unnecessary.
+    """
+    
+    _stores = weakref.WeakSet()
+    
+    def __init__(self, name: str, ttl: Optional[float] = None, max_size: Optional[int] = None,
+                 persist: bool = False):
+        self.name = name
+        self.ttl = STATE_TTL if ttl is None else ttl
+        self.max_size = STATE_MAX_SIZE if max_size is None else max_size
+        self.persist = persist
+        self._data: "OrderedDict[int, list]" = OrderedDict()  # chat_id -> [value, expires_at]
+        self._lock = threading.RLock()
+        ExpiringStateStore._stores.add(self)
+    
+    def _live(self, key, now: float, touch: bool):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[1] < now:
+            del self._data[key]
+            self._persist_delete(key)
+            return None
+        if touch:
+            entry[1] = now + self.ttl
+            self._data.move_to_end(key)
+        return entry
+    
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return self._live(key, time(), touch=False) is not None
+    
+    def __getitem__(self, key):
+        with self._lock:
+            entry = self._live(key, time(), touch=True)
+            if entry is None:
+                raise KeyError(key)
+            return entry[0]
+    
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._live(key, time(), touch=True)
+            return default if entry is None else entry[0]
+    
+    def __setitem__(self, key, value):
+        with self._lock:
+            expires_at = time() + self.ttl
+            self._data[key] = [value, expires_at]
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                evicted, _ = self._data.popitem(last=False)
+                logger.info(f"State store '{self.name}' full, evicted chat {evicted}")
+                self._persist_delete(evicted)
+            self._persist_save(key, value, expires_at)
+    
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return default
+            self._persist_delete(key)
+            return entry[0] if entry[1] >= time() else default
+    
+    def __delitem__(self, key):
+        if self.pop(key, _MISSING) is _MISSING:
+            raise KeyError(key)
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            if self.persist:
+                self._with_db(lambda conn, db: db.delete_conversation_state(conn, self.name))
+    
+    def sweep(self) -> int:
+        """Drop expired entries; returns how many were removed."""
+        now = time()
+        with self._lock:
+            expired = [k for k, (_, expires_at) in self._data.items() if expires_at < now]
+            for key in expired:
+                del self._data[key]
+            if expired and self.persist:
+                self._with_db(lambda conn, db: db.purge_expired_conversation_states(conn, now))
+        if expired:
+            logger.debug(f"State store '{self.name}': expired {len(expired)} entries")
+        return len(expired)
+    
+    def flush(self):
+        """Re-save all live entries (persistent stores only)."""
+        if not self.persist:
+            return
+        with self._lock:
+            items = [(k, v, exp) for k, (v, exp) in self._data.items()]
+        for key, value, expires_at in items:
+            self._persist_save(key, value, expires_at)
+    
+    def restore(self) -> int:
+        """Load live entries saved by a previous run (persistent stores only)."""
+        if not self.persist:
+            return 0
+        rows = self._with_db(lambda conn, db: db.load_conversation_states(conn, self.name, time())) or []
+        with self._lock:
+            for chat_id, data, expires_at in rows:
+                try:
+                    self._data[chat_id] = [json.loads(data), expires_at]
+                except ValueError:
+                    logger.warning(f"State store '{self.name}': dropping unreadable state for chat {chat_id}")
+        return len(rows)
+    
+    def _persist_save(self, key, value, expires_at: float):
+        if not self.persist:
+            return
+        try:
+            data = json.dumps(value)
+        except (TypeError, ValueError):
+            logger.warning(f"State store '{self.name}': state for chat {key} is not JSON-serialisable, not persisted")
+            return
+        self._with_db(lambda conn, db: db.save_conversation_state(conn, self.name, key, data, expires_at))
+    
+    def _persist_delete(self, key):
+        if self.persist:
+            self._with_db(lambda conn, db: db.delete_conversation_state(conn, self.name, key))
+    
+    def _with_db(self, fn):
+        # الحفظ في قاعدة البيانات اختياري: أي خطأ يُسجَّل والمخزن يستمر في الذاكرة
+        try:
+            import db
+            from db_utils import db_connection
+            with db_connection() as conn:
+                return fn(conn, db)
+        except Exception:
+            logger.exception(f"State store '{self.name}': database persistence failed")
+            return None
+    
+    @classmethod
+    def all_stores(cls) -> list:
+        return list(cls._stores)
+
+
+_MISSING = object()
+_sweeper_thread: Optional[threading.Thread] = None
+_sweeper_stop = threading.Event()
+
+
+def _sweep_loop(interval: float):
+    while not _sweeper_stop.wait(interval):
+        for store in ExpiringStateStore.all_stores():
+            try:
+                store.sweep()
+                store.flush()
+            except Exception:
+                logger.exception(f"State sweeper failed for store '{store.name}'")
+
+
+def start_state_sweeper(interval: Optional[float] = None):
+    """Start the background thread that expires (and re-saves) state store entries. Idempotent."""
+    global _sweeper_thread
+    if _sweeper_thread is not None and _sweeper_thread.is_alive():
+        return
+    _sweeper_stop.clear()
+    _sweeper_thread = threading.Thread(
+        target=_sweep_loop, args=(interval or STATE_SWEEP_INTERVAL,), name="state-sweeper", daemon=True
+    )
+    _sweeper_thread.start()
+
+
+def stop_state_sweeper():
+    """Stop the sweeper and save persistent stores one last time."""
+    global _sweeper_thread
+    _sweeper_stop.set()
+    if _sweeper_thread is not None:
+        _sweeper_thread.join(timeout=5)
+        _sweeper_thread = None
+    for store in ExpiringStateStore.all_stores():
+        store.flush()
+
+
 @dataclass
 class UserState:
     """Represents a user's current state in a multi-step process."""
@@ -32,7 +235,7 @@ class StateManager:
     """Thread-safe state manager for user interactions."""
     
     def __init__(self):
-        self._states: Dict[int, UserState] = {}
+        self._states = ExpiringStateStore("state_manager")
         self._lock = threading.Lock()
     
     def start(self, chat_id: int, state_type: StateType, initial_data: Optional[Dict[str, Any]] = None):
@@ -82,96 +285,190 @@ class StateManager:
 
 
 class RateLimiter:
-    """Rate limiter to prevent abuse."""
+    """
+    Token-bucket rate limiter to prevent abuse.
     
-    def __init__(self, max_calls: int = 5, period: int = 60):
+    Each key may burst up to `max_calls` calls and regains max_calls/period tokens
+    per second. Per-key memory is fixed (tokens + timestamp). Idle keys (whose bucket
+    has refilled) are evicted once per period, and at most `max_keys` keys are kept
+    (least recently used dropped first).
+    """
+    
+    def __init__(self, max_calls: int = 5, period: int = 60, max_keys: Optional[int] = None):
         """
         Initialize rate limiter.
         
         Args:
             max_calls: Maximum number of calls allowed
             period: Time period in seconds
+            max_keys: Maximum number of tracked keys (default RATE_LIMIT_MAX_KEYS)
         """
         self.max_calls = max_calls
         self.period = period
-        self._calls: Dict[int, list] = defaultdict(list)
+        self.max_keys = max_keys or RATE_LIMIT_MAX_KEYS
+        self._rate = max_calls / period
+        self._buckets: "OrderedDict[Any, list]" = OrderedDict()  # key -> [tokens, updated]
         self._lock = threading.Lock()
+        self._next_eviction = monotonic() + period
     
-    def is_allowed(self, user_id: int) -> bool:
-        """Check if user is allowed to make a call."""
+    def is_allowed(self, user_id, consume: bool = True) -> bool:
+        """Check if a key (user id, chat id, ...) is allowed to make a call (consume=False only peeks)."""
         with self._lock:
-            now = time()
-            # Remove old calls
-            self._calls[user_id] = [
-                t for t in self._calls[user_id]
-                if now - t < self.period
-            ]
+            now = monotonic()
+            if now >= self._next_eviction:
+                self._evict_idle(now)
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                bucket = [float(self.max_calls), now]
+                self._buckets[user_id] = bucket
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                bucket[0] = min(self.max_calls, bucket[0] + (now - bucket[1]) * self._rate)
+                bucket[1] = now
+                self._buckets.move_to_end(user_id)
             
-            if len(self._calls[user_id]) >= self.max_calls:
+            if bucket[0] < 1:
                 return False
-            
-            self._calls[user_id].append(now)
+            if consume:
+                bucket[0] -= 1
             return True
     
-    def reset(self, user_id: int):
-        """Reset rate limit for a user."""
+    def _evict_idle(self, now: float):
+        # bucket ممتلئ يعادل مفتاحاً غير موجود، فحذفه لا يغير النتيجة
+        idle = [k for k, (tokens, updated) in self._buckets.items()
+                if tokens + (now - updated) * self._rate >= self.max_calls]
+        for key in idle:
+            del self._buckets[key]
+        self._next_eviction = now + self.period
+    
+    def reset(self, user_id):
+        """Reset rate limit for a key."""
         with self._lock:
-            self._calls.pop(user_id, None)
+            self._buckets.pop(user_id, None)
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._buckets)
+
+
+class RateLimits:
+    """
+    Named rate limits sharing one interface, e.g. per user ("start", "callback"),
+    per chat ("broadcast") or global (key omitted).
+    """
+    
+    GLOBAL = "__global__"
+    
+    def __init__(self):
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._lock = threading.Lock()
+    
+    def add(self, name: str, max_calls: int, period: int, max_keys: Optional[int] = None) -> RateLimiter:
+        """Define (or replace) a named limit."""
+        limiter = RateLimiter(max_calls=max_calls, period=period, max_keys=max_keys)
+        self._limiters[name] = limiter
+        return limiter
+    
+    def is_allowed(self, name: str, key=GLOBAL) -> bool:
+        """Consume one call of limit `name` for `key`; raises KeyError for an undefined limit."""
+        return self._limiters[name].is_allowed(key)
+    
+    def allow_all(self, *checks) -> bool:
+        """
+        Consume one call from every (name, key) pair only if all of them allow it,
+        so a call rejected by one limit does not use up the others.
+        """
+        with self._lock:
+            if not all(self._limiters[name].is_allowed(key, consume=False) for name, key in checks):
+                return False
+            for name, key in checks:
+                self._limiters[name].is_allowed(key)
+            return True
+    
+    def reset(self, name: str, key=GLOBAL):
+        self._limiters[name].reset(key)
 
 
 class CallbackRouter:
-    """Router for callback queries."""
+    """
+    Router for callback queries.
+
+    Exact callback_data values are looked up in a dict; prefixes are stored in a
+    character trie, so routing costs O(len(callback_data)) whatever the number of
+    registered handlers. The longest matching prefix wins.
+    """
+    
+    _HANDLER = object()  # مفتاح العقدة التي تحمل (handler, group) داخل الـ trie
     
     def __init__(self):
-        self._handlers: Dict[str, callable] = {}
-        self._prefix_handlers: Dict[str, callable] = {}
+        self._handlers: Dict[str, tuple] = {}
+        self._prefix_trie: Dict[Any, Any] = {}
     
-    def register(self, callback_data: str, exact_match: bool = True):
+    def register(self, callback_data: str, exact_match: bool = True, group: Optional[str] = None):
         """
         Register a callback handler.
         
         Args:
             callback_data: Callback data string or prefix
             exact_match: If True, requires exact match; if False, matches prefix
+            group: Optional feature/group name, see group_of()
         """
         def decorator(func):
             if exact_match:
-                self._handlers[callback_data] = func
+                self._handlers[callback_data] = (func, group)
             else:
-                self._prefix_handlers[callback_data] = func
+                node = self._prefix_trie
+                for ch in callback_data:
+                    node = node.setdefault(ch, {})
+                node[self._HANDLER] = (func, group)
             return func
         return decorator
     
-    def route(self, callback_query) -> bool:
+    def resolve(self, data: Optional[str]) -> Optional[tuple]:
+        """Return (handler, group) for callback data, or None if nothing matches."""
+        if data is None:
+            return None
+        entry = self._handlers.get(data)
+        if entry is not None:
+            return entry
+        node = self._prefix_trie
+        best = node.get(self._HANDLER)
+        for ch in data:
+            node = node.get(ch)
+            if node is None:
+                break
+            best = node.get(self._HANDLER, best)
+        return best
+    
+    def group_of(self, data: Optional[str]) -> Optional[str]:
+        """Group name of the handler that would receive `data` (None if unrouted)."""
+        entry = self.resolve(data)
+        return entry[1] if entry else None
+    
+    def route(self, callback_query, *args) -> bool:
         """
         Route callback query to appropriate handler.
+        Extra positional args are passed to the handler after the callback query.
         
         Returns:
-            True if handler was found and called, False otherwise
+            True if a handler was found and completed, False if none matched
+        
+        Raises:
+            Exception: whatever the handler raised (after logging it), so the
+            caller can still answer the callback query
         """
         data = callback_query.data
-        
-        # Try exact match first
-        if data in self._handlers:
-            try:
-                self._handlers[data](callback_query)
-                return True
-            except Exception as e:
-                logger.exception(f"Error in callback handler for {data}: {e}")
-                return False
-        
-        # Try prefix match
-        for prefix, handler in self._prefix_handlers.items():
-            if data.startswith(prefix):
-                try:
-                    handler(callback_query)
-                    return True
-                except Exception as e:
-                    logger.exception(f"Error in prefix callback handler for {prefix}: {e}")
-                    return False
-        
-        logger.warning(f"No handler found for callback: {data}")
-        return False
+        entry = self.resolve(data)
+        if entry is None:
+            logger.warning(f"No handler found for callback: {data}")
+            return False
+        try:
+            entry[0](callback_query, *args)
+        except Exception as e:
+            logger.exception(f"Error in callback handler for {data}: {e}")
+            raise
+        return True
 
 
 class BotHandlers:
@@ -0,0 +1,22 @@
+# bot_handlers/callbacks/__init__.py
+"""Callback query handlers, split by feature and routed by CallbackRouter."""
+from bot_handlers.base import CallbackRouter
+from bot_handlers.callbacks import (
+    custom_reminder, faq, homework, manual_reminder, notifications, schedule_admin, students, weekly_schedule
+)
+
+FEATURE_MODULES = (homework, faq, manual_reminder, custom_reminder, schedule_admin, weekly_schedule, notifications,
+                   students)
+
+
+def build_callback_router(ctx) -> CallbackRouter:
+    """
+    Build the router used by handlers.callbacks.
+    
+    ctx holds `bot`, `sch_mgr` and the next-step closures defined in
+    handlers.register_handlers that the feature modules need.
+    """
+    router = CallbackRouter()
+    for module in FEATURE_MODULES:
+        module.register(router, ctx)
+    return router
@@ -0,0 +1,115 @@
+# bot_handlers/callbacks/custom_reminder.py
+"""Custom reminder callbacks (add, list, delete, done/undone)."""
+import logging
+from telebot import types
+from db import (
+    delete_custom_reminder, get_all_custom_reminders_for_user, get_custom_reminder,
+    is_custom_reminder_done_for_user, mark_custom_reminder_done, mark_custom_reminder_undone
+)
+from db_utils import db_connection
+from constants import (
+    CALLBACK_CUSTOM_REMINDER, CALLBACK_CUSTOM_REMINDER_ADD, CALLBACK_CUSTOM_REMINDER_CONFIRM_DELETE,
+    CALLBACK_CUSTOM_REMINDER_DELETE, CALLBACK_CUSTOM_REMINDER_DONE, CALLBACK_CUSTOM_REMINDER_LIST,
+    CALLBACK_CUSTOM_REMINDER_UNDONE
+)
+from bot_handlers.helpers import cancel_inline_kb, custom_reminder_item_kb, custom_reminder_main_kb
+from bot_handlers.state import pending_manual
+
+logger = logging.getLogger(__name__)
+
+
+def register(router, ctx):
+    """Register these callbacks on `router` (ctx: see handlers.register_handlers)."""
+    bot = ctx.bot
+    sch_mgr = ctx.sch_mgr
+    _custom_reminder_step_text = ctx._custom_reminder_step_text
+
+    @router.register(CALLBACK_CUSTOM_REMINDER, group="custom_reminder")
+    def _on_custom_reminder(c, uid, data, chat_id):
+        bot.send_message(chat_id, "🔔 تذكيراتي المخصصة:", reply_markup=custom_reminder_main_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_CUSTOM_REMINDER_ADD, group="custom_reminder")
+    def _on_custom_reminder_add(c, uid, data, chat_id):
+        pending_manual[chat_id] = {"step": "custom_text", "type": "custom_reminder"}
+        msg = bot.send_message(chat_id, "أرسل نص التذكير (أو اكتب 'إلغاء'):", reply_markup=cancel_inline_kb())
+        bot.register_next_step_handler(msg, _custom_reminder_step_text, chat_id, uid)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_CUSTOM_REMINDER_LIST, group="custom_reminder")
+    def _on_custom_reminder_list(c, uid, data, chat_id):
+        with db_connection() as conn_local:
+            reminders = get_all_custom_reminders_for_user(conn_local, uid)
+        if not reminders:
+            bot.send_message(chat_id, "لا توجد تذكيرات مخصصة.", reply_markup=custom_reminder_main_kb())
+            bot.answer_callback_query(c.id)
+            return
+        for r in reminders:
+            with db_connection() as conn_check:
+                is_done = is_custom_reminder_done_for_user(conn_check, r['id'], uid)
+            text = f"🔔 تذكير مخصص\n\n{r['text']}\n\n⏰ الموعد: {r['reminder_datetime']}\nID: {r['id']}"
+            kb = custom_reminder_item_kb(r['id'], is_done=is_done)
+            bot.send_message(chat_id, text, reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_CUSTOM_REMINDER_DELETE, exact_match=False, group="custom_reminder")
+    def _on_custom_reminder_delete(c, uid, data, chat_id):
+        reminder_id = int(data.split(":", 1)[1])
+        kb = types.InlineKeyboardMarkup()
+        kb.add(types.InlineKeyboardButton("نعم احذف", callback_data=f"{CALLBACK_CUSTOM_REMINDER_CONFIRM_DELETE}{reminder_id}"))
+        kb.add(types.InlineKeyboardButton("إلغاء", callback_data=CALLBACK_CUSTOM_REMINDER_LIST))
+        bot.send_message(chat_id, f"هل أنت متأكد من حذف التذكير المخصص ID:{reminder_id}؟", reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_CUSTOM_REMINDER_CONFIRM_DELETE, exact_match=False, group="custom_reminder")
+    def _on_custom_reminder_confirm_delete(c, uid, data, chat_id):
+        reminder_id = int(data.split(":", 1)[1])
+        with db_connection() as conn_local:
+            deleted = delete_custom_reminder(conn_local, reminder_id, uid)
+        if deleted:
+
+            try:
+                job_id = f"custom_reminder-{reminder_id}"
+                sch_mgr.remove_date_job(job_id)
+            except Exception:
+                pass
+            bot.send_message(chat_id, f"تم حذف التذكير المخصص (ID:{reminder_id}).")
+        else:
+            bot.send_message(chat_id, "لم أجد هذا التذكير أو ليس لديك صلاحية لحذفه.")
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_CUSTOM_REMINDER_DONE, exact_match=False, group="custom_reminder")
+    def _on_custom_reminder_done(c, uid, data, chat_id):
+        reminder_id = int(data.split(":", 1)[1])
+        with db_connection() as conn_local:
+            mark_custom_reminder_done(conn_local, reminder_id, uid)
+            r = get_custom_reminder(conn_local, reminder_id)
+            is_done = is_custom_reminder_done_for_user(conn_local, reminder_id, uid)
+        if r and r['user_id'] == uid:
+            try:
+                if c.message:
+                    text = f"🔔 تذكير مخصص\n\n{r['text']}\n\n⏰ الموعد: {r['reminder_datetime']}\nID: {r['id']}"
+                    kb = custom_reminder_item_kb(reminder_id, is_done=is_done)
+                    bot.edit_message_text(chat_id=chat_id, message_id=c.message.message_id, text=text, reply_markup=kb)
+                bot.send_message(chat_id, f"✅ تم وسم التذكير المخصص (ID:{reminder_id}) كـ 'تم' بالنسبة لك.")
+            except Exception:
+                bot.send_message(chat_id, f"✅ تم وسم التذكير المخصص (ID:{reminder_id}) كـ 'تم' بالنسبة لك.")
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_CUSTOM_REMINDER_UNDONE, exact_match=False, group="custom_reminder")
+    def _on_custom_reminder_undone(c, uid, data, chat_id):
+        reminder_id = int(data.split(":", 1)[1])
+        with db_connection() as conn_local:
+            mark_custom_reminder_undone(conn_local, reminder_id, uid)
+            r = get_custom_reminder(conn_local, reminder_id)
+            is_done = is_custom_reminder_done_for_user(conn_local, reminder_id, uid)
+        if r and r['user_id'] == uid:
+            try:
+                if c.message:
+                    text = f"🔔 تذكير مخصص\n\n{r['text']}\n\n⏰ الموعد: {r['reminder_datetime']}\nID: {r['id']}"
+                    kb = custom_reminder_item_kb(reminder_id, is_done=is_done)
+                    bot.edit_message_text(chat_id=chat_id, message_id=c.message.message_id, text=text, reply_markup=kb)
+                bot.send_message(chat_id, f"❌ تم إلغاء وضع 'تم' للتذكير المخصص (ID:{reminder_id}) بالنسبة لك.")
+            except Exception:
+                bot.send_message(chat_id, f"❌ تم إلغاء وضع 'تم' للتذكير المخصص (ID:{reminder_id}) بالنسبة لك.")
+        bot.answer_callback_query(c.id)
@@ -0,0 +1,232 @@
+# bot_handlers/callbacks/faq.py
+"""FAQ callbacks (student list/view and admin add/edit/delete)."""
+import logging
+from db import delete_faq_entry, get_all_faq_entries, get_faq_entry, update_faq_entry
+from db_utils import db_connection
+from constants import (
+    CALLBACK_FAQ_ADMIN, CALLBACK_FAQ_ADMIN_ADD, CALLBACK_FAQ_ADMIN_DELETE, CALLBACK_FAQ_ADMIN_DELETE_ANSWER,
+    CALLBACK_FAQ_ADMIN_DELETE_ANSWER_CONFIRM, CALLBACK_FAQ_ADMIN_DELETE_ANSWER_SELECT,
+    CALLBACK_FAQ_ADMIN_DELETE_CONFIRM, CALLBACK_FAQ_ADMIN_DELETE_SELECT, CALLBACK_FAQ_ADMIN_EDIT,
+    CALLBACK_FAQ_ADMIN_EDIT_ANSWER, CALLBACK_FAQ_ADMIN_EDIT_ANSWER_SELECT, CALLBACK_FAQ_ADMIN_EDIT_SELECT,
+    CALLBACK_FAQ_BACK, CALLBACK_FAQ_LIST, CALLBACK_FAQ_VIEW, FAQ_ANSWER_PLACEHOLDER
+)
+from bot_handlers.helpers import (
+    cancel_inline_kb, faq_admin_delete_answer_confirm_kb, faq_admin_delete_confirm_kb, faq_admin_main_kb,
+    faq_admin_select_kb, faq_item_kb, is_admin, main_menu_kb
+)
+from bot_handlers.state import pending_faq_admin
+
+logger = logging.getLogger(__name__)
+
+
+def register(router, ctx):
+    """Register these callbacks on `router` (ctx: see handlers.register_handlers)."""
+    bot = ctx.bot
+    faq_admin_add_step_question = ctx.faq_admin_add_step_question
+    faq_admin_edit_step_answer_only = ctx.faq_admin_edit_step_answer_only
+    faq_admin_edit_step_question = ctx.faq_admin_edit_step_question
+    send_faq_list = ctx.send_faq_list
+
+    @router.register(CALLBACK_FAQ_LIST, group="faq")
+    def _on_faq_list(c, uid, data, chat_id):
+        send_faq_list(chat_id)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_FAQ_BACK, group="faq")
+    def _on_faq_back(c, uid, data, chat_id):
+        bot.send_message(chat_id, "عاد للقائمة الرئيسية.", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_FAQ_VIEW, exact_match=False, group="faq")
+    def _on_faq_view(c, uid, data, chat_id):
+        faq_id = int(data.split(":", 1)[1])
+        with db_connection() as conn_local:
+            entry = get_faq_entry(conn_local, faq_id)
+        if not entry:
+            bot.answer_callback_query(c.id, "السؤال غير موجود.", show_alert=True)
+            return
+        text = f"❓ {entry['question']}\n\n{entry['answer']}"
+        kb = faq_item_kb()
+        try:
+            if c.message:
+                bot.edit_message_text(chat_id=chat_id, message_id=c.message.message_id, text=text, reply_markup=kb)
+            else:
+                bot.send_message(chat_id, text, reply_markup=kb)
+        except Exception:
+            bot.send_message(chat_id, text, reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_FAQ_ADMIN, group="faq")
+    def _on_faq_admin(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+        kb = faq_admin_main_kb()
+        bot.send_message(chat_id, "⚙️ إدارة الأسئلة الشائعة:", reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_FAQ_ADMIN_ADD, group="faq")
+    def _on_faq_admin_add(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+        pending_faq_admin[chat_id] = {"action": "add", "step": "question"}
+        msg = bot.send_message(chat_id, "أرسل نص السؤال (أو اكتب 'إلغاء'):", reply_markup=cancel_inline_kb())
+        bot.register_next_step_handler(msg, faq_admin_add_step_question, chat_id, uid)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_FAQ_ADMIN_EDIT, group="faq")
+    def _on_faq_admin_edit(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+        with db_connection() as conn_local:
+            entries = get_all_faq_entries(conn_local)
+        if not entries:
+            bot.send_message(chat_id, "لا توجد أسئلة شائعة للتعديل.", reply_markup=faq_admin_main_kb())
+            bot.answer_callback_query(c.id)
+            return
+        kb = faq_admin_select_kb(entries, "edit")
+        bot.send_message(chat_id, "اختر السؤال للتعديل:", reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_FAQ_ADMIN_EDIT_ANSWER, group="faq")
+    def _on_faq_admin_edit_answer(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+        with db_connection() as conn_local:
+            entries = get_all_faq_entries(conn_local)
+        if not entries:
+            bot.send_message(chat_id, "لا توجد أسئلة شائعة لتعديل الإجابة.", reply_markup=faq_admin_main_kb())
+            bot.answer_callback_query(c.id)
+            return
+        kb = faq_admin_select_kb(entries, "edit_answer")
+        bot.send_message(chat_id, "اختر السؤال لتعديل الإجابة:", reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_FAQ_ADMIN_DELETE, group="faq")
+    def _on_faq_admin_delete(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+        with db_connection() as conn_local:
+            entries = get_all_faq_entries(conn_local)
+        if not entries:
+            bot.send_message(chat_id, "لا توجد أسئلة شائعة للحذف.", reply_markup=faq_admin_main_kb())
+            bot.answer_callback_query(c.id)
+            return
+        kb = faq_admin_select_kb(entries, "delete")
+        bot.send_message(chat_id, "اختر السؤال للحذف:", reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_FAQ_ADMIN_DELETE_ANSWER, group="faq")
+    def _on_faq_admin_delete_answer(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+        with db_connection() as conn_local:
+            entries = get_all_faq_entries(conn_local)
+        if not entries:
+            bot.send_message(chat_id, "لا توجد أسئلة شائعة لحذف الإجابة.", reply_markup=faq_admin_main_kb())
+            bot.answer_callback_query(c.id)
+            return
+        kb = faq_admin_select_kb(entries, "delete_answer")
+        bot.send_message(chat_id, "اختر السؤال لحذف الإجابة:", reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_FAQ_ADMIN_EDIT_SELECT, exact_match=False, group="faq")
+    def _on_faq_admin_edit_select(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+        faq_id = int(data.split(":", 1)[1])
+        with db_connection() as conn_local:
+            entry = get_faq_entry(conn_local, faq_id)
+        if not entry:
+            bot.answer_callback_query(c.id, "السؤال غير موجود.", show_alert=True)
+            return
+        pending_faq_admin[chat_id] = {
+            "action": "edit",
+            "step": "question",
+            "faq_id": faq_id,
+            "current_question": entry["question"],
+            "current_answer": entry["answer"],
+        }
+        msg = bot.send_message(chat_id, "أرسل نص السؤال الجديد (أو اكتب 'إلغاء'):", reply_markup=cancel_inline_kb())
+        bot.register_next_step_handler(msg, faq_admin_edit_step_question, chat_id, uid)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_FAQ_ADMIN_EDIT_ANSWER_SELECT, exact_match=False, group="faq")
+    def _on_faq_admin_edit_answer_select(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+        faq_id = int(data.split(":", 1)[1])
+        with db_connection() as conn_local:
+            entry = get_faq_entry(conn_local, faq_id)
+        if not entry:
+            bot.answer_callback_query(c.id, "السؤال غير موجود.", show_alert=True)
+            return
+        pending_faq_admin[chat_id] = {
+            "action": "edit_answer",
+            "step": "answer",
+            "faq_id": faq_id,
+            "current_question": entry["question"],
+            "current_answer": entry["answer"],
+        }
+        msg = bot.send_message(chat_id, "أرسل الإجابة الجديدة (أو اكتب 'إلغاء'):", reply_markup=cancel_inline_kb())
+        bot.register_next_step_handler(msg, faq_admin_edit_step_answer_only, chat_id, uid)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_FAQ_ADMIN_DELETE_SELECT, exact_match=False, group="faq")
+    def _on_faq_admin_delete_select(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+        faq_id = int(data.split(":", 1)[1])
+        kb = faq_admin_delete_confirm_kb(faq_id)
+        bot.send_message(chat_id, f"هل أنت متأكد من حذف السؤال (ID:{faq_id})؟", reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_FAQ_ADMIN_DELETE_ANSWER_SELECT, exact_match=False, group="faq")
+    def _on_faq_admin_delete_answer_select(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+        faq_id = int(data.split(":", 1)[1])
+        kb = faq_admin_delete_answer_confirm_kb(faq_id)
+        bot.send_message(chat_id, f"هل أنت متأكد من حذف الإجابة (ID:{faq_id})؟", reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_FAQ_ADMIN_DELETE_CONFIRM, exact_match=False, group="faq")
+    def _on_faq_admin_delete_confirm(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+        faq_id = int(data.split(":", 1)[1])
+        with db_connection() as conn_local:
+            deleted = delete_faq_entry(conn_local, faq_id)
+        if deleted:
+            bot.send_message(chat_id, f"✅ تم حذف السؤال (ID:{faq_id}).", reply_markup=faq_admin_main_kb())
+        else:
+            bot.send_message(chat_id, f"لم يتم العثور على السؤال (ID:{faq_id}).", reply_markup=faq_admin_main_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_FAQ_ADMIN_DELETE_ANSWER_CONFIRM, exact_match=False, group="faq")
+    def _on_faq_admin_delete_answer_confirm(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+        faq_id = int(data.split(":", 1)[1])
+        with db_connection() as conn_local:
+            entry = get_faq_entry(conn_local, faq_id)
+            if entry:
+                deleted = update_faq_entry(conn_local, faq_id, entry["question"], FAQ_ANSWER_PLACEHOLDER)
+            else:
+                deleted = False
+        if deleted:
+            bot.send_message(chat_id, f"✅ تم حذف الإجابة (ID:{faq_id}).", reply_markup=faq_admin_main_kb())
+        else:
+            bot.send_message(chat_id, f"لم يتم العثور على السؤال (ID:{faq_id}).", reply_markup=faq_admin_main_kb())
+        bot.answer_callback_query(c.id)
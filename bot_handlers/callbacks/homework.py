@@ -0,0 +1,280 @@
+# bot_handlers/callbacks/homework.py
+"""Homework callbacks (list/browse, view, done/undone, add, edit, delete)."""
+import logging
+import telebot
+from telebot import types
+from db import (
+    delete_homework, get_all_homeworks_for_user, get_homework, get_homework_for_user, mark_done, mark_undone
+)
+from db_utils import db_connection
+from constants import (
+    CALLBACK_HW_ADD, CALLBACK_HW_BACK, CALLBACK_HW_CONFIRM_DELETE, CALLBACK_HW_DELETE, CALLBACK_HW_DELETE_ID,
+    CALLBACK_HW_DONE, CALLBACK_HW_EDIT, CALLBACK_HW_EDIT_FIELD, CALLBACK_HW_EDIT_ID, CALLBACK_HW_LIST,
+    CALLBACK_HW_PAGE, CALLBACK_HW_PDF, CALLBACK_HW_UNDONE, CALLBACK_HW_VIEW, HW_LIST_PAGE_SIZE
+)
+from bot_handlers.helpers import (
+    cancel_inline_kb, format_homework_page_text, format_homework_text, hw_item_kb, hw_list_page_kb, is_admin,
+    main_menu_kb
+)
+from bot_handlers.state import start_pending_add
+
+logger = logging.getLogger(__name__)
+
+
+def register(router, ctx):
+    """Register these callbacks on `router` (ctx: see handlers.register_handlers)."""
+    bot = ctx.bot
+    sch_mgr = ctx.sch_mgr
+    hw_add_step_subject = ctx.hw_add_step_subject
+    hw_edit_handle_field = ctx.hw_edit_handle_field
+
+    @router.register(CALLBACK_HW_BACK, group="homework")
+    def _on_hw_back(c, uid, data, chat_id):
+        try:
+            if c.message:
+                bot.edit_message_reply_markup(chat_id=chat_id, message_id=c.message.message_id, reply_markup=None)
+        except Exception:
+            pass
+        bot.send_message(chat_id, "عاد للقائمة الرئيسية.", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_HW_LIST, group="homework")
+    @router.register(CALLBACK_HW_PAGE, exact_match=False, group="homework")
+    def _on_hw_list(c, uid, data, chat_id):
+        try:
+            offset = max(int(data.split(":", 1)[1]), 0) if data.startswith(CALLBACK_HW_PAGE) else 0
+        except ValueError:
+            offset = 0
+        with db_connection() as conn_local:
+            # نجلب عنصرًا إضافيًا لمعرفة وجود صفحة تالية دون COUNT(*)
+            rows = get_all_homeworks_for_user(conn_local, uid, limit=HW_LIST_PAGE_SIZE + 1, offset=offset)
+        if not rows and offset > 0:
+            offset = 0
+            with db_connection() as conn_local:
+                rows = get_all_homeworks_for_user(conn_local, uid, limit=HW_LIST_PAGE_SIZE + 1, offset=0)
+
+        if not rows:
+            try:
+                bot.edit_message_reply_markup(chat_id=chat_id, message_id=c.message.message_id, reply_markup=None)
+            except Exception:
+                pass
+            bot.send_message(chat_id, "لا توجد واجبات محفوظة.", reply_markup=main_menu_kb())
+            bot.answer_callback_query(c.id)
+            return
+
+        has_next = len(rows) > HW_LIST_PAGE_SIZE
+        rows = rows[:HW_LIST_PAGE_SIZE]
+        text = format_homework_page_text(rows, offset)
+        kb = hw_list_page_kb(rows, offset, HW_LIST_PAGE_SIZE, has_next)
+        try:
+            if c.message:
+                bot.edit_message_text(chat_id=chat_id, message_id=c.message.message_id, text=text, reply_markup=kb)
+            else:
+                bot.send_message(chat_id, text, reply_markup=kb)
+        except telebot.apihelper.ApiTelegramException as e:
+            if "message is not modified" not in str(e):
+                bot.send_message(chat_id, text, reply_markup=kb)
+        except Exception:
+            bot.send_message(chat_id, text, reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_HW_ADD, group="homework")
+    def _on_hw_add(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+        start_pending_add(chat_id)
+        msg = bot.send_message(chat_id, "أرسل اسم المادة (أو اكتب 'إلغاء'):", reply_markup=cancel_inline_kb())
+        bot.register_next_step_handler(msg, hw_add_step_subject, chat_id, uid)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_HW_VIEW, exact_match=False, group="homework")
+    def _on_hw_view(c, uid, data, chat_id):
+        hw_id = int(data.split(":", 1)[1])
+        with db_connection() as conn_local:
+            r = get_homework_for_user(conn_local, hw_id, uid)
+        if not r:
+            bot.answer_callback_query(c.id, "لم أجد هذا الواجب.", show_alert=True)
+            return
+        text = format_homework_text(r)
+        kb = hw_item_kb(uid, r['id'], is_done=bool(r['done_for_user']))
+        try:
+            if c.message:
+                bot.edit_message_text(chat_id=chat_id, message_id=c.message.message_id, text=text, reply_markup=kb)
+            else:
+                bot.send_message(chat_id, text, reply_markup=kb)
+        except Exception:
+            bot.send_message(chat_id, text, reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_HW_DONE, exact_match=False, group="homework")
+    def _on_hw_done(c, uid, data, chat_id):
+        hw_id = int(data.split(":", 1)[1])
+        with db_connection() as conn_local:
+            mark_done(conn_local, hw_id, uid)
+
+            r = get_homework_for_user(conn_local, hw_id, uid)
+            is_done = bool(r['done_for_user']) if r else True
+        if r:
+
+            try:
+                if c.message:
+                    text = format_homework_text(r)
+                    kb = hw_item_kb(uid, hw_id, is_done=is_done)
+                    bot.edit_message_text(chat_id=chat_id, message_id=c.message.message_id, text=text, reply_markup=kb)
+                bot.send_message(chat_id, f"✅ تم وسم الواجب (ID:{hw_id}) كـ 'تم' بالنسبة لك.")
+            except Exception:
+                bot.send_message(chat_id, f"✅ تم وسم الواجب (ID:{hw_id}) كـ 'تم' بالنسبة لك.")
+        else:
+            bot.send_message(chat_id, f"✅ تم وسم الواجب (ID:{hw_id}) كـ 'تم' بالنسبة لك.")
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_HW_UNDONE, exact_match=False, group="homework")
+    def _on_hw_undone(c, uid, data, chat_id):
+        hw_id = int(data.split(":", 1)[1])
+        with db_connection() as conn_local:
+            mark_undone(conn_local, hw_id, uid)
+
+            r = get_homework_for_user(conn_local, hw_id, uid)
+            is_done = bool(r['done_for_user']) if r else False
+        if r:
+
+            try:
+                if c.message:
+                    text = format_homework_text(r)
+                    kb = hw_item_kb(uid, hw_id, is_done=is_done)
+                    bot.edit_message_text(chat_id=chat_id, message_id=c.message.message_id, text=text, reply_markup=kb)
+                bot.send_message(chat_id, f"❌ تم إلغاء وضع 'تم' للواجب (ID:{hw_id}) بالنسبة لك.")
+            except Exception:
+                bot.send_message(chat_id, f"❌ تم إلغاء وضع 'تم' للواجب (ID:{hw_id}) بالنسبة لك.")
+        else:
+            bot.send_message(chat_id, f"❌ تم إلغاء وضع 'تم' للواجب (ID:{hw_id}) بالنسبة لك.")
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_HW_PDF, exact_match=False, group="homework")
+    def _on_hw_pdf(c, uid, data, chat_id):
+        hw_id = int(data.split(":", 1)[1])
+        with db_connection() as conn_local:
+            r = get_homework(conn_local, hw_id)
+        if not r:
+            bot.answer_callback_query(c.id, "لم أجد هذا الواجب.", show_alert=True)
+            return
+        if r["pdf_type"] == "file_id":
+            try:
+                bot.send_document(chat_id, r["pdf_value"])
+            except Exception:
+                bot.send_message(chat_id, "فشل إرسال الملف.")
+        elif r["pdf_type"] == "url" and r["pdf_value"]:
+            kb = types.InlineKeyboardMarkup()
+            kb.add(types.InlineKeyboardButton("فتح رابط الملف", url=r["pdf_value"]))
+            bot.send_message(chat_id, "ملف الواجب:", reply_markup=kb)
+        else:
+            bot.send_message(chat_id, "لا يوجد ملف مرفق لهذا الواجب.")
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_HW_EDIT, group="homework")
+    def _on_hw_edit(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+        with db_connection() as conn_local:
+            rows = get_all_homeworks_for_user(conn_local, uid)
+        if not rows:
+            bot.answer_callback_query(c.id, "لا توجد واجبات.", show_alert=False)
+            return
+        kb = types.InlineKeyboardMarkup()
+        for r in rows:
+            kb.add(types.InlineKeyboardButton(f"{r['id']} | {r['subject']} | {r['due_at']}", 
+                                              callback_data=f"{CALLBACK_HW_EDIT_ID}{r['id']}"))
+        kb.add(types.InlineKeyboardButton("↩️ رجوع", callback_data=CALLBACK_HW_BACK))
+        try:
+            if c.message:
+                bot.edit_message_reply_markup(chat_id=chat_id, message_id=c.message.message_id, reply_markup=None)
+        except Exception:
+            pass
+        bot.send_message(chat_id, "اختر واجبًا للتعديل:", reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_HW_DELETE, group="homework")
+    def _on_hw_delete(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+        with db_connection() as conn_local:
+            rows = get_all_homeworks_for_user(conn_local, uid)
+        if not rows:
+            bot.answer_callback_query(c.id, "لا توجد واجبات.", show_alert=False)
+            return
+        kb = types.InlineKeyboardMarkup()
+        for r in rows:
+            kb.add(types.InlineKeyboardButton(f"{r['id']} | {r['subject']} | {r['due_at']}", 
+                                              callback_data=f"{CALLBACK_HW_DELETE_ID}{r['id']}"))
+        kb.add(types.InlineKeyboardButton("↩️ رجوع", callback_data=CALLBACK_HW_BACK))
+        try:
+            if c.message:
+                bot.edit_message_reply_markup(chat_id=chat_id, message_id=c.message.message_id, reply_markup=None)
+        except Exception:
+            pass
+        bot.send_message(chat_id, "اختر واجبًا للحذف:", reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_HW_DELETE_ID, exact_match=False, group="homework")
+    def _on_hw_delete_id(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+        hw_id = int(data.split(":", 1)[1])
+        kb = types.InlineKeyboardMarkup()
+        kb.add(types.InlineKeyboardButton("نعم احذف", callback_data=f"{CALLBACK_HW_CONFIRM_DELETE}{hw_id}"))
+        kb.add(types.InlineKeyboardButton("إلغاء", callback_data=CALLBACK_HW_BACK))
+        bot.send_message(chat_id, f"هل أنت متأكد من حذف الواجب ID:{hw_id} ؟", reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_HW_CONFIRM_DELETE, exact_match=False, group="homework")
+    def _on_hw_confirm_delete(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+        hw_id = int(data.split(":", 1)[1])
+        with db_connection() as conn_local:
+            delete_homework(conn_local, hw_id)
+        sch_mgr.remove_hw_jobs(hw_id)
+        bot.send_message(chat_id, f"حُذف الواجب (ID:{hw_id}).")
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_HW_EDIT_ID, exact_match=False, group="homework")
+    def _on_hw_edit_id(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+        hw_id = int(data.split(":", 1)[1])
+        kb = types.InlineKeyboardMarkup()
+        kb.add(types.InlineKeyboardButton("تعديل المادة", callback_data=f"{CALLBACK_HW_EDIT_FIELD}{hw_id}:subject"))
+        kb.add(types.InlineKeyboardButton("تعديل الوصف", callback_data=f"{CALLBACK_HW_EDIT_FIELD}{hw_id}:description"))
+        kb.add(types.InlineKeyboardButton("تعديل الموعد", callback_data=f"{CALLBACK_HW_EDIT_FIELD}{hw_id}:due_at"))
+        kb.add(types.InlineKeyboardButton("تعديل ملف PDF", callback_data=f"{CALLBACK_HW_EDIT_FIELD}{hw_id}:pdf"))
+        kb.add(types.InlineKeyboardButton("تعديل الشروط", callback_data=f"{CALLBACK_HW_EDIT_FIELD}{hw_id}:conditions"))
+        kb.add(types.InlineKeyboardButton("تعديل التذكيرات", callback_data=f"{CALLBACK_HW_EDIT_FIELD}{hw_id}:reminders"))
+        kb.add(types.InlineKeyboardButton("رجوع", callback_data=CALLBACK_HW_BACK))
+        bot.send_message(chat_id, "اختر الحقل الذي تريد تعديله:", reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_HW_EDIT_FIELD, exact_match=False, group="homework")
+    def _on_hw_edit_field(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+        parts = data.split(":")
+        hw_id = int(parts[1])
+        field = parts[2]
+        prompt_map = {
+            "subject": "أرسل المادة الجديدة (أو اكتب 'إلغاء'):",
+            "description": "أرسل الوصف الجديد (أو اكتب 'إلغاء'):",
+            "due_at": "أرسل الموعد الجديد بصيغة YYYY-MM-DD HH:MM (أو 'إلغاء'):",
+            "pdf": "أرسل الآن ملف PDF كملف أو رابط URL أو اكتب 'none' لإزالته أو 'إلغاء' لإيقاف:",
+            "conditions": "أرسل الشروط الجديدة أو 'none' أو 'إلغاء':",
+            "reminders": "أرسل التذكيرات (مثال: default أو 7,3,1) أو 'إلغاء':"
+        }
+        msg = bot.send_message(chat_id, prompt_map.get(field, "أرسل القيمة الجديدة (أو 'إلغاء'):"), reply_markup=cancel_inline_kb())
+        bot.register_next_step_handler(msg, hw_edit_handle_field, hw_id, field)
+        bot.answer_callback_query(c.id)
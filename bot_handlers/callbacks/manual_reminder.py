@@ -0,0 +1,78 @@
+# bot_handlers/callbacks/manual_reminder.py
+"""Manual reminder callbacks (send now / schedule, target selection)."""
+import logging
+from telebot import types
+from constants import (
+    CALLBACK_HW_CANCEL, CALLBACK_MANUAL_REMINDER, CALLBACK_MANUAL_SCHEDULE, CALLBACK_MANUAL_SEND_NOW,
+    CALLBACK_MANUAL_TARGET_ALL, CALLBACK_MANUAL_TARGET_CHAT, CALLBACK_MANUAL_TARGET_CHAT_TOPIC,
+    CALLBACK_MANUAL_TARGET_USER, PENDING_STEP_ENTER_CHAT, PENDING_STEP_ENTER_CONTENT,
+    PENDING_STEP_ENTER_TARGET, PENDING_STEP_TARGET_TYPE
+)
+from bot_handlers.helpers import cancel_inline_kb, is_admin
+from bot_handlers.state import pending_manual, start_pending_manual
+
+logger = logging.getLogger(__name__)
+
+
+def register(router, ctx):
+    """Register these callbacks on `router` (ctx: see handlers.register_handlers)."""
+    bot = ctx.bot
+    _manual_next_step_handler = ctx._manual_next_step_handler
+
+    @router.register(CALLBACK_MANUAL_REMINDER, group="manual_reminder")
+    def _on_manual_reminder(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+        start_pending_manual(chat_id)
+        kb = types.InlineKeyboardMarkup()
+        kb.add(types.InlineKeyboardButton("أرسل الآن", callback_data=CALLBACK_MANUAL_SEND_NOW))
+        kb.add(types.InlineKeyboardButton("جدولة", callback_data=CALLBACK_MANUAL_SCHEDULE))
+        kb.add(types.InlineKeyboardButton("إلغاء", callback_data=CALLBACK_HW_CANCEL))
+        bot.send_message(chat_id, "هل تريد إرسال التذكير الآن أم جدولة؟", reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_MANUAL_SEND_NOW, group="manual_reminder")
+    @router.register(CALLBACK_MANUAL_SCHEDULE, group="manual_reminder")
+    def _on_manual_send_now(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+        mode = "now" if data == CALLBACK_MANUAL_SEND_NOW else "schedule"
+        pending_manual[chat_id] = {"mode": mode, "step": PENDING_STEP_TARGET_TYPE}
+        kb = types.InlineKeyboardMarkup()
+        kb.add(types.InlineKeyboardButton("إلى الجميع", callback_data=CALLBACK_MANUAL_TARGET_ALL))
+        kb.add(types.InlineKeyboardButton("إلى user_id", callback_data=CALLBACK_MANUAL_TARGET_USER))
+        kb.add(types.InlineKeyboardButton("إلى chat", callback_data=CALLBACK_MANUAL_TARGET_CHAT))
+        kb.add(types.InlineKeyboardButton("إلى chat topic (موضوع)", callback_data=CALLBACK_MANUAL_TARGET_CHAT_TOPIC))
+        kb.add(types.InlineKeyboardButton("إلغاء", callback_data=CALLBACK_HW_CANCEL))
+        bot.send_message(chat_id, "اختر نوع المستهدف:", reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register("manual_target_", exact_match=False, group="manual_reminder")
+    def _on_manual_target(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+        t = data.split("manual_target_")[1]
+        pm = pending_manual.get(chat_id) or {}
+        pm["target_type"] = t
+
+        if t == "all":
+            pm["step"] = PENDING_STEP_ENTER_CONTENT
+        elif t == "chat_topic":
+            pm["step"] = PENDING_STEP_ENTER_CHAT
+        else:
+            pm["step"] = PENDING_STEP_ENTER_TARGET
+        pending_manual[chat_id] = pm
+
+        if pm["step"] == PENDING_STEP_ENTER_CONTENT:
+            msg = bot.send_message(chat_id, "أرسل نص التذكير أو ملف (صورة، صوت، PDF، فيديو، إلخ) أو كليهما:\nيمكنك إرسال ملف أولاً ثم النص، أو النص فقط، أو الملف فقط.", reply_markup=cancel_inline_kb())
+            bot.register_next_step_handler(msg, _manual_next_step_handler, chat_id)
+        elif pm["step"] == PENDING_STEP_ENTER_TARGET:
+            msg = bot.send_message(chat_id, "أدخل قيمة المستهدف (مثلاً user_id أو chat_id) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
+            bot.register_next_step_handler(msg, _manual_next_step_handler, chat_id)
+        elif pm["step"] == PENDING_STEP_ENTER_CHAT:
+            msg = bot.send_message(chat_id, "أدخل chat_id للمجموعة (يمكنك أيضًا الرد داخل الـ topic برسالة). ثم اضغط إرسال:", reply_markup=cancel_inline_kb())
+            bot.register_next_step_handler(msg, _manual_next_step_handler, chat_id)
+        bot.answer_callback_query(c.id)
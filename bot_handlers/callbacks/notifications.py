@@ -0,0 +1,302 @@
+# bot_handlers/callbacks/notifications.py
+"""Notification settings callbacks."""
+import logging
+from db import (
+    disable_all_notifications, enable_all_notifications, get_notification_settings, set_notification_setting
+)
+from db_utils import db_connection, safe_get
+from constants import (
+    CALLBACK_NOTIFICATION_DISABLE_ALL, CALLBACK_NOTIFICATION_DISABLE_CUSTOM,
+    CALLBACK_NOTIFICATION_DISABLE_HOMEWORK, CALLBACK_NOTIFICATION_DISABLE_MANUAL,
+    CALLBACK_NOTIFICATION_ENABLE_ALL, CALLBACK_NOTIFICATION_ENABLE_CUSTOM,
+    CALLBACK_NOTIFICATION_ENABLE_HOMEWORK, CALLBACK_NOTIFICATION_ENABLE_MANUAL,
+    CALLBACK_NOTIFICATION_SETTINGS
+)
+from bot_handlers.helpers import main_menu_kb, notification_settings_kb
+
+logger = logging.getLogger(__name__)
+
+
+def register(router, ctx):
+    """Register these callbacks on `router` (ctx: see handlers.register_handlers)."""
+    bot = ctx.bot
+
+    @router.register(CALLBACK_NOTIFICATION_SETTINGS, group="notifications")
+    def _on_notification_settings(c, uid, data, chat_id):
+        reply_chat_id = chat_id or c.from_user.id
+        try:
+            with db_connection() as conn:
+                settings = get_notification_settings(conn, uid)
+                if settings:
+
+                    homework_enabled = bool(safe_get(settings, 'homework_reminders_enabled', 1))
+                    manual_enabled = bool(safe_get(settings, 'manual_reminders_enabled', 1))
+                    custom_enabled = bool(safe_get(settings, 'custom_reminders_enabled', 1))
+                else:
+
+                    homework_enabled = True
+                    manual_enabled = True
+                    custom_enabled = True
+
+                text = "🔕 **إعدادات الإشعارات**\n\n"
+                text += "يمكنك اختيار أنواع الإشعارات التي تريد استقبالها:\n\n"
+                text += f"• تذكيرات الواجبات: {'✅ مفعّلة' if homework_enabled else '❌ معطّلة'}\n"
+                text += f"• تذكيرات الأدمين: {'✅ مفعّلة' if manual_enabled else '❌ معطّلة'}\n"
+                text += f"• تذكيراتي المخصصة: {'✅ مفعّلة' if custom_enabled else '❌ معطّلة'}\n\n"
+                text += "اضغط على الزر لتغيير الإعداد."
+
+                kb = notification_settings_kb(homework_enabled, manual_enabled, custom_enabled)
+                try:
+                    bot.send_message(reply_chat_id, text, parse_mode='Markdown', reply_markup=kb)
+                except Exception:
+
+                    text_plain = text.replace('**', '').replace('`', '')
+                    bot.send_message(reply_chat_id, text_plain, reply_markup=kb)
+        except Exception as e:
+            logger.exception("Failed to load notification settings")
+            bot.send_message(reply_chat_id, f"حدث خطأ في تحميل إعدادات الإشعارات: {e}", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_NOTIFICATION_DISABLE_HOMEWORK, group="notifications")
+    def _on_notification_disable_homework(c, uid, data, chat_id):
+        reply_chat_id = chat_id or c.from_user.id
+        try:
+            with db_connection() as conn:
+                set_notification_setting(conn, uid, 'homework_reminders', False)
+
+                settings = get_notification_settings(conn, uid)
+                if settings:
+                    homework_enabled = bool(safe_get(settings, 'homework_reminders_enabled', 1))
+                    manual_enabled = bool(safe_get(settings, 'manual_reminders_enabled', 1))
+                    custom_enabled = bool(safe_get(settings, 'custom_reminders_enabled', 1))
+                else:
+                    homework_enabled = False
+                    manual_enabled = True
+                    custom_enabled = True
+                text = "🔕 **إعدادات الإشعارات**\n\n✅ تم إيقاف تذكيرات الواجبات.\n\n"
+                text += "يمكنك اختيار أنواع الإشعارات التي تريد استقبالها:\n\n"
+                text += f"• تذكيرات الواجبات: {'✅ مفعّلة' if homework_enabled else '❌ معطّلة'}\n"
+                text += f"• تذكيرات الأدمين: {'✅ مفعّلة' if manual_enabled else '❌ معطّلة'}\n"
+                text += f"• تذكيراتي المخصصة: {'✅ مفعّلة' if custom_enabled else '❌ معطّلة'}\n\n"
+                text += "اضغط على الزر لتغيير الإعداد."
+                kb = notification_settings_kb(homework_enabled, manual_enabled, custom_enabled)
+                try:
+                    bot.send_message(reply_chat_id, text, parse_mode='Markdown', reply_markup=kb)
+                except Exception:
+                    text_plain = text.replace('**', '').replace('`', '')
+                    bot.send_message(reply_chat_id, text_plain, reply_markup=kb)
+        except Exception as e:
+            logger.exception("Failed to disable homework reminders")
+            bot.send_message(reply_chat_id, f"حدث خطأ: {e}", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_NOTIFICATION_ENABLE_HOMEWORK, group="notifications")
+    def _on_notification_enable_homework(c, uid, data, chat_id):
+        reply_chat_id = chat_id or c.from_user.id
+        try:
+            with db_connection() as conn:
+                set_notification_setting(conn, uid, 'homework_reminders', True)
+
+                settings = get_notification_settings(conn, uid)
+                if settings:
+                    homework_enabled = bool(safe_get(settings, 'homework_reminders_enabled', 1))
+                    manual_enabled = bool(safe_get(settings, 'manual_reminders_enabled', 1))
+                    custom_enabled = bool(safe_get(settings, 'custom_reminders_enabled', 1))
+                else:
+                    homework_enabled = True
+                    manual_enabled = True
+                    custom_enabled = True
+                text = "🔕 **إعدادات الإشعارات**\n\n✅ تم تفعيل تذكيرات الواجبات.\n\n"
+                text += "يمكنك اختيار أنواع الإشعارات التي تريد استقبالها:\n\n"
+                text += f"• تذكيرات الواجبات: {'✅ مفعّلة' if homework_enabled else '❌ معطّلة'}\n"
+                text += f"• تذكيرات الأدمين: {'✅ مفعّلة' if manual_enabled else '❌ معطّلة'}\n"
+                text += f"• تذكيراتي المخصصة: {'✅ مفعّلة' if custom_enabled else '❌ معطّلة'}\n\n"
+                text += "اضغط على الزر لتغيير الإعداد."
+                kb = notification_settings_kb(homework_enabled, manual_enabled, custom_enabled)
+                try:
+                    bot.send_message(reply_chat_id, text, parse_mode='Markdown', reply_markup=kb)
+                except Exception:
+                    text_plain = text.replace('**', '').replace('`', '')
+                    bot.send_message(reply_chat_id, text_plain, reply_markup=kb)
+        except Exception as e:
+            logger.exception("Failed to enable homework reminders")
+            bot.send_message(reply_chat_id, f"حدث خطأ: {e}", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_NOTIFICATION_DISABLE_MANUAL, group="notifications")
+    def _on_notification_disable_manual(c, uid, data, chat_id):
+        reply_chat_id = chat_id or c.from_user.id
+        try:
+            with db_connection() as conn:
+                set_notification_setting(conn, uid, 'manual_reminders', False)
+
+                settings = get_notification_settings(conn, uid)
+                if settings:
+                    homework_enabled = bool(safe_get(settings, 'homework_reminders_enabled', 1))
+                    manual_enabled = bool(safe_get(settings, 'manual_reminders_enabled', 1))
+                    custom_enabled = bool(safe_get(settings, 'custom_reminders_enabled', 1))
+                else:
+                    homework_enabled = True
+                    manual_enabled = False
+                    custom_enabled = True
+                text = "🔕 **إعدادات الإشعارات**\n\n✅ تم إيقاف تذكيرات الأدمين.\n\n"
+                text += "يمكنك اختيار أنواع الإشعارات التي تريد استقبالها:\n\n"
+                text += f"• تذكيرات الواجبات: {'✅ مفعّلة' if homework_enabled else '❌ معطّلة'}\n"
+                text += f"• تذكيرات الأدمين: {'✅ مفعّلة' if manual_enabled else '❌ معطّلة'}\n"
+                text += f"• تذكيراتي المخصصة: {'✅ مفعّلة' if custom_enabled else '❌ معطّلة'}\n\n"
+                text += "اضغط على الزر لتغيير الإعداد."
+                kb = notification_settings_kb(homework_enabled, manual_enabled, custom_enabled)
+                try:
+                    bot.send_message(reply_chat_id, text, parse_mode='Markdown', reply_markup=kb)
+                except Exception:
+                    text_plain = text.replace('**', '').replace('`', '')
+                    bot.send_message(reply_chat_id, text_plain, reply_markup=kb)
+        except Exception as e:
+            logger.exception("Failed to disable manual reminders")
+            bot.send_message(reply_chat_id, f"حدث خطأ: {e}", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_NOTIFICATION_ENABLE_MANUAL, group="notifications")
+    def _on_notification_enable_manual(c, uid, data, chat_id):
+        reply_chat_id = chat_id or c.from_user.id
+        try:
+            with db_connection() as conn:
+                set_notification_setting(conn, uid, 'manual_reminders', True)
+
+                settings = get_notification_settings(conn, uid)
+                if settings:
+                    homework_enabled = bool(safe_get(settings, 'homework_reminders_enabled', 1))
+                    manual_enabled = bool(safe_get(settings, 'manual_reminders_enabled', 1))
+                    custom_enabled = bool(safe_get(settings, 'custom_reminders_enabled', 1))
+                else:
+                    homework_enabled = True
+                    manual_enabled = True
+                    custom_enabled = True
+                text = "🔕 **إعدادات الإشعارات**\n\n✅ تم تفعيل تذكيرات الأدمين.\n\n"
+                text += "يمكنك اختيار أنواع الإشعارات التي تريد استقبالها:\n\n"
+                text += f"• تذكيرات الواجبات: {'✅ مفعّلة' if homework_enabled else '❌ معطّلة'}\n"
+                text += f"• تذكيرات الأدمين: {'✅ مفعّلة' if manual_enabled else '❌ معطّلة'}\n"
+                text += f"• تذكيراتي المخصصة: {'✅ مفعّلة' if custom_enabled else '❌ معطّلة'}\n\n"
+                text += "اضغط على الزر لتغيير الإعداد."
+                kb = notification_settings_kb(homework_enabled, manual_enabled, custom_enabled)
+                try:
+                    bot.send_message(reply_chat_id, text, parse_mode='Markdown', reply_markup=kb)
+                except Exception:
+                    text_plain = text.replace('**', '').replace('`', '')
+                    bot.send_message(reply_chat_id, text_plain, reply_markup=kb)
+        except Exception as e:
+            logger.exception("Failed to enable manual reminders")
+            bot.send_message(reply_chat_id, f"حدث خطأ: {e}", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_NOTIFICATION_DISABLE_CUSTOM, group="notifications")
+    def _on_notification_disable_custom(c, uid, data, chat_id):
+        reply_chat_id = chat_id or c.from_user.id
+        try:
+            with db_connection() as conn:
+                set_notification_setting(conn, uid, 'custom_reminders', False)
+
+                settings = get_notification_settings(conn, uid)
+                if settings:
+                    homework_enabled = bool(safe_get(settings, 'homework_reminders_enabled', 1))
+                    manual_enabled = bool(safe_get(settings, 'manual_reminders_enabled', 1))
+                    custom_enabled = bool(safe_get(settings, 'custom_reminders_enabled', 1))
+                else:
+                    homework_enabled = True
+                    manual_enabled = True
+                    custom_enabled = False
+                text = "🔕 **إعدادات الإشعارات**\n\n✅ تم إيقاف تذكيراتي المخصصة.\n\n"
+                text += "يمكنك اختيار أنواع الإشعارات التي تريد استقبالها:\n\n"
+                text += f"• تذكيرات الواجبات: {'✅ مفعّلة' if homework_enabled else '❌ معطّلة'}\n"
+                text += f"• تذكيرات الأدمين: {'✅ مفعّلة' if manual_enabled else '❌ معطّلة'}\n"
+                text += f"• تذكيراتي المخصصة: {'✅ مفعّلة' if custom_enabled else '❌ معطّلة'}\n\n"
+                text += "اضغط على الزر لتغيير الإعداد."
+                kb = notification_settings_kb(homework_enabled, manual_enabled, custom_enabled)
+                try:
+                    bot.send_message(reply_chat_id, text, parse_mode='Markdown', reply_markup=kb)
+                except Exception:
+                    text_plain = text.replace('**', '').replace('`', '')
+                    bot.send_message(reply_chat_id, text_plain, reply_markup=kb)
+        except Exception as e:
+            logger.exception("Failed to disable custom reminders")
+            bot.send_message(reply_chat_id, f"حدث خطأ: {e}", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_NOTIFICATION_ENABLE_CUSTOM, group="notifications")
+    def _on_notification_enable_custom(c, uid, data, chat_id):
+        reply_chat_id = chat_id or c.from_user.id
+        try:
+            with db_connection() as conn:
+                set_notification_setting(conn, uid, 'custom_reminders', True)
+
+                settings = get_notification_settings(conn, uid)
+                if settings:
+                    homework_enabled = bool(safe_get(settings, 'homework_reminders_enabled', 1))
+                    manual_enabled = bool(safe_get(settings, 'manual_reminders_enabled', 1))
+                    custom_enabled = bool(safe_get(settings, 'custom_reminders_enabled', 1))
+                else:
+                    homework_enabled = True
+                    manual_enabled = True
+                    custom_enabled = True
+                text = "🔕 **إعدادات الإشعارات**\n\n✅ تم تفعيل تذكيراتي المخصصة.\n\n"
+                text += "يمكنك اختيار أنواع الإشعارات التي تريد استقبالها:\n\n"
+                text += f"• تذكيرات الواجبات: {'✅ مفعّلة' if homework_enabled else '❌ معطّلة'}\n"
+                text += f"• تذكيرات الأدمين: {'✅ مفعّلة' if manual_enabled else '❌ معطّلة'}\n"
+                text += f"• تذكيراتي المخصصة: {'✅ مفعّلة' if custom_enabled else '❌ معطّلة'}\n\n"
+                text += "اضغط على الزر لتغيير الإعداد."
+                kb = notification_settings_kb(homework_enabled, manual_enabled, custom_enabled)
+                try:
+                    bot.send_message(reply_chat_id, text, parse_mode='Markdown', reply_markup=kb)
+                except Exception:
+                    text_plain = text.replace('**', '').replace('`', '')
+                    bot.send_message(reply_chat_id, text_plain, reply_markup=kb)
+        except Exception as e:
+            logger.exception("Failed to enable custom reminders")
+            bot.send_message(reply_chat_id, f"حدث خطأ: {e}", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_NOTIFICATION_DISABLE_ALL, group="notifications")
+    def _on_notification_disable_all(c, uid, data, chat_id):
+        reply_chat_id = chat_id or c.from_user.id
+        try:
+            with db_connection() as conn:
+                disable_all_notifications(conn, uid)
+                text = "🔕 **إعدادات الإشعارات**\n\n✅ تم إيقاف جميع الإشعارات.\n\n"
+                text += "يمكنك اختيار أنواع الإشعارات التي تريد استقبالها:\n\n"
+                text += "• تذكيرات الواجبات: ❌ معطّلة\n"
+                text += "• تذكيرات الأدمين: ❌ معطّلة\n"
+                text += "• تذكيراتي المخصصة: ❌ معطّلة\n\n"
+                text += "اضغط على الزر لتغيير الإعداد."
+                kb = notification_settings_kb(False, False, False)
+                try:
+                    bot.send_message(reply_chat_id, text, parse_mode='Markdown', reply_markup=kb)
+                except Exception:
+                    text_plain = text.replace('**', '').replace('`', '')
+                    bot.send_message(reply_chat_id, text_plain, reply_markup=kb)
+        except Exception as e:
+            logger.exception("Failed to disable all notifications")
+            bot.send_message(reply_chat_id, f"حدث خطأ: {e}", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_NOTIFICATION_ENABLE_ALL, group="notifications")
+    def _on_notification_enable_all(c, uid, data, chat_id):
+        reply_chat_id = chat_id or c.from_user.id
+        try:
+            with db_connection() as conn:
+                enable_all_notifications(conn, uid)
+                text = "🔕 **إعدادات الإشعارات**\n\n✅ تم استعادة جميع الإشعارات.\n\n"
+                text += "يمكنك اختيار أنواع الإشعارات التي تريد استقبالها:\n\n"
+                text += "• تذكيرات الواجبات: ✅ مفعّلة\n"
+                text += "• تذكيرات الأدمين: ✅ مفعّلة\n"
+                text += "• تذكيراتي المخصصة: ✅ مفعّلة\n\n"
+                text += "اضغط على الزر لتغيير الإعداد."
+                kb = notification_settings_kb(True, True, True)
+                try:
+                    bot.send_message(reply_chat_id, text, parse_mode='Markdown', reply_markup=kb)
+                except Exception:
+                    text_plain = text.replace('**', '').replace('`', '')
+                    bot.send_message(reply_chat_id, text_plain, reply_markup=kb)
+        except Exception as e:
+            logger.exception("Failed to enable all notifications")
+            bot.send_message(reply_chat_id, f"حدث خطأ: {e}", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
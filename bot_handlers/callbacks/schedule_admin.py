@@ -0,0 +1,713 @@
+# bot_handlers/callbacks/schedule_admin.py
+"""Weekly schedule admin callbacks (classes, locations, class edits, alternating weeks)."""
+import logging
+from telebot import types
+from db_utils import db_connection, safe_get
+from constants import (
+    CALLBACK_ALTERNATING_ADD, CALLBACK_ALTERNATING_EDIT, CALLBACK_ALTERNATING_EDIT_DATE,
+    CALLBACK_ALTERNATING_LIST, CALLBACK_HW_CANCEL, CALLBACK_SCHEDULE_EDIT_ALTERNATING,
+    CALLBACK_SCHEDULE_EDIT_COURSE, CALLBACK_SCHEDULE_EDIT_LOCATION, CALLBACK_SCHEDULE_EDIT_TIME_END,
+    CALLBACK_SCHEDULE_EDIT_TIME_START, CALLBACK_SCHEDULE_EDIT_TYPE, CALLBACK_WEEKLY_SCHEDULE_ADMIN,
+    CALLBACK_WEEKLY_SCHEDULE_ADMIN_ADD, CALLBACK_WEEKLY_SCHEDULE_ADMIN_ALTERNATING,
+    CALLBACK_WEEKLY_SCHEDULE_ADMIN_CONFIRM_DELETE, CALLBACK_WEEKLY_SCHEDULE_ADMIN_DAY,
+    CALLBACK_WEEKLY_SCHEDULE_ADMIN_DELETE, CALLBACK_WEEKLY_SCHEDULE_ADMIN_EDIT,
+    CALLBACK_WEEKLY_SCHEDULE_ADMIN_GROUP, CALLBACK_WEEKLY_SCHEDULE_ADMIN_LOCATIONS,
+    CALLBACK_WEEKLY_SCHEDULE_ADMIN_VIEW
+)
+from bot_handlers.helpers import cancel_inline_kb, is_admin, main_menu_kb
+from bot_handlers.schedule_admin_helpers import (
+    DAY_NAMES_AR, alternating_config_actions_kb, alternating_configs_list_kb,
+    format_alternating_config_for_display, format_class_for_display, schedule_admin_class_actions_kb,
+    schedule_admin_classes_list_kb, schedule_admin_day_menu_kb, schedule_admin_days_kb,
+    schedule_admin_groups_kb
+)
+from bot_handlers.state import pending_schedule_admin
+
+logger = logging.getLogger(__name__)
+
+
+def register(router, ctx):
+    """Register these callbacks on `router` (ctx: see handlers.register_handlers)."""
+    bot = ctx.bot
+    schedule_admin_add_alternating_config_step_key = ctx.schedule_admin_add_alternating_config_step_key
+    schedule_admin_add_step_time_start = ctx.schedule_admin_add_step_time_start
+    schedule_admin_add_step_alternating = ctx.schedule_admin_add_step_alternating
+    schedule_admin_edit_alternating_config_step = ctx.schedule_admin_edit_alternating_config_step
+    schedule_admin_edit_class_field_step = ctx.schedule_admin_edit_class_field_step
+    schedule_admin_location_step_name = ctx.schedule_admin_location_step_name
+    schedule_admin_location_step_url = ctx.schedule_admin_location_step_url
+
+    @router.register(CALLBACK_WEEKLY_SCHEDULE_ADMIN, group="schedule_admin")
+    def _on_weekly_schedule_admin(c, uid, data, chat_id):
+        logger.info(f"[SCHEDULE ADMIN] Callback received: data={data}, uid={uid}, chat_id={chat_id}")
+        if not is_admin(uid):
+            logger.warning(f"[SCHEDULE ADMIN] User {uid} is not admin")
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id
+        if not reply_chat_id:
+            reply_chat_id = c.from_user.id  
+        logger.info(f"[SCHEDULE ADMIN] Using reply_chat_id={reply_chat_id}")
+
+        try:
+            from db_schedule import get_all_groups
+            groups = []
+            try:
+                with db_connection() as conn:
+                    groups = get_all_groups(conn)
+                    logger.info(f"[SCHEDULE ADMIN] Loaded {len(groups)} groups from database: {groups}")
+            except Exception as db_error:
+                logger.warning(f"[SCHEDULE ADMIN] Could not load groups from DB: {db_error}, using defaults")
+
+            if not groups:
+                groups = ["01", "02", "03", "04"]  
+                logger.info(f"[SCHEDULE ADMIN] Using default groups: {groups}")
+
+            kb = schedule_admin_groups_kb(groups)
+            logger.info(f"[SCHEDULE ADMIN] Created keyboard with {len(groups)} groups")
+            bot.send_message(reply_chat_id, "⚙️ إدارة الجداول الأسبوعية\n\nاختر المجموعة:", reply_markup=kb)
+            logger.info(f"[SCHEDULE ADMIN] Sent schedule admin menu to chat {reply_chat_id} for user {uid}")
+        except Exception as e:
+            logger.exception(f"[SCHEDULE ADMIN] Failed to load schedule admin: {e}")
+            error_msg = f"حدث خطأ في تحميل إدارة الجداول.\nالخطأ: {str(e)}"
+            try:
+                bot.send_message(reply_chat_id, error_msg, reply_markup=main_menu_kb())
+            except Exception as send_error:
+                logger.exception(f"[SCHEDULE ADMIN] Failed to send error message: {send_error}")
+
+                bot.answer_callback_query(c.id, "حدث خطأ. راجع اللوغ.", show_alert=True)
+        finally:
+            bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_WEEKLY_SCHEDULE_ADMIN_GROUP, exact_match=False, group="schedule_admin")
+    def _on_weekly_schedule_admin_group(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        group_number = data.split(":", 1)[1]
+        if group_number == "new":
+
+            bot.send_message(reply_chat_id, "إضافة مجموعة جديدة (سيتم إضافتها لاحقاً)", reply_markup=main_menu_kb())
+            bot.answer_callback_query(c.id)
+            return
+        kb = schedule_admin_days_kb(group_number)
+        bot.send_message(reply_chat_id, f"Group {group_number} - اختر اليوم:", reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_WEEKLY_SCHEDULE_ADMIN_DAY, exact_match=False, group="schedule_admin")
+    def _on_weekly_schedule_admin_day(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        parts = data.split(":", 1)[1].split(":")
+        group_number = parts[0]
+        day = parts[1] if len(parts) > 1 else None
+        if day:
+            kb = schedule_admin_day_menu_kb(group_number, day)
+            day_ar = DAY_NAMES_AR.get(day, day)
+            bot.send_message(reply_chat_id, f"Group {group_number} - {day_ar}\n\nاختر الإجراء:", reply_markup=kb)
+        else:
+            kb = schedule_admin_days_kb(group_number)
+            bot.send_message(reply_chat_id, f"Group {group_number} - اختر اليوم:", reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_WEEKLY_SCHEDULE_ADMIN_VIEW, exact_match=False, group="schedule_admin")
+    def _on_weekly_schedule_admin_view(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        parts = data.split(":", 1)[1].split(":")
+        group_number = parts[0]
+        day = parts[1] if len(parts) > 1 else None
+        try:
+            from db_schedule import get_schedule_classes
+            with db_connection() as conn:
+                if day:
+                    classes = get_schedule_classes(conn, group_number, day)
+                    day_ar = DAY_NAMES_AR.get(day, day)
+                    if not classes:
+                        bot.send_message(reply_chat_id, f"Group {group_number} - {day_ar}\n\nلا توجد حصص في هذا اليوم.", reply_markup=schedule_admin_day_menu_kb(group_number, day))
+                    else:
+                        text = f"Group {group_number} - {day_ar}\n\n"
+                        for cls in classes:
+                            text += format_class_for_display(dict(cls)) + "\n\n"
+                        kb = schedule_admin_classes_list_kb(group_number, day, [dict(c) for c in classes])
+                        bot.send_message(reply_chat_id, text, reply_markup=kb)
+                else:
+
+                    classes = get_schedule_classes(conn, group_number)
+                    if not classes:
+                        bot.send_message(reply_chat_id, f"Group {group_number}\n\nلا توجد حصص.", reply_markup=schedule_admin_days_kb(group_number))
+                    else:
+                        text = f"Group {group_number} - الجدول الأسبوعي الكامل\n\n"
+                        current_day = None
+                        for cls in classes:
+                            if cls['day_name'] != current_day:
+                                current_day = cls['day_name']
+                                day_ar = DAY_NAMES_AR.get(current_day, current_day)
+                                text += f"\n📅 {day_ar}:\n"
+                            text += format_class_for_display(dict(cls)) + "\n"
+                        bot.send_message(reply_chat_id, text, reply_markup=schedule_admin_days_kb(group_number))
+        except Exception as e:
+            logger.exception("Failed to view schedule")
+            bot.send_message(reply_chat_id, f"حدث خطأ في عرض الجدول. راجع اللوغ. الخطأ: {e}", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_WEEKLY_SCHEDULE_ADMIN_ADD, exact_match=False, group="schedule_admin")
+    def _on_weekly_schedule_admin_add(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        parts = data.split(":", 1)[1].split(":")
+        group_number = parts[0]
+        day = parts[1]
+
+        pending_schedule_admin[reply_chat_id] = {
+            "action": "add",
+            "group_number": group_number,
+            "day": day,
+            "step": "time_start"
+        }
+        msg = bot.send_message(reply_chat_id, "أرسل وقت البداية (مثال: 08:00) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
+        bot.register_next_step_handler(msg, schedule_admin_add_step_time_start, reply_chat_id)
+        bot.answer_callback_query(c.id)
+
+    @router.register("schedule_type:", exact_match=False, group="schedule_add")
+    def _on_schedule_type(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        class_type = data.split(":", 1)[1]
+        reply_chat_id = chat_id or c.from_user.id
+
+        pm = pending_schedule_admin.get(reply_chat_id)
+        if not pm:
+            bot.send_message(reply_chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
+            bot.answer_callback_query(c.id)
+            return
+        pm["class_type"] = class_type
+        pm["step"] = "alternating"
+        pending_schedule_admin[reply_chat_id] = pm
+
+        msg = bot.send_message(reply_chat_id, "هل هذه الحصة دورية (تظهر في أسبوع وتختفي في الأسبوع التالي)؟\nأرسل 'نعم' أو 'لا' أو 'إلغاء':", reply_markup=cancel_inline_kb())
+        bot.register_next_step_handler(msg, schedule_admin_add_step_alternating, reply_chat_id)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_WEEKLY_SCHEDULE_ADMIN_EDIT, exact_match=False, group="schedule_admin")
+    def _on_weekly_schedule_admin_edit(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        class_id = int(data.split(":", 1)[1])
+        try:
+            from db_schedule import get_schedule_class
+            with db_connection() as conn:
+                cls = get_schedule_class(conn, class_id)
+                if not cls:
+                    bot.send_message(reply_chat_id, "لم أجد هذه الحصة.", reply_markup=main_menu_kb())
+                    bot.answer_callback_query(c.id)
+                    return
+                cls_dict = dict(cls)
+                text = format_class_for_display(cls_dict)
+                kb = schedule_admin_class_actions_kb(class_id, cls_dict['group_number'], cls_dict['day_name'])
+                bot.send_message(reply_chat_id, text, reply_markup=kb)
+        except Exception as e:
+            logger.exception("Failed to edit schedule class")
+            bot.send_message(reply_chat_id, f"حدث خطأ في عرض الحصة. راجع اللوغ. الخطأ: {e}", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_WEEKLY_SCHEDULE_ADMIN_DELETE, exact_match=False, group="schedule_admin")
+    def _on_weekly_schedule_admin_delete(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        class_id = int(data.split(":", 1)[1])
+        try:
+            from db_schedule import get_schedule_class
+            with db_connection() as conn:
+                cls = get_schedule_class(conn, class_id)
+                if cls:
+                    kb = types.InlineKeyboardMarkup()
+                    kb.add(types.InlineKeyboardButton("نعم احذف", callback_data=f"{CALLBACK_WEEKLY_SCHEDULE_ADMIN_CONFIRM_DELETE}{class_id}"))
+                    kb.add(types.InlineKeyboardButton("إلغاء", callback_data=f"{CALLBACK_WEEKLY_SCHEDULE_ADMIN_EDIT}{class_id}"))
+                    bot.send_message(reply_chat_id, f"هل أنت متأكد من حذف الحصة:\n{format_class_for_display(dict(cls))}", reply_markup=kb)
+        except Exception as e:
+            logger.exception("Failed to delete schedule class")
+            bot.send_message(reply_chat_id, f"حدث خطأ. راجع اللوغ. الخطأ: {e}", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_WEEKLY_SCHEDULE_ADMIN_CONFIRM_DELETE, exact_match=False, group="schedule_admin")
+    def _on_weekly_schedule_admin_confirm_delete(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        class_id = int(data.split(":", 1)[1])
+        try:
+            from db_schedule import delete_schedule_class, get_schedule_class
+            with db_connection() as conn:
+                cls = get_schedule_class(conn, class_id)
+                if cls:
+                    delete_schedule_class(conn, class_id)
+                    bot.send_message(reply_chat_id, f"تم حذف الحصة (ID: {class_id}).")
+
+                    cls_dict = dict(cls)
+                    kb = schedule_admin_day_menu_kb(cls_dict['group_number'], cls_dict['day_name'])
+                    bot.send_message(reply_chat_id, f"Group {cls_dict['group_number']} - {DAY_NAMES_AR.get(cls_dict['day_name'], cls_dict['day_name'])}", reply_markup=kb)
+        except Exception as e:
+            logger.exception("Failed to delete schedule class")
+            bot.send_message(reply_chat_id, f"حدث خطأ في حذف الحصة. راجع اللوغ. الخطأ: {e}", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_WEEKLY_SCHEDULE_ADMIN_LOCATIONS, group="schedule_location")
+    def _on_weekly_schedule_admin_locations(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        try:
+            from db_schedule import get_schedule_locations
+            with db_connection() as conn:
+                locations = get_schedule_locations(conn)
+                if not locations:
+                    text = "📍 إدارة المواقع\n\nلا توجد مواقع مسجلة."
+                    kb = types.InlineKeyboardMarkup()
+                    kb.add(types.InlineKeyboardButton("➕ إضافة موقع", callback_data="schedule_location_add"))
+                    kb.add(types.InlineKeyboardButton("↩️ رجوع", callback_data=CALLBACK_WEEKLY_SCHEDULE_ADMIN))
+                    bot.send_message(reply_chat_id, text, reply_markup=kb)
+                else:
+                    text = "📍 إدارة المواقع\n\nالمواقع المسجلة:\n\n"
+                    kb = types.InlineKeyboardMarkup()
+                    for loc_name, maps_url in sorted(locations.items()):
+                        text += f"📍 {loc_name}\n   🔗 {maps_url[:50]}...\n\n"
+                        kb.add(types.InlineKeyboardButton(f"✏️ {loc_name}", callback_data=f"schedule_location_edit:{loc_name}"))
+                    kb.add(types.InlineKeyboardButton("➕ إضافة موقع", callback_data="schedule_location_add"))
+                    kb.add(types.InlineKeyboardButton("↩️ رجوع", callback_data=CALLBACK_WEEKLY_SCHEDULE_ADMIN))
+                    bot.send_message(reply_chat_id, text, reply_markup=kb)
+        except Exception as e:
+            logger.exception("Failed to load locations")
+            bot.send_message(reply_chat_id, f"حدث خطأ في تحميل المواقع. راجع اللوغ. الخطأ: {e}", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register("schedule_location_add", group="schedule_location")
+    def _on_schedule_location_add(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        pending_schedule_admin[reply_chat_id] = {
+            "action": "add_location",
+            "step": "location_name"
+        }
+        msg = bot.send_message(reply_chat_id, "أرسل اسم الموقع (مثال: Amphi H) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
+        bot.register_next_step_handler(msg, schedule_admin_location_step_name, reply_chat_id)
+        bot.answer_callback_query(c.id)
+
+    @router.register("schedule_location_edit:", exact_match=False, group="schedule_location")
+    def _on_schedule_location_edit(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        location_name = data.split(":", 1)[1]
+        try:
+            from db_schedule import get_schedule_location
+            with db_connection() as conn:
+                maps_url = get_schedule_location(conn, location_name)
+                if maps_url:
+                    kb = types.InlineKeyboardMarkup()
+                    kb.add(types.InlineKeyboardButton("✏️ تعديل رابط الخريطة", callback_data=f"schedule_location_edit_url:{location_name}"))
+                    kb.add(types.InlineKeyboardButton("🗑️ حذف الموقع", callback_data=f"schedule_location_delete:{location_name}"))
+                    kb.add(types.InlineKeyboardButton("↩️ رجوع", callback_data=CALLBACK_WEEKLY_SCHEDULE_ADMIN_LOCATIONS))
+                    text = f"📍 الموقع: {location_name}\n\n🔗 رابط الخريطة:\n{maps_url}"
+                    bot.send_message(reply_chat_id, text, reply_markup=kb)
+                else:
+                    bot.send_message(reply_chat_id, "لم أجد هذا الموقع.", reply_markup=main_menu_kb())
+        except Exception as e:
+            logger.exception("Failed to load location")
+            bot.send_message(reply_chat_id, f"حدث خطأ. راجع اللوغ. الخطأ: {e}", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register("schedule_location_edit_url:", exact_match=False, group="schedule_location")
+    def _on_schedule_location_edit_url(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        location_name = data.split(":", 1)[1]
+        pending_schedule_admin[reply_chat_id] = {
+            "action": "edit_location_url",
+            "location_name": location_name,
+            "step": "maps_url"
+        }
+        msg = bot.send_message(reply_chat_id, f"أرسل رابط Google Maps الجديد للموقع '{location_name}' أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
+        bot.register_next_step_handler(msg, schedule_admin_location_step_url, reply_chat_id, location_name)
+        bot.answer_callback_query(c.id)
+
+    @router.register("schedule_location_delete:", exact_match=False, group="schedule_location")
+    def _on_schedule_location_delete(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        location_name = data.split(":", 1)[1]
+        kb = types.InlineKeyboardMarkup()
+        kb.add(types.InlineKeyboardButton("نعم احذف", callback_data=f"schedule_location_confirm_delete:{location_name}"))
+        kb.add(types.InlineKeyboardButton("إلغاء", callback_data=CALLBACK_WEEKLY_SCHEDULE_ADMIN_LOCATIONS))
+        bot.send_message(reply_chat_id, f"هل أنت متأكد من حذف الموقع '{location_name}'؟", reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register("schedule_location_confirm_delete:", exact_match=False, group="schedule_location")
+    def _on_schedule_location_confirm_delete(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        location_name = data.split(":", 1)[1]
+        try:
+            from db_schedule import delete_schedule_location
+            with db_connection() as conn:
+                if delete_schedule_location(conn, location_name):
+                    bot.send_message(reply_chat_id, f"✅ تم حذف الموقع '{location_name}'.")
+
+                    from db_schedule import get_schedule_locations
+                    locations = get_schedule_locations(conn)
+                    if not locations:
+                        text = "📍 إدارة المواقع\n\nلا توجد مواقع مسجلة."
+                        kb = types.InlineKeyboardMarkup()
+                        kb.add(types.InlineKeyboardButton("➕ إضافة موقع", callback_data="schedule_location_add"))
+                        kb.add(types.InlineKeyboardButton("↩️ رجوع", callback_data=CALLBACK_WEEKLY_SCHEDULE_ADMIN))
+                        bot.send_message(reply_chat_id, text, reply_markup=kb)
+                    else:
+                        text = "📍 إدارة المواقع\n\nالمواقع المسجلة:\n\n"
+                        kb = types.InlineKeyboardMarkup()
+                        for loc_name, maps_url in sorted(locations.items()):
+                            text += f"📍 {loc_name}\n   🔗 {maps_url[:50]}...\n\n"
+                            kb.add(types.InlineKeyboardButton(f"✏️ {loc_name}", callback_data=f"schedule_location_edit:{loc_name}"))
+                        kb.add(types.InlineKeyboardButton("➕ إضافة موقع", callback_data="schedule_location_add"))
+                        kb.add(types.InlineKeyboardButton("↩️ رجوع", callback_data=CALLBACK_WEEKLY_SCHEDULE_ADMIN))
+                        bot.send_message(reply_chat_id, text, reply_markup=kb)
+                else:
+                    bot.send_message(reply_chat_id, f"لم أجد الموقع '{location_name}'.", reply_markup=main_menu_kb())
+        except Exception as e:
+            logger.exception("Failed to delete location")
+            bot.send_message(reply_chat_id, f"حدث خطأ في حذف الموقع. راجع اللوغ. الخطأ: {e}", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_SCHEDULE_EDIT_TIME_START, exact_match=False, group="schedule_edit")
+    def _on_schedule_edit_time_start(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        class_id = int(data.split(":", 1)[1])
+        pending_schedule_admin[reply_chat_id] = {
+            "action": "edit_class",
+            "class_id": class_id,
+            "field": "time_start",
+            "step": "enter_value"
+        }
+        msg = bot.send_message(reply_chat_id, "أرسل وقت البداية الجديد (مثال: 08:00) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
+        bot.register_next_step_handler(msg, schedule_admin_edit_class_field_step, reply_chat_id)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_SCHEDULE_EDIT_TIME_END, exact_match=False, group="schedule_edit")
+    def _on_schedule_edit_time_end(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        class_id = int(data.split(":", 1)[1])
+        pending_schedule_admin[reply_chat_id] = {
+            "action": "edit_class",
+            "class_id": class_id,
+            "field": "time_end",
+            "step": "enter_value"
+        }
+        msg = bot.send_message(reply_chat_id, "أرسل وقت الانتهاء الجديد (مثال: 09:30) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
+        bot.register_next_step_handler(msg, schedule_admin_edit_class_field_step, reply_chat_id)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_SCHEDULE_EDIT_COURSE, exact_match=False, group="schedule_edit")
+    def _on_schedule_edit_course(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        class_id = int(data.split(":", 1)[1])
+        pending_schedule_admin[reply_chat_id] = {
+            "action": "edit_class",
+            "class_id": class_id,
+            "field": "course",
+            "step": "enter_value"
+        }
+        msg = bot.send_message(reply_chat_id, "أرسل اسم المادة الجديد (مثال: Analysis1) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
+        bot.register_next_step_handler(msg, schedule_admin_edit_class_field_step, reply_chat_id)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_SCHEDULE_EDIT_LOCATION, exact_match=False, group="schedule_edit")
+    def _on_schedule_edit_location(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        class_id = int(data.split(":", 1)[1])
+        pending_schedule_admin[reply_chat_id] = {
+            "action": "edit_class",
+            "class_id": class_id,
+            "field": "location",
+            "step": "enter_value"
+        }
+        msg = bot.send_message(reply_chat_id, "أرسل المكان الجديد (مثال: Amphi H) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
+        bot.register_next_step_handler(msg, schedule_admin_edit_class_field_step, reply_chat_id)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_SCHEDULE_EDIT_TYPE, exact_match=False, group="schedule_edit")
+    def _on_schedule_edit_type(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        class_id = int(data.split(":", 1)[1])
+        kb = types.InlineKeyboardMarkup()
+        kb.add(types.InlineKeyboardButton("Course", callback_data=f"schedule_edit_type_select:{class_id}:Course"))
+        kb.add(types.InlineKeyboardButton("Tutorial Session", callback_data=f"schedule_edit_type_select:{class_id}:Tutorial Session"))
+        kb.add(types.InlineKeyboardButton("Laboratory Session", callback_data=f"schedule_edit_type_select:{class_id}:Laboratory Session"))
+        kb.add(types.InlineKeyboardButton("Online Session", callback_data=f"schedule_edit_type_select:{class_id}:Online Session"))
+        kb.add(types.InlineKeyboardButton("إلغاء", callback_data=CALLBACK_HW_CANCEL))
+        bot.send_message(reply_chat_id, "اختر نوع الحصة الجديد:", reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register("schedule_edit_type_select:", exact_match=False, group="schedule_edit")
+    def _on_schedule_edit_type_select(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        parts = data.split(":", 2)
+        class_id = int(parts[1])
+        class_type = parts[2]
+        try:
+            from db_schedule import update_schedule_class_field, get_schedule_class
+            with db_connection() as conn:
+                if update_schedule_class_field(conn, class_id, "class_type", class_type):
+                    cls = get_schedule_class(conn, class_id)
+                    if cls:
+                        cls_dict = dict(cls)
+                        text = format_class_for_display(cls_dict)
+                        kb = schedule_admin_class_actions_kb(class_id, cls_dict['group_number'], cls_dict['day_name'])
+                        bot.send_message(reply_chat_id, f"✅ تم تحديث نوع الحصة.\n\n{text}", reply_markup=kb)
+                    else:
+                        bot.send_message(reply_chat_id, "✅ تم تحديث نوع الحصة.", reply_markup=main_menu_kb())
+                else:
+                    bot.send_message(reply_chat_id, "❌ فشل تحديث نوع الحصة.", reply_markup=main_menu_kb())
+        except Exception as e:
+            logger.exception("Failed to update class type")
+            bot.send_message(reply_chat_id, f"حدث خطأ في تحديث نوع الحصة: {e}", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_SCHEDULE_EDIT_ALTERNATING, exact_match=False, group="schedule_edit")
+    def _on_schedule_edit_alternating(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        class_id = int(data.split(":", 1)[1])
+        try:
+            from db_schedule import get_schedule_class, update_schedule_class_field
+            with db_connection() as conn:
+                cls = get_schedule_class(conn, class_id)
+                if not cls:
+                    bot.send_message(reply_chat_id, "لم أجد هذه الحصة.", reply_markup=main_menu_kb())
+                    bot.answer_callback_query(c.id)
+                    return
+
+                cls_dict = dict(cls)
+                is_alternating = bool(cls_dict.get('is_alternating', 0))
+
+                new_alternating = not is_alternating
+                if new_alternating:
+
+                    pending_schedule_admin[reply_chat_id] = {
+                        "action": "edit_class",
+                        "class_id": class_id,
+                        "field": "alternating",
+                        "step": "enter_alternating_key",
+                        "is_alternating": True
+                    }
+                    msg = bot.send_message(reply_chat_id, "أرسل مفتاح الحصة الدورية (مثال: algorithm1) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
+                    bot.register_next_step_handler(msg, schedule_admin_edit_class_field_step, reply_chat_id)
+                else:
+
+                    if update_schedule_class_field(conn, class_id, "is_alternating", False):
+                        update_schedule_class_field(conn, class_id, "alternating_key", None)
+                        cls = get_schedule_class(conn, class_id)
+                        if cls:
+                            cls_dict = dict(cls)
+                            text = format_class_for_display(cls_dict)
+                            kb = schedule_admin_class_actions_kb(class_id, cls_dict['group_number'], cls_dict['day_name'])
+                            bot.send_message(reply_chat_id, f"✅ تم تعطيل الحالة الدورية.\n\n{text}", reply_markup=kb)
+        except Exception as e:
+            logger.exception("Failed to update alternating status")
+            bot.send_message(reply_chat_id, f"حدث خطأ: {e}", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_WEEKLY_SCHEDULE_ADMIN_ALTERNATING, group="alternating_config")
+    def _on_weekly_schedule_admin_alternating(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        try:
+            from db_schedule import get_all_alternating_week_configs
+            with db_connection() as conn:
+                configs = get_all_alternating_week_configs(conn)
+                if not configs:
+                    text = "🔄 إدارة الحصص الدورية\n\nلا توجد إعدادات للحصص الدورية."
+                    kb = types.InlineKeyboardMarkup()
+                    kb.add(types.InlineKeyboardButton("➕ إضافة إعداد جديد", callback_data=CALLBACK_ALTERNATING_ADD))
+                    kb.add(types.InlineKeyboardButton("↩️ رجوع", callback_data=CALLBACK_WEEKLY_SCHEDULE_ADMIN))
+                    bot.send_message(reply_chat_id, text, reply_markup=kb)
+                else:
+                    text = "🔄 إدارة الحصص الدورية\n\nالإعدادات الموجودة:\n\n"
+                    configs_list = []
+                    for config in configs:
+                        config_dict = {
+                            'alternating_key': safe_get(config, 'alternating_key', ''),
+                            'reference_date': safe_get(config, 'reference_date', ''),
+                            'description': safe_get(config, 'description')
+                        }
+                        configs_list.append(config_dict)
+                        text += format_alternating_config_for_display(config_dict) + "\n"
+                    kb = alternating_configs_list_kb(configs_list)
+                    bot.send_message(reply_chat_id, text, reply_markup=kb)
+        except Exception as e:
+            logger.exception("Failed to load alternating configs")
+            bot.send_message(reply_chat_id, f"حدث خطأ في تحميل إعدادات الحصص الدورية: {e}", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_ALTERNATING_LIST, group="alternating_config")
+    def _on_alternating_list(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        try:
+            from db_schedule import get_all_alternating_week_configs
+            with db_connection() as conn:
+                configs = get_all_alternating_week_configs(conn)
+                if not configs:
+                    text = "🔄 إدارة الحصص الدورية\n\nلا توجد إعدادات للحصص الدورية."
+                    kb = types.InlineKeyboardMarkup()
+                    kb.add(types.InlineKeyboardButton("➕ إضافة إعداد جديد", callback_data=CALLBACK_ALTERNATING_ADD))
+                    kb.add(types.InlineKeyboardButton("↩️ رجوع", callback_data=CALLBACK_WEEKLY_SCHEDULE_ADMIN))
+                    bot.send_message(reply_chat_id, text, reply_markup=kb)
+                else:
+                    text = "🔄 إدارة الحصص الدورية\n\nالإعدادات الموجودة:\n\n"
+                    configs_list = []
+                    for config in configs:
+                        config_dict = {
+                            'alternating_key': safe_get(config, 'alternating_key', ''),
+                            'reference_date': safe_get(config, 'reference_date', ''),
+                            'description': safe_get(config, 'description')
+                        }
+                        configs_list.append(config_dict)
+                        text += format_alternating_config_for_display(config_dict) + "\n"
+                    kb = alternating_configs_list_kb(configs_list)
+                    bot.send_message(reply_chat_id, text, reply_markup=kb)
+        except Exception as e:
+            logger.exception("Failed to load alternating configs")
+            bot.send_message(reply_chat_id, f"حدث خطأ: {e}", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_ALTERNATING_EDIT, exact_match=False, group="alternating_config")
+    def _on_alternating_edit(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        alternating_key = data.split(":", 1)[1]
+        try:
+            from db_schedule import get_alternating_week_config
+            with db_connection() as conn:
+                config = get_alternating_week_config(conn, alternating_key)
+                if not config:
+                    bot.send_message(reply_chat_id, "لم أجد هذا الإعداد.", reply_markup=main_menu_kb())
+                    bot.answer_callback_query(c.id)
+                    return
+                config_dict = {
+                    'alternating_key': safe_get(config, 'alternating_key', ''),
+                    'reference_date': safe_get(config, 'reference_date', ''),
+                    'description': safe_get(config, 'description')
+                }
+                text = format_alternating_config_for_display(config_dict)
+                kb = alternating_config_actions_kb(alternating_key)
+                bot.send_message(reply_chat_id, text, reply_markup=kb)
+        except Exception as e:
+            logger.exception("Failed to load alternating config")
+            bot.send_message(reply_chat_id, f"حدث خطأ: {e}", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_ALTERNATING_EDIT_DATE, exact_match=False, group="alternating_config")
+    def _on_alternating_edit_date(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        alternating_key = data.split(":", 1)[1]
+        pending_schedule_admin[reply_chat_id] = {
+            "action": "edit_alternating_config",
+            "alternating_key": alternating_key,
+            "field": "reference_date",
+            "step": "enter_value"
+        }
+        msg = bot.send_message(reply_chat_id, "أرسل تاريخ المرجع الجديد بصيغة YYYY-MM-DD (مثال: 2024-11-11) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
+        bot.register_next_step_handler(msg, schedule_admin_edit_alternating_config_step, reply_chat_id)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_ALTERNATING_ADD, group="alternating_config")
+    def _on_alternating_add(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+
+        reply_chat_id = chat_id or c.from_user.id
+        pending_schedule_admin[reply_chat_id] = {
+            "action": "add_alternating_config",
+            "step": "enter_key"
+        }
+        msg = bot.send_message(reply_chat_id, "أرسل مفتاح الحصة الدورية (مثال: algorithm1) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
+        bot.register_next_step_handler(msg, schedule_admin_add_alternating_config_step_key, reply_chat_id)
+        bot.answer_callback_query(c.id)
@@ -0,0 +1,68 @@
+# bot_handlers/callbacks/students.py
+"""Student directory (/students) pages: keyset pagination on user_id with a group filter."""
+import logging
+from typing import Optional
+
+import telebot
+from db import count_registered_users, get_registered_users_page
+from db_utils import db_connection
+from constants import CALLBACK_STUDENTS_PAGE, STUDENTS_PAGE_SIZE
+from bot_handlers.helpers import format_students_page_text, is_admin, students_page_kb
+
+logger = logging.getLogger(__name__)
+
+
+def render_students_page(group: Optional[str] = None, after_id: Optional[int] = None,
+                         before_id: Optional[int] = None):
+    """Load one /students page and return (text, keyboard)."""
+    with db_connection() as conn_local:
+        # نجلب عنصرًا إضافيًا لمعرفة وجود صفحة أخرى في نفس الاتجاه
+        rows = get_registered_users_page(conn_local, after_id=after_id, before_id=before_id,
+                                         limit=STUDENTS_PAGE_SIZE + 1, group=group)
+        total = count_registered_users(conn_local, group)
+    if before_id is not None:
+        has_prev = len(rows) > STUDENTS_PAGE_SIZE
+        rows = rows[-STUDENTS_PAGE_SIZE:]
+        has_next = True
+    else:
+        has_next = len(rows) > STUDENTS_PAGE_SIZE
+        rows = rows[:STUDENTS_PAGE_SIZE]
+        has_prev = after_id is not None
+    if rows:
+        text = format_students_page_text(rows, total, group)
+    elif group:
+        text = f"📋 لا يوجد طلاب مسجلين في المجموعة {group}."
+    else:
+        text = "📋 لا يوجد طلاب مسجلين حالياً."
+    return text, students_page_kb(rows, has_prev, has_next, group)
+
+
+def register(router, ctx):
+    """Register these callbacks on `router` (ctx: see handlers.register_handlers)."""
+    bot = ctx.bot
+
+    @router.register(CALLBACK_STUDENTS_PAGE, exact_match=False, group="students")
+    def _on_students_page(c, uid, data, chat_id):
+        if not is_admin(uid):
+            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
+            return
+        try:
+            direction, cursor, group = data[len(CALLBACK_STUDENTS_PAGE):].split(":", 2)
+            cursor_id = int(cursor) if cursor else None
+        except ValueError:
+            bot.answer_callback_query(c.id, "بيانات غير صالحة.")
+            return
+
+        text, kb = render_students_page(group or None,
+                                        after_id=cursor_id if direction == "n" else None,
+                                        before_id=cursor_id if direction == "p" else None)
+        try:
+            if c.message:
+                bot.edit_message_text(chat_id=chat_id, message_id=c.message.message_id, text=text,
+                                      parse_mode="Markdown", reply_markup=kb)
+            else:
+                bot.send_message(chat_id, text, parse_mode="Markdown", reply_markup=kb)
+        except telebot.apihelper.ApiTelegramException as e:
+            if "message is not modified" not in str(e):
+                logger.exception("Failed to show students page")
+        bot.answer_callback_query(c.id)
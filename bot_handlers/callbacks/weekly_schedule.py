@@ -0,0 +1,148 @@
+# bot_handlers/callbacks/weekly_schedule.py
+"""Weekly schedule callbacks for students (group, today, tomorrow, week)."""
+import logging
+import os
+from constants import (
+    CALLBACK_WEEKLY_SCHEDULE, CALLBACK_WEEKLY_SCHEDULE_GROUP_01, CALLBACK_WEEKLY_SCHEDULE_GROUP_02,
+    CALLBACK_WEEKLY_SCHEDULE_GROUP_03, CALLBACK_WEEKLY_SCHEDULE_GROUP_04, CALLBACK_WEEKLY_SCHEDULE_TODAY,
+    CALLBACK_WEEKLY_SCHEDULE_TOMORROW, CALLBACK_WEEKLY_SCHEDULE_WEEK
+)
+from bot_handlers.helpers import main_menu_kb, weekly_schedule_group_kb, weekly_schedule_time_kb
+
+logger = logging.getLogger(__name__)
+
+
+def register(router, ctx):
+    """Register these callbacks on `router` (ctx: see handlers.register_handlers)."""
+    bot = ctx.bot
+
+    @router.register(CALLBACK_WEEKLY_SCHEDULE, group="weekly_schedule")
+    def _on_weekly_schedule(c, uid, data, chat_id):
+        kb = weekly_schedule_group_kb()
+        try:
+            if c.message:
+                bot.edit_message_text(chat_id=chat_id, message_id=c.message.message_id, text="Select your Group", reply_markup=kb)
+            else:
+                bot.send_message(chat_id, "Select your Group", reply_markup=kb)
+        except Exception:
+            bot.send_message(chat_id, "Select your Group", reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_WEEKLY_SCHEDULE_GROUP_01, group="weekly_schedule")
+    def _on_weekly_schedule_group_01(c, uid, data, chat_id):
+        kb = weekly_schedule_time_kb("01")
+        bot.send_message(chat_id, "Group 01 - اختر التوقيت:", reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_WEEKLY_SCHEDULE_GROUP_02, group="weekly_schedule")
+    def _on_weekly_schedule_group_02(c, uid, data, chat_id):
+        kb = weekly_schedule_time_kb("02")
+        bot.send_message(chat_id, "Group 02 - اختر التوقيت:", reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_WEEKLY_SCHEDULE_GROUP_03, group="weekly_schedule")
+    def _on_weekly_schedule_group_03(c, uid, data, chat_id):
+        kb = weekly_schedule_time_kb("03")
+        bot.send_message(chat_id, "Group 03 - اختر التوقيت:", reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_WEEKLY_SCHEDULE_GROUP_04, group="weekly_schedule")
+    def _on_weekly_schedule_group_04(c, uid, data, chat_id):
+        kb = weekly_schedule_time_kb("04")
+        bot.send_message(chat_id, "Group 4 - اختر التوقيت:", reply_markup=kb)
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_WEEKLY_SCHEDULE_TODAY, exact_match=False, group="weekly_schedule")
+    def _on_weekly_schedule_today(c, uid, data, chat_id):
+        group_number = data.split(":", 1)[1]
+        try:
+            from weekly_schedule import get_today_schedule_entries, format_day_schedule_message
+            from bot_handlers.weekly_schedule_helpers import day_schedule_keyboard
+
+            entries = get_today_schedule_entries(group_number)
+
+            if not entries:
+                bot.send_message(chat_id, "📅 اليوم\n\nلا توجد حصص في هذا اليوم.", reply_markup=main_menu_kb())
+            else:
+                # رسالة واحدة لليوم كاملًا مع زر خريطة لكل مكان
+                message_text = format_day_schedule_message(entries, "اليوم", group_number)
+                kb = day_schedule_keyboard(entries)
+                if kb:
+                    bot.send_message(chat_id, message_text, reply_markup=kb)
+                else:
+                    bot.send_message(chat_id, message_text)
+        except Exception:
+            logger.exception("Failed to get today's schedule")
+            bot.send_message(chat_id, "حدث خطأ في جلب جدول اليوم. راجع اللوغ.", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_WEEKLY_SCHEDULE_TOMORROW, exact_match=False, group="weekly_schedule")
+    def _on_weekly_schedule_tomorrow(c, uid, data, chat_id):
+        group_number = data.split(":", 1)[1]
+        try:
+            from weekly_schedule import get_tomorrow_schedule_entries, format_day_schedule_message
+            from bot_handlers.weekly_schedule_helpers import day_schedule_keyboard
+
+            entries = get_tomorrow_schedule_entries(group_number)
+
+            if not entries:
+                bot.send_message(chat_id, "📅 الغد\n\nلا توجد حصص في هذا اليوم.", reply_markup=main_menu_kb())
+            else:
+                # رسالة واحدة لليوم كاملًا مع زر خريطة لكل مكان
+                message_text = format_day_schedule_message(entries, "الغد", group_number)
+                kb = day_schedule_keyboard(entries)
+                if kb:
+                    bot.send_message(chat_id, message_text, reply_markup=kb)
+                else:
+                    bot.send_message(chat_id, message_text)
+        except Exception:
+            logger.exception("Failed to get tomorrow's schedule")
+            bot.send_message(chat_id, "حدث خطأ في جلب جدول الغد. راجع اللوغ.", reply_markup=main_menu_kb())
+        bot.answer_callback_query(c.id)
+
+    @router.register(CALLBACK_WEEKLY_SCHEDULE_WEEK, exact_match=False, group="weekly_schedule")
+    def _on_weekly_schedule_week(c, uid, data, chat_id):
+        group_number = data.split(":", 1)[1]
+        try:
+            from weekly_schedule import format_weekly_schedule
+            schedule_text = format_weekly_schedule(group_number)
+
+            if not schedule_text or not schedule_text.strip():
+                logger.warning(f"format_weekly_schedule returned empty text for group {group_number}")
+                schedule_text = f"📅 الجدول الأسبوعي الكامل - Group {group_number}\n\nلا توجد حصص مسجلة لهذه المجموعة.\n\nيرجى إضافة الحصص من قائمة الإدارة (Admin)."
+
+            bot.send_message(chat_id, schedule_text, reply_markup=main_menu_kb())
+
+            try:
+                from config import SCHEDULES_DIR
+                if SCHEDULES_DIR and os.path.exists(SCHEDULES_DIR):
+
+                    pdf_filename = f"weekly_schedule_group_{group_number}.pdf"
+                    pdf_path = os.path.join(SCHEDULES_DIR, pdf_filename)
+
+                    if os.path.exists(pdf_path):
+
+                        with open(pdf_path, 'rb') as pdf_file:
+                            bot.send_document(chat_id, pdf_file, caption=f"📄 الجدول الأسبوعي الكامل - Group {group_number}")
+                        logger.info(f"Sent PDF schedule for Group {group_number}")
+                    else:
+
+                        pdf_all_path = os.path.join(SCHEDULES_DIR, "weekly_schedule_all.pdf")
+                        if os.path.exists(pdf_all_path):
+                            with open(pdf_all_path, 'rb') as pdf_file:
+                                bot.send_document(chat_id, pdf_file, caption=f"📄 الجدول الأسبوعي الكامل - Group {group_number}")
+                            logger.info(f"Sent general PDF schedule for Group {group_number}")
+                        else:
+                            logger.debug(f"PDF schedule file not found for Group {group_number}")
+            except Exception as pdf_error:
+
+                logger.warning(f"Failed to send PDF schedule: {pdf_error}")
+
+        except Exception as e:
+            logger.exception(f"Failed to get weekly schedule for group {group_number}: {e}")
+            error_msg = f"حدث خطأ في جلب الجدول الأسبوعي لمجموعة {group_number}.\n\nالخطأ: {str(e)}\n\nيرجى التحقق من قاعدة البيانات أو الاتصال بالأدمين."
+            try:
+                bot.send_message(chat_id, error_msg, reply_markup=main_menu_kb())
+            except Exception as send_error:
+                logger.exception(f"Failed to send error message: {send_error}")
+        bot.answer_callback_query(c.id)
@@ -11,7 +11,7 @@ from db_utils import safe_get
 from utils import CANCEL_TEXT
 from constants import (
     CALLBACK_HW_DONE, CALLBACK_HW_UNDONE, CALLBACK_HW_PDF, CALLBACK_HW_EDIT_ID,
-    CALLBACK_HW_DELETE_ID, CALLBACK_HW_BACK, CALLBACK_HW_LIST,
+    CALLBACK_HW_DELETE_ID, CALLBACK_HW_BACK, CALLBACK_HW_LIST, CALLBACK_HW_PAGE, CALLBACK_HW_VIEW,
     CALLBACK_HW_ADD, CALLBACK_HW_EDIT, CALLBACK_HW_DELETE,
     CALLBACK_MANUAL_REMINDER, CALLBACK_HW_CANCEL,
     CALLBACK_CUSTOM_REMINDER, CALLBACK_CUSTOM_REMINDER_ADD, CALLBACK_CUSTOM_REMINDER_LIST,
@@ -36,6 +36,7 @@ from constants import (
     CALLBACK_NOTIFICATION_DISABLE_MANUAL, CALLBACK_NOTIFICATION_ENABLE_MANUAL,
     CALLBACK_NOTIFICATION_DISABLE_CUSTOM, CALLBACK_NOTIFICATION_ENABLE_CUSTOM,
     CALLBACK_NOTIFICATION_DISABLE_ALL, CALLBACK_NOTIFICATION_ENABLE_ALL,
+    CALLBACK_STUDENTS_PAGE,
     MAIN_MENU_BUTTONS,
     REGISTRATION_GROUP_OPTIONS
 )
@@ -108,10 +109,83 @@ def hw_item_kb(user_id: int, hw_id: int, is_done: bool = False):
     if is_admin(user_id):
         kb.add(types.InlineKeyboardButton("✏️ تعديل", callback_data=f"{CALLBACK_HW_EDIT_ID}{hw_id}"))
         kb.add(types.InlineKeyboardButton("🗑️ حذف", callback_data=f"{CALLBACK_HW_DELETE_ID}{hw_id}"))
+    kb.add(types.InlineKeyboardButton("📋 قائمة الواجبات", callback_data=CALLBACK_HW_LIST))
+    kb.add(types.InlineKeyboardButton("↩️ رجوع", callback_data=CALLBACK_HW_BACK))
+    return kb
+
+
+def format_homework_page_text(rows, offset: int) -> str:
+    """Format one page of the homework browser (rows carry done_for_user)."""
+    lines = ["📋 قائمة الواجبات:", ""]
+    for index, row in enumerate(rows, start=offset + 1):
+        mark = "✅" if safe_get(row, "done_for_user") else "⬜"
+        lines.append(f"{index}. {mark} {row['subject']} — {row['due_at']} (ID:{row['id']})")
+    lines.append("")
+    lines.append("اختر واجبًا لعرض تفاصيله.")
+    return "\n".join(lines)
+
+
+def hw_list_page_kb(rows, offset: int, page_size: int, has_next: bool):
+    """
+    Create the homework browser keyboard: one button per homework on this page,
+    then previous/next buttons carrying the page offset in callback_data.
+    """
+    kb = types.InlineKeyboardMarkup()
+    for row in rows:
+        mark = "✅" if safe_get(row, "done_for_user") else "⬜"
+        kb.add(types.InlineKeyboardButton(f"{mark} {row['subject']} | {row['due_at']}",
+                                          callback_data=f"{CALLBACK_HW_VIEW}{row['id']}"))
+    nav = []
+    if offset > 0:
+        nav.append(types.InlineKeyboardButton("◀️ السابق", callback_data=f"{CALLBACK_HW_PAGE}{max(offset - page_size, 0)}"))
+    if has_next:
+        nav.append(types.InlineKeyboardButton("التالي ▶️", callback_data=f"{CALLBACK_HW_PAGE}{offset + page_size}"))
+    if nav:
+        kb.row(*nav)
     kb.add(types.InlineKeyboardButton("↩️ رجوع", callback_data=CALLBACK_HW_BACK))
     return kb
 
 
+def format_students_page_text(rows, total: int, group: Optional[str] = None) -> str:
+    """Format one page of the /students directory (Markdown; names are escaped)."""
+    title = f"المجموعة {group}" if group else "جميع المجموعات"
+    lines = [f"📋 **قائمة الطلاب المسجلين — {title} ({total} طالب):**", ""]
+    for row in rows:
+        full_name = row['full_name'] or "غير محدد"
+        for ch in "_*`[":
+            full_name = full_name.replace(ch, f"\\{ch}")
+        group_label = f" ({row['group_number']})" if row.get('group_number') and not group else ""
+        lines.append(f"• {full_name}{group_label} — `{row['user_id']}`")
+    return "\n".join(lines)
+
+
+def students_page_kb(rows, has_prev: bool, has_next: bool, group: Optional[str] = None):
+    """
+    Create the /students keyboard: previous/next buttons carrying the keyset cursor
+    (first/last user_id of the page) and a group filter row.
+    
+    callback_data: students_page:<p|n>:<cursor user_id>:<group>
+    """
+    kb = types.InlineKeyboardMarkup()
+    group = group or ""
+    nav = []
+    if rows and has_prev:
+        nav.append(types.InlineKeyboardButton("◀️ السابق",
+                                              callback_data=f"{CALLBACK_STUDENTS_PAGE}p:{rows[0]['user_id']}:{group}"))
+    if rows and has_next:
+        nav.append(types.InlineKeyboardButton("التالي ▶️",
+                                              callback_data=f"{CALLBACK_STUDENTS_PAGE}n:{rows[-1]['user_id']}:{group}"))
+    if nav:
+        kb.row(*nav)
+    filters = [types.InlineKeyboardButton("✅ الكل" if not group else "الكل", callback_data=f"{CALLBACK_STUDENTS_PAGE}n::")]
+    for index in range(1, len(REGISTRATION_GROUP_OPTIONS) + 1):
+        value = f"{index:02d}"
+        label = f"✅ {value}" if value == group else value
+        filters.append(types.InlineKeyboardButton(label, callback_data=f"{CALLBACK_STUDENTS_PAGE}n::{value}"))
+    kb.row(*filters)
+    return kb
+
+
 def hw_main_kb(user_id: int):
     """Create homework main menu keyboard."""
     kb = types.InlineKeyboardMarkup()
@@ -0,0 +1,67 @@
+"""
+Shared conversation state for handlers.py and the callback modules.
+
+Both sides import the pending stores from here instead of from handlers, so the
+callback modules do not depend on the main handlers module.
+"""
+from typing import Optional
+
+from .base import StateManager, StateType, ExpiringStateStore, STATE_PERSIST
+
+
+# حالات المحادثات الجارية (TTL + حد أقصى للحجم). التدفقات التي يكملها callback (الأدمين، التذكير اليدوي)
+# يمكن حفظها في قاعدة البيانات عبر STATE_PERSIST؛ التسجيل وإضافة الواجب يعتمدان على next_step_handler فقط.
+pending_add = ExpiringStateStore("add_homework")
+pending_manual = ExpiringStateStore("manual", persist=STATE_PERSIST)
+pending_registration = ExpiringStateStore("registration")
+pending_schedule_admin = ExpiringStateStore("schedule_admin", persist=STATE_PERSIST)
+pending_faq_admin = ExpiringStateStore("faq_admin", persist=STATE_PERSIST)
+
+state_mgr = StateManager()
+
+
+def restore_pending_states() -> int:
+    """Reload persisted conversations (STATE_PERSIST only). Returns the number restored."""
+    if not STATE_PERSIST:
+        return 0
+    return sum(store.restore() for store in (pending_manual, pending_schedule_admin, pending_faq_admin))
+
+
+def start_pending_add(chat_id):
+    """Start pending add state (backward compatibility)."""
+    pending_add[chat_id] = True
+    state_mgr.start(chat_id, StateType.ADD_HOMEWORK)
+
+
+def cancel_pending_add(chat_id):
+    """Cancel pending add state (backward compatibility)."""
+    pending_add.pop(chat_id, None)
+    state_mgr.clear(chat_id)
+
+
+def is_pending_add(chat_id):
+    """Check if pending add state is active (backward compatibility)."""
+    return pending_add.get(chat_id, False)
+
+
+def start_pending_manual(chat_id):
+    """Start pending manual reminder state (backward compatibility)."""
+    pending_manual[chat_id] = {"step": "target_type"}
+    state_mgr.start(chat_id, StateType.MANUAL_REMINDER, {"step": "target_type"})
+
+
+def cancel_pending_manual(chat_id):
+    """Cancel pending manual reminder state (backward compatibility)."""
+    pending_manual.pop(chat_id, None)
+    state_mgr.clear(chat_id)
+
+
+def get_pending_manual(chat_id) -> Optional[dict]:
+    """Get pending manual reminder state (backward compatibility)."""
+    pm = pending_manual.get(chat_id)
+    if pm:
+        return dict(pm)
+    state = state_mgr.get(chat_id)
+    if state and state.state_type == StateType.MANUAL_REMINDER:
+        return {"step": state.step, **state.data}
+    return None
@@ -1,6 +1,6 @@
 # bot_handlers/weekly_schedule_helpers.py
 """Helper functions for weekly schedule keyboards."""
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from telebot import types
 from constants import CALLBACK_WEEKLY_SCHEDULE_LOCATION
 
@@ -23,3 +23,21 @@ def class_entry_keyboard(entry: Dict[str, Any], group_number: str = "", day: str
     
     return None
 
+
+def day_schedule_keyboard(entries: List[Dict[str, Any]]) -> Optional[types.InlineKeyboardMarkup]:
+    """
+    Create one keyboard for a whole day: a map button per located class
+    (one per location). Returns None if no class has a map.
+    """
+    from weekly_schedule import has_location_map, get_location_map_url
+    
+    kb = types.InlineKeyboardMarkup()
+    seen = set()
+    for entry in entries:
+        location = entry.get("location", "")
+        if location in seen or not has_location_map(location):
+            continue
+        seen.add(location)
+        kb.add(types.InlineKeyboardButton(f"📍 {entry.get('course', '')} - {location}",
+                                          url=get_location_map_url(location)))
+    return kb if seen else None
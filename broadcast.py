@@ -0,0 +1,254 @@
+"""
+Broadcast engine — إرسال جماعي متوازي مع احترام حدود Telegram.
+
+- Token bucket عام (~30 رسالة/ثانية) + token bucket لكل محادثة.
+- مجموعة عمّال (ThreadPoolExecutor) محدودة الحجم وطويلة العمر لكل engine (تُغلق عند إيقاف البوت).
+- إعادة المحاولة عند 429 باستخدام retry_after.
+- تقرير نهائي: sent / failed / skipped.
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional
+
+try:
+    from telebot.apihelper import ApiTelegramException
+except ImportError:  # pragma: no cover
+    ApiTelegramException = None
+
+logger = logging.getLogger(__name__)
+
+
+BROADCAST_WORKERS = int(os.getenv("BROADCAST_WORKERS") or "8")
+BROADCAST_GLOBAL_RATE = float(os.getenv("BROADCAST_GLOBAL_RATE") or "25")
+BROADCAST_PER_CHAT_RATE = float(os.getenv("BROADCAST_PER_CHAT_RATE") or "1")
+BROADCAST_MAX_RETRIES = int(os.getenv("BROADCAST_MAX_RETRIES") or "3")
+
+# أخطاء تعني أن المستلم غير قابل للوصول (حظر البوت، حساب محذوف...) — نتخطاه بدون إعادة محاولة
+_SKIP_ERROR_CODES = (403,)
+_SKIP_DESCRIPTIONS = ("chat not found", "user is deactivated", "bot was blocked")
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1.0))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def try_acquire(self) -> float:
+        """Take one token if available; otherwise return seconds to wait (0 means acquired)."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """Block until one token is available."""
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def is_full(self) -> bool:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens >= self.capacity
+
+
+@dataclass
+class BroadcastResult:
+    """Totals reported at the end of a broadcast."""
+    sent: int = 0
+    failed: int = 0
+    skipped: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.sent + self.failed + self.skipped
+
+    def __str__(self) -> str:
+        return f"sent={self.sent} failed={self.failed} skipped={self.skipped}"
+
+
+class RecipientSkipped(Exception):
+    """Raised by a deliver callable to mark a recipient as skipped rather than failed."""
+
+
+def _retry_after(exc) -> Optional[float]:
+    try:
+        params = (exc.result_json or {}).get("parameters") or {}
+        value = params.get("retry_after")
+        return float(value) if value is not None else None
+    except Exception:
+        return None
+
+
+def is_unreachable(exc) -> bool:
+    """True when Telegram says the recipient can never be reached (blocked, deleted, unknown chat)."""
+    if ApiTelegramException is None or not isinstance(exc, ApiTelegramException):
+        return False
+    if exc.error_code in _SKIP_ERROR_CODES:
+        return True
+    description = (getattr(exc, "description", "") or "").lower()
+    return exc.error_code == 400 and any(d in description for d in _SKIP_DESCRIPTIONS)
+
+
+class BroadcastEngine:
+    """
+    Rate-limited concurrent sender shared by every broadcast in the process.
+
+    Usage:
+        engine = get_broadcast_engine(bot)
+        result = engine.broadcast(recipients, lambda chat_id: engine.call(chat_id, bot.send_message, chat_id, text))
+    """
+
+    def __init__(self,
+                 bot,
+                 max_workers: int = BROADCAST_WORKERS,
+                 global_rate: float = BROADCAST_GLOBAL_RATE,
+                 per_chat_rate: float = BROADCAST_PER_CHAT_RATE,
+                 max_retries: int = BROADCAST_MAX_RETRIES):
+        self.bot = bot
+        self.max_workers = max(1, int(max_workers))
+        self.per_chat_rate = per_chat_rate
+        self.max_retries = max(0, int(max_retries))
+        self._global_bucket = TokenBucket(global_rate)
+        self._chat_buckets: Dict[object, TokenBucket] = {}
+        self._chat_lock = threading.Lock()
+        # عند 429 نوقف جميع العمّال حتى انتهاء retry_after وليس فقط العامل الحالي
+        self._paused_until = 0.0
+        self._pause_lock = threading.Lock()
+        # executor واحد طوال عمر الـ engine: لا إنشاء/هدم خيوط مع كل دفعة outbox
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="broadcast")
+            return self._pool
+
+    def shutdown(self, wait: bool = True):
+        """Stop the worker pool (a later broadcast() starts a new one)."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        with self._chat_lock:
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                if len(self._chat_buckets) >= 10000:
+                    # إزالة buckets الممتلئة (محادثات خاملة) لإبقاء الذاكرة محدودة
+                    for key in [k for k, b in self._chat_buckets.items() if b.is_full()]:
+                        del self._chat_buckets[key]
+                bucket = TokenBucket(self.per_chat_rate, capacity=3)
+                self._chat_buckets[chat_id] = bucket
+            return bucket
+
+    def _wait_pause(self):
+        while True:
+            with self._pause_lock:
+                remaining = self._paused_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def _pause(self, seconds: float):
+        with self._pause_lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def call(self, chat_id, func: Callable, *args, **kwargs):
+        """
+        Invoke one Telegram API method for `chat_id` under the rate limits.
+        Retries 429 responses after `retry_after`; other errors propagate.
+        """
+        attempt = 0
+        while True:
+            self._wait_pause()
+            self._chat_bucket(chat_id).acquire()
+            self._global_bucket.acquire()
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if ApiTelegramException is not None and isinstance(e, ApiTelegramException) and e.error_code == 429:
+                    attempt += 1
+                    if attempt > self.max_retries:
+                        raise
+                    delay = _retry_after(e) or 1.0
+                    logger.warning("broadcast: 429 for chat_id=%s, retry %d/%d after %.1fs",
+                                   chat_id, attempt, self.max_retries, delay)
+                    self._pause(delay)
+                    continue
+                raise
+
+    def _deliver_one(self, recipient, deliver: Callable, label: str) -> str:
+        try:
+            deliver(recipient)
+            return "sent"
+        except RecipientSkipped:
+            return "skipped"
+        except Exception as e:
+            if is_unreachable(e):
+                logger.info("broadcast[%s]: recipient %s unreachable (%s), skipping", label, recipient, e)
+                return "skipped"
+            logger.exception("broadcast[%s]: failed to deliver to %s", label, recipient)
+            return "failed"
+
+    def broadcast(self, recipients: Iterable, deliver: Callable, label: str = "") -> BroadcastResult:
+        """
+        Run `deliver(recipient)` for every recipient on the bounded worker pool.
+
+        `deliver` should issue its API calls through `self.call` so they share the limits.
+        """
+        result = BroadcastResult()
+        recipients = list(recipients)
+        if not recipients:
+            return result
+
+        for outcome in self._executor().map(lambda r: self._deliver_one(r, deliver, label), recipients):
+            setattr(result, outcome, getattr(result, outcome) + 1)
+
+        logger.info("broadcast[%s]: finished — %s", label, result)
+        return result
+
+
+_engines: Dict[int, BroadcastEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_broadcast_engine(bot) -> BroadcastEngine:
+    """Return the shared engine for `bot` so concurrent jobs share one global rate limit."""
+    with _engines_lock:
+        engine = _engines.get(id(bot))
+        if engine is None or engine.bot is not bot:
+            engine = BroadcastEngine(bot)
+            _engines[id(bot)] = engine
+        return engine
+
+
+def shutdown_broadcast_engines(wait: bool = True):
+    """Stop the worker pools of every shared engine (called from bot.py at exit)."""
+    with _engines_lock:
+        engines = list(_engines.values())
+    for engine in engines:
+        engine.shutdown(wait=wait)
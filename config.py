@@ -142,6 +142,9 @@ DEFAULT_REMINDERS = os.getenv("DEFAULT_REMINDERS", "3,2,1")
 BACKUP_ENABLED = (os.getenv("BACKUP_ENABLED") or "true").lower() == "true"
 BACKUP_INTERVAL_HOURS = int(os.getenv("BACKUP_INTERVAL_HOURS") or "24")
 MAX_BACKUP_FILES = int(os.getenv("MAX_BACKUP_FILES") or "7")
+# سياسة الاحتفاظ: آخر نسخة لكل يوم من آخر BACKUP_KEEP_DAILY يوماً + آخر نسخة لكل أسبوع من آخر BACKUP_KEEP_WEEKLY أسابيع
+BACKUP_KEEP_DAILY = int(os.getenv("BACKUP_KEEP_DAILY") or "7")
+BACKUP_KEEP_WEEKLY = int(os.getenv("BACKUP_KEEP_WEEKLY") or "4")
 
 # ============================================
 # Development Settings
@@ -225,6 +228,7 @@ def print_config(hide_sensitive=True):
     print(f"BACKUP_ENABLED:      {BACKUP_ENABLED}")
     print(f"BACKUP_INTERVAL:     {BACKUP_INTERVAL_HOURS}h")
     print(f"MAX_BACKUP_FILES:    {MAX_BACKUP_FILES}")
+    print(f"BACKUP_KEEP:         {BACKUP_KEEP_DAILY} daily, {BACKUP_KEEP_WEEKLY} weekly")
     print(f"DEBUG_MODE:          {DEBUG_MODE}")
     print("="*70 + "\n")
 
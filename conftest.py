@@ -0,0 +1,16 @@
+"""
+إعدادات pytest المشتركة: الاختبارات لا تلمس reminders.db في جذر المستودع
+"""
+import pytest
+
+from db_adapter import get_adapter
+
+
+@pytest.fixture(autouse=True)
+def tmp_db(tmp_path, monkeypatch):
+    """Point the default SQLite database (get_conn() / db_connection()) at a per-test file."""
+    path = str(tmp_path / "reminders.db")
+    adapter = get_adapter()
+    if adapter.db_type == "sqlite":
+        monkeypatch.setitem(adapter.connection_info, "path", path)
+    return path
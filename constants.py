@@ -13,6 +13,7 @@ CALLBACK_HW_EDIT_FIELD = "hw_edit_field:"
 CALLBACK_HW_CANCEL = "hw_cancel_add"
 CALLBACK_HW_BACK = "hw_back"
 CALLBACK_HW_LIST = "hw_list"
+CALLBACK_HW_PAGE = "hw_page:"
 CALLBACK_HW_ADD = "hw_add"
 CALLBACK_HW_EDIT = "hw_edit"
 CALLBACK_HW_DELETE = "hw_delete"
@@ -98,10 +99,14 @@ CALLBACK_NOTIFICATION_ENABLE_CUSTOM = "notification_enable_custom"
 CALLBACK_NOTIFICATION_DISABLE_ALL = "notification_disable_all"
 CALLBACK_NOTIFICATION_ENABLE_ALL = "notification_enable_all"
 
+CALLBACK_STUDENTS_PAGE = "students_page:"
+
 
 DEFAULT_REMINDERS = "3,2,1"
 MAX_INPUT_LENGTH = 2000
 MAX_DESCRIPTION_LENGTH = 5000
+HW_LIST_PAGE_SIZE = 8
+STUDENTS_PAGE_SIZE = 25
 MAIN_MENU_BUTTONS = ("Homeworks", "Weekly Schedule", "FAQ", "Update Info")
 REGISTRATION_GROUP_OPTIONS = ("Group 1", "Group 2", "Group 3", "Group 4")
 REGISTRATION_GROUP_NORMALIZATION = {
@@ -4,20 +4,25 @@ DB helpers for Reminder bot — thread-safe approach:
 - get_conn(db_path=None): returns a database connection (SQLite or PostgreSQL)
 - ensure_tables(conn=None)
 - insert_homework, get_homework, get_all_homeworks, delete_homework, mark_done, update_field
+- get_all_homeworks_for_user, get_homework_for_user (with per-user done_for_user flag)
 - register_user(conn, user_id, username, first_name, last_name, ts=None)
 - update_user_display_name(conn, user_id, display_name)
 - is_user_registered, get_all_registered_user_ids
+- get_registered_users_page (keyset-paginated student directory), count_registered_users
+- save_conversation_state, load_conversation_states, delete_conversation_state (persisted multi-step flows)
 """
 
 import os
 import sqlite3
+import threading
 from typing import List, Optional, Union
 import logging
 
 # Import database adapter
-from db_adapter import get_conn as adapter_get_conn, close_conn
+from db_adapter import get_conn as adapter_get_conn, close_conn, connection_target, to_epoch
 from db_config import DB_TYPE
-from db_sql import get_create_table_sql, get_current_timestamp, get_returning_clause
+from db_sql import (get_current_timestamp, get_returning_clause,
+                    get_schema_version_table_sql, get_schema_migrations)
 
 logger = logging.getLogger(__name__)
 
@@ -35,32 +40,78 @@ def get_conn(db_path: Optional[str] = None):
     """
     return adapter_get_conn(db_path)
 
+# قواعد البيانات التي طُبّقت عليها الترحيلات في هذه العملية (مسار SQLite أو "postgresql")
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+
+def _apply_migrations(conn) -> int:
+    """Apply pending schema migrations. Returns the resulting schema version."""
+    cur = conn.cursor()
+    placeholder = "%s" if DB_TYPE == "postgresql" else "?"
+    cur.execute(get_schema_version_table_sql())
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    current = cur.fetchone()[0]
+
+    for version, description, statements in get_schema_migrations():
+        if version <= current:
+            continue
+        try:
+            for step in statements:
+                if callable(step):
+                    step(cur)
+                else:
+                    cur.execute(step)
+            if DB_TYPE == "postgresql":
+                cur.execute(f"INSERT INTO schema_version (version, description) VALUES ({placeholder}, {placeholder}) "
+                            f"ON CONFLICT (version) DO NOTHING", (version, description))
+            else:
+                cur.execute(f"INSERT OR IGNORE INTO schema_version (version, description) VALUES ({placeholder}, {placeholder})",
+                            (version, description))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Schema migration {version} ({description}) failed: {e}")
+            raise
+        logger.info(f"Applied schema migration {version}: {description}")
+        current = version
+    conn.commit()
+    return current
+
+
 def ensure_tables(conn=None):
-    """Ensure required tables exist. If conn is None open a temporary one."""
+    """
+    Ensure the schema is up to date. If conn is None open a temporary one.
+
+    Migrations run once per process and database; later calls return without
+    touching the database.
+    """
     own = False
     if conn is None:
         conn = get_conn()
         own = True
-    
+
     try:
-        cur = conn.cursor()
-        schemas = get_create_table_sql()
-        
-        # Create all tables
-        for table_name, create_sql in schemas.items():
-            try:
-                cur.execute(create_sql)
-                logger.debug(f"Table {table_name} created/verified")
-            except Exception as e:
-                logger.error(f"Error creating table {table_name}: {e}")
-                raise
-        
-        conn.commit()
+        target = connection_target(conn)
+        if target is not None and target in _schema_ready:
+            return
+        with _schema_lock:
+            if target is not None and target in _schema_ready:
+                return
+            _apply_migrations(conn)
+            if target is not None:
+                _schema_ready.add(target)
     finally:
         if own:
             close_conn(conn)
 
 
+def reset_schema_cache():
+    """Forget which databases were migrated (e.g. after a database file was replaced)."""
+    with _schema_lock:
+        _schema_ready.clear()
+
+
 def insert_homework(conn,
                     subject: str,
                     description: str,
@@ -79,10 +130,11 @@ def insert_homework(conn,
         # PostgreSQL uses %s placeholders and RETURNING clause
         cur.execute("""
         INSERT INTO homeworks
-          (subject, description, due_at, pdf_type, pdf_value, conditions, created_by, chat_id, reminders, target_user_id)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+          (subject, description, due_at, pdf_type, pdf_value, conditions, created_by, chat_id, reminders, target_user_id, due_ts)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         RETURNING id
-        """, (subject, description, due_at, pdf_type, pdf_value, conditions, created_by, chat_id, reminders, target_user_id))
+        """, (subject, description, due_at, pdf_type, pdf_value, conditions, created_by, chat_id, reminders, target_user_id,
+              to_epoch(due_at)))
         result = cur.fetchone()
         conn.commit()
         return result[0] if result else None
@@ -90,9 +142,10 @@ def insert_homework(conn,
         # SQLite uses ? placeholders
         cur.execute("""
         INSERT INTO homeworks
-          (subject, description, due_at, pdf_type, pdf_value, conditions, created_by, chat_id, reminders, target_user_id)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (subject, description, due_at, pdf_type, pdf_value, conditions, created_by, chat_id, reminders, target_user_id))
+          (subject, description, due_at, pdf_type, pdf_value, conditions, created_by, chat_id, reminders, target_user_id, due_ts)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (subject, description, due_at, pdf_type, pdf_value, conditions, created_by, chat_id, reminders, target_user_id,
+              to_epoch(due_at)))
         conn.commit()
         return cur.lastrowid
 
@@ -135,6 +188,50 @@ def get_all_homeworks(conn) -> List:
         cur.execute("SELECT * FROM homeworks ORDER BY due_at")
         return cur.fetchall()
 
+def _select_homeworks_for_user(conn, user_id: int, where: str = "", params: tuple = (),
+                               limit: Optional[int] = None, offset: int = 0) -> List:
+    """SELECT homeworks with a per-user done_for_user flag (one LEFT JOIN, no per-row lookups)."""
+    placeholder = "%s" if DB_TYPE == "postgresql" else "?"
+    paging = ""
+    if limit is not None:
+        paging = f"LIMIT {placeholder} OFFSET {placeholder}"
+        params = params + (int(limit), int(offset))
+    sql = f"""
+        SELECT h.*, CASE WHEN hc.hw_id IS NULL THEN 0 ELSE 1 END AS done_for_user
+        FROM homeworks h
+        LEFT JOIN homework_completions hc ON hc.hw_id = h.id AND hc.user_id = {placeholder}
+        {where}
+        ORDER BY h.due_at, h.id
+        {paging}
+    """
+    if DB_TYPE == "postgresql":
+        import psycopg2.extras
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute(sql, (user_id,) + params)
+        from db_adapter import Row
+        return [Row(dict(r)) for r in cur.fetchall()]
+    conn.row_factory = sqlite3.Row
+    cur = conn.cursor()
+    cur.execute(sql, (user_id,) + params)
+    return cur.fetchall()
+
+
+def get_all_homeworks_for_user(conn, user_id: int, limit: Optional[int] = None, offset: int = 0) -> List:
+    """
+    Homeworks ordered by due_at, each with a done_for_user column (0/1) for `user_id`.
+    Pass limit/offset to fetch one page.
+    """
+    ensure_tables(conn)
+    return _select_homeworks_for_user(conn, user_id, limit=limit, offset=offset)
+
+
+def get_homework_for_user(conn, hw_id: int, user_id: int):
+    """One homework with its done_for_user column for `user_id`, or None."""
+    ensure_tables(conn)
+    placeholder = "%s" if DB_TYPE == "postgresql" else "?"
+    rows = _select_homeworks_for_user(conn, user_id, f"WHERE h.id = {placeholder}", (hw_id,))
+    return rows[0] if rows else None
+
 def delete_homework(conn, hw_id: int):
     ensure_tables(conn)
     cur = conn.cursor()
@@ -194,7 +291,11 @@ def update_field(conn, hw_id: int, field: str, value):
     
     placeholder = "%s" if DB_TYPE == "postgresql" else "?"
     
-    if value is None:
+    if field == "due_at":
+        # due_ts (epoch) يتبع due_at دائماً
+        sql = f"UPDATE homeworks SET due_at = {placeholder}, due_ts = {placeholder} WHERE id = {placeholder}"
+        cur.execute(sql, (value, to_epoch(value), hw_id))
+    elif value is None:
         sql = f"UPDATE homeworks SET {field} = NULL WHERE id = {placeholder}"
         cur.execute(sql, (hw_id,))
     else:
@@ -207,46 +308,13 @@ def register_user(conn, user_id: int, username: Optional[str]=None,
                   first_name: Optional[str]=None, last_name: Optional[str]=None, ts: Optional[str]=None):
     """
     Robust upsert for users table:
-    - Ensures required columns exist (adds them if missing - SQLite only).
+    - Missing columns on legacy databases are added once by the schema migrations (ensure_tables).
     - Attempts UPDATE ... WHERE user_id = ?; if no rows updated, does INSERT.
     This avoids relying on 'id' column or ON CONFLICT which may not be supported on some DBs.
     """
     ensure_tables(conn)
     cur = conn.cursor()
 
-    # For SQLite, check and add columns if needed
-    if DB_TYPE == "sqlite":
-        try:
-            cur.execute("PRAGMA table_info(users)")
-            pi = cur.fetchall()
-            existing_cols = []
-            for r in pi:
-                if isinstance(r, sqlite3.Row) or isinstance(r, dict):
-                    existing_cols.append(r["name"])
-                else:
-                    existing_cols.append(r[1])
-        except Exception:
-            existing_cols = []
-
-        # Add missing columns for SQLite
-        expected = {
-            "user_id": "INTEGER",
-            "username": "TEXT",
-            "first_name": "TEXT",
-            "last_name": "TEXT",
-            "registered_at": "TEXT",
-            "started_at": "TEXT",
-            "display_name": "TEXT",
-            "group_number": "TEXT"
-        }
-        for col, col_type in expected.items():
-            if col not in existing_cols:
-                try:
-                    cur.execute(f"ALTER TABLE users ADD COLUMN {col} {col_type}")
-                    conn.commit()
-                except Exception:
-                    pass
-
     # Common upsert logic
     placeholder = "%s" if DB_TYPE == "postgresql" else "?"
     
@@ -300,7 +368,7 @@ def register_user(conn, user_id: int, username: Optional[str]=None,
 
 def update_user_display_name(conn, user_id: int, display_name: str, group_number: Optional[str] = None):
     """
-    Ensure 'display_name' column exists, then update the user's display name.
+    Update the user's display name (columns are guaranteed by ensure_tables migrations).
     Flexible parsing: accepts separators '_', ' ', '-', ','; splits on first occurrence.
     Left part -> last_name (لقب), right part -> first_name (اسم).
     If no separator -> store display_name and set first_name to the token (optional).
@@ -308,27 +376,6 @@ def update_user_display_name(conn, user_id: int, display_name: str, group_number
     ensure_tables(conn)
     cur = conn.cursor()
 
-    # For SQLite, check and add columns if needed
-    if DB_TYPE == "sqlite":
-        try:
-            cur.execute("PRAGMA table_info(users);")
-            cols = [r[1] for r in cur.fetchall()]
-        except Exception:
-            cols = []
-
-        if "display_name" not in cols:
-            try:
-                cur.execute("ALTER TABLE users ADD COLUMN display_name TEXT")
-                conn.commit()
-            except Exception:
-                pass
-        if "group_number" not in cols:
-            try:
-                cur.execute("ALTER TABLE users ADD COLUMN group_number TEXT")
-                conn.commit()
-            except Exception:
-                pass
-
     # Parse display name
     s = (display_name or "").strip()
     lname = None
@@ -463,16 +510,6 @@ def is_user_registration_complete(conn, user_id: int) -> bool:
     cur = conn.cursor()
     placeholder = "%s" if DB_TYPE == "postgresql" else "?"
     
-    # For SQLite, check column existence
-    if DB_TYPE == "sqlite":
-        try:
-            cur.execute("PRAGMA table_info(users);")
-            cols = [r[1] for r in cur.fetchall()]
-        except Exception:
-            cols = []
-        if "display_name" not in cols or "group_number" not in cols:
-            return False
-    
     try:
         cur.execute(f"SELECT display_name, group_number FROM users WHERE user_id = {placeholder} LIMIT 1", (user_id,))
         row = cur.fetchone()
@@ -496,6 +533,74 @@ def get_all_registered_user_ids(conn) -> List[int]:
         return []
 
 
+def get_homework_reminder_recipients(conn, hw_id: int, target_user_id: Optional[int] = None) -> List[tuple]:
+    """
+    Resolve homework reminder recipients in a single query.
+
+    Joins users against homework_completions and notification_settings so the
+    caller does not need one lookup per user.
+
+    Returns:
+        List of (user_id, eligible) tuples. eligible is False when the user already
+        completed the homework or disabled homework_reminders.
+        For a targeted homework only the target user is returned (registered or not).
+    """
+    cur = conn.cursor()
+    placeholder = "%s" if DB_TYPE == "postgresql" else "?"
+
+    if target_user_id is not None:
+        cur.execute(f"""
+            SELECT
+              CASE WHEN EXISTS (SELECT 1 FROM homework_completions WHERE hw_id = {placeholder} AND user_id = {placeholder})
+                   THEN 1 ELSE 0 END,
+              COALESCE((SELECT homework_reminders_enabled FROM notification_settings WHERE user_id = {placeholder}), 1)
+        """, (hw_id, target_user_id, target_user_id))
+        row = cur.fetchone()
+        done, enabled = (row[0], row[1]) if row else (0, 1)
+        return [(target_user_id, not done and bool(enabled))]
+
+    cur.execute(f"""
+        SELECT u.user_id,
+               CASE WHEN hc.user_id IS NULL AND COALESCE(ns.homework_reminders_enabled, 1) = 1
+                    THEN 1 ELSE 0 END AS eligible
+        FROM users u
+        LEFT JOIN homework_completions hc ON hc.hw_id = {placeholder} AND hc.user_id = u.user_id
+        LEFT JOIN notification_settings ns ON ns.user_id = u.user_id
+        WHERE u.user_id IS NOT NULL
+    """, (hw_id,))
+    return [(r[0], bool(r[1])) for r in cur.fetchall()]
+
+
+def get_registered_users_notification_flags(conn, setting_type: str) -> List[tuple]:
+    """
+    Get every registered user with one notification flag in a single query.
+    setting_type: 'homework_reminders', 'manual_reminders', or 'custom_reminders'
+
+    Returns:
+        List of (user_id, enabled) tuples (enabled defaults to True when no settings row).
+    """
+    if setting_type not in _NOTIFICATION_TYPES:
+        raise ValueError(f"Unknown notification setting: {setting_type}")
+    target = connection_target(conn)
+    with _notification_cache_lock:
+        flags = _notification_cache.get(target) if target is not None else None
+    cur = conn.cursor()
+    if flags is not None:
+        # الإعدادات في الذاكرة: نحتاج فقط قائمة المستخدمين
+        index = _NOTIFICATION_TYPES.index(setting_type)
+        cur.execute("SELECT user_id FROM users WHERE user_id IS NOT NULL")
+        return [(r[0], flags[r[0]][index] if r[0] in flags else True) for r in cur.fetchall()]
+
+    column_name = f"{setting_type}_enabled"
+    cur.execute(f"""
+        SELECT u.user_id, COALESCE(ns.{column_name}, 1)
+        FROM users u
+        LEFT JOIN notification_settings ns ON ns.user_id = u.user_id
+        WHERE u.user_id IS NOT NULL
+    """)
+    return [(r[0], bool(r[1])) for r in cur.fetchall()]
+
+
 def get_all_registered_users(conn) -> List[dict]:
     """
     Get all registered users with their full name and user_id.
@@ -534,6 +639,71 @@ def get_all_registered_users(conn) -> List[dict]:
         return []
 
 
+# نفس منطق get_all_registered_users لكن داخل SQL: display_name ثم first_name + last_name
+_USER_FULL_NAME_SQL = ("COALESCE(NULLIF(display_name, ''), "
+                       "NULLIF(TRIM(COALESCE(first_name, '') || ' ' || COALESCE(last_name, '')), ''))")
+
+
+def get_registered_users_page(conn, after_id: Optional[int] = None, before_id: Optional[int] = None,
+                              limit: int = 25, group: Optional[str] = None) -> List[dict]:
+    """
+    One page of registered users, keyset-paginated on user_id.
+    
+    Args:
+        after_id: return users with user_id > after_id (next page)
+        before_id: return users with user_id < before_id (previous page; takes precedence)
+        limit: maximum rows (ask for page_size + 1 to know if another page exists)
+        group: optional users.group_number filter (e.g. "01")
+    
+    Returns:
+        List of dicts with keys: user_id, full_name, group_number — ascending by user_id
+        (the rows closest to before_id when paging backwards).
+    """
+    ensure_tables(conn)
+    cur = conn.cursor()
+    placeholder = "%s" if DB_TYPE == "postgresql" else "?"
+    
+    conditions, params = [], []
+    if group:
+        conditions.append(f"group_number = {placeholder}")
+        params.append(group)
+    if before_id is not None:
+        conditions.append(f"user_id < {placeholder}")
+        params.append(before_id)
+        order = "DESC"
+    else:
+        if after_id is not None:
+            conditions.append(f"user_id > {placeholder}")
+            params.append(after_id)
+        order = "ASC"
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    params.append(limit)
+    
+    cur.execute(f"""
+        SELECT user_id, {_USER_FULL_NAME_SQL} AS full_name, group_number
+        FROM users {where}
+        ORDER BY user_id {order}
+        LIMIT {placeholder}
+    """, tuple(params))
+    rows = [{'user_id': r[0], 'full_name': r[1], 'group_number': r[2]} for r in cur.fetchall()]
+    if order == "DESC":
+        rows.reverse()
+    return rows
+
+
+def count_registered_users(conn, group: Optional[str] = None) -> int:
+    """Number of registered users (optionally in one group)."""
+    ensure_tables(conn)
+    cur = conn.cursor()
+    placeholder = "%s" if DB_TYPE == "postgresql" else "?"
+    if group:
+        cur.execute(f"SELECT COUNT(*) FROM users WHERE group_number = {placeholder}", (group,))
+    else:
+        cur.execute("SELECT COUNT(*) FROM users")
+    row = cur.fetchone()
+    return int(row[0]) if row else 0
+
+
 def insert_custom_reminder(conn, user_id: int, text: str, reminder_datetime: str) -> int:
     """Insert a custom reminder for a user."""
     ensure_tables(conn)
@@ -541,18 +711,18 @@ def insert_custom_reminder(conn, user_id: int, text: str, reminder_datetime: str
     
     if DB_TYPE == "postgresql":
         cur.execute("""
-            INSERT INTO custom_reminders (user_id, text, reminder_datetime)
-            VALUES (%s, %s, %s)
+            INSERT INTO custom_reminders (user_id, text, reminder_datetime, reminder_ts)
+            VALUES (%s, %s, %s, %s)
             RETURNING id
-        """, (user_id, text, reminder_datetime))
+        """, (user_id, text, reminder_datetime, to_epoch(reminder_datetime)))
         result = cur.fetchone()
         conn.commit()
         return result[0] if result else None
     else:
         cur.execute("""
-            INSERT INTO custom_reminders (user_id, text, reminder_datetime)
-            VALUES (?, ?, ?)
-        """, (user_id, text, reminder_datetime))
+            INSERT INTO custom_reminders (user_id, text, reminder_datetime, reminder_ts)
+            VALUES (?, ?, ?, ?)
+        """, (user_id, text, reminder_datetime, to_epoch(reminder_datetime)))
         conn.commit()
         return cur.lastrowid
 
@@ -758,12 +928,61 @@ def get_notification_settings(conn, user_id: int) -> Optional:
         cur.execute(f"SELECT * FROM notification_settings WHERE user_id = {placeholder}", (user_id,))
         return cur.fetchone()
 
+# كاش إعدادات الإشعارات لكل قاعدة بيانات: target -> {user_id: (homework, manual, custom)}
+# المستخدم غير الموجود في الخريطة = لا يوجد صف = كل الإشعارات مفعّلة
+_NOTIFICATION_TYPES = ("homework_reminders", "manual_reminders", "custom_reminders")
+_notification_cache = {}
+_notification_cache_lock = threading.Lock()
+
+
+def load_notification_settings_cache(conn) -> int:
+    """Load every notification_settings row into memory in one query. Returns the row count."""
+    ensure_tables(conn)
+    target = connection_target(conn)
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT user_id, homework_reminders_enabled, manual_reminders_enabled, custom_reminders_enabled
+        FROM notification_settings
+    """)
+    flags = {r[0]: (bool(r[1]), bool(r[2]), bool(r[3])) for r in cur.fetchall()}
+    if target is not None:
+        with _notification_cache_lock:
+            _notification_cache[target] = flags
+    return len(flags)
+
+
+def _cache_notification_flags(conn, user_id: int, changes: dict):
+    """Write-through update of the cached flags after a successful commit ({setting_type: enabled})."""
+    target = connection_target(conn)
+    with _notification_cache_lock:
+        flags = _notification_cache.get(target)
+        if flags is None:
+            return
+        current = flags.get(user_id, (True, True, True))
+        flags[user_id] = tuple(bool(changes.get(name, current[i]))
+                               for i, name in enumerate(_NOTIFICATION_TYPES))
+
+
 def get_notification_setting(conn, user_id: int, setting_type: str) -> bool:
     """
     Get a specific notification setting for a user.
     setting_type: 'homework_reminders', 'manual_reminders', or 'custom_reminders'
     Returns True if enabled (default), False if disabled.
+    Served from the in-memory cache (loaded in bulk on first use).
     """
+    if setting_type not in _NOTIFICATION_TYPES:
+        return True
+    target = connection_target(conn)
+    if target is not None:
+        with _notification_cache_lock:
+            flags = _notification_cache.get(target)
+        if flags is None:
+            load_notification_settings_cache(conn)
+            with _notification_cache_lock:
+                flags = _notification_cache.get(target, {})
+        entry = flags.get(user_id)
+        return True if entry is None else entry[_NOTIFICATION_TYPES.index(setting_type)]
+
     ensure_tables(conn)
     settings = get_notification_settings(conn, user_id)
     if not settings:
@@ -815,6 +1034,7 @@ def set_notification_setting(conn, user_id: int, setting_type: str, enabled: boo
             cur.execute(f"UPDATE notification_settings SET {column_name} = ?, updated_at = ? WHERE user_id = ?",
                        (enabled_int, updated_at, user_id))
     conn.commit()
+    _cache_notification_flags(conn, user_id, {setting_type: enabled})
     return True
 
 def enable_all_notifications(conn, user_id: int) -> bool:
@@ -854,6 +1074,7 @@ def enable_all_notifications(conn, user_id: int) -> bool:
                 VALUES (?, 1, 1, 1, ?)
             """, (user_id, updated_at))
     conn.commit()
+    _cache_notification_flags(conn, user_id, {name: True for name in _NOTIFICATION_TYPES})
     return True
 
 def disable_all_notifications(conn, user_id: int) -> bool:
@@ -893,9 +1114,63 @@ def disable_all_notifications(conn, user_id: int) -> bool:
                 VALUES (?, 0, 0, 0, ?)
             """, (user_id, updated_at))
     conn.commit()
+    _cache_notification_flags(conn, user_id, {name: False for name in _NOTIFICATION_TYPES})
     return True
 
 
+def save_conversation_state(conn, store: str, chat_id: int, data: str, expires_at: float):
+    """Upsert one in-progress conversation (data is JSON text, expires_at a unix timestamp)."""
+    ensure_tables(conn)
+    cur = conn.cursor()
+    if DB_TYPE == "postgresql":
+        cur.execute("""
+            INSERT INTO conversation_state (store, chat_id, data, expires_at)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (store, chat_id) DO UPDATE SET data = EXCLUDED.data, expires_at = EXCLUDED.expires_at
+        """, (store, chat_id, data, expires_at))
+    else:
+        cur.execute("""
+            INSERT OR REPLACE INTO conversation_state (store, chat_id, data, expires_at)
+            VALUES (?, ?, ?, ?)
+        """, (store, chat_id, data, expires_at))
+    conn.commit()
+
+
+def delete_conversation_state(conn, store: str, chat_id: Optional[int] = None):
+    """Delete one conversation of a store, or all of them when chat_id is None."""
+    ensure_tables(conn)
+    cur = conn.cursor()
+    placeholder = "%s" if DB_TYPE == "postgresql" else "?"
+    if chat_id is None:
+        cur.execute(f"DELETE FROM conversation_state WHERE store = {placeholder}", (store,))
+    else:
+        cur.execute(f"DELETE FROM conversation_state WHERE store = {placeholder} AND chat_id = {placeholder}",
+                    (store, chat_id))
+    conn.commit()
+
+
+def load_conversation_states(conn, store: str, now: float) -> List:
+    """Drop expired conversations of a store and return the live ones as (chat_id, data, expires_at)."""
+    ensure_tables(conn)
+    cur = conn.cursor()
+    placeholder = "%s" if DB_TYPE == "postgresql" else "?"
+    cur.execute(f"DELETE FROM conversation_state WHERE store = {placeholder} AND expires_at < {placeholder}",
+                (store, now))
+    conn.commit()
+    cur.execute(f"SELECT chat_id, data, expires_at FROM conversation_state WHERE store = {placeholder}", (store,))
+    return [(r[0], r[1], r[2]) for r in cur.fetchall()]
+
+
+def purge_expired_conversation_states(conn, now: float) -> int:
+    """Delete expired conversations of every store; returns the number of rows removed."""
+    ensure_tables(conn)
+    cur = conn.cursor()
+    placeholder = "%s" if DB_TYPE == "postgresql" else "?"
+    cur.execute(f"DELETE FROM conversation_state WHERE expires_at < {placeholder}", (now,))
+    conn.commit()
+    return cur.rowcount or 0
+
+
 if __name__ == "__main__":
     conn = get_conn()
     ensure_tables(conn)
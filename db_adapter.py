@@ -4,6 +4,8 @@ Database adapter - provides unified interface for SQLite and PostgreSQL.
 
 import os
 import logging
+import threading
+from datetime import datetime
 from typing import Any, Optional, List
 from contextlib import contextmanager
 
@@ -23,10 +25,112 @@ except ImportError:
 
 from db_config import DB_TYPE, get_connection_info
 
+try:
+    from pytz import timezone as pytz_timezone
+except ImportError:
+    pytz_timezone = None
+
 
 # Connection pool for PostgreSQL
 _pg_pool = None
 
+# SQLite: عدد الاتصالات الخاملة المحتفظ بها لكل خيط ولكل ملف قاعدة بيانات
+# (0 = تعطيل إعادة الاستخدام والعودة إلى اتصال جديد في كل مرة)
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE") or "4")
+
+
+class _PooledConnection(sqlite3.Connection):
+    """sqlite3.Connection that remembers which pool path it belongs to."""
+    _pool_path: Optional[str] = None
+
+
+class _SQLitePool:
+    """
+    Thread-local pool of long-lived SQLite connections.
+
+    Each thread keeps up to `max_idle` idle connections per database path. A checked-out
+    connection is never shared, so nested get_conn() calls on the same thread still get
+    distinct connections (and their own transactions). PRAGMAs run once per connection.
+    """
+
+    def __init__(self, max_idle: int = SQLITE_POOL_SIZE):
+        self.max_idle = max_idle
+        self._local = threading.local()
+
+    def _idle(self, path: str) -> list:
+        idle = getattr(self._local, "idle", None)
+        if idle is None:
+            idle = self._local.idle = {}
+        return idle.setdefault(path, [])
+
+    @staticmethod
+    def _connect(path: str):
+        conn = sqlite3.connect(path, check_same_thread=False, timeout=30, factory=_PooledConnection)
+        conn.row_factory = sqlite3.Row
+        conn._pool_path = path
+        try:
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute("PRAGMA synchronous=NORMAL;")
+        except Exception:
+            pass
+        return conn
+
+    def acquire(self, path: str):
+        idle = self._idle(path)
+        while idle:
+            conn = idle.pop()
+            try:
+                conn.execute("SELECT 1")
+            except sqlite3.ProgrammingError:
+                # أُغلق مباشرة عبر conn.close() من مكان آخر
+                continue
+            return conn
+        return self._connect(path)
+
+    def release(self, conn) -> bool:
+        """
+        Return a connection to the calling thread's idle list.
+
+        Uncommitted work is rolled back, matching what close() would do.
+        Returns False if the connection is not poolable (it is then closed).
+        """
+        path = getattr(conn, "_pool_path", None)
+        if path is None:
+            conn.close()
+            return False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            try:
+                conn.close()
+            except Exception:
+                pass
+            return False
+        idle = self._idle(path)
+        if any(c is conn for c in idle):
+            return True
+        if len(idle) >= self.max_idle:
+            conn.close()
+            return False
+        idle.append(conn)
+        return True
+
+    def close_all(self):
+        """Close the idle connections of the calling thread."""
+        idle = getattr(self._local, "idle", None) or {}
+        for conns in idle.values():
+            for conn in conns:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        idle.clear()
+
+
+_sqlite_pool = _SQLitePool()
+
 
 class Row:
     """
@@ -101,18 +205,9 @@ class DatabaseAdapter:
             Connection object (sqlite3.Connection or psycopg2 connection)
         """
         if self.db_type == "sqlite":
-            conn = sqlite3.connect(
-                self.connection_info["path"],
-                check_same_thread=False,
-                timeout=30
-            )
-            conn.row_factory = sqlite3.Row
-            try:
-                conn.execute("PRAGMA journal_mode=WAL;")
-                conn.execute("PRAGMA synchronous=NORMAL;")
-            except Exception:
-                pass
-            return conn
+            if SQLITE_POOL_SIZE > 0:
+                return _sqlite_pool.acquire(self.connection_info["path"])
+            return _SQLitePool._connect(self.connection_info["path"])
         
         elif self.db_type == "postgresql":
             try:
@@ -217,17 +312,87 @@ def get_conn(db_path: Optional[str] = None):
     return adapter.get_connection()
 
 
+def connection_target(conn) -> Optional[str]:
+    """
+    Identify the database a connection points to (used to cache per-database work).
+
+    Returns:
+        Absolute SQLite file path, "postgresql", or None if unknown (e.g. in-memory).
+    """
+    if get_adapter().db_type == "postgresql":
+        return "postgresql"
+    path = getattr(conn, "_pool_path", None)
+    if path is None:
+        try:
+            row = conn.execute("PRAGMA database_list").fetchone()
+            path = row[2] if row else None
+        except Exception:
+            path = None
+    if not path or path == ":memory:":
+        return None
+    return os.path.abspath(path)
+
+
+# المنطقة الزمنية التي تُفسَّر بها التواريخ المخزنة بدون منطقة (due_at / reminder_datetime)
+APP_TIMEZONE = os.getenv("APP_TIMEZONE") or "Africa/Algiers"
+_app_tz = None
+
+
+def get_app_timezone():
+    """pytz timezone for APP_TIMEZONE (shared with SchedulerManager); None without pytz."""
+    global _app_tz
+    if _app_tz is None and pytz_timezone is not None:
+        try:
+            _app_tz = pytz_timezone(APP_TIMEZONE)
+        except Exception:
+            logger.warning(f"Unknown APP_TIMEZONE {APP_TIMEZONE!r}, using UTC")
+            _app_tz = pytz_timezone("UTC")
+    return _app_tz
+
+
+def to_epoch(value) -> Optional[int]:
+    """
+    Convert a due date to epoch seconds (the indexed due_ts / reminder_ts columns).
+
+    Accepts "YYYY-MM-DD HH:MM[:SS]" strings (SQLite TEXT, user input), naive datetimes
+    (PostgreSQL TIMESTAMP) — both read as APP_TIMEZONE local time — and aware datetimes.
+    Returns None for empty or unparseable values.
+    """
+    if value is None or value == "":
+        return None
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value).strip()[:19])
+        except ValueError:
+            return None
+    if value.tzinfo is None:
+        tz = get_app_timezone()
+        if tz is None:
+            return int(value.timestamp())  # بدون pytz: التوقيت المحلي للنظام
+        value = tz.localize(value)
+    return int(value.timestamp())
+
+
+def from_epoch(ts, tz=None) -> datetime:
+    """Aware datetime for epoch seconds in `tz` (default APP_TIMEZONE; naive local time without pytz)."""
+    tz = tz or get_app_timezone()
+    if tz is None:
+        return datetime.fromtimestamp(int(ts))
+    return datetime.fromtimestamp(int(ts), tz)
+
+
 def close_conn(conn):
     """
     Close a database connection properly.
     
-    For SQLite: closes the connection
+    For SQLite: returns the connection to the thread-local pool
+                (uncommitted changes are rolled back, like close())
     For PostgreSQL: returns connection to pool
     """
     adapter = get_adapter()
     
     if adapter.db_type == "sqlite":
         if conn:
-            conn.close()
+            _sqlite_pool.release(conn)
     elif adapter.db_type == "postgresql":
         adapter.release_connection(conn)
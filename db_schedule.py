@@ -1,11 +1,35 @@
 
 """Database functions for weekly schedule management."""
 import sqlite3
+from functools import wraps
 from typing import List, Optional, Dict, Any
 from db import ensure_tables, get_conn
 from db_utils import db_connection as _db_connection
 
 
+# يزداد مع كل تعديل على الحصص أو الأماكن أو إعدادات الأسابيع الدورية،
+# وتعتمد عليه الكاشات في weekly_schedule لمعرفة أن نسختها قديمة
+_schedule_generation = 0
+
+
+def get_schedule_generation() -> int:
+    """Current schedule data generation (changes after every schedule write)."""
+    return _schedule_generation
+
+
+def _invalidates_schedule_cache(func):
+    """Bump the schedule generation after a write, whatever its outcome."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        global _schedule_generation
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _schedule_generation += 1
+    return wrapper
+
+
+@_invalidates_schedule_cache
 def insert_schedule_class(conn: sqlite3.Connection, group_number: str, day_name: str,
                          time_start: str, time_end: str, course: str, location: str,
                          class_type: str, is_alternating: bool = False,
@@ -69,6 +93,25 @@ def get_schedule_classes(conn: sqlite3.Connection, group_number: str, day_name:
     return cur.fetchall()
 
 
+def get_group_schedule_rows(conn: sqlite3.Connection, group_number: str) -> List[sqlite3.Row]:
+    """
+    Get a group's whole week in one query, each class joined with its location
+    maps_url and, for alternating classes, the reference_date of its config.
+    """
+    ensure_tables(conn)
+    conn.row_factory = sqlite3.Row
+    cur = conn.cursor()
+    cur.execute("""
+    SELECT c.*, l.maps_url AS location_url, a.reference_date AS alt_reference_date
+    FROM weekly_schedule_classes c
+    LEFT JOIN schedule_locations l ON l.location_name = c.location
+    LEFT JOIN alternating_weeks_config a ON a.alternating_key = c.alternating_key
+    WHERE c.group_number = ?
+    ORDER BY c.day_name, c.display_order, c.time_start
+    """, (group_number,))
+    return cur.fetchall()
+
+
 def get_schedule_class(conn: sqlite3.Connection, class_id: int) -> Optional[sqlite3.Row]:
     """Get a specific schedule class by ID."""
     ensure_tables(conn)
@@ -77,6 +120,7 @@ def get_schedule_class(conn: sqlite3.Connection, class_id: int) -> Optional[sqli
     return cur.fetchone()
 
 
+@_invalidates_schedule_cache
 def update_schedule_class(conn: sqlite3.Connection, class_id: int, **kwargs) -> bool:
     """Update a schedule class. kwargs can contain: time_start, time_end, course, location, class_type, is_alternating, alternating_key, display_order"""
     ensure_tables(conn)
@@ -108,6 +152,7 @@ def update_schedule_class(conn: sqlite3.Connection, class_id: int, **kwargs) ->
     return cur.rowcount > 0
 
 
+@_invalidates_schedule_cache
 def delete_schedule_class(conn: sqlite3.Connection, class_id: int) -> bool:
     """Delete a schedule class."""
     ensure_tables(conn)
@@ -117,6 +162,7 @@ def delete_schedule_class(conn: sqlite3.Connection, class_id: int) -> bool:
     return cur.rowcount > 0
 
 
+@_invalidates_schedule_cache
 def insert_schedule_location(conn: sqlite3.Connection, location_name: str, maps_url: str) -> bool:
     """Insert or update a schedule location."""
     ensure_tables(conn)
@@ -155,6 +201,7 @@ def get_schedule_location(conn: sqlite3.Connection, location_name: str) -> Optio
     return row[0] if row else None
 
 
+@_invalidates_schedule_cache
 def delete_schedule_location(conn: sqlite3.Connection, location_name: str) -> bool:
     """Delete a schedule location."""
     ensure_tables(conn)
@@ -164,6 +211,7 @@ def delete_schedule_location(conn: sqlite3.Connection, location_name: str) -> bo
     return cur.rowcount > 0
 
 
+@_invalidates_schedule_cache
 def set_alternating_week_config(conn: sqlite3.Connection, alternating_key: str, reference_date: str, description: Optional[str] = None) -> bool:
     """Set configuration for alternating weeks."""
     ensure_tables(conn)
@@ -211,6 +259,7 @@ def get_all_alternating_week_configs(conn: sqlite3.Connection) -> List[sqlite3.R
     return cur.fetchall()
 
 
+@_invalidates_schedule_cache
 def update_schedule_class_field(conn: sqlite3.Connection, class_id: int, field: str, value: Any) -> bool:
     """Update a specific field of a schedule class."""
     ensure_tables(conn)
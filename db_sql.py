@@ -9,6 +9,9 @@ def get_create_table_sql() -> dict:
     """
     Get CREATE TABLE statements for the current database type.
     
+    This is the current schema for reference; schema migrations carry their own
+    frozen DDL (see get_schema_migrations()).
+    
     Returns:
         dict: Table name -> CREATE TABLE SQL
     """
@@ -36,7 +39,8 @@ def _get_sqlite_schema() -> dict:
               done INTEGER DEFAULT 0,
               reminders TEXT,
               target_user_id INTEGER,
-              created_at TEXT DEFAULT CURRENT_TIMESTAMP
+              created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+              due_ts INTEGER
             )
         """,
         "users": """
@@ -67,6 +71,7 @@ def _get_sqlite_schema() -> dict:
               text TEXT NOT NULL,
               reminder_datetime TEXT NOT NULL,
               created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+              reminder_ts INTEGER,
               FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
             )
         """,
@@ -133,6 +138,49 @@ def _get_sqlite_schema() -> dict:
               updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
               FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
             )
+        """,
+        "outbox_jobs": """
+            CREATE TABLE IF NOT EXISTS outbox_jobs (
+              job_key TEXT PRIMARY KEY,
+              payload TEXT NOT NULL,
+              created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+        "outbox": """
+            CREATE TABLE IF NOT EXISTS outbox (
+              id INTEGER PRIMARY KEY AUTOINCREMENT,
+              job_key TEXT NOT NULL,
+              recipient INTEGER NOT NULL,
+              status TEXT NOT NULL DEFAULT 'pending',
+              attempts INTEGER DEFAULT 0,
+              last_error TEXT,
+              updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+              ops_done INTEGER DEFAULT 0,
+              next_attempt_at TEXT,
+              UNIQUE (job_key, recipient),
+              FOREIGN KEY (job_key) REFERENCES outbox_jobs(job_key) ON DELETE CASCADE
+            )
+        """,
+        "reminder_queue": """
+            CREATE TABLE IF NOT EXISTS reminder_queue (
+              job_id TEXT PRIMARY KEY,
+              run_at TEXT NOT NULL,
+              callable_ref TEXT NOT NULL,
+              args TEXT NOT NULL,
+              created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+        "reminder_queue_run_at_idx": """
+            CREATE INDEX IF NOT EXISTS idx_reminder_queue_run_at ON reminder_queue (run_at)
+        """,
+        "conversation_state": """
+            CREATE TABLE IF NOT EXISTS conversation_state (
+              store TEXT NOT NULL,
+              chat_id INTEGER NOT NULL,
+              data TEXT NOT NULL,
+              expires_at REAL NOT NULL,
+              PRIMARY KEY (store, chat_id)
+            )
         """
     }
 
@@ -154,7 +202,8 @@ def _get_postgresql_schema() -> dict:
               done INTEGER DEFAULT 0,
               reminders TEXT,
               target_user_id INTEGER,
-              created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+              created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+              due_ts BIGINT
             )
         """,
         "users": """
@@ -185,6 +234,7 @@ def _get_postgresql_schema() -> dict:
               text TEXT NOT NULL,
               reminder_datetime TIMESTAMP NOT NULL,
               created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+              reminder_ts BIGINT,
               FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
             )
         """,
@@ -251,10 +301,498 @@ def _get_postgresql_schema() -> dict:
               updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
               FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
             )
+        """,
+        "outbox_jobs": """
+            CREATE TABLE IF NOT EXISTS outbox_jobs (
+              job_key TEXT PRIMARY KEY,
+              payload TEXT NOT NULL,
+              created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+        "outbox": """
+            CREATE TABLE IF NOT EXISTS outbox (
+              id SERIAL PRIMARY KEY,
+              job_key TEXT NOT NULL,
+              recipient BIGINT NOT NULL,
+              status TEXT NOT NULL DEFAULT 'pending',
+              attempts INTEGER DEFAULT 0,
+              last_error TEXT,
+              updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+              ops_done INTEGER DEFAULT 0,
+              next_attempt_at TIMESTAMP,
+              UNIQUE (job_key, recipient),
+              FOREIGN KEY (job_key) REFERENCES outbox_jobs(job_key) ON DELETE CASCADE
+            )
+        """,
+        "reminder_queue": """
+            CREATE TABLE IF NOT EXISTS reminder_queue (
+              job_id TEXT PRIMARY KEY,
+              run_at TIMESTAMP NOT NULL,
+              callable_ref TEXT NOT NULL,
+              args TEXT NOT NULL,
+              created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+        "reminder_queue_run_at_idx": """
+            CREATE INDEX IF NOT EXISTS idx_reminder_queue_run_at ON reminder_queue (run_at)
+        """,
+        "conversation_state": """
+            CREATE TABLE IF NOT EXISTS conversation_state (
+              store TEXT NOT NULL,
+              chat_id BIGINT NOT NULL,
+              data TEXT NOT NULL,
+              expires_at DOUBLE PRECISION NOT NULL,
+              PRIMARY KEY (store, chat_id)
+            )
+        """
+    }
+
+
+def get_schema_version_table_sql() -> str:
+    """CREATE TABLE statement for the table that records applied schema migrations."""
+    ts_type = "TIMESTAMP" if DB_TYPE == "postgresql" else "TEXT"
+    return f"""
+        CREATE TABLE IF NOT EXISTS schema_version (
+          version INTEGER PRIMARY KEY,
+          description TEXT,
+          applied_at {ts_type} DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+
+
+def get_schema_migrations() -> list:
+    """
+    Ordered schema migrations for the current database type.
+
+    Returns:
+        list: (version, description, [steps]) tuples. A step is an SQL string or a
+        callable taking a cursor (for changes plain SQL cannot express idempotently).
+        Append-only — never edit an entry that may already be applied; add a new
+        version with its own literal DDL instead (e.g. when a table is added to
+        get_create_table_sql(), which describes the current schema only).
+    """
+    if DB_TYPE == "postgresql":
+        user_columns = [f"ALTER TABLE users ADD COLUMN IF NOT EXISTS {col} {col_type}"
+                        for col, col_type in _USERS_COLUMNS.items()]
+    else:
+        user_columns = [lambda cur: _sqlite_add_missing_columns(cur, "users", _USERS_COLUMNS)]
+    return [
+        (1, "baseline tables", _baseline_tables()),
+        (2, "users columns for legacy databases", user_columns),
+        (3, "conversation_state table", [_conversation_state_table()]),
+        (4, "indexes for hot query paths", list(get_index_sql().values())),
+        (5, "epoch due-date columns", _epoch_column_steps()),
+        (6, "outbox progress and backoff columns", _outbox_column_steps()),
+        (7, "outbox tables", _outbox_tables()),
+        (8, "reminder_queue table", _reminder_queue_table()),
+    ]
+
+
+# DDL الخاص بكل ترقية مكتوب حرفياً ومجمّد: تعديل get_create_table_sql() لا يغيّر ما تنفذه ترقية قديمة.
+# قواعد بيانات طبّقت الترقية 1 بنسختها السابقة (التي شملت outbox و reminder_queue) تمر على 7 و 8 دون تغيير.
+
+def _baseline_tables() -> list:
+    """Migration 1: the tables of the first release."""
+    if DB_TYPE == "postgresql":
+        return _baseline_postgresql_tables()
+    return _baseline_sqlite_tables()
+
+
+def _baseline_sqlite_tables() -> list:
+    """SQLite tables as first released (migration 1). Frozen — do not edit."""
+    return [
+        """
+            CREATE TABLE IF NOT EXISTS homeworks (
+              id INTEGER PRIMARY KEY AUTOINCREMENT,
+              subject TEXT NOT NULL,
+              description TEXT,
+              due_at TEXT NOT NULL,
+              pdf_type TEXT,
+              pdf_value TEXT,
+              conditions TEXT,
+              created_by INTEGER,
+              chat_id INTEGER,
+              done INTEGER DEFAULT 0,
+              reminders TEXT,
+              target_user_id INTEGER,
+              created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+        """
+            CREATE TABLE IF NOT EXISTS users (
+              user_id INTEGER UNIQUE NOT NULL,
+              started_at TEXT,
+              username TEXT,
+              first_name TEXT,
+              last_name TEXT,
+              registered_at TEXT,
+              display_name TEXT,
+              group_number TEXT
+            )
+        """,
+        """
+            CREATE TABLE IF NOT EXISTS homework_completions (
+              hw_id INTEGER NOT NULL,
+              user_id INTEGER NOT NULL,
+              completed_at TEXT DEFAULT CURRENT_TIMESTAMP,
+              PRIMARY KEY (hw_id, user_id),
+              FOREIGN KEY (hw_id) REFERENCES homeworks(id) ON DELETE CASCADE
+            )
+        """,
+        """
+            CREATE TABLE IF NOT EXISTS custom_reminders (
+              id INTEGER PRIMARY KEY AUTOINCREMENT,
+              user_id INTEGER NOT NULL,
+              text TEXT NOT NULL,
+              reminder_datetime TEXT NOT NULL,
+              created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+              FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+            )
+        """,
+        """
+            CREATE TABLE IF NOT EXISTS custom_reminder_completions (
+              reminder_id INTEGER NOT NULL,
+              user_id INTEGER NOT NULL,
+              completed_at TEXT DEFAULT CURRENT_TIMESTAMP,
+              PRIMARY KEY (reminder_id, user_id),
+              FOREIGN KEY (reminder_id) REFERENCES custom_reminders(id) ON DELETE CASCADE
+            )
+        """,
+        """
+            CREATE TABLE IF NOT EXISTS faq_entries (
+              id INTEGER PRIMARY KEY AUTOINCREMENT,
+              question TEXT NOT NULL,
+              answer TEXT NOT NULL,
+              created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+              updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+        """
+            CREATE TABLE IF NOT EXISTS weekly_schedule_classes (
+              id INTEGER PRIMARY KEY AUTOINCREMENT,
+              group_number TEXT NOT NULL,
+              day_name TEXT NOT NULL,
+              time_start TEXT NOT NULL,
+              time_end TEXT NOT NULL,
+              course TEXT NOT NULL,
+              location TEXT NOT NULL,
+              class_type TEXT NOT NULL,
+              is_alternating INTEGER DEFAULT 0,
+              alternating_key TEXT,
+              display_order INTEGER DEFAULT 0,
+              created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+              updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+              UNIQUE(group_number, day_name, time_start, course)
+            )
+        """,
+        """
+            CREATE TABLE IF NOT EXISTS schedule_locations (
+              location_name TEXT PRIMARY KEY,
+              maps_url TEXT,
+              created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+              updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+        """
+            CREATE TABLE IF NOT EXISTS alternating_weeks_config (
+              id INTEGER PRIMARY KEY AUTOINCREMENT,
+              alternating_key TEXT UNIQUE NOT NULL,
+              reference_date TEXT NOT NULL,
+              description TEXT,
+              created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+              updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+        """
+            CREATE TABLE IF NOT EXISTS notification_settings (
+              user_id INTEGER PRIMARY KEY,
+              homework_reminders_enabled INTEGER DEFAULT 1,
+              manual_reminders_enabled INTEGER DEFAULT 1,
+              custom_reminders_enabled INTEGER DEFAULT 1,
+              updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+              FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+            )
+        """
+    ]
+
+
+def _baseline_postgresql_tables() -> list:
+    """PostgreSQL tables as first released (migration 1). Frozen — do not edit."""
+    return [
+        """
+            CREATE TABLE IF NOT EXISTS homeworks (
+              id SERIAL PRIMARY KEY,
+              subject TEXT NOT NULL,
+              description TEXT,
+              due_at TIMESTAMP NOT NULL,
+              pdf_type TEXT,
+              pdf_value TEXT,
+              conditions TEXT,
+              created_by INTEGER,
+              chat_id INTEGER,
+              done INTEGER DEFAULT 0,
+              reminders TEXT,
+              target_user_id INTEGER,
+              created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+        """
+            CREATE TABLE IF NOT EXISTS users (
+              user_id BIGINT UNIQUE NOT NULL,
+              started_at TIMESTAMP,
+              username TEXT,
+              first_name TEXT,
+              last_name TEXT,
+              registered_at TIMESTAMP,
+              display_name TEXT,
+              group_number TEXT
+            )
+        """,
+        """
+            CREATE TABLE IF NOT EXISTS homework_completions (
+              hw_id INTEGER NOT NULL,
+              user_id BIGINT NOT NULL,
+              completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+              PRIMARY KEY (hw_id, user_id),
+              FOREIGN KEY (hw_id) REFERENCES homeworks(id) ON DELETE CASCADE
+            )
+        """,
+        """
+            CREATE TABLE IF NOT EXISTS custom_reminders (
+              id SERIAL PRIMARY KEY,
+              user_id BIGINT NOT NULL,
+              text TEXT NOT NULL,
+              reminder_datetime TIMESTAMP NOT NULL,
+              created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+              FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+            )
+        """,
+        """
+            CREATE TABLE IF NOT EXISTS custom_reminder_completions (
+              reminder_id INTEGER NOT NULL,
+              user_id BIGINT NOT NULL,
+              completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+              PRIMARY KEY (reminder_id, user_id),
+              FOREIGN KEY (reminder_id) REFERENCES custom_reminders(id) ON DELETE CASCADE
+            )
+        """,
+        """
+            CREATE TABLE IF NOT EXISTS faq_entries (
+              id SERIAL PRIMARY KEY,
+              question TEXT NOT NULL,
+              answer TEXT NOT NULL,
+              created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+              updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+        """
+            CREATE TABLE IF NOT EXISTS weekly_schedule_classes (
+              id SERIAL PRIMARY KEY,
+              group_number TEXT NOT NULL,
+              day_name TEXT NOT NULL,
+              time_start TEXT NOT NULL,
+              time_end TEXT NOT NULL,
+              course TEXT NOT NULL,
+              location TEXT NOT NULL,
+              class_type TEXT NOT NULL,
+              is_alternating INTEGER DEFAULT 0,
+              alternating_key TEXT,
+              display_order INTEGER DEFAULT 0,
+              created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+              updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+              UNIQUE(group_number, day_name, time_start, course)
+            )
+        """,
+        """
+            CREATE TABLE IF NOT EXISTS schedule_locations (
+              location_name TEXT PRIMARY KEY,
+              maps_url TEXT,
+              created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+              updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+        """
+            CREATE TABLE IF NOT EXISTS alternating_weeks_config (
+              id SERIAL PRIMARY KEY,
+              alternating_key TEXT UNIQUE NOT NULL,
+              reference_date TEXT NOT NULL,
+              description TEXT,
+              created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+              updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+        """
+            CREATE TABLE IF NOT EXISTS notification_settings (
+              user_id BIGINT PRIMARY KEY,
+              homework_reminders_enabled INTEGER DEFAULT 1,
+              manual_reminders_enabled INTEGER DEFAULT 1,
+              custom_reminders_enabled INTEGER DEFAULT 1,
+              updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+              FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+            )
         """
+    ]
+
+
+def _conversation_state_table() -> str:
+    """Migration 3: persisted multi-step conversation state."""
+    chat_id_type, expires_type = ("BIGINT", "DOUBLE PRECISION") if DB_TYPE == "postgresql" else ("INTEGER", "REAL")
+    return f"""
+        CREATE TABLE IF NOT EXISTS conversation_state (
+          store TEXT NOT NULL,
+          chat_id {chat_id_type} NOT NULL,
+          data TEXT NOT NULL,
+          expires_at {expires_type} NOT NULL,
+          PRIMARY KEY (store, chat_id)
+        )
+    """
+
+
+def _outbox_tables() -> list:
+    """Migration 7: outbox_jobs / outbox (already including the migration 6 columns)."""
+    if DB_TYPE == "postgresql":
+        id_type, recipient_type, ts_type = "SERIAL PRIMARY KEY", "BIGINT", "TIMESTAMP"
+    else:
+        id_type, recipient_type, ts_type = "INTEGER PRIMARY KEY AUTOINCREMENT", "INTEGER", "TEXT"
+    return [
+        f"""
+        CREATE TABLE IF NOT EXISTS outbox_jobs (
+          job_key TEXT PRIMARY KEY,
+          payload TEXT NOT NULL,
+          created_at {ts_type} DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        f"""
+        CREATE TABLE IF NOT EXISTS outbox (
+          id {id_type},
+          job_key TEXT NOT NULL,
+          recipient {recipient_type} NOT NULL,
+          status TEXT NOT NULL DEFAULT 'pending',
+          attempts INTEGER DEFAULT 0,
+          last_error TEXT,
+          updated_at {ts_type} DEFAULT CURRENT_TIMESTAMP,
+          ops_done INTEGER DEFAULT 0,
+          next_attempt_at {ts_type},
+          UNIQUE (job_key, recipient),
+          FOREIGN KEY (job_key) REFERENCES outbox_jobs(job_key) ON DELETE CASCADE
+        )
+        """,
+    ]
+
+
+def _reminder_queue_table() -> list:
+    """Migration 8: reminder_queue for the next-due dispatcher."""
+    ts_type = "TIMESTAMP" if DB_TYPE == "postgresql" else "TEXT"
+    return [
+        f"""
+        CREATE TABLE IF NOT EXISTS reminder_queue (
+          job_id TEXT PRIMARY KEY,
+          run_at {ts_type} NOT NULL,
+          callable_ref TEXT NOT NULL,
+          args TEXT NOT NULL,
+          created_at {ts_type} DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_reminder_queue_run_at ON reminder_queue (run_at)",
+    ]
+
+
+# أعمدة epoch (ثوانٍ UTC) بجانب أعمدة التاريخ النصية/TIMESTAMP: مقارنات رقمية مفهرسة على كلا النوعين
+_EPOCH_COLUMNS = {
+    "homeworks": ("due_at", "due_ts"),
+    "custom_reminders": ("reminder_datetime", "reminder_ts"),
+}
+
+
+def _epoch_column_steps() -> list:
+    if DB_TYPE == "postgresql":
+        steps = [f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {ts_col} BIGINT"
+                 for table, (_, ts_col) in _EPOCH_COLUMNS.items()]
+    else:
+        steps = [lambda cur, table=table, ts_col=ts_col: _sqlite_add_missing_columns(cur, table, {ts_col: "INTEGER"})
+                 for table, (_, ts_col) in _EPOCH_COLUMNS.items()]
+    steps.append(_backfill_epoch_columns)
+    steps.append("CREATE INDEX IF NOT EXISTS idx_homeworks_done_due_ts ON homeworks (done, due_ts)")
+    steps.append("CREATE INDEX IF NOT EXISTS idx_custom_reminders_ts ON custom_reminders (reminder_ts)")
+    # حل محله idx_homeworks_done_due_ts (bootstrap يقارن due_ts الآن)
+    steps.append("DROP INDEX IF EXISTS idx_homeworks_done_due_at")
+    return steps
+
+
+def _backfill_epoch_columns(cur):
+    """Fill due_ts / reminder_ts for rows written before the columns existed."""
+    from db_adapter import to_epoch
+    placeholder = "%s" if DB_TYPE == "postgresql" else "?"
+    for table, (dt_col, ts_col) in _EPOCH_COLUMNS.items():
+        cur.execute(f"SELECT id, {dt_col} FROM {table} WHERE {ts_col} IS NULL")
+        updates = [(to_epoch(value), row_id) for row_id, value in cur.fetchall()]
+        updates = [u for u in updates if u[0] is not None]
+        if updates:
+            cur.executemany(f"UPDATE {table} SET {ts_col} = {placeholder} WHERE id = {placeholder}", updates)
+
+
+def _outbox_column_steps() -> list:
+    # ops_done: عدد العمليات المرسلة من payload (الاستئناف منها)؛ next_attempt_at: موعد إعادة المحاولة (backoff)
+    # في قاعدة بيانات جديدة لا يوجد outbox بعد (تنشئه الترقية 7 بالأعمدة كاملة)، فلا شيء يُعدَّل
+    if DB_TYPE == "postgresql":
+        return ["ALTER TABLE IF EXISTS outbox ADD COLUMN IF NOT EXISTS ops_done INTEGER DEFAULT 0",
+                "ALTER TABLE IF EXISTS outbox ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMP"]
+    return [lambda cur: _sqlite_add_missing_columns(cur, "outbox", {"ops_done": "INTEGER DEFAULT 0",
+                                                                    "next_attempt_at": "TEXT"})]
+
+
+def get_index_sql() -> dict:
+    """
+    Secondary indexes for the hot query paths (same SQL on SQLite and PostgreSQL).
+
+    Applied by schema migration 4, after the users columns exist on legacy databases.
+
+    Returns:
+        dict: Index name -> CREATE INDEX SQL
+    """
+    return {
+        # get_all_custom_reminders_for_user: WHERE user_id = ? ORDER BY reminder_datetime
+        "idx_custom_reminders_user_datetime":
+            "CREATE INDEX IF NOT EXISTS idx_custom_reminders_user_datetime ON custom_reminders (user_id, reminder_datetime)",
+        # كان لـ bootstrap_all؛ حل محله idx_homeworks_done_due_ts وتحذفه الترقية 5
+        "idx_homeworks_done_due_at":
+            "CREATE INDEX IF NOT EXISTS idx_homeworks_done_due_at ON homeworks (done, due_at)",
+        # get_all_homeworks / homework browser: ORDER BY due_at
+        "idx_homeworks_due_at":
+            "CREATE INDEX IF NOT EXISTS idx_homeworks_due_at ON homeworks (due_at)",
+        # get_schedule_classes: WHERE group_number = ? AND day_name = ? ORDER BY display_order, time_start
+        "idx_weekly_schedule_group_day":
+            "CREATE INDEX IF NOT EXISTS idx_weekly_schedule_group_day "
+            "ON weekly_schedule_classes (group_number, day_name, display_order, time_start)",
+        # /students group filter + keyset on user_id
+        "idx_users_group_number":
+            "CREATE INDEX IF NOT EXISTS idx_users_group_number ON users (group_number, user_id)",
     }
 
 
+# أعمدة users التي قد تنقص في قواعد بيانات قديمة (أُنشئت قبل إضافتها إلى المخطط)
+_USERS_COLUMNS = {
+    "started_at": "TEXT",
+    "username": "TEXT",
+    "first_name": "TEXT",
+    "last_name": "TEXT",
+    "registered_at": "TEXT",
+    "display_name": "TEXT",
+    "group_number": "TEXT",
+}
+
+
+def _sqlite_add_missing_columns(cur, table: str, columns: dict):
+    """SQLite has no ADD COLUMN IF NOT EXISTS: probe table_info once and add what is missing (no-op if the table is absent)."""
+    cur.execute(f"PRAGMA table_info({table})")
+    existing = {r[1] for r in cur.fetchall()}
+    if not existing:
+        return
+    for col, col_type in columns.items():
+        if col not in existing:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {col} {col_type}")
+
+
 def get_current_timestamp() -> str:
     """
     Get the SQL for current timestamp based on DB type.
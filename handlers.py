@@ -2,9 +2,13 @@
 """Telegram bot handlers for homework reminder system."""
 import html
 import logging
+import os
 import threading
+import time
+import uuid
+from collections import OrderedDict
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional
 
 import telebot
 from telebot import types
@@ -13,80 +17,47 @@ from config import ADMIN_IDS
 from utils import is_cancel_text, parse_dt
 from db import (
     ensure_tables,
-    insert_homework, get_homework, get_all_homeworks, delete_homework,
-    mark_done, mark_undone, is_homework_done_for_user, update_field, register_user, update_user_display_name,
-    is_user_registered, is_user_registration_complete, get_all_registered_user_ids, get_user_display_info,
-    get_all_registered_users,
-    insert_custom_reminder, get_custom_reminder, get_all_custom_reminders_for_user, delete_custom_reminder,
-    mark_custom_reminder_done, mark_custom_reminder_undone, is_custom_reminder_done_for_user,
-    get_notification_setting, set_notification_setting, enable_all_notifications, disable_all_notifications,
-    get_notification_settings, insert_faq_entry, get_faq_entry, get_all_faq_entries,
-    update_faq_entry, delete_faq_entry
+    insert_homework, get_homework,
+    update_field, register_user, update_user_display_name,
+    is_user_registered, is_user_registration_complete, get_user_display_info,
+    get_registered_users_notification_flags,
+    insert_custom_reminder,
+    get_notification_setting,
+    insert_faq_entry, get_all_faq_entries,
+    update_faq_entry
 )
+from db_adapter import to_epoch, from_epoch
 from db_utils import db_connection, safe_get
+from outbox import submit as outbox_submit, message_op, media_ops
 from validators import (
     validate_text_input, validate_datetime, validate_user_id,
     validate_reminders, validate_url
 )
 from constants import (
-    CALLBACK_HW_DONE, CALLBACK_HW_UNDONE, CALLBACK_HW_PDF, CALLBACK_HW_VIEW, CALLBACK_HW_EDIT_ID,
-    CALLBACK_HW_DELETE_ID, CALLBACK_HW_CONFIRM_DELETE, CALLBACK_HW_EDIT_FIELD,
-    CALLBACK_HW_CANCEL, CALLBACK_HW_BACK, CALLBACK_HW_LIST, CALLBACK_HW_ADD,
-    CALLBACK_HW_EDIT, CALLBACK_HW_DELETE, CALLBACK_MANUAL_REMINDER,
-    CALLBACK_MANUAL_SEND_NOW, CALLBACK_MANUAL_SCHEDULE, CALLBACK_MANUAL_TARGET_ALL,
-    CALLBACK_MANUAL_TARGET_USER, CALLBACK_MANUAL_TARGET_CHAT,
-    CALLBACK_MANUAL_TARGET_CHAT_TOPIC, DEFAULT_REMINDERS,
-    PENDING_STEP_TARGET_TYPE, PENDING_STEP_ENTER_TARGET, PENDING_STEP_ENTER_TEXT,
+    CALLBACK_HW_CANCEL,
+    PENDING_STEP_ENTER_TARGET, PENDING_STEP_ENTER_TEXT,
     PENDING_STEP_ENTER_CONTENT, PENDING_STEP_ENTER_CHAT, PENDING_STEP_ENTER_THREAD, PENDING_STEP_ENTER_DATETIME,
     MAX_INPUT_LENGTH, MAX_DESCRIPTION_LENGTH,
-    CALLBACK_CUSTOM_REMINDER, CALLBACK_CUSTOM_REMINDER_ADD, CALLBACK_CUSTOM_REMINDER_LIST,
-    CALLBACK_CUSTOM_REMINDER_DELETE, CALLBACK_CUSTOM_REMINDER_CONFIRM_DELETE,
-    CALLBACK_CUSTOM_REMINDER_DONE, CALLBACK_CUSTOM_REMINDER_UNDONE,
-    CALLBACK_FAQ_LIST, CALLBACK_FAQ_VIEW, CALLBACK_FAQ_ADMIN, CALLBACK_FAQ_ADMIN_ADD,
-    CALLBACK_FAQ_ADMIN_EDIT, CALLBACK_FAQ_ADMIN_EDIT_ANSWER, CALLBACK_FAQ_ADMIN_DELETE,
-    CALLBACK_FAQ_ADMIN_DELETE_ANSWER, CALLBACK_FAQ_ADMIN_EDIT_SELECT,
-    CALLBACK_FAQ_ADMIN_EDIT_ANSWER_SELECT, CALLBACK_FAQ_ADMIN_DELETE_SELECT,
-    CALLBACK_FAQ_ADMIN_DELETE_CONFIRM, CALLBACK_FAQ_ADMIN_DELETE_ANSWER_SELECT,
-    CALLBACK_FAQ_ADMIN_DELETE_ANSWER_CONFIRM, CALLBACK_FAQ_BACK,
-    FAQ_ANSWER_PLACEHOLDER,
-    CALLBACK_WEEKLY_SCHEDULE, CALLBACK_WEEKLY_SCHEDULE_GROUP_01, CALLBACK_WEEKLY_SCHEDULE_GROUP_02,
-    CALLBACK_WEEKLY_SCHEDULE_GROUP_03, CALLBACK_WEEKLY_SCHEDULE_GROUP_04,
-    CALLBACK_WEEKLY_SCHEDULE_TODAY, CALLBACK_WEEKLY_SCHEDULE_TOMORROW, CALLBACK_WEEKLY_SCHEDULE_WEEK,
-    CALLBACK_WEEKLY_SCHEDULE_ADMIN, CALLBACK_WEEKLY_SCHEDULE_ADMIN_GROUP, CALLBACK_WEEKLY_SCHEDULE_ADMIN_DAY,
-    CALLBACK_WEEKLY_SCHEDULE_ADMIN_VIEW, CALLBACK_WEEKLY_SCHEDULE_ADMIN_ADD, CALLBACK_WEEKLY_SCHEDULE_ADMIN_EDIT,
-    CALLBACK_WEEKLY_SCHEDULE_ADMIN_DELETE, CALLBACK_WEEKLY_SCHEDULE_ADMIN_CONFIRM_DELETE,
-    CALLBACK_WEEKLY_SCHEDULE_ADMIN_LOCATIONS, CALLBACK_WEEKLY_SCHEDULE_ADMIN_ALTERNATING,
-    CALLBACK_SCHEDULE_EDIT_TIME_START, CALLBACK_SCHEDULE_EDIT_TIME_END,
-    CALLBACK_SCHEDULE_EDIT_COURSE, CALLBACK_SCHEDULE_EDIT_LOCATION,
-    CALLBACK_SCHEDULE_EDIT_TYPE, CALLBACK_SCHEDULE_EDIT_ALTERNATING,
-    CALLBACK_ALTERNATING_LIST, CALLBACK_ALTERNATING_EDIT, CALLBACK_ALTERNATING_EDIT_DATE, CALLBACK_ALTERNATING_ADD,
-    CALLBACK_NOTIFICATION_SETTINGS, CALLBACK_NOTIFICATION_DISABLE_HOMEWORK, CALLBACK_NOTIFICATION_ENABLE_HOMEWORK,
-    CALLBACK_NOTIFICATION_DISABLE_MANUAL, CALLBACK_NOTIFICATION_ENABLE_MANUAL,
-    CALLBACK_NOTIFICATION_DISABLE_CUSTOM, CALLBACK_NOTIFICATION_ENABLE_CUSTOM,
-    CALLBACK_NOTIFICATION_DISABLE_ALL, CALLBACK_NOTIFICATION_ENABLE_ALL,
     REGISTRATION_GROUP_NORMALIZATION, REGISTRATION_GROUP_OPTIONS
 )
 
 logger = logging.getLogger(__name__)
 
 
-from bot_handlers.base import BotHandlers, StateManager, StateType
+from bot_handlers.base import STATE_PERSIST, start_state_sweeper
+from bot_handlers.state import (pending_manual, pending_registration, pending_schedule_admin, pending_faq_admin,
+                                 restore_pending_states, cancel_pending_add, is_pending_add, cancel_pending_manual)
 from bot_handlers.helpers import (
-    is_admin, format_homework_text, main_menu_kb, cancel_inline_kb, registration_kb,
-    hw_item_kb, hw_main_kb, try_get_chat_variants,
-    custom_reminder_main_kb, custom_reminder_item_kb,
-    weekly_schedule_group_kb, weekly_schedule_time_kb,
-    faq_list_kb, faq_item_kb, faq_admin_main_kb,
-    faq_admin_select_kb, faq_admin_delete_confirm_kb,
-    faq_admin_delete_answer_confirm_kb,
-    notification_settings_kb, is_main_menu_button
+    is_admin, main_menu_kb, cancel_inline_kb, registration_kb,
+    hw_main_kb, try_get_chat_variants,
+    weekly_schedule_group_kb,
+    faq_list_kb, faq_admin_main_kb,
+    is_main_menu_button
 )
 from bot_handlers.schedule_admin_helpers import (
-    schedule_admin_groups_kb, schedule_admin_days_kb, schedule_admin_day_menu_kb,
-    schedule_admin_classes_list_kb, schedule_admin_class_actions_kb, format_class_for_display,
-    schedule_admin_edit_class_menu_kb, format_alternating_config_for_display,
-    alternating_configs_list_kb, alternating_config_actions_kb,
-    DAY_NAMES_AR, DAY_ORDER
+    schedule_admin_class_actions_kb, format_class_for_display,
+    format_alternating_config_for_display,
+    alternating_config_actions_kb
 )
 
 
@@ -116,8 +87,8 @@ def _job_send_to_chat(chat_id: int, text: str, message_thread_id: Optional[int]
         logger.exception("فشل إرسال رسالة مجدولة إلى chat %s (thread %s)", chat_id, message_thread_id)
 
 
-def _job_send_to_user(user_id: int, text: str):
-    """دالة سطحية لإرسال رسالة خاصة مجدولة."""
+def _job_send_to_user(user_id: int, text: str, job_key: str):
+    """دالة سطحية لإرسال رسالة خاصة مجدولة (عبر outbox؛ job_key = معرف الـ job حتى لا تتكرر عند إعادة التنفيذ)."""
     try:
         if not global_bot:
             logger.error("_job_send_to_user: global_bot غير مضبوط")
@@ -128,17 +99,32 @@ def _job_send_to_user(user_id: int, text: str):
             if not get_notification_setting(conn, user_id, 'manual_reminders'):
                 logger.info("_job_send_to_user: user_id=%s disabled manual_reminders, skipping", user_id)
                 return
-        
-        global_bot.send_message(user_id, text)
-    except telebot.apihelper.ApiTelegramException as e:
-        if e.error_code == 403:
-            logger.warning(f"Bot was blocked by user {user_id}")
-        else:
-            logger.exception("فشل إرسال رسالة مجدولة إلى user %s", user_id)
+            
+            outbox_submit(job_key, [user_id], [message_op(text)], conn=conn)
     except Exception:
         logger.exception("فشل إرسال رسالة مجدولة إلى user %s", user_id)
 
 
+def _job_broadcast_manual(job_key: str, text: str, media_type: Optional[str] = None, media_file_id: Optional[str] = None, caption: Optional[str] = None):
+    """
+    دالة سطحية لتذكير يدوي مجدول إلى الجميع: job واحد يحمل المحتوى مرة واحدة،
+    وقائمة المستلمين تُحسب وقت التنفيذ ثم تُرسل دفعة واحدة عبر outbox.
+    """
+    try:
+        with db_connection() as conn:
+            flags = get_registered_users_notification_flags(conn, 'manual_reminders')
+            eligible = [uid for uid, enabled in flags if enabled]
+            if media_type and media_file_id:
+                ops = media_ops(text, media_type, media_file_id, caption)
+            else:
+                ops = [message_op(text)] if text else []
+            queued = outbox_submit(job_key, eligible, ops, conn=conn) if ops else 0
+        logger.info("_job_broadcast_manual: %s queued %d recipients (%d disabled manual_reminders)",
+                    job_key, queued, len(flags) - len(eligible))
+    except Exception:
+        logger.exception("فشل تنفيذ التذكير اليدوي الجماعي %s", job_key)
+
+
 def _job_send_custom_reminder(reminder_id: int, user_id: int):
     """دالة سطحية لإرسال تذكير مخصص مجدول."""
     try:
@@ -179,8 +165,8 @@ def _job_send_custom_reminder(reminder_id: int, user_id: int):
         logger.exception("فشل إرسال تذكير مخصص reminder_id=%s إلى user_id=%s", reminder_id, user_id)
 
 
-def _job_send_media_to_user(user_id: int, text: str, media_type: str, media_file_id: str, caption: Optional[str] = None):
-    """دالة سطحية لإرسال ملف مجدول إلى مستخدم."""
+def _job_send_media_to_user(user_id: int, text: str, media_type: str, media_file_id: str, caption: Optional[str], job_key: str):
+    """دالة سطحية لإرسال ملف مجدول إلى مستخدم (عبر outbox؛ job_key = معرف الـ job)."""
     try:
         if not global_bot:
             logger.error("_job_send_media_to_user: global_bot غير مضبوط")
@@ -191,35 +177,11 @@ def _job_send_media_to_user(user_id: int, text: str, media_type: str, media_file
             if not get_notification_setting(conn, user_id, 'manual_reminders'):
                 logger.info("_job_send_media_to_user: user_id=%s disabled manual_reminders, skipping", user_id)
                 return
-        
-        
-        if text:
-            global_bot.send_message(user_id, text)
-        
-        
-        if media_type == "photo":
-            global_bot.send_photo(user_id, media_file_id, caption=caption)
-        elif media_type == "audio":
-            global_bot.send_audio(user_id, media_file_id, caption=caption)
-        elif media_type == "voice":
-            global_bot.send_voice(user_id, media_file_id, caption=caption)
-        elif media_type == "video":
-            global_bot.send_video(user_id, media_file_id, caption=caption)
-        elif media_type == "document":
-            global_bot.send_document(user_id, media_file_id, caption=caption)
-        elif media_type == "video_note":
-            global_bot.send_video_note(user_id, media_file_id)
-        elif media_type == "sticker":
-            global_bot.send_sticker(user_id, media_file_id)
-        else:
-            logger.warning("_job_send_media_to_user: unknown media_type=%s", media_type)
             
-        logger.info("_job_send_media_to_user: sent media_type=%s to user_id=%s", media_type, user_id)
-    except telebot.apihelper.ApiTelegramException as e:
-        if e.error_code == 403:
-            logger.warning(f"Bot was blocked by user {user_id}")
-        else:
-            logger.exception("فشل إرسال ملف media_type=%s إلى user_id=%s", media_type, user_id)
+            ops = media_ops(text, media_type, media_file_id, caption)
+            outbox_submit(job_key, [user_id], ops, conn=conn)
+            
+        logger.info("_job_send_media_to_user: queued media_type=%s to user_id=%s", media_type, user_id)
     except Exception:
         logger.exception("فشل إرسال ملف media_type=%s إلى user_id=%s", media_type, user_id)
 
@@ -277,92 +239,70 @@ def _job_send_media_to_chat(chat_id: int, text: str, media_type: str, media_file
 
 
 
-_pending_add = {}
-_pending_manual = {}
-_pending_registration = {}
-_pending_schedule_admin = {}  
-_pending_faq_admin = {}
-_pending_lock = threading.Lock()
-_pending_registration_lock = threading.Lock()
-_pending_schedule_admin_lock = threading.Lock()
-_pending_faq_admin_lock = threading.Lock()
+# كاش المستخدمين المكتملي التسجيل: user_id -> وقت انتهاء الصلاحية (LRU محدود الحجم)
+REGISTRATION_CACHE_TTL = float(os.getenv("REGISTRATION_CACHE_TTL") or "600")
+REGISTRATION_CACHE_SIZE = int(os.getenv("REGISTRATION_CACHE_SIZE") or "10000")
+_registered_cache: "OrderedDict[int, float]" = OrderedDict()
+_registered_cache_lock = threading.Lock()
 
+# حدود الاستخدام (token bucket): callbacks لكل مستخدم خلال 10 ثوانٍ، والبث الفوري للجميع في الدقيقة
+CALLBACK_RATE_LIMIT = int(os.getenv("CALLBACK_RATE_LIMIT") or "30")
+BROADCAST_RATE_LIMIT = int(os.getenv("BROADCAST_RATE_LIMIT") or "3")
+BROADCAST_GLOBAL_RATE_LIMIT = int(os.getenv("BROADCAST_GLOBAL_RATE_LIMIT") or "10")
 
-_state_mgr: Optional[StateManager] = None
 
+def _registration_cached(user_id: int) -> bool:
+    with _registered_cache_lock:
+        expires = _registered_cache.get(user_id)
+        if expires is None:
+            return False
+        if expires < time.monotonic():
+            del _registered_cache[user_id]
+            return False
+        _registered_cache.move_to_end(user_id)
+        return True
 
-def start_pending_add(chat_id):
-    """Start pending add state (backward compatibility)."""
-    with _pending_lock:
-        _pending_add[chat_id] = True
-    if _state_mgr:
-        _state_mgr.start(chat_id, StateType.ADD_HOMEWORK)
 
-
-def cancel_pending_add(chat_id):
-    """Cancel pending add state (backward compatibility)."""
-    with _pending_lock:
-        _pending_add.pop(chat_id, None)
-    if _state_mgr:
-        _state_mgr.clear(chat_id)
-
-
-def is_pending_add(chat_id):
-    """Check if pending add state is active (backward compatibility)."""
-    with _pending_lock:
-        return _pending_add.get(chat_id, False)
-    
-    if _state_mgr:
-        return _state_mgr.is_active(chat_id, StateType.ADD_HOMEWORK)
-    return False
-
-
-def start_pending_manual(chat_id):
-    """Start pending manual reminder state (backward compatibility)."""
-    with _pending_lock:
-        _pending_manual[chat_id] = {"step": "target_type"}
-    if _state_mgr:
-        _state_mgr.start(chat_id, StateType.MANUAL_REMINDER, {"step": "target_type"})
-
-
-def cancel_pending_manual(chat_id):
-    """Cancel pending manual reminder state (backward compatibility)."""
-    with _pending_lock:
-        _pending_manual.pop(chat_id, None)
-    if _state_mgr:
-        _state_mgr.clear(chat_id)
-
-
-def get_pending_manual(chat_id):
-    """Get pending manual reminder state (backward compatibility)."""
-    with _pending_lock:
-        pm = _pending_manual.get(chat_id)
-        if pm:
-            return dict(pm)
-    
-    if _state_mgr:
-        state = _state_mgr.get(chat_id)
-        if state and state.state_type == StateType.MANUAL_REMINDER:
-            return {"step": state.step, **state.data}
-    return None
+def _remember_registration(user_id: int):
+    with _registered_cache_lock:
+        _registered_cache[user_id] = time.monotonic() + REGISTRATION_CACHE_TTL
+        _registered_cache.move_to_end(user_id)
+        while len(_registered_cache) > REGISTRATION_CACHE_SIZE:
+            _registered_cache.popitem(last=False)
 
 
+def invalidate_registration_cache(user_id: Optional[int] = None):
+    """Drop one user (or everyone) from the registration cache after users rows change."""
+    with _registered_cache_lock:
+        if user_id is None:
+            _registered_cache.clear()
+        else:
+            _registered_cache.pop(user_id, None)
 
 
+def is_registration_complete_cached(user_id: int, conn=None) -> bool:
+    """is_user_registration_complete with a TTL cache of positive answers."""
+    if _registration_cached(user_id):
+        return True
+    if conn is None:
+        with db_connection() as conn_local:
+            complete = is_user_registration_complete(conn_local, user_id)
+    else:
+        complete = is_user_registration_complete(conn, user_id)
+    if complete:
+        _remember_registration(user_id)
+    return complete
 
 
 def cancel_operation(chat_id: int, message_id: Optional[int] = None):
     """Cancel any pending operations and clear state."""
     cancel_pending_add(chat_id)
     cancel_pending_manual(chat_id)
-    with _pending_registration_lock:
-        _pending_registration.pop(chat_id, None)
+    pending_registration.pop(chat_id, None)
     
-    with _pending_schedule_admin_lock:
-        _pending_schedule_admin.pop(chat_id, None)
+    pending_schedule_admin.pop(chat_id, None)
 
-    with _pending_faq_admin_lock:
-        _pending_faq_admin.pop(chat_id, None)
+    pending_faq_admin.pop(chat_id, None)
     
     if message_id and global_bot:
         try:
@@ -378,31 +318,36 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
     sch_mgr يجب أن يملك:
       - schedule_homework_reminders(row)
       - remove_hw_jobs(hw_id)
-      - scheduler (APScheduler instance)
+      - add_date_job(callable_ref, run_date, args, job_id) / remove_date_job(job_id)
     
     Note: This function maintains backward compatibility.
     For new code, consider using BotHandlers class from handlers.base
     """
-    global global_bot, _state_mgr
+    global global_bot
     
     
     global_bot = bot
     
     
-    _state_mgr = StateManager()
+    if STATE_PERSIST:
+        restored = restore_pending_states()
+        logger.info(f"Restored {restored} in-progress conversations")
+    start_state_sweeper()
     
     
-    from bot_handlers.base import RateLimiter
-    rate_limiter = RateLimiter(max_calls=5, period=60)
+    from bot_handlers.base import RateLimits
+    rate_limits = RateLimits()
+    rate_limits.add("start", max_calls=5, period=60)                               # لكل مستخدم
+    rate_limits.add("callback", max_calls=CALLBACK_RATE_LIMIT, period=10)          # لكل مستخدم
+    rate_limits.add("broadcast", max_calls=BROADCAST_RATE_LIMIT, period=60)        # لكل محادثة أدمين
+    rate_limits.add("broadcast_global", max_calls=BROADCAST_GLOBAL_RATE_LIMIT, period=60)  # عام
 
     def ensure_registration(chat_id: int, user_id: int) -> bool:
-        with db_connection() as conn_local:
-            if is_user_registration_complete(conn_local, user_id):
-                return True
-        with _pending_registration_lock:
-            if chat_id in _pending_registration:
-                return False
-            _pending_registration[chat_id] = {"step": "name"}
+        if is_registration_complete_cached(user_id):
+            return True
+        if chat_id in pending_registration:
+            return False
+        pending_registration[chat_id] = {"step": "name"}
         try:
             msg = bot.send_message(
                 chat_id,
@@ -427,13 +372,12 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
                 "display_name": safe_get(current, "display_name"),
                 "group_number": safe_get(current, "group_number"),
             }
-        with _pending_registration_lock:
-            _pending_registration[chat_id] = {
-                "step": "name",
-                "mode": "update",
-                "previous_display_name": current_data["display_name"],
-                "previous_group_number": current_data["group_number"],
-            }
+        pending_registration[chat_id] = {
+            "step": "name",
+            "mode": "update",
+            "previous_display_name": current_data["display_name"],
+            "previous_group_number": current_data["group_number"],
+        }
         msg = bot.send_message(
             chat_id,
             "📝 لتحديث بياناتك:\n\nيرجى إرسال الاسم واللقب (مثال: خالد السعيد) ثم اختيار المجموعة من الخيارات المتاحة.\n\nأرسل الاسم الآن:",
@@ -445,7 +389,7 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
     @bot.message_handler(commands=["start"])
     def cmd_start(m):
         
-        if not rate_limiter.is_allowed(m.from_user.id):
+        if not rate_limits.is_allowed("start", m.from_user.id):
             try:
                 bot.send_message(m.chat.id, "⏳ انتظر قليلاً قبل المحاولة مرة أخرى")
             except Exception:
@@ -459,11 +403,12 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
             last_name = getattr(m.from_user, "last_name", None)
             try:
                 register_user(conn_local, m.from_user.id, username, first_name, last_name, ts)
+                invalidate_registration_cache(m.from_user.id)
                 logger.info(f"Registered user: id={m.from_user.id} username={username} name={first_name} {last_name}")
             except Exception:
                 logger.exception("Failed register_user in /start")
 
-            registration_complete = is_user_registration_complete(conn_local, m.from_user.id)
+            registration_complete = is_registration_complete_cached(m.from_user.id, conn_local)
             welcome_kb = main_menu_kb() if registration_complete else registration_kb()
 
             
@@ -583,1910 +528,140 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
 
     @bot.message_handler(commands=['students'])
     def cmd_students(m):
-        """Admin-only command to list all registered students with their names and IDs."""
+        """
+        Admin-only paginated list of registered students (names and IDs).
+        /students [group] — optional group filter, e.g. /students 2
+        """
         if not is_admin(m.from_user.id):
             bot.send_message(m.chat.id, "⛔ هذا الأمر متاح فقط للمشرفين.")
             return
         
-        try:
-            with db_connection() as conn_local:
-                users = get_all_registered_users(conn_local)
-            
-            if not users:
-                bot.send_message(m.chat.id, "📋 لا يوجد طلاب مسجلين حالياً.", reply_markup=main_menu_kb())
-                return
-            
-            # Build the message
-            lines = [f"📋 **قائمة الطلاب المسجلين ({len(users)} طالب):**\n"]
-            for i, user in enumerate(users, 1):
-                user_id = user['user_id']
-                full_name = user['full_name'] or "غير محدد"
-                lines.append(f"{i}. {full_name} — `{user_id}`")
-            
-            message_text = "\n".join(lines)
-            
-            # Telegram has a 4096 character limit per message
-            telegram_msg_limit = 4096
-            if len(message_text) <= telegram_msg_limit:
-                bot.send_message(m.chat.id, message_text, parse_mode="Markdown", reply_markup=main_menu_kb())
-            else:
-                # Split into multiple messages if needed
-                chunks = []
-                current_chunk = lines[0] + "\n"
-                for line in lines[1:]:
-                    if len(current_chunk) + len(line) + 1 > telegram_msg_limit - 100:  # Leave some margin
-                        chunks.append(current_chunk)
-                        current_chunk = line + "\n"  # Start new chunk with the current line
-                    else:
-                        current_chunk += line + "\n"
-                if current_chunk:
-                    chunks.append(current_chunk)
-                
-                for chunk in chunks:
-                    bot.send_message(m.chat.id, chunk, parse_mode="Markdown")
-                bot.send_message(m.chat.id, "✅ تم عرض جميع الطلاب.", reply_markup=main_menu_kb())
-            
-            logger.info(f"Admin {m.from_user.id} listed all {len(users)} registered students")
-        except Exception:
-            logger.exception("Failed to list students")
-            bot.send_message(m.chat.id, "❌ حدث خطأ أثناء جلب قائمة الطلاب.")
-
-    def send_faq_list(chat_id: int):
-        with db_connection() as conn_local:
-            entries = get_all_faq_entries(conn_local)
-        if not entries:
-            bot.send_message(chat_id, "لا توجد أسئلة شائعة حالياً.", reply_markup=main_menu_kb())
-            return
-        kb = faq_list_kb(entries)
-        bot.send_message(chat_id, "📖 الأسئلة الشائعة:", reply_markup=kb)
-
-    @bot.message_handler(commands=['faq'])
-    def cmd_faq(m):
-        if not ensure_registration(m.chat.id, m.from_user.id):
-            return
-        send_faq_list(m.chat.id)
-
-    
-    @bot.message_handler(func=lambda msg: msg.text == "Homeworks")
-    def open_hw_menu(m):
-        if not ensure_registration(m.chat.id, m.from_user.id):
-            return
-        kb = hw_main_kb(m.from_user.id)
-        bot.send_message(m.chat.id, "قائمة Homeworks:", reply_markup=kb)
-        logger.info(f"Opened Homeworks menu for user {m.from_user.id} in chat {m.chat.id}")
-
-    
-    @bot.message_handler(func=lambda msg: msg.text == "Weekly Schedule")
-    def open_weekly_schedule_menu(m):
-        if not ensure_registration(m.chat.id, m.from_user.id):
-            return
-        kb = weekly_schedule_group_kb()
-        bot.send_message(m.chat.id, "Select your Group", reply_markup=kb)
-        logger.info(f"Opened Weekly Schedule menu for user {m.from_user.id} in chat {m.chat.id}")
-
-    @bot.message_handler(func=lambda msg: msg.text == "FAQ")
-    def open_faq_menu(m):
-        if not ensure_registration(m.chat.id, m.from_user.id):
-            return
-        send_faq_list(m.chat.id)
-        logger.info(f"Opened FAQ menu for user {m.from_user.id} in chat {m.chat.id}")
-
-    @bot.message_handler(func=lambda msg: msg.text == "Update Info")
-    def update_user_info(m):
-        with db_connection() as conn_local:
-            registration_complete = is_user_registration_complete(conn_local, m.from_user.id)
-        if not registration_complete:
-            ensure_registration(m.chat.id, m.from_user.id)
-            return
-        start_update_registration(m.chat.id, m.from_user.id)
-        logger.info(f"Started update info flow for user {m.from_user.id} in chat {m.chat.id}")
-
-    
-    
-
-    
-    @bot.callback_query_handler(func=lambda c: True)
-    def callbacks(c):
-        uid = c.from_user.id
-        data = c.data
-        chat_id = c.message.chat.id if c.message else None
-        logger.info(f"[DEBUG CALLBACK] {datetime.now().isoformat()} | from={uid} | chat={chat_id} | data={data}")
-
-        if data != CALLBACK_HW_CANCEL and chat_id is not None:
-            if not ensure_registration(chat_id, uid):
-                bot.answer_callback_query(c.id)
-                bot.send_message(chat_id, "يرجى إكمال التسجيل أولاً باستخدام /start.", reply_markup=main_menu_kb())
-                return
-
-        
-        if data == CALLBACK_HW_CANCEL:
-            
-            cancel_operation(chat_id, c.message.message_id if c.message else None)
-            bot.send_message(chat_id, "تم إلغاء العملية.", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
-            return
-        
-        
-        
-        
-        is_location_callback = (
-            data == "schedule_location_add" or
-            data.startswith("schedule_location_edit:") or
-            data.startswith("schedule_location_edit_url:") or
-            data.startswith("schedule_location_delete:") or
-            data.startswith("schedule_location_confirm_delete:") or
-            data == CALLBACK_WEEKLY_SCHEDULE_ADMIN_LOCATIONS
-        )
-        is_edit_callback = (
-            data.startswith("schedule_edit_type_select:") or
-            data.startswith(CALLBACK_SCHEDULE_EDIT_TIME_START) or
-            data.startswith(CALLBACK_SCHEDULE_EDIT_TIME_END) or
-            data.startswith(CALLBACK_SCHEDULE_EDIT_COURSE) or
-            data.startswith(CALLBACK_SCHEDULE_EDIT_LOCATION) or
-            data.startswith(CALLBACK_SCHEDULE_EDIT_TYPE) or
-            data.startswith(CALLBACK_SCHEDULE_EDIT_ALTERNATING)
-        )
-        is_alternating_config_callback = (
-            data == CALLBACK_ALTERNATING_LIST or
-            data.startswith(CALLBACK_ALTERNATING_EDIT) or
-            data.startswith(CALLBACK_ALTERNATING_EDIT_DATE) or
-            data == CALLBACK_ALTERNATING_ADD or
-            data == CALLBACK_WEEKLY_SCHEDULE_ADMIN_ALTERNATING
-        )
-
-        is_faq_callback = (
-            data == CALLBACK_FAQ_LIST or
-            data == CALLBACK_FAQ_ADMIN or
-            data == CALLBACK_FAQ_ADMIN_ADD or
-            data == CALLBACK_FAQ_ADMIN_EDIT or
-            data == CALLBACK_FAQ_ADMIN_EDIT_ANSWER or
-            data == CALLBACK_FAQ_ADMIN_DELETE or
-            data == CALLBACK_FAQ_ADMIN_DELETE_ANSWER or
-            data.startswith(CALLBACK_FAQ_VIEW) or
-            data.startswith(CALLBACK_FAQ_ADMIN_EDIT_SELECT) or
-            data.startswith(CALLBACK_FAQ_ADMIN_EDIT_ANSWER_SELECT) or
-            data.startswith(CALLBACK_FAQ_ADMIN_DELETE_SELECT) or
-            data.startswith(CALLBACK_FAQ_ADMIN_DELETE_CONFIRM) or
-            data.startswith(CALLBACK_FAQ_ADMIN_DELETE_ANSWER_SELECT) or
-            data.startswith(CALLBACK_FAQ_ADMIN_DELETE_ANSWER_CONFIRM) or
-            data == CALLBACK_FAQ_BACK
-        )
-        
-        with _pending_schedule_admin_lock:
-            if chat_id in _pending_schedule_admin and not (is_location_callback or is_edit_callback or is_alternating_config_callback):
-                pm = _pending_schedule_admin.get(chat_id)
-                
-                if pm and pm.get("action") not in ["add_location", "edit_location_url", "edit_class", "edit_alternating_config", "add_alternating_config"]:
-                    logger.info(f"[SCHEDULE ADMIN] Found pending operation for chat {chat_id}, clearing it due to callback: {data}")
-                    _pending_schedule_admin.pop(chat_id, None)
-
-        with _pending_faq_admin_lock:
-            if chat_id in _pending_faq_admin and not is_faq_callback:
-                _pending_faq_admin.pop(chat_id, None)
-                    
-
-        
-        if data == CALLBACK_HW_BACK:
-            try:
-                if c.message:
-                    bot.edit_message_reply_markup(chat_id=chat_id, message_id=c.message.message_id, reply_markup=None)
-            except Exception:
-                pass
-            bot.send_message(chat_id, "عاد للقائمة الرئيسية.", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data == CALLBACK_HW_LIST:
-            with db_connection() as conn_local:
-                rows = get_all_homeworks(conn_local)
-
-            if not rows:
-                try:
-                    bot.edit_message_reply_markup(chat_id=chat_id, message_id=c.message.message_id, reply_markup=None)
-                except Exception:
-                    pass
-                bot.send_message(chat_id, "لا توجد واجبات محفوظة.", reply_markup=main_menu_kb())
-                bot.answer_callback_query(c.id)
-                return
-
-            try:
-                bot.edit_message_reply_markup(chat_id=chat_id, message_id=c.message.message_id, reply_markup=None)
-            except Exception:
-                pass
-
-            for r in rows:
-                text = format_homework_text(r)
-                with db_connection() as conn_check:
-                    is_done = is_homework_done_for_user(conn_check, r['id'], uid)
-                kb = hw_item_kb(uid, r['id'], is_done=is_done)
-                bot.send_message(chat_id, text, reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data == CALLBACK_FAQ_LIST:
-            send_faq_list(chat_id)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data == CALLBACK_FAQ_BACK:
-            bot.send_message(chat_id, "عاد للقائمة الرئيسية.", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith(CALLBACK_FAQ_VIEW):
-            faq_id = int(data.split(":", 1)[1])
-            with db_connection() as conn_local:
-                entry = get_faq_entry(conn_local, faq_id)
-            if not entry:
-                bot.answer_callback_query(c.id, "السؤال غير موجود.", show_alert=True)
-                return
-            text = f"❓ {entry['question']}\n\n{entry['answer']}"
-            kb = faq_item_kb()
-            try:
-                if c.message:
-                    bot.edit_message_text(chat_id=chat_id, message_id=c.message.message_id, text=text, reply_markup=kb)
-                else:
-                    bot.send_message(chat_id, text, reply_markup=kb)
-            except Exception:
-                bot.send_message(chat_id, text, reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data == CALLBACK_FAQ_ADMIN:
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            kb = faq_admin_main_kb()
-            bot.send_message(chat_id, "⚙️ إدارة الأسئلة الشائعة:", reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data == CALLBACK_FAQ_ADMIN_ADD:
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            with _pending_faq_admin_lock:
-                _pending_faq_admin[chat_id] = {"action": "add", "step": "question"}
-            msg = bot.send_message(chat_id, "أرسل نص السؤال (أو اكتب 'إلغاء'):", reply_markup=cancel_inline_kb())
-            bot.register_next_step_handler(msg, faq_admin_add_step_question, chat_id, uid)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data == CALLBACK_FAQ_ADMIN_EDIT:
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            with db_connection() as conn_local:
-                entries = get_all_faq_entries(conn_local)
-            if not entries:
-                bot.send_message(chat_id, "لا توجد أسئلة شائعة للتعديل.", reply_markup=faq_admin_main_kb())
-                bot.answer_callback_query(c.id)
-                return
-            kb = faq_admin_select_kb(entries, "edit")
-            bot.send_message(chat_id, "اختر السؤال للتعديل:", reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data == CALLBACK_FAQ_ADMIN_EDIT_ANSWER:
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            with db_connection() as conn_local:
-                entries = get_all_faq_entries(conn_local)
-            if not entries:
-                bot.send_message(chat_id, "لا توجد أسئلة شائعة لتعديل الإجابة.", reply_markup=faq_admin_main_kb())
-                bot.answer_callback_query(c.id)
-                return
-            kb = faq_admin_select_kb(entries, "edit_answer")
-            bot.send_message(chat_id, "اختر السؤال لتعديل الإجابة:", reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data == CALLBACK_FAQ_ADMIN_DELETE:
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            with db_connection() as conn_local:
-                entries = get_all_faq_entries(conn_local)
-            if not entries:
-                bot.send_message(chat_id, "لا توجد أسئلة شائعة للحذف.", reply_markup=faq_admin_main_kb())
-                bot.answer_callback_query(c.id)
-                return
-            kb = faq_admin_select_kb(entries, "delete")
-            bot.send_message(chat_id, "اختر السؤال للحذف:", reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data == CALLBACK_FAQ_ADMIN_DELETE_ANSWER:
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            with db_connection() as conn_local:
-                entries = get_all_faq_entries(conn_local)
-            if not entries:
-                bot.send_message(chat_id, "لا توجد أسئلة شائعة لحذف الإجابة.", reply_markup=faq_admin_main_kb())
-                bot.answer_callback_query(c.id)
-                return
-            kb = faq_admin_select_kb(entries, "delete_answer")
-            bot.send_message(chat_id, "اختر السؤال لحذف الإجابة:", reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith(CALLBACK_FAQ_ADMIN_EDIT_SELECT):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            faq_id = int(data.split(":", 1)[1])
-            with db_connection() as conn_local:
-                entry = get_faq_entry(conn_local, faq_id)
-            if not entry:
-                bot.answer_callback_query(c.id, "السؤال غير موجود.", show_alert=True)
-                return
-            with _pending_faq_admin_lock:
-                _pending_faq_admin[chat_id] = {
-                    "action": "edit",
-                    "step": "question",
-                    "faq_id": faq_id,
-                    "current_question": entry["question"],
-                    "current_answer": entry["answer"],
-                }
-            msg = bot.send_message(chat_id, "أرسل نص السؤال الجديد (أو اكتب 'إلغاء'):", reply_markup=cancel_inline_kb())
-            bot.register_next_step_handler(msg, faq_admin_edit_step_question, chat_id, uid)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith(CALLBACK_FAQ_ADMIN_EDIT_ANSWER_SELECT):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            faq_id = int(data.split(":", 1)[1])
-            with db_connection() as conn_local:
-                entry = get_faq_entry(conn_local, faq_id)
-            if not entry:
-                bot.answer_callback_query(c.id, "السؤال غير موجود.", show_alert=True)
-                return
-            with _pending_faq_admin_lock:
-                _pending_faq_admin[chat_id] = {
-                    "action": "edit_answer",
-                    "step": "answer",
-                    "faq_id": faq_id,
-                    "current_question": entry["question"],
-                    "current_answer": entry["answer"],
-                }
-            msg = bot.send_message(chat_id, "أرسل الإجابة الجديدة (أو اكتب 'إلغاء'):", reply_markup=cancel_inline_kb())
-            bot.register_next_step_handler(msg, faq_admin_edit_step_answer_only, chat_id, uid)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith(CALLBACK_FAQ_ADMIN_DELETE_SELECT):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            faq_id = int(data.split(":", 1)[1])
-            kb = faq_admin_delete_confirm_kb(faq_id)
-            bot.send_message(chat_id, f"هل أنت متأكد من حذف السؤال (ID:{faq_id})؟", reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith(CALLBACK_FAQ_ADMIN_DELETE_ANSWER_SELECT):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            faq_id = int(data.split(":", 1)[1])
-            kb = faq_admin_delete_answer_confirm_kb(faq_id)
-            bot.send_message(chat_id, f"هل أنت متأكد من حذف الإجابة (ID:{faq_id})؟", reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith(CALLBACK_FAQ_ADMIN_DELETE_CONFIRM):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            faq_id = int(data.split(":", 1)[1])
-            with db_connection() as conn_local:
-                deleted = delete_faq_entry(conn_local, faq_id)
-            if deleted:
-                bot.send_message(chat_id, f"✅ تم حذف السؤال (ID:{faq_id}).", reply_markup=faq_admin_main_kb())
-            else:
-                bot.send_message(chat_id, f"لم يتم العثور على السؤال (ID:{faq_id}).", reply_markup=faq_admin_main_kb())
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith(CALLBACK_FAQ_ADMIN_DELETE_ANSWER_CONFIRM):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            faq_id = int(data.split(":", 1)[1])
-            with db_connection() as conn_local:
-                entry = get_faq_entry(conn_local, faq_id)
-                if entry:
-                    deleted = update_faq_entry(conn_local, faq_id, entry["question"], FAQ_ANSWER_PLACEHOLDER)
-                else:
-                    deleted = False
-            if deleted:
-                bot.send_message(chat_id, f"✅ تم حذف الإجابة (ID:{faq_id}).", reply_markup=faq_admin_main_kb())
-            else:
-                bot.send_message(chat_id, f"لم يتم العثور على السؤال (ID:{faq_id}).", reply_markup=faq_admin_main_kb())
-            bot.answer_callback_query(c.id)
-            return
-        
-        if data == CALLBACK_HW_ADD:
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            start_pending_add(chat_id)
-            msg = bot.send_message(chat_id, "أرسل اسم المادة (أو اكتب 'إلغاء'):", reply_markup=cancel_inline_kb())
-            bot.register_next_step_handler(msg, hw_add_step_subject, chat_id, uid)
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data.startswith(CALLBACK_HW_VIEW):
-            hw_id = int(data.split(":", 1)[1])
-            with db_connection() as conn_local:
-                r = get_homework(conn_local, hw_id)
-            if not r:
-                bot.answer_callback_query(c.id, "لم أجد هذا الواجب.", show_alert=True)
-                return
-            text = format_homework_text(r)
-            with db_connection() as conn_check:
-                is_done = is_homework_done_for_user(conn_check, r['id'], uid)
-            kb = hw_item_kb(uid, r['id'], is_done=is_done)
-            try:
-                if c.message:
-                    bot.edit_message_text(chat_id=chat_id, message_id=c.message.message_id, text=text, reply_markup=kb)
-                else:
-                    bot.send_message(chat_id, text, reply_markup=kb)
-            except Exception:
-                bot.send_message(chat_id, text, reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data.startswith(CALLBACK_HW_DONE):
-            hw_id = int(data.split(":", 1)[1])
-            with db_connection() as conn_local:
-                mark_done(conn_local, hw_id, uid)
-                
-                r = get_homework(conn_local, hw_id)
-                is_done = is_homework_done_for_user(conn_local, hw_id, uid)
-            if r:
-                
-                try:
-                    if c.message:
-                        text = format_homework_text(r)
-                        kb = hw_item_kb(uid, hw_id, is_done=is_done)
-                        bot.edit_message_text(chat_id=chat_id, message_id=c.message.message_id, text=text, reply_markup=kb)
-                    bot.send_message(chat_id, f"✅ تم وسم الواجب (ID:{hw_id}) كـ 'تم' بالنسبة لك.")
-                except Exception:
-                    bot.send_message(chat_id, f"✅ تم وسم الواجب (ID:{hw_id}) كـ 'تم' بالنسبة لك.")
-            else:
-                bot.send_message(chat_id, f"✅ تم وسم الواجب (ID:{hw_id}) كـ 'تم' بالنسبة لك.")
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data.startswith(CALLBACK_HW_UNDONE):
-            hw_id = int(data.split(":", 1)[1])
-            with db_connection() as conn_local:
-                mark_undone(conn_local, hw_id, uid)
-                
-                r = get_homework(conn_local, hw_id)
-                is_done = is_homework_done_for_user(conn_local, hw_id, uid)
-            if r:
-                
-                try:
-                    if c.message:
-                        text = format_homework_text(r)
-                        kb = hw_item_kb(uid, hw_id, is_done=is_done)
-                        bot.edit_message_text(chat_id=chat_id, message_id=c.message.message_id, text=text, reply_markup=kb)
-                    bot.send_message(chat_id, f"❌ تم إلغاء وضع 'تم' للواجب (ID:{hw_id}) بالنسبة لك.")
-                except Exception:
-                    bot.send_message(chat_id, f"❌ تم إلغاء وضع 'تم' للواجب (ID:{hw_id}) بالنسبة لك.")
-            else:
-                bot.send_message(chat_id, f"❌ تم إلغاء وضع 'تم' للواجب (ID:{hw_id}) بالنسبة لك.")
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data.startswith(CALLBACK_HW_PDF):
-            hw_id = int(data.split(":", 1)[1])
-            with db_connection() as conn_local:
-                r = get_homework(conn_local, hw_id)
-            if not r:
-                bot.answer_callback_query(c.id, "لم أجد هذا الواجب.", show_alert=True)
-                return
-            if r["pdf_type"] == "file_id":
-                try:
-                    bot.send_document(chat_id, r["pdf_value"])
-                except Exception:
-                    bot.send_message(chat_id, "فشل إرسال الملف.")
-            elif r["pdf_type"] == "url" and r["pdf_value"]:
-                kb = types.InlineKeyboardMarkup()
-                kb.add(types.InlineKeyboardButton("فتح رابط الملف", url=r["pdf_value"]))
-                bot.send_message(chat_id, "ملف الواجب:", reply_markup=kb)
-            else:
-                bot.send_message(chat_id, "لا يوجد ملف مرفق لهذا الواجب.")
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data == CALLBACK_HW_EDIT:
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            with db_connection() as conn_local:
-                rows = get_all_homeworks(conn_local)
-            if not rows:
-                bot.answer_callback_query(c.id, "لا توجد واجبات.", show_alert=False)
-                return
-            kb = types.InlineKeyboardMarkup()
-            for r in rows:
-                kb.add(types.InlineKeyboardButton(f"{r['id']} | {r['subject']} | {r['due_at']}", 
-                                                  callback_data=f"{CALLBACK_HW_EDIT_ID}{r['id']}"))
-            kb.add(types.InlineKeyboardButton("↩️ رجوع", callback_data=CALLBACK_HW_BACK))
-            try:
-                if c.message:
-                    bot.edit_message_reply_markup(chat_id=chat_id, message_id=c.message.message_id, reply_markup=None)
-            except Exception:
-                pass
-            bot.send_message(chat_id, "اختر واجبًا للتعديل:", reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data == CALLBACK_HW_DELETE:
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            with db_connection() as conn_local:
-                rows = get_all_homeworks(conn_local)
-            if not rows:
-                bot.answer_callback_query(c.id, "لا توجد واجبات.", show_alert=False)
-                return
-            kb = types.InlineKeyboardMarkup()
-            for r in rows:
-                kb.add(types.InlineKeyboardButton(f"{r['id']} | {r['subject']} | {r['due_at']}", 
-                                                  callback_data=f"{CALLBACK_HW_DELETE_ID}{r['id']}"))
-            kb.add(types.InlineKeyboardButton("↩️ رجوع", callback_data=CALLBACK_HW_BACK))
-            try:
-                if c.message:
-                    bot.edit_message_reply_markup(chat_id=chat_id, message_id=c.message.message_id, reply_markup=None)
-            except Exception:
-                pass
-            bot.send_message(chat_id, "اختر واجبًا للحذف:", reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith(CALLBACK_HW_DELETE_ID):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            hw_id = int(data.split(":", 1)[1])
-            kb = types.InlineKeyboardMarkup()
-            kb.add(types.InlineKeyboardButton("نعم احذف", callback_data=f"{CALLBACK_HW_CONFIRM_DELETE}{hw_id}"))
-            kb.add(types.InlineKeyboardButton("إلغاء", callback_data=CALLBACK_HW_BACK))
-            bot.send_message(chat_id, f"هل أنت متأكد من حذف الواجب ID:{hw_id} ؟", reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith(CALLBACK_HW_CONFIRM_DELETE):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            hw_id = int(data.split(":", 1)[1])
-            with db_connection() as conn_local:
-                delete_homework(conn_local, hw_id)
-            sch_mgr.remove_hw_jobs(hw_id)
-            bot.send_message(chat_id, f"حُذف الواجب (ID:{hw_id}).")
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith(CALLBACK_HW_EDIT_ID):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            hw_id = int(data.split(":", 1)[1])
-            kb = types.InlineKeyboardMarkup()
-            kb.add(types.InlineKeyboardButton("تعديل المادة", callback_data=f"{CALLBACK_HW_EDIT_FIELD}{hw_id}:subject"))
-            kb.add(types.InlineKeyboardButton("تعديل الوصف", callback_data=f"{CALLBACK_HW_EDIT_FIELD}{hw_id}:description"))
-            kb.add(types.InlineKeyboardButton("تعديل الموعد", callback_data=f"{CALLBACK_HW_EDIT_FIELD}{hw_id}:due_at"))
-            kb.add(types.InlineKeyboardButton("تعديل ملف PDF", callback_data=f"{CALLBACK_HW_EDIT_FIELD}{hw_id}:pdf"))
-            kb.add(types.InlineKeyboardButton("تعديل الشروط", callback_data=f"{CALLBACK_HW_EDIT_FIELD}{hw_id}:conditions"))
-            kb.add(types.InlineKeyboardButton("تعديل التذكيرات", callback_data=f"{CALLBACK_HW_EDIT_FIELD}{hw_id}:reminders"))
-            kb.add(types.InlineKeyboardButton("رجوع", callback_data=CALLBACK_HW_BACK))
-            bot.send_message(chat_id, "اختر الحقل الذي تريد تعديله:", reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith(CALLBACK_HW_EDIT_FIELD):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            parts = data.split(":")
-            hw_id = int(parts[1])
-            field = parts[2]
-            prompt_map = {
-                "subject": "أرسل المادة الجديدة (أو اكتب 'إلغاء'):",
-                "description": "أرسل الوصف الجديد (أو اكتب 'إلغاء'):",
-                "due_at": "أرسل الموعد الجديد بصيغة YYYY-MM-DD HH:MM (أو 'إلغاء'):",
-                "pdf": "أرسل الآن ملف PDF كملف أو رابط URL أو اكتب 'none' لإزالته أو 'إلغاء' لإيقاف:",
-                "conditions": "أرسل الشروط الجديدة أو 'none' أو 'إلغاء':",
-                "reminders": "أرسل التذكيرات (مثال: default أو 7,3,1) أو 'إلغاء':"
-            }
-            msg = bot.send_message(chat_id, prompt_map.get(field, "أرسل القيمة الجديدة (أو 'إلغاء'):"), reply_markup=cancel_inline_kb())
-            bot.register_next_step_handler(msg, hw_edit_handle_field, hw_id, field)
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data == CALLBACK_MANUAL_REMINDER:
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            start_pending_manual(chat_id)
-            kb = types.InlineKeyboardMarkup()
-            kb.add(types.InlineKeyboardButton("أرسل الآن", callback_data=CALLBACK_MANUAL_SEND_NOW))
-            kb.add(types.InlineKeyboardButton("جدولة", callback_data=CALLBACK_MANUAL_SCHEDULE))
-            kb.add(types.InlineKeyboardButton("إلغاء", callback_data=CALLBACK_HW_CANCEL))
-            bot.send_message(chat_id, "هل تريد إرسال التذكير الآن أم جدولة؟", reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data == CALLBACK_MANUAL_SEND_NOW or data == CALLBACK_MANUAL_SCHEDULE:
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            mode = "now" if data == CALLBACK_MANUAL_SEND_NOW else "schedule"
-            with _pending_lock:
-                _pending_manual[chat_id] = {"mode": mode, "step": PENDING_STEP_TARGET_TYPE}
-            kb = types.InlineKeyboardMarkup()
-            kb.add(types.InlineKeyboardButton("إلى الجميع", callback_data=CALLBACK_MANUAL_TARGET_ALL))
-            kb.add(types.InlineKeyboardButton("إلى user_id", callback_data=CALLBACK_MANUAL_TARGET_USER))
-            kb.add(types.InlineKeyboardButton("إلى chat", callback_data=CALLBACK_MANUAL_TARGET_CHAT))
-            kb.add(types.InlineKeyboardButton("إلى chat topic (موضوع)", callback_data=CALLBACK_MANUAL_TARGET_CHAT_TOPIC))
-            kb.add(types.InlineKeyboardButton("إلغاء", callback_data=CALLBACK_HW_CANCEL))
-            bot.send_message(chat_id, "اختر نوع المستهدف:", reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith("manual_target_"):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            t = data.split("manual_target_")[1]
-            with _pending_lock:
-                pm = _pending_manual.get(chat_id) or {}
-                pm["target_type"] = t
-                
-                if t == "all":
-                    pm["step"] = PENDING_STEP_ENTER_CONTENT
-                elif t == "chat_topic":
-                    pm["step"] = PENDING_STEP_ENTER_CHAT
-                else:
-                    pm["step"] = PENDING_STEP_ENTER_TARGET
-                _pending_manual[chat_id] = pm
-
-            if pm["step"] == PENDING_STEP_ENTER_CONTENT:
-                msg = bot.send_message(chat_id, "أرسل نص التذكير أو ملف (صورة، صوت، PDF، فيديو، إلخ) أو كليهما:\nيمكنك إرسال ملف أولاً ثم النص، أو النص فقط، أو الملف فقط.", reply_markup=cancel_inline_kb())
-                bot.register_next_step_handler(msg, _manual_next_step_handler, chat_id)
-            elif pm["step"] == PENDING_STEP_ENTER_TARGET:
-                msg = bot.send_message(chat_id, "أدخل قيمة المستهدف (مثلاً user_id أو chat_id) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
-                bot.register_next_step_handler(msg, _manual_next_step_handler, chat_id)
-            elif pm["step"] == PENDING_STEP_ENTER_CHAT:
-                msg = bot.send_message(chat_id, "أدخل chat_id للمجموعة (يمكنك أيضًا الرد داخل الـ topic برسالة). ثم اضغط إرسال:", reply_markup=cancel_inline_kb())
-                bot.register_next_step_handler(msg, _manual_next_step_handler, chat_id)
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        
-        if data == CALLBACK_CUSTOM_REMINDER:
-            bot.send_message(chat_id, "🔔 تذكيراتي المخصصة:", reply_markup=custom_reminder_main_kb())
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data == CALLBACK_CUSTOM_REMINDER_ADD:
-            with _pending_lock:
-                _pending_manual[chat_id] = {"step": "custom_text", "type": "custom_reminder"}
-            msg = bot.send_message(chat_id, "أرسل نص التذكير (أو اكتب 'إلغاء'):", reply_markup=cancel_inline_kb())
-            bot.register_next_step_handler(msg, _custom_reminder_step_text, chat_id, uid)
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data == CALLBACK_CUSTOM_REMINDER_LIST:
-            with db_connection() as conn_local:
-                reminders = get_all_custom_reminders_for_user(conn_local, uid)
-            if not reminders:
-                bot.send_message(chat_id, "لا توجد تذكيرات مخصصة.", reply_markup=custom_reminder_main_kb())
-                bot.answer_callback_query(c.id)
-                return
-            for r in reminders:
-                with db_connection() as conn_check:
-                    is_done = is_custom_reminder_done_for_user(conn_check, r['id'], uid)
-                text = f"🔔 تذكير مخصص\n\n{r['text']}\n\n⏰ الموعد: {r['reminder_datetime']}\nID: {r['id']}"
-                kb = custom_reminder_item_kb(r['id'], is_done=is_done)
-                bot.send_message(chat_id, text, reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data.startswith(CALLBACK_CUSTOM_REMINDER_DELETE):
-            reminder_id = int(data.split(":", 1)[1])
-            kb = types.InlineKeyboardMarkup()
-            kb.add(types.InlineKeyboardButton("نعم احذف", callback_data=f"{CALLBACK_CUSTOM_REMINDER_CONFIRM_DELETE}{reminder_id}"))
-            kb.add(types.InlineKeyboardButton("إلغاء", callback_data=CALLBACK_CUSTOM_REMINDER_LIST))
-            bot.send_message(chat_id, f"هل أنت متأكد من حذف التذكير المخصص ID:{reminder_id}؟", reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith(CALLBACK_CUSTOM_REMINDER_CONFIRM_DELETE):
-            reminder_id = int(data.split(":", 1)[1])
-            with db_connection() as conn_local:
-                deleted = delete_custom_reminder(conn_local, reminder_id, uid)
-            if deleted:
-                
-                try:
-                    job_id = f"custom_reminder-{reminder_id}"
-                    sch_mgr.scheduler.remove_job(job_id)
-                except Exception:
-                    pass
-                bot.send_message(chat_id, f"تم حذف التذكير المخصص (ID:{reminder_id}).")
-            else:
-                bot.send_message(chat_id, "لم أجد هذا التذكير أو ليس لديك صلاحية لحذفه.")
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data.startswith(CALLBACK_CUSTOM_REMINDER_DONE):
-            reminder_id = int(data.split(":", 1)[1])
-            with db_connection() as conn_local:
-                mark_custom_reminder_done(conn_local, reminder_id, uid)
-                r = get_custom_reminder(conn_local, reminder_id)
-                is_done = is_custom_reminder_done_for_user(conn_local, reminder_id, uid)
-            if r and r['user_id'] == uid:
-                try:
-                    if c.message:
-                        text = f"🔔 تذكير مخصص\n\n{r['text']}\n\n⏰ الموعد: {r['reminder_datetime']}\nID: {r['id']}"
-                        kb = custom_reminder_item_kb(reminder_id, is_done=is_done)
-                        bot.edit_message_text(chat_id=chat_id, message_id=c.message.message_id, text=text, reply_markup=kb)
-                    bot.send_message(chat_id, f"✅ تم وسم التذكير المخصص (ID:{reminder_id}) كـ 'تم' بالنسبة لك.")
-                except Exception:
-                    bot.send_message(chat_id, f"✅ تم وسم التذكير المخصص (ID:{reminder_id}) كـ 'تم' بالنسبة لك.")
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data.startswith(CALLBACK_CUSTOM_REMINDER_UNDONE):
-            reminder_id = int(data.split(":", 1)[1])
-            with db_connection() as conn_local:
-                mark_custom_reminder_undone(conn_local, reminder_id, uid)
-                r = get_custom_reminder(conn_local, reminder_id)
-                is_done = is_custom_reminder_done_for_user(conn_local, reminder_id, uid)
-            if r and r['user_id'] == uid:
-                try:
-                    if c.message:
-                        text = f"🔔 تذكير مخصص\n\n{r['text']}\n\n⏰ الموعد: {r['reminder_datetime']}\nID: {r['id']}"
-                        kb = custom_reminder_item_kb(reminder_id, is_done=is_done)
-                        bot.edit_message_text(chat_id=chat_id, message_id=c.message.message_id, text=text, reply_markup=kb)
-                    bot.send_message(chat_id, f"❌ تم إلغاء وضع 'تم' للتذكير المخصص (ID:{reminder_id}) بالنسبة لك.")
-                except Exception:
-                    bot.send_message(chat_id, f"❌ تم إلغاء وضع 'تم' للتذكير المخصص (ID:{reminder_id}) بالنسبة لك.")
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        
-        if data == CALLBACK_WEEKLY_SCHEDULE_ADMIN:
-            logger.info(f"[SCHEDULE ADMIN] Callback received: data={data}, uid={uid}, chat_id={chat_id}")
-            if not is_admin(uid):
-                logger.warning(f"[SCHEDULE ADMIN] User {uid} is not admin")
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            
-            reply_chat_id = chat_id
-            if not reply_chat_id:
-                reply_chat_id = c.from_user.id  
-            logger.info(f"[SCHEDULE ADMIN] Using reply_chat_id={reply_chat_id}")
-            
-            try:
-                from db_schedule import get_all_groups
-                groups = []
-                try:
-                    with db_connection() as conn:
-                        groups = get_all_groups(conn)
-                        logger.info(f"[SCHEDULE ADMIN] Loaded {len(groups)} groups from database: {groups}")
-                except Exception as db_error:
-                    logger.warning(f"[SCHEDULE ADMIN] Could not load groups from DB: {db_error}, using defaults")
-                
-                if not groups:
-                    groups = ["01", "02", "03", "04"]  
-                    logger.info(f"[SCHEDULE ADMIN] Using default groups: {groups}")
-                
-                kb = schedule_admin_groups_kb(groups)
-                logger.info(f"[SCHEDULE ADMIN] Created keyboard with {len(groups)} groups")
-                bot.send_message(reply_chat_id, "⚙️ إدارة الجداول الأسبوعية\n\nاختر المجموعة:", reply_markup=kb)
-                logger.info(f"[SCHEDULE ADMIN] Sent schedule admin menu to chat {reply_chat_id} for user {uid}")
-            except Exception as e:
-                logger.exception(f"[SCHEDULE ADMIN] Failed to load schedule admin: {e}")
-                error_msg = f"حدث خطأ في تحميل إدارة الجداول.\nالخطأ: {str(e)}"
-                try:
-                    bot.send_message(reply_chat_id, error_msg, reply_markup=main_menu_kb())
-                except Exception as send_error:
-                    logger.exception(f"[SCHEDULE ADMIN] Failed to send error message: {send_error}")
-                    
-                    bot.answer_callback_query(c.id, "حدث خطأ. راجع اللوغ.", show_alert=True)
-            finally:
-                bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith(CALLBACK_WEEKLY_SCHEDULE_ADMIN_GROUP):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            group_number = data.split(":", 1)[1]
-            if group_number == "new":
-                
-                bot.send_message(reply_chat_id, "إضافة مجموعة جديدة (سيتم إضافتها لاحقاً)", reply_markup=main_menu_kb())
-                bot.answer_callback_query(c.id)
-                return
-            kb = schedule_admin_days_kb(group_number)
-            bot.send_message(reply_chat_id, f"Group {group_number} - اختر اليوم:", reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith(CALLBACK_WEEKLY_SCHEDULE_ADMIN_DAY):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            parts = data.split(":", 1)[1].split(":")
-            group_number = parts[0]
-            day = parts[1] if len(parts) > 1 else None
-            if day:
-                kb = schedule_admin_day_menu_kb(group_number, day)
-                day_ar = DAY_NAMES_AR.get(day, day)
-                bot.send_message(reply_chat_id, f"Group {group_number} - {day_ar}\n\nاختر الإجراء:", reply_markup=kb)
-            else:
-                kb = schedule_admin_days_kb(group_number)
-                bot.send_message(reply_chat_id, f"Group {group_number} - اختر اليوم:", reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith(CALLBACK_WEEKLY_SCHEDULE_ADMIN_VIEW):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            parts = data.split(":", 1)[1].split(":")
-            group_number = parts[0]
-            day = parts[1] if len(parts) > 1 else None
-            try:
-                from db_schedule import get_schedule_classes
-                with db_connection() as conn:
-                    if day:
-                        classes = get_schedule_classes(conn, group_number, day)
-                        day_ar = DAY_NAMES_AR.get(day, day)
-                        if not classes:
-                            bot.send_message(reply_chat_id, f"Group {group_number} - {day_ar}\n\nلا توجد حصص في هذا اليوم.", reply_markup=schedule_admin_day_menu_kb(group_number, day))
-                        else:
-                            text = f"Group {group_number} - {day_ar}\n\n"
-                            for cls in classes:
-                                text += format_class_for_display(dict(cls)) + "\n\n"
-                            kb = schedule_admin_classes_list_kb(group_number, day, [dict(c) for c in classes])
-                            bot.send_message(reply_chat_id, text, reply_markup=kb)
-                    else:
-                        
-                        classes = get_schedule_classes(conn, group_number)
-                        if not classes:
-                            bot.send_message(reply_chat_id, f"Group {group_number}\n\nلا توجد حصص.", reply_markup=schedule_admin_days_kb(group_number))
-                        else:
-                            text = f"Group {group_number} - الجدول الأسبوعي الكامل\n\n"
-                            current_day = None
-                            for cls in classes:
-                                if cls['day_name'] != current_day:
-                                    current_day = cls['day_name']
-                                    day_ar = DAY_NAMES_AR.get(current_day, current_day)
-                                    text += f"\n📅 {day_ar}:\n"
-                                text += format_class_for_display(dict(cls)) + "\n"
-                            bot.send_message(reply_chat_id, text, reply_markup=schedule_admin_days_kb(group_number))
-            except Exception as e:
-                logger.exception("Failed to view schedule")
-                bot.send_message(reply_chat_id, f"حدث خطأ في عرض الجدول. راجع اللوغ. الخطأ: {e}", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith(CALLBACK_WEEKLY_SCHEDULE_ADMIN_ADD):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            parts = data.split(":", 1)[1].split(":")
-            group_number = parts[0]
-            day = parts[1]
-            
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin[reply_chat_id] = {
-                    "action": "add",
-                    "group_number": group_number,
-                    "day": day,
-                    "step": "time_start"
-                }
-            msg = bot.send_message(reply_chat_id, "أرسل وقت البداية (مثال: 08:00) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
-            bot.register_next_step_handler(msg, schedule_admin_add_step_time_start, reply_chat_id)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith(CALLBACK_WEEKLY_SCHEDULE_ADMIN_EDIT):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            class_id = int(data.split(":", 1)[1])
-            try:
-                from db_schedule import get_schedule_class
-                with db_connection() as conn:
-                    cls = get_schedule_class(conn, class_id)
-                    if not cls:
-                        bot.send_message(reply_chat_id, "لم أجد هذه الحصة.", reply_markup=main_menu_kb())
-                        bot.answer_callback_query(c.id)
-                        return
-                    cls_dict = dict(cls)
-                    text = format_class_for_display(cls_dict)
-                    kb = schedule_admin_class_actions_kb(class_id, cls_dict['group_number'], cls_dict['day_name'])
-                    bot.send_message(reply_chat_id, text, reply_markup=kb)
-            except Exception as e:
-                logger.exception("Failed to edit schedule class")
-                bot.send_message(reply_chat_id, f"حدث خطأ في عرض الحصة. راجع اللوغ. الخطأ: {e}", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith(CALLBACK_WEEKLY_SCHEDULE_ADMIN_DELETE):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            class_id = int(data.split(":", 1)[1])
-            try:
-                from db_schedule import get_schedule_class
-                with db_connection() as conn:
-                    cls = get_schedule_class(conn, class_id)
-                    if cls:
-                        kb = types.InlineKeyboardMarkup()
-                        kb.add(types.InlineKeyboardButton("نعم احذف", callback_data=f"{CALLBACK_WEEKLY_SCHEDULE_ADMIN_CONFIRM_DELETE}{class_id}"))
-                        kb.add(types.InlineKeyboardButton("إلغاء", callback_data=f"{CALLBACK_WEEKLY_SCHEDULE_ADMIN_EDIT}{class_id}"))
-                        bot.send_message(reply_chat_id, f"هل أنت متأكد من حذف الحصة:\n{format_class_for_display(dict(cls))}", reply_markup=kb)
-            except Exception as e:
-                logger.exception("Failed to delete schedule class")
-                bot.send_message(reply_chat_id, f"حدث خطأ. راجع اللوغ. الخطأ: {e}", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith(CALLBACK_WEEKLY_SCHEDULE_ADMIN_CONFIRM_DELETE):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            class_id = int(data.split(":", 1)[1])
-            try:
-                from db_schedule import delete_schedule_class, get_schedule_class
-                with db_connection() as conn:
-                    cls = get_schedule_class(conn, class_id)
-                    if cls:
-                        delete_schedule_class(conn, class_id)
-                        bot.send_message(reply_chat_id, f"تم حذف الحصة (ID: {class_id}).")
-                        
-                        cls_dict = dict(cls)
-                        kb = schedule_admin_day_menu_kb(cls_dict['group_number'], cls_dict['day_name'])
-                        bot.send_message(reply_chat_id, f"Group {cls_dict['group_number']} - {DAY_NAMES_AR.get(cls_dict['day_name'], cls_dict['day_name'])}", reply_markup=kb)
-            except Exception as e:
-                logger.exception("Failed to delete schedule class")
-                bot.send_message(reply_chat_id, f"حدث خطأ في حذف الحصة. راجع اللوغ. الخطأ: {e}", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data == CALLBACK_WEEKLY_SCHEDULE_ADMIN_LOCATIONS:
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            try:
-                from db_schedule import get_schedule_locations
-                with db_connection() as conn:
-                    locations = get_schedule_locations(conn)
-                    if not locations:
-                        text = "📍 إدارة المواقع\n\nلا توجد مواقع مسجلة."
-                        kb = types.InlineKeyboardMarkup()
-                        kb.add(types.InlineKeyboardButton("➕ إضافة موقع", callback_data="schedule_location_add"))
-                        kb.add(types.InlineKeyboardButton("↩️ رجوع", callback_data=CALLBACK_WEEKLY_SCHEDULE_ADMIN))
-                        bot.send_message(reply_chat_id, text, reply_markup=kb)
-                    else:
-                        text = "📍 إدارة المواقع\n\nالمواقع المسجلة:\n\n"
-                        kb = types.InlineKeyboardMarkup()
-                        for loc_name, maps_url in sorted(locations.items()):
-                            text += f"📍 {loc_name}\n   🔗 {maps_url[:50]}...\n\n"
-                            kb.add(types.InlineKeyboardButton(f"✏️ {loc_name}", callback_data=f"schedule_location_edit:{loc_name}"))
-                        kb.add(types.InlineKeyboardButton("➕ إضافة موقع", callback_data="schedule_location_add"))
-                        kb.add(types.InlineKeyboardButton("↩️ رجوع", callback_data=CALLBACK_WEEKLY_SCHEDULE_ADMIN))
-                        bot.send_message(reply_chat_id, text, reply_markup=kb)
-            except Exception as e:
-                logger.exception("Failed to load locations")
-                bot.send_message(reply_chat_id, f"حدث خطأ في تحميل المواقع. راجع اللوغ. الخطأ: {e}", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
-            return
-
-        if data == "schedule_location_add":
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin[reply_chat_id] = {
-                    "action": "add_location",
-                    "step": "location_name"
-                }
-            msg = bot.send_message(reply_chat_id, "أرسل اسم الموقع (مثال: Amphi H) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
-            bot.register_next_step_handler(msg, schedule_admin_location_step_name, reply_chat_id)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith("schedule_location_edit:"):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            location_name = data.split(":", 1)[1]
-            try:
-                from db_schedule import get_schedule_location
-                with db_connection() as conn:
-                    maps_url = get_schedule_location(conn, location_name)
-                    if maps_url:
-                        kb = types.InlineKeyboardMarkup()
-                        kb.add(types.InlineKeyboardButton("✏️ تعديل رابط الخريطة", callback_data=f"schedule_location_edit_url:{location_name}"))
-                        kb.add(types.InlineKeyboardButton("🗑️ حذف الموقع", callback_data=f"schedule_location_delete:{location_name}"))
-                        kb.add(types.InlineKeyboardButton("↩️ رجوع", callback_data=CALLBACK_WEEKLY_SCHEDULE_ADMIN_LOCATIONS))
-                        text = f"📍 الموقع: {location_name}\n\n🔗 رابط الخريطة:\n{maps_url}"
-                        bot.send_message(reply_chat_id, text, reply_markup=kb)
-                    else:
-                        bot.send_message(reply_chat_id, "لم أجد هذا الموقع.", reply_markup=main_menu_kb())
-            except Exception as e:
-                logger.exception("Failed to load location")
-                bot.send_message(reply_chat_id, f"حدث خطأ. راجع اللوغ. الخطأ: {e}", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith("schedule_location_edit_url:"):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            location_name = data.split(":", 1)[1]
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin[reply_chat_id] = {
-                    "action": "edit_location_url",
-                    "location_name": location_name,
-                    "step": "maps_url"
-                }
-            msg = bot.send_message(reply_chat_id, f"أرسل رابط Google Maps الجديد للموقع '{location_name}' أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
-            bot.register_next_step_handler(msg, schedule_admin_location_step_url, reply_chat_id, location_name)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith("schedule_location_delete:"):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            location_name = data.split(":", 1)[1]
-            kb = types.InlineKeyboardMarkup()
-            kb.add(types.InlineKeyboardButton("نعم احذف", callback_data=f"schedule_location_confirm_delete:{location_name}"))
-            kb.add(types.InlineKeyboardButton("إلغاء", callback_data=CALLBACK_WEEKLY_SCHEDULE_ADMIN_LOCATIONS))
-            bot.send_message(reply_chat_id, f"هل أنت متأكد من حذف الموقع '{location_name}'؟", reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith("schedule_location_confirm_delete:"):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            location_name = data.split(":", 1)[1]
-            try:
-                from db_schedule import delete_schedule_location
-                with db_connection() as conn:
-                    if delete_schedule_location(conn, location_name):
-                        bot.send_message(reply_chat_id, f"✅ تم حذف الموقع '{location_name}'.")
-                        
-                        from db_schedule import get_schedule_locations
-                        locations = get_schedule_locations(conn)
-                        if not locations:
-                            text = "📍 إدارة المواقع\n\nلا توجد مواقع مسجلة."
-                            kb = types.InlineKeyboardMarkup()
-                            kb.add(types.InlineKeyboardButton("➕ إضافة موقع", callback_data="schedule_location_add"))
-                            kb.add(types.InlineKeyboardButton("↩️ رجوع", callback_data=CALLBACK_WEEKLY_SCHEDULE_ADMIN))
-                            bot.send_message(reply_chat_id, text, reply_markup=kb)
-                        else:
-                            text = "📍 إدارة المواقع\n\nالمواقع المسجلة:\n\n"
-                            kb = types.InlineKeyboardMarkup()
-                            for loc_name, maps_url in sorted(locations.items()):
-                                text += f"📍 {loc_name}\n   🔗 {maps_url[:50]}...\n\n"
-                                kb.add(types.InlineKeyboardButton(f"✏️ {loc_name}", callback_data=f"schedule_location_edit:{loc_name}"))
-                            kb.add(types.InlineKeyboardButton("➕ إضافة موقع", callback_data="schedule_location_add"))
-                            kb.add(types.InlineKeyboardButton("↩️ رجوع", callback_data=CALLBACK_WEEKLY_SCHEDULE_ADMIN))
-                            bot.send_message(reply_chat_id, text, reply_markup=kb)
-                    else:
-                        bot.send_message(reply_chat_id, f"لم أجد الموقع '{location_name}'.", reply_markup=main_menu_kb())
-            except Exception as e:
-                logger.exception("Failed to delete location")
-                bot.send_message(reply_chat_id, f"حدث خطأ في حذف الموقع. راجع اللوغ. الخطأ: {e}", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        
-        if data.startswith(CALLBACK_SCHEDULE_EDIT_TIME_START):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            class_id = int(data.split(":", 1)[1])
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin[reply_chat_id] = {
-                    "action": "edit_class",
-                    "class_id": class_id,
-                    "field": "time_start",
-                    "step": "enter_value"
-                }
-            msg = bot.send_message(reply_chat_id, "أرسل وقت البداية الجديد (مثال: 08:00) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
-            bot.register_next_step_handler(msg, schedule_admin_edit_class_field_step, reply_chat_id)
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data.startswith(CALLBACK_SCHEDULE_EDIT_TIME_END):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            class_id = int(data.split(":", 1)[1])
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin[reply_chat_id] = {
-                    "action": "edit_class",
-                    "class_id": class_id,
-                    "field": "time_end",
-                    "step": "enter_value"
-                }
-            msg = bot.send_message(reply_chat_id, "أرسل وقت الانتهاء الجديد (مثال: 09:30) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
-            bot.register_next_step_handler(msg, schedule_admin_edit_class_field_step, reply_chat_id)
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data.startswith(CALLBACK_SCHEDULE_EDIT_COURSE):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            class_id = int(data.split(":", 1)[1])
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin[reply_chat_id] = {
-                    "action": "edit_class",
-                    "class_id": class_id,
-                    "field": "course",
-                    "step": "enter_value"
-                }
-            msg = bot.send_message(reply_chat_id, "أرسل اسم المادة الجديد (مثال: Analysis1) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
-            bot.register_next_step_handler(msg, schedule_admin_edit_class_field_step, reply_chat_id)
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data.startswith(CALLBACK_SCHEDULE_EDIT_LOCATION):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            class_id = int(data.split(":", 1)[1])
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin[reply_chat_id] = {
-                    "action": "edit_class",
-                    "class_id": class_id,
-                    "field": "location",
-                    "step": "enter_value"
-                }
-            msg = bot.send_message(reply_chat_id, "أرسل المكان الجديد (مثال: Amphi H) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
-            bot.register_next_step_handler(msg, schedule_admin_edit_class_field_step, reply_chat_id)
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data.startswith(CALLBACK_SCHEDULE_EDIT_TYPE):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            class_id = int(data.split(":", 1)[1])
-            kb = types.InlineKeyboardMarkup()
-            kb.add(types.InlineKeyboardButton("Course", callback_data=f"schedule_edit_type_select:{class_id}:Course"))
-            kb.add(types.InlineKeyboardButton("Tutorial Session", callback_data=f"schedule_edit_type_select:{class_id}:Tutorial Session"))
-            kb.add(types.InlineKeyboardButton("Laboratory Session", callback_data=f"schedule_edit_type_select:{class_id}:Laboratory Session"))
-            kb.add(types.InlineKeyboardButton("Online Session", callback_data=f"schedule_edit_type_select:{class_id}:Online Session"))
-            kb.add(types.InlineKeyboardButton("إلغاء", callback_data=CALLBACK_HW_CANCEL))
-            bot.send_message(reply_chat_id, "اختر نوع الحصة الجديد:", reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data.startswith("schedule_edit_type_select:"):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            parts = data.split(":", 2)
-            class_id = int(parts[1])
-            class_type = parts[2]
-            try:
-                from db_schedule import update_schedule_class_field, get_schedule_class
-                with db_connection() as conn:
-                    if update_schedule_class_field(conn, class_id, "class_type", class_type):
-                        cls = get_schedule_class(conn, class_id)
-                        if cls:
-                            cls_dict = dict(cls)
-                            text = format_class_for_display(cls_dict)
-                            kb = schedule_admin_class_actions_kb(class_id, cls_dict['group_number'], cls_dict['day_name'])
-                            bot.send_message(reply_chat_id, f"✅ تم تحديث نوع الحصة.\n\n{text}", reply_markup=kb)
-                        else:
-                            bot.send_message(reply_chat_id, "✅ تم تحديث نوع الحصة.", reply_markup=main_menu_kb())
-                    else:
-                        bot.send_message(reply_chat_id, "❌ فشل تحديث نوع الحصة.", reply_markup=main_menu_kb())
-            except Exception as e:
-                logger.exception("Failed to update class type")
-                bot.send_message(reply_chat_id, f"حدث خطأ في تحديث نوع الحصة: {e}", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data.startswith(CALLBACK_SCHEDULE_EDIT_ALTERNATING):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            class_id = int(data.split(":", 1)[1])
-            try:
-                from db_schedule import get_schedule_class, update_schedule_class_field
-                with db_connection() as conn:
-                    cls = get_schedule_class(conn, class_id)
-                    if not cls:
-                        bot.send_message(reply_chat_id, "لم أجد هذه الحصة.", reply_markup=main_menu_kb())
-                        bot.answer_callback_query(c.id)
-                        return
-                    
-                    cls_dict = dict(cls)
-                    is_alternating = bool(cls_dict.get('is_alternating', 0))
-                    
-                    
-                    new_alternating = not is_alternating
-                    if new_alternating:
-                        
-                        with _pending_schedule_admin_lock:
-                            _pending_schedule_admin[reply_chat_id] = {
-                                "action": "edit_class",
-                                "class_id": class_id,
-                                "field": "alternating",
-                                "step": "enter_alternating_key",
-                                "is_alternating": True
-                            }
-                        msg = bot.send_message(reply_chat_id, "أرسل مفتاح الحصة الدورية (مثال: algorithm1) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
-                        bot.register_next_step_handler(msg, schedule_admin_edit_class_field_step, reply_chat_id)
-                    else:
-                        
-                        if update_schedule_class_field(conn, class_id, "is_alternating", False):
-                            update_schedule_class_field(conn, class_id, "alternating_key", None)
-                            cls = get_schedule_class(conn, class_id)
-                            if cls:
-                                cls_dict = dict(cls)
-                                text = format_class_for_display(cls_dict)
-                                kb = schedule_admin_class_actions_kb(class_id, cls_dict['group_number'], cls_dict['day_name'])
-                                bot.send_message(reply_chat_id, f"✅ تم تعطيل الحالة الدورية.\n\n{text}", reply_markup=kb)
-            except Exception as e:
-                logger.exception("Failed to update alternating status")
-                bot.send_message(reply_chat_id, f"حدث خطأ: {e}", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data == CALLBACK_WEEKLY_SCHEDULE_ADMIN_ALTERNATING:
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            try:
-                from db_schedule import get_all_alternating_week_configs
-                with db_connection() as conn:
-                    configs = get_all_alternating_week_configs(conn)
-                    if not configs:
-                        text = "🔄 إدارة الحصص الدورية\n\nلا توجد إعدادات للحصص الدورية."
-                        kb = types.InlineKeyboardMarkup()
-                        kb.add(types.InlineKeyboardButton("➕ إضافة إعداد جديد", callback_data=CALLBACK_ALTERNATING_ADD))
-                        kb.add(types.InlineKeyboardButton("↩️ رجوع", callback_data=CALLBACK_WEEKLY_SCHEDULE_ADMIN))
-                        bot.send_message(reply_chat_id, text, reply_markup=kb)
-                    else:
-                        text = "🔄 إدارة الحصص الدورية\n\nالإعدادات الموجودة:\n\n"
-                        configs_list = []
-                        for config in configs:
-                            config_dict = {
-                                'alternating_key': safe_get(config, 'alternating_key', ''),
-                                'reference_date': safe_get(config, 'reference_date', ''),
-                                'description': safe_get(config, 'description')
-                            }
-                            configs_list.append(config_dict)
-                            text += format_alternating_config_for_display(config_dict) + "\n"
-                        kb = alternating_configs_list_kb(configs_list)
-                        bot.send_message(reply_chat_id, text, reply_markup=kb)
-            except Exception as e:
-                logger.exception("Failed to load alternating configs")
-                bot.send_message(reply_chat_id, f"حدث خطأ في تحميل إعدادات الحصص الدورية: {e}", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
-            return
-
-        if data == CALLBACK_ALTERNATING_LIST:
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            try:
-                from db_schedule import get_all_alternating_week_configs
-                with db_connection() as conn:
-                    configs = get_all_alternating_week_configs(conn)
-                    if not configs:
-                        text = "🔄 إدارة الحصص الدورية\n\nلا توجد إعدادات للحصص الدورية."
-                        kb = types.InlineKeyboardMarkup()
-                        kb.add(types.InlineKeyboardButton("➕ إضافة إعداد جديد", callback_data=CALLBACK_ALTERNATING_ADD))
-                        kb.add(types.InlineKeyboardButton("↩️ رجوع", callback_data=CALLBACK_WEEKLY_SCHEDULE_ADMIN))
-                        bot.send_message(reply_chat_id, text, reply_markup=kb)
-                    else:
-                        text = "🔄 إدارة الحصص الدورية\n\nالإعدادات الموجودة:\n\n"
-                        configs_list = []
-                        for config in configs:
-                            config_dict = {
-                                'alternating_key': safe_get(config, 'alternating_key', ''),
-                                'reference_date': safe_get(config, 'reference_date', ''),
-                                'description': safe_get(config, 'description')
-                            }
-                            configs_list.append(config_dict)
-                            text += format_alternating_config_for_display(config_dict) + "\n"
-                        kb = alternating_configs_list_kb(configs_list)
-                        bot.send_message(reply_chat_id, text, reply_markup=kb)
-            except Exception as e:
-                logger.exception("Failed to load alternating configs")
-                bot.send_message(reply_chat_id, f"حدث خطأ: {e}", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith(CALLBACK_ALTERNATING_EDIT):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            alternating_key = data.split(":", 1)[1]
-            try:
-                from db_schedule import get_alternating_week_config
-                with db_connection() as conn:
-                    config = get_alternating_week_config(conn, alternating_key)
-                    if not config:
-                        bot.send_message(reply_chat_id, "لم أجد هذا الإعداد.", reply_markup=main_menu_kb())
-                        bot.answer_callback_query(c.id)
-                        return
-                    config_dict = {
-                        'alternating_key': safe_get(config, 'alternating_key', ''),
-                        'reference_date': safe_get(config, 'reference_date', ''),
-                        'description': safe_get(config, 'description')
-                    }
-                    text = format_alternating_config_for_display(config_dict)
-                    kb = alternating_config_actions_kb(alternating_key)
-                    bot.send_message(reply_chat_id, text, reply_markup=kb)
-            except Exception as e:
-                logger.exception("Failed to load alternating config")
-                bot.send_message(reply_chat_id, f"حدث خطأ: {e}", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
-            return
-
-        if data.startswith(CALLBACK_ALTERNATING_EDIT_DATE):
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            alternating_key = data.split(":", 1)[1]
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin[reply_chat_id] = {
-                    "action": "edit_alternating_config",
-                    "alternating_key": alternating_key,
-                    "field": "reference_date",
-                    "step": "enter_value"
-                }
-            msg = bot.send_message(reply_chat_id, f"أرسل تاريخ المرجع الجديد بصيغة YYYY-MM-DD (مثال: 2024-11-11) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
-            bot.register_next_step_handler(msg, schedule_admin_edit_alternating_config_step, reply_chat_id)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data == CALLBACK_ALTERNATING_ADD:
-            if not is_admin(uid):
-                bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-                return
-            
-            reply_chat_id = chat_id or c.from_user.id
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin[reply_chat_id] = {
-                    "action": "add_alternating_config",
-                    "step": "enter_key"
-                }
-            msg = bot.send_message(reply_chat_id, "أرسل مفتاح الحصة الدورية (مثال: algorithm1) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
-            bot.register_next_step_handler(msg, schedule_admin_add_alternating_config_step_key, reply_chat_id)
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        
-        if data == CALLBACK_WEEKLY_SCHEDULE:
-            kb = weekly_schedule_group_kb()
-            try:
-                if c.message:
-                    bot.edit_message_text(chat_id=chat_id, message_id=c.message.message_id, text="Select your Group", reply_markup=kb)
-                else:
-                    bot.send_message(chat_id, "Select your Group", reply_markup=kb)
-            except Exception:
-                bot.send_message(chat_id, "Select your Group", reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data == CALLBACK_WEEKLY_SCHEDULE_GROUP_01:
-            kb = weekly_schedule_time_kb("01")
-            bot.send_message(chat_id, "Group 01 - اختر التوقيت:", reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data == CALLBACK_WEEKLY_SCHEDULE_GROUP_02:
-            kb = weekly_schedule_time_kb("02")
-            bot.send_message(chat_id, "Group 02 - اختر التوقيت:", reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data == CALLBACK_WEEKLY_SCHEDULE_GROUP_03:
-            kb = weekly_schedule_time_kb("03")
-            bot.send_message(chat_id, "Group 03 - اختر التوقيت:", reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        if data == CALLBACK_WEEKLY_SCHEDULE_GROUP_04:
-            kb = weekly_schedule_time_kb("04")
-            bot.send_message(chat_id, "Group 4 - اختر التوقيت:", reply_markup=kb)
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data.startswith(CALLBACK_WEEKLY_SCHEDULE_TODAY):
-            group_number = data.split(":", 1)[1]
-            try:
-                from weekly_schedule import get_today_schedule_entries, format_single_class_message
-                from bot_handlers.weekly_schedule_helpers import class_entry_keyboard
-                
-                entries = get_today_schedule_entries(group_number)
-                
-                if not entries:
-                    bot.send_message(chat_id, "📅 اليوم\n\nلا توجد حصص في هذا اليوم.", reply_markup=main_menu_kb())
-                else:
-                    
-                    for entry in entries:
-                        message_text = format_single_class_message(entry)
-                        kb = class_entry_keyboard(entry, group_number, entry.get("day_ar", ""))
-                        if kb:
-                            bot.send_message(chat_id, message_text, reply_markup=kb)
-                        else:
-                            bot.send_message(chat_id, message_text)
-            except Exception as e:
-                logger.exception("Failed to get today's schedule")
-                bot.send_message(chat_id, f"حدث خطأ في جلب جدول اليوم. راجع اللوغ.", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data.startswith(CALLBACK_WEEKLY_SCHEDULE_TOMORROW):
-            group_number = data.split(":", 1)[1]
-            try:
-                from weekly_schedule import get_tomorrow_schedule_entries, format_single_class_message
-                from bot_handlers.weekly_schedule_helpers import class_entry_keyboard
-                
-                entries = get_tomorrow_schedule_entries(group_number)
-                
-                if not entries:
-                    bot.send_message(chat_id, "📅 الغد\n\nلا توجد حصص في هذا اليوم.", reply_markup=main_menu_kb())
-                else:
-                    
-                    for entry in entries:
-                        message_text = format_single_class_message(entry)
-                        kb = class_entry_keyboard(entry, group_number, entry.get("day_ar", ""))
-                        if kb:
-                            bot.send_message(chat_id, message_text, reply_markup=kb)
-                        else:
-                            bot.send_message(chat_id, message_text)
-            except Exception as e:
-                logger.exception("Failed to get tomorrow's schedule")
-                bot.send_message(chat_id, f"حدث خطأ في جلب جدول الغد. راجع اللوغ.", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data.startswith(CALLBACK_WEEKLY_SCHEDULE_WEEK):
-            group_number = data.split(":", 1)[1]
-            try:
-                from weekly_schedule import format_weekly_schedule
-                schedule_text = format_weekly_schedule(group_number)
-                
-                
-                if not schedule_text or not schedule_text.strip():
-                    logger.warning(f"format_weekly_schedule returned empty text for group {group_number}")
-                    schedule_text = f"📅 الجدول الأسبوعي الكامل - Group {group_number}\n\nلا توجد حصص مسجلة لهذه المجموعة.\n\nيرجى إضافة الحصص من قائمة الإدارة (Admin)."
-                
-                bot.send_message(chat_id, schedule_text, reply_markup=main_menu_kb())
-                
-                
-                try:
-                    from config import SCHEDULES_DIR
-                    import os
-                    if SCHEDULES_DIR and os.path.exists(SCHEDULES_DIR):
-                        
-                        pdf_filename = f"weekly_schedule_group_{group_number}.pdf"
-                        pdf_path = os.path.join(SCHEDULES_DIR, pdf_filename)
-                        
-                        if os.path.exists(pdf_path):
-                            
-                            with open(pdf_path, 'rb') as pdf_file:
-                                bot.send_document(chat_id, pdf_file, caption=f"📄 الجدول الأسبوعي الكامل - Group {group_number}")
-                            logger.info(f"Sent PDF schedule for Group {group_number}")
-                        else:
-                            
-                            pdf_all_path = os.path.join(SCHEDULES_DIR, "weekly_schedule_all.pdf")
-                            if os.path.exists(pdf_all_path):
-                                with open(pdf_all_path, 'rb') as pdf_file:
-                                    bot.send_document(chat_id, pdf_file, caption=f"📄 الجدول الأسبوعي الكامل - Group {group_number}")
-                                logger.info(f"Sent general PDF schedule for Group {group_number}")
-                            else:
-                                logger.debug(f"PDF schedule file not found for Group {group_number}")
-                except Exception as pdf_error:
-                    
-                    logger.warning(f"Failed to send PDF schedule: {pdf_error}")
-                    
-            except Exception as e:
-                logger.exception(f"Failed to get weekly schedule for group {group_number}: {e}")
-                error_msg = f"حدث خطأ في جلب الجدول الأسبوعي لمجموعة {group_number}.\n\nالخطأ: {str(e)}\n\nيرجى التحقق من قاعدة البيانات أو الاتصال بالأدمين."
-                try:
-                    bot.send_message(chat_id, error_msg, reply_markup=main_menu_kb())
-                except Exception as send_error:
-                    logger.exception(f"Failed to send error message: {send_error}")
-            bot.answer_callback_query(c.id)
-            return
-
-        
-        if data == CALLBACK_NOTIFICATION_SETTINGS:
-            reply_chat_id = chat_id or c.from_user.id
-            try:
-                with db_connection() as conn:
-                    settings = get_notification_settings(conn, uid)
-                    if settings:
-                        
-                        homework_enabled = bool(safe_get(settings, 'homework_reminders_enabled', 1))
-                        manual_enabled = bool(safe_get(settings, 'manual_reminders_enabled', 1))
-                        custom_enabled = bool(safe_get(settings, 'custom_reminders_enabled', 1))
-                    else:
-                        
-                        homework_enabled = True
-                        manual_enabled = True
-                        custom_enabled = True
-                    
-                    text = "🔕 **إعدادات الإشعارات**\n\n"
-                    text += "يمكنك اختيار أنواع الإشعارات التي تريد استقبالها:\n\n"
-                    text += f"• تذكيرات الواجبات: {'✅ مفعّلة' if homework_enabled else '❌ معطّلة'}\n"
-                    text += f"• تذكيرات الأدمين: {'✅ مفعّلة' if manual_enabled else '❌ معطّلة'}\n"
-                    text += f"• تذكيراتي المخصصة: {'✅ مفعّلة' if custom_enabled else '❌ معطّلة'}\n\n"
-                    text += "اضغط على الزر لتغيير الإعداد."
-                    
-                    kb = notification_settings_kb(homework_enabled, manual_enabled, custom_enabled)
-                    try:
-                        bot.send_message(reply_chat_id, text, parse_mode='Markdown', reply_markup=kb)
-                    except Exception:
-                        
-                        text_plain = text.replace('**', '').replace('`', '')
-                        bot.send_message(reply_chat_id, text_plain, reply_markup=kb)
-            except Exception as e:
-                logger.exception("Failed to load notification settings")
-                bot.send_message(reply_chat_id, f"حدث خطأ في تحميل إعدادات الإشعارات: {e}", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
+        group = None
+        parts = (m.text or "").split(maxsplit=1)
+        if len(parts) > 1:
+            arg = parts[1].strip()
+            group = REGISTRATION_GROUP_NORMALIZATION.get(arg.casefold())
+            if group is None and arg.isdigit() and 1 <= int(arg) <= len(REGISTRATION_GROUP_OPTIONS):
+                group = f"{int(arg):02d}"
+            if group is None:
+                bot.send_message(m.chat.id, f"❌ مجموعة غير صالحة: {arg}. مثال: /students 2")
+                return
+        
+        try:
+            from bot_handlers.callbacks.students import render_students_page
+            text, kb = render_students_page(group)
+            bot.send_message(m.chat.id, text, parse_mode="Markdown", reply_markup=kb)
+            logger.info(f"Admin {m.from_user.id} opened the students directory (group={group or 'all'})")
+        except Exception:
+            logger.exception("Failed to list students")
+            bot.send_message(m.chat.id, "❌ حدث خطأ أثناء جلب قائمة الطلاب.")
+
+    def send_faq_list(chat_id: int):
+        with db_connection() as conn_local:
+            entries = get_all_faq_entries(conn_local)
+        if not entries:
+            bot.send_message(chat_id, "لا توجد أسئلة شائعة حالياً.", reply_markup=main_menu_kb())
             return
+        kb = faq_list_kb(entries)
+        bot.send_message(chat_id, "📖 الأسئلة الشائعة:", reply_markup=kb)
 
-        
-        if data == CALLBACK_NOTIFICATION_DISABLE_HOMEWORK:
-            reply_chat_id = chat_id or c.from_user.id
-            try:
-                with db_connection() as conn:
-                    set_notification_setting(conn, uid, 'homework_reminders', False)
-                    
-                    settings = get_notification_settings(conn, uid)
-                    if settings:
-                        homework_enabled = bool(safe_get(settings, 'homework_reminders_enabled', 1))
-                        manual_enabled = bool(safe_get(settings, 'manual_reminders_enabled', 1))
-                        custom_enabled = bool(safe_get(settings, 'custom_reminders_enabled', 1))
-                    else:
-                        homework_enabled = False
-                        manual_enabled = True
-                        custom_enabled = True
-                    text = "🔕 **إعدادات الإشعارات**\n\n✅ تم إيقاف تذكيرات الواجبات.\n\n"
-                    text += "يمكنك اختيار أنواع الإشعارات التي تريد استقبالها:\n\n"
-                    text += f"• تذكيرات الواجبات: {'✅ مفعّلة' if homework_enabled else '❌ معطّلة'}\n"
-                    text += f"• تذكيرات الأدمين: {'✅ مفعّلة' if manual_enabled else '❌ معطّلة'}\n"
-                    text += f"• تذكيراتي المخصصة: {'✅ مفعّلة' if custom_enabled else '❌ معطّلة'}\n\n"
-                    text += "اضغط على الزر لتغيير الإعداد."
-                    kb = notification_settings_kb(homework_enabled, manual_enabled, custom_enabled)
-                    try:
-                        bot.send_message(reply_chat_id, text, parse_mode='Markdown', reply_markup=kb)
-                    except Exception:
-                        text_plain = text.replace('**', '').replace('`', '')
-                        bot.send_message(reply_chat_id, text_plain, reply_markup=kb)
-            except Exception as e:
-                logger.exception("Failed to disable homework reminders")
-                bot.send_message(reply_chat_id, f"حدث خطأ: {e}", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
+    @bot.message_handler(commands=['faq'])
+    def cmd_faq(m):
+        if not ensure_registration(m.chat.id, m.from_user.id):
             return
+        send_faq_list(m.chat.id)
 
-        
-        if data == CALLBACK_NOTIFICATION_ENABLE_HOMEWORK:
-            reply_chat_id = chat_id or c.from_user.id
-            try:
-                with db_connection() as conn:
-                    set_notification_setting(conn, uid, 'homework_reminders', True)
-                    
-                    settings = get_notification_settings(conn, uid)
-                    if settings:
-                        homework_enabled = bool(safe_get(settings, 'homework_reminders_enabled', 1))
-                        manual_enabled = bool(safe_get(settings, 'manual_reminders_enabled', 1))
-                        custom_enabled = bool(safe_get(settings, 'custom_reminders_enabled', 1))
-                    else:
-                        homework_enabled = True
-                        manual_enabled = True
-                        custom_enabled = True
-                    text = "🔕 **إعدادات الإشعارات**\n\n✅ تم تفعيل تذكيرات الواجبات.\n\n"
-                    text += "يمكنك اختيار أنواع الإشعارات التي تريد استقبالها:\n\n"
-                    text += f"• تذكيرات الواجبات: {'✅ مفعّلة' if homework_enabled else '❌ معطّلة'}\n"
-                    text += f"• تذكيرات الأدمين: {'✅ مفعّلة' if manual_enabled else '❌ معطّلة'}\n"
-                    text += f"• تذكيراتي المخصصة: {'✅ مفعّلة' if custom_enabled else '❌ معطّلة'}\n\n"
-                    text += "اضغط على الزر لتغيير الإعداد."
-                    kb = notification_settings_kb(homework_enabled, manual_enabled, custom_enabled)
-                    try:
-                        bot.send_message(reply_chat_id, text, parse_mode='Markdown', reply_markup=kb)
-                    except Exception:
-                        text_plain = text.replace('**', '').replace('`', '')
-                        bot.send_message(reply_chat_id, text_plain, reply_markup=kb)
-            except Exception as e:
-                logger.exception("Failed to enable homework reminders")
-                bot.send_message(reply_chat_id, f"حدث خطأ: {e}", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
+    
+    @bot.message_handler(func=lambda msg: msg.text == "Homeworks")
+    def open_hw_menu(m):
+        if not ensure_registration(m.chat.id, m.from_user.id):
             return
+        kb = hw_main_kb(m.from_user.id)
+        bot.send_message(m.chat.id, "قائمة Homeworks:", reply_markup=kb)
+        logger.info(f"Opened Homeworks menu for user {m.from_user.id} in chat {m.chat.id}")
 
-        
-        if data == CALLBACK_NOTIFICATION_DISABLE_MANUAL:
-            reply_chat_id = chat_id or c.from_user.id
-            try:
-                with db_connection() as conn:
-                    set_notification_setting(conn, uid, 'manual_reminders', False)
-                    
-                    settings = get_notification_settings(conn, uid)
-                    if settings:
-                        homework_enabled = bool(safe_get(settings, 'homework_reminders_enabled', 1))
-                        manual_enabled = bool(safe_get(settings, 'manual_reminders_enabled', 1))
-                        custom_enabled = bool(safe_get(settings, 'custom_reminders_enabled', 1))
-                    else:
-                        homework_enabled = True
-                        manual_enabled = False
-                        custom_enabled = True
-                    text = "🔕 **إعدادات الإشعارات**\n\n✅ تم إيقاف تذكيرات الأدمين.\n\n"
-                    text += "يمكنك اختيار أنواع الإشعارات التي تريد استقبالها:\n\n"
-                    text += f"• تذكيرات الواجبات: {'✅ مفعّلة' if homework_enabled else '❌ معطّلة'}\n"
-                    text += f"• تذكيرات الأدمين: {'✅ مفعّلة' if manual_enabled else '❌ معطّلة'}\n"
-                    text += f"• تذكيراتي المخصصة: {'✅ مفعّلة' if custom_enabled else '❌ معطّلة'}\n\n"
-                    text += "اضغط على الزر لتغيير الإعداد."
-                    kb = notification_settings_kb(homework_enabled, manual_enabled, custom_enabled)
-                    try:
-                        bot.send_message(reply_chat_id, text, parse_mode='Markdown', reply_markup=kb)
-                    except Exception:
-                        text_plain = text.replace('**', '').replace('`', '')
-                        bot.send_message(reply_chat_id, text_plain, reply_markup=kb)
-            except Exception as e:
-                logger.exception("Failed to disable manual reminders")
-                bot.send_message(reply_chat_id, f"حدث خطأ: {e}", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
+    
+    @bot.message_handler(func=lambda msg: msg.text == "Weekly Schedule")
+    def open_weekly_schedule_menu(m):
+        if not ensure_registration(m.chat.id, m.from_user.id):
             return
+        kb = weekly_schedule_group_kb()
+        bot.send_message(m.chat.id, "Select your Group", reply_markup=kb)
+        logger.info(f"Opened Weekly Schedule menu for user {m.from_user.id} in chat {m.chat.id}")
 
-        
-        if data == CALLBACK_NOTIFICATION_ENABLE_MANUAL:
-            reply_chat_id = chat_id or c.from_user.id
-            try:
-                with db_connection() as conn:
-                    set_notification_setting(conn, uid, 'manual_reminders', True)
-                    
-                    settings = get_notification_settings(conn, uid)
-                    if settings:
-                        homework_enabled = bool(safe_get(settings, 'homework_reminders_enabled', 1))
-                        manual_enabled = bool(safe_get(settings, 'manual_reminders_enabled', 1))
-                        custom_enabled = bool(safe_get(settings, 'custom_reminders_enabled', 1))
-                    else:
-                        homework_enabled = True
-                        manual_enabled = True
-                        custom_enabled = True
-                    text = "🔕 **إعدادات الإشعارات**\n\n✅ تم تفعيل تذكيرات الأدمين.\n\n"
-                    text += "يمكنك اختيار أنواع الإشعارات التي تريد استقبالها:\n\n"
-                    text += f"• تذكيرات الواجبات: {'✅ مفعّلة' if homework_enabled else '❌ معطّلة'}\n"
-                    text += f"• تذكيرات الأدمين: {'✅ مفعّلة' if manual_enabled else '❌ معطّلة'}\n"
-                    text += f"• تذكيراتي المخصصة: {'✅ مفعّلة' if custom_enabled else '❌ معطّلة'}\n\n"
-                    text += "اضغط على الزر لتغيير الإعداد."
-                    kb = notification_settings_kb(homework_enabled, manual_enabled, custom_enabled)
-                    try:
-                        bot.send_message(reply_chat_id, text, parse_mode='Markdown', reply_markup=kb)
-                    except Exception:
-                        text_plain = text.replace('**', '').replace('`', '')
-                        bot.send_message(reply_chat_id, text_plain, reply_markup=kb)
-            except Exception as e:
-                logger.exception("Failed to enable manual reminders")
-                bot.send_message(reply_chat_id, f"حدث خطأ: {e}", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
+    @bot.message_handler(func=lambda msg: msg.text == "FAQ")
+    def open_faq_menu(m):
+        if not ensure_registration(m.chat.id, m.from_user.id):
             return
+        send_faq_list(m.chat.id)
+        logger.info(f"Opened FAQ menu for user {m.from_user.id} in chat {m.chat.id}")
 
-        
-        if data == CALLBACK_NOTIFICATION_DISABLE_CUSTOM:
-            reply_chat_id = chat_id or c.from_user.id
-            try:
-                with db_connection() as conn:
-                    set_notification_setting(conn, uid, 'custom_reminders', False)
-                    
-                    settings = get_notification_settings(conn, uid)
-                    if settings:
-                        homework_enabled = bool(safe_get(settings, 'homework_reminders_enabled', 1))
-                        manual_enabled = bool(safe_get(settings, 'manual_reminders_enabled', 1))
-                        custom_enabled = bool(safe_get(settings, 'custom_reminders_enabled', 1))
-                    else:
-                        homework_enabled = True
-                        manual_enabled = True
-                        custom_enabled = False
-                    text = "🔕 **إعدادات الإشعارات**\n\n✅ تم إيقاف تذكيراتي المخصصة.\n\n"
-                    text += "يمكنك اختيار أنواع الإشعارات التي تريد استقبالها:\n\n"
-                    text += f"• تذكيرات الواجبات: {'✅ مفعّلة' if homework_enabled else '❌ معطّلة'}\n"
-                    text += f"• تذكيرات الأدمين: {'✅ مفعّلة' if manual_enabled else '❌ معطّلة'}\n"
-                    text += f"• تذكيراتي المخصصة: {'✅ مفعّلة' if custom_enabled else '❌ معطّلة'}\n\n"
-                    text += "اضغط على الزر لتغيير الإعداد."
-                    kb = notification_settings_kb(homework_enabled, manual_enabled, custom_enabled)
-                    try:
-                        bot.send_message(reply_chat_id, text, parse_mode='Markdown', reply_markup=kb)
-                    except Exception:
-                        text_plain = text.replace('**', '').replace('`', '')
-                        bot.send_message(reply_chat_id, text_plain, reply_markup=kb)
-            except Exception as e:
-                logger.exception("Failed to disable custom reminders")
-                bot.send_message(reply_chat_id, f"حدث خطأ: {e}", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
+    @bot.message_handler(func=lambda msg: msg.text == "Update Info")
+    def update_user_info(m):
+        registration_complete = is_registration_complete_cached(m.from_user.id)
+        if not registration_complete:
+            ensure_registration(m.chat.id, m.from_user.id)
             return
+        start_update_registration(m.chat.id, m.from_user.id)
+        logger.info(f"Started update info flow for user {m.from_user.id} in chat {m.chat.id}")
 
-        
-        if data == CALLBACK_NOTIFICATION_ENABLE_CUSTOM:
-            reply_chat_id = chat_id or c.from_user.id
-            try:
-                with db_connection() as conn:
-                    set_notification_setting(conn, uid, 'custom_reminders', True)
-                    
-                    settings = get_notification_settings(conn, uid)
-                    if settings:
-                        homework_enabled = bool(safe_get(settings, 'homework_reminders_enabled', 1))
-                        manual_enabled = bool(safe_get(settings, 'manual_reminders_enabled', 1))
-                        custom_enabled = bool(safe_get(settings, 'custom_reminders_enabled', 1))
-                    else:
-                        homework_enabled = True
-                        manual_enabled = True
-                        custom_enabled = True
-                    text = "🔕 **إعدادات الإشعارات**\n\n✅ تم تفعيل تذكيراتي المخصصة.\n\n"
-                    text += "يمكنك اختيار أنواع الإشعارات التي تريد استقبالها:\n\n"
-                    text += f"• تذكيرات الواجبات: {'✅ مفعّلة' if homework_enabled else '❌ معطّلة'}\n"
-                    text += f"• تذكيرات الأدمين: {'✅ مفعّلة' if manual_enabled else '❌ معطّلة'}\n"
-                    text += f"• تذكيراتي المخصصة: {'✅ مفعّلة' if custom_enabled else '❌ معطّلة'}\n\n"
-                    text += "اضغط على الزر لتغيير الإعداد."
-                    kb = notification_settings_kb(homework_enabled, manual_enabled, custom_enabled)
-                    try:
-                        bot.send_message(reply_chat_id, text, parse_mode='Markdown', reply_markup=kb)
-                    except Exception:
-                        text_plain = text.replace('**', '').replace('`', '')
-                        bot.send_message(reply_chat_id, text_plain, reply_markup=kb)
-            except Exception as e:
-                logger.exception("Failed to enable custom reminders")
-                bot.send_message(reply_chat_id, f"حدث خطأ: {e}", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
+    
+    
+
+    
+    @bot.callback_query_handler(func=lambda c: True)
+    def callbacks(c):
+        uid = c.from_user.id
+        data = c.data
+        chat_id = c.message.chat.id if c.message else None
+        logger.info(f"[DEBUG CALLBACK] {datetime.now().isoformat()} | from={uid} | chat={chat_id} | data={data}")
+
+        # الإلغاء مسموح دائماً
+        if data != CALLBACK_HW_CANCEL and not rate_limits.is_allowed("callback", uid):
+            bot.answer_callback_query(c.id, text="⏳ انتظر قليلاً قبل المحاولة مرة أخرى")
             return
 
+        if data != CALLBACK_HW_CANCEL and chat_id is not None:
+            if not ensure_registration(chat_id, uid):
+                bot.answer_callback_query(c.id)
+                bot.send_message(chat_id, "يرجى إكمال التسجيل أولاً باستخدام /start.", reply_markup=main_menu_kb())
+                return
+
         
-        if data == CALLBACK_NOTIFICATION_DISABLE_ALL:
-            reply_chat_id = chat_id or c.from_user.id
-            try:
-                with db_connection() as conn:
-                    disable_all_notifications(conn, uid)
-                    text = "🔕 **إعدادات الإشعارات**\n\n✅ تم إيقاف جميع الإشعارات.\n\n"
-                    text += "يمكنك اختيار أنواع الإشعارات التي تريد استقبالها:\n\n"
-                    text += "• تذكيرات الواجبات: ❌ معطّلة\n"
-                    text += "• تذكيرات الأدمين: ❌ معطّلة\n"
-                    text += "• تذكيراتي المخصصة: ❌ معطّلة\n\n"
-                    text += "اضغط على الزر لتغيير الإعداد."
-                    kb = notification_settings_kb(False, False, False)
-                    try:
-                        bot.send_message(reply_chat_id, text, parse_mode='Markdown', reply_markup=kb)
-                    except Exception:
-                        text_plain = text.replace('**', '').replace('`', '')
-                        bot.send_message(reply_chat_id, text_plain, reply_markup=kb)
-            except Exception as e:
-                logger.exception("Failed to disable all notifications")
-                bot.send_message(reply_chat_id, f"حدث خطأ: {e}", reply_markup=main_menu_kb())
+        if data == CALLBACK_HW_CANCEL:
+            
+            cancel_operation(chat_id, c.message.message_id if c.message else None)
+            bot.send_message(chat_id, "تم إلغاء العملية.", reply_markup=main_menu_kb())
             bot.answer_callback_query(c.id)
             return
-
         
-        if data == CALLBACK_NOTIFICATION_ENABLE_ALL:
-            reply_chat_id = chat_id or c.from_user.id
+        
+        
+        
+        # مجموعة الـ callback (schedule_add / schedule_location / schedule_edit / alternating_config / faq ...)
+        route_group = _callback_router.group_of(data)
+        
+        if chat_id in pending_schedule_admin and route_group not in ("schedule_add", "schedule_location", "schedule_edit", "alternating_config"):
+            pm = pending_schedule_admin.get(chat_id)
+                
+            if pm and pm.get("action") not in ["add_location", "edit_location_url", "edit_class", "edit_alternating_config", "add_alternating_config"]:
+                logger.info(f"[SCHEDULE ADMIN] Found pending operation for chat {chat_id}, clearing it due to callback: {data}")
+                pending_schedule_admin.pop(chat_id, None)
+
+        if chat_id in pending_faq_admin and route_group != "faq":
+            pending_faq_admin.pop(chat_id, None)
+
+        try:
+            handled = _callback_router.route(c, uid, data, chat_id)
+        except Exception:
+            # الخطأ مسجّل في route؛ نوقف مؤشر التحميل ونبلغ المستخدم
             try:
-                with db_connection() as conn:
-                    enable_all_notifications(conn, uid)
-                    text = "🔕 **إعدادات الإشعارات**\n\n✅ تم استعادة جميع الإشعارات.\n\n"
-                    text += "يمكنك اختيار أنواع الإشعارات التي تريد استقبالها:\n\n"
-                    text += "• تذكيرات الواجبات: ✅ مفعّلة\n"
-                    text += "• تذكيرات الأدمين: ✅ مفعّلة\n"
-                    text += "• تذكيراتي المخصصة: ✅ مفعّلة\n\n"
-                    text += "اضغط على الزر لتغيير الإعداد."
-                    kb = notification_settings_kb(True, True, True)
-                    try:
-                        bot.send_message(reply_chat_id, text, parse_mode='Markdown', reply_markup=kb)
-                    except Exception:
-                        text_plain = text.replace('**', '').replace('`', '')
-                        bot.send_message(reply_chat_id, text_plain, reply_markup=kb)
-            except Exception as e:
-                logger.exception("Failed to enable all notifications")
-                bot.send_message(reply_chat_id, f"حدث خطأ: {e}", reply_markup=main_menu_kb())
-            bot.answer_callback_query(c.id)
+                bot.answer_callback_query(c.id, "حدث خطأ. حاول مرة أخرى.", show_alert=True)
+            except Exception:
+                pass
             return
-
-        bot.answer_callback_query(c.id)
+        if not handled:
+            bot.answer_callback_query(c.id)
 
     
     def hw_add_step_subject(msg, chat_id, admin_id):
@@ -2635,11 +810,9 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
         if is_main_menu_button(text):
             _prompt_registration_input(chat_id, "يرجى إدخال الاسم واللقب أولاً لإكمال التسجيل.", handle_name_input)
             return
-        with _pending_registration_lock:
-            pending = _pending_registration.get(chat_id)
+        pending = pending_registration.get(chat_id)
         if is_cancel_text(text) or not pending or not isinstance(pending, dict):
-            with _pending_registration_lock:
-                _pending_registration.pop(chat_id, None)
+            pending_registration.pop(chat_id, None)
             bot.send_message(chat_id, "تم إلغاء إدخال الاسم.", reply_markup=main_menu_kb())
             return
         if pending.get("step") != "name":
@@ -2655,14 +828,13 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
         display_name = text
         user_id = msg.from_user.id
 
-        with _pending_registration_lock:
-            _pending_registration[chat_id] = {
-                "step": "group",
-                "display_name": display_name,
-                "mode": pending.get("mode") or "register",
-                "previous_display_name": pending.get("previous_display_name"),
-                "previous_group_number": pending.get("previous_group_number"),
-            }
+        pending_registration[chat_id] = {
+            "step": "group",
+            "display_name": display_name,
+            "mode": pending.get("mode") or "register",
+            "previous_display_name": pending.get("previous_display_name"),
+            "previous_group_number": pending.get("previous_group_number"),
+        }
         msg_group = bot.send_message(
             chat_id,
             "✅ تم حفظ الاسم.\n\nالآن اختر مجموعتك من الخيارات المتاحة:",
@@ -2676,11 +848,9 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
         if is_main_menu_button(text):
             _prompt_registration_input(chat_id, "يرجى اختيار رقم المجموعة لإكمال التسجيل.", handle_group_input, include_groups=True)
             return
-        with _pending_registration_lock:
-            pending = _pending_registration.get(chat_id)
+        pending = pending_registration.get(chat_id)
         if is_cancel_text(text) or not pending or not isinstance(pending, dict):
-            with _pending_registration_lock:
-                _pending_registration.pop(chat_id, None)
+            pending_registration.pop(chat_id, None)
             bot.send_message(chat_id, "تم إلغاء إدخال المجموعة.", reply_markup=main_menu_kb())
             return
         if pending.get("step") != "group":
@@ -2713,9 +883,9 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
 
         with db_connection() as conn_local:
             update_user_display_name(conn_local, user_id, display_name, group_number=group_number)
+        invalidate_registration_cache(user_id)
 
-        with _pending_registration_lock:
-            _pending_registration.pop(chat_id, None)
+        pending_registration.pop(chat_id, None)
 
         bot.send_message(chat_id, f"شكرًا — تم حفظ بياناتك: {display_name} (المجموعة {group_number}).", reply_markup=main_menu_kb())
         logger.info(f"User {user_id} set display_name={display_name} group={group_number}")
@@ -2851,8 +1021,7 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
     def _manual_next_step_handler(msg, originating_chat_id):
         chat_id = originating_chat_id
         text = (msg.text or "").strip()
-        with _pending_lock:
-            pm = _pending_manual.get(chat_id)
+        pm = pending_manual.get(chat_id)
         if not pm:
             bot.send_message(chat_id, "لا توجد عملية يدوية معلقة.", reply_markup=main_menu_kb())
             return
@@ -2870,7 +1039,7 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
                 val = int(text)
                 pm["target_value"] = val
                 pm["step"] = PENDING_STEP_ENTER_CONTENT
-                _pending_manual[chat_id] = pm
+                pending_manual[chat_id] = pm
                 msg2 = bot.send_message(chat_id, "أرسل نص التذكير أو ملف (صورة، صوت، PDF، فيديو، إلخ) أو كليهما:", reply_markup=cancel_inline_kb())
                 bot.register_next_step_handler(msg2, _manual_next_step_handler, chat_id)
                 return
@@ -2937,7 +1106,7 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
                 
                 msg2 = bot.send_message(chat_id, f"✅ تم استلام {media_type}. هل تريد إضافة نص إضافي؟\nأرسل النص أو اكتب 'تم' أو 'إلغاء' للمتابعة بدون نص إضافي:", reply_markup=cancel_inline_kb())
                 bot.register_next_step_handler(msg2, _manual_content_finalize_handler, chat_id)
-                _pending_manual[chat_id] = pm
+                pending_manual[chat_id] = pm
                 return
             else:
                 
@@ -2946,12 +1115,12 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
                 pm["media_file_id"] = None
                 pm["caption"] = None
             
-            _pending_manual[chat_id] = pm
+            pending_manual[chat_id] = pm
             
             
             if mode == "schedule":
                 pm["step"] = PENDING_STEP_ENTER_DATETIME
-                _pending_manual[chat_id] = pm
+                pending_manual[chat_id] = pm
                 msg2 = bot.send_message(chat_id, "أدخل التاريخ والوقت للإرسال بصيغة YYYY-MM-DD HH:MM أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
                 bot.register_next_step_handler(msg2, _manual_next_step_handler, chat_id)
                 return
@@ -2977,7 +1146,7 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
             pm["text"] = text
             if mode == "schedule":
                 pm["step"] = PENDING_STEP_ENTER_DATETIME
-                _pending_manual[chat_id] = pm
+                pending_manual[chat_id] = pm
                 msg2 = bot.send_message(chat_id, "أدخل التاريخ والوقت للإرسال بصيغة YYYY-MM-DD HH:MM أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
                 bot.register_next_step_handler(msg2, _manual_next_step_handler, chat_id)
                 return
@@ -2992,7 +1161,7 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
         
         if step == PENDING_STEP_ENTER_DATETIME:
             try:
-                dt = parse_dt(text)
+                dt = from_epoch(to_epoch(parse_dt(text)))  # aware في APP_TIMEZONE
             except Exception:
                 msg2 = bot.send_message(chat_id, "صيغة غير صحيحة. أرسل التاريخ بصيغة: YYYY-MM-DD HH:MM أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
                 bot.register_next_step_handler(msg2, _manual_next_step_handler, chat_id)
@@ -3028,7 +1197,7 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
                 pm["target_value"] = chat_id_val
                 pm["thread_id"] = thread_id
                 pm["step"] = PENDING_STEP_ENTER_CONTENT
-                _pending_manual[chat_id] = pm
+                pending_manual[chat_id] = pm
                 msg2 = bot.send_message(chat_id, f"تم التقاط topic thread_id={thread_id} تلقائياً. الآن أرسل نص التذكير أو ملف:", reply_markup=cancel_inline_kb())
                 bot.register_next_step_handler(msg2, _manual_next_step_handler, chat_id)
                 return
@@ -3039,7 +1208,7 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
                 pm["target_value"] = chat_id_val
                 
                 pm["step"] = PENDING_STEP_ENTER_THREAD
-                _pending_manual[chat_id] = pm
+                pending_manual[chat_id] = pm
                 msg2 = bot.send_message(chat_id, "أدخل message_thread_id للـ topic (رقم) أو قم بالرد على رسالة داخل الموضوع ثم أرسل هنا:", reply_markup=cancel_inline_kb())
                 bot.register_next_step_handler(msg2, _manual_next_step_handler, chat_id)
                 return
@@ -3065,7 +1234,7 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
 
             pm["thread_id"] = thread_id
             pm["step"] = PENDING_STEP_ENTER_CONTENT
-            _pending_manual[chat_id] = pm
+            pending_manual[chat_id] = pm
             msg2 = bot.send_message(chat_id, f"تم حفظ thread_id={thread_id}. الآن أرسل نص التذكير أو ملف:", reply_markup=cancel_inline_kb())
             bot.register_next_step_handler(msg2, _manual_next_step_handler, chat_id)
             return
@@ -3075,8 +1244,7 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
         """معالج للنص الإضافي بعد استلام الملف."""
         chat_id = originating_chat_id
         text = (msg.text or "").strip()
-        with _pending_lock:
-            pm = _pending_manual.get(chat_id)
+        pm = pending_manual.get(chat_id)
         if not pm:
             bot.send_message(chat_id, "لا توجد عملية يدوية معلقة.", reply_markup=main_menu_kb())
             return
@@ -3099,12 +1267,12 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
             else:
                 pm["text"] = text
         
-        _pending_manual[chat_id] = pm
+        pending_manual[chat_id] = pm
         
         
         if mode == "schedule":
             pm["step"] = PENDING_STEP_ENTER_DATETIME
-            _pending_manual[chat_id] = pm
+            pending_manual[chat_id] = pm
             msg2 = bot.send_message(chat_id, "أدخل التاريخ والوقت للإرسال بصيغة YYYY-MM-DD HH:MM أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
             bot.register_next_step_handler(msg2, _manual_next_step_handler, chat_id)
         else:
@@ -3124,6 +1292,14 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
             cancel_pending_manual(chat_id)
 
     
+    def _submit_manual_now(job_key, recipient, text, media_type=None, media_file_id=None, caption=None, thread_id=None):
+        """Queue an immediate manual send to one user/chat in the outbox (survives a crash mid-send)."""
+        if media_type and media_file_id:
+            ops = media_ops(text, media_type, media_file_id, caption, message_thread_id=thread_id)
+        else:
+            ops = [message_op(text, **({"message_thread_id": thread_id} if thread_id else {}))] if text else []
+        return outbox_submit(job_key, [recipient], ops) if ops else 0
+
     def _do_manual_send(origin_chat_id, mode, text, target_type, target_value=None, when: Optional[datetime] = None, thread_id: Optional[int] = None, media_type: Optional[str] = None, media_file_id: Optional[str] = None, caption: Optional[str] = None):
         """
         mode: 'now' أو 'schedule'
@@ -3157,58 +1333,36 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
 
             
             if target_type == "all":
-                with db_connection() as conn_local:
-                    uids = get_all_registered_user_ids(conn_local)
-                failures = 0
-                skipped = 0
-                for uid in uids:
-                    try:
-                        if mode == "now":
-                            
-                            with db_connection() as conn_check:
-                                if not get_notification_setting(conn_check, uid, 'manual_reminders'):
-                                    logger.info("_do_manual_send: user_id=%s disabled manual_reminders, skipping", uid)
-                                    skipped += 1
-                                    continue
-                            if media_type and media_file_id:
-                                
-                                if text:
-                                    bot.send_message(uid, text)
-                                if media_type == "photo":
-                                    bot.send_photo(uid, media_file_id, caption=caption)
-                                elif media_type == "audio":
-                                    bot.send_audio(uid, media_file_id, caption=caption)
-                                elif media_type == "voice":
-                                    bot.send_voice(uid, media_file_id, caption=caption)
-                                elif media_type == "video":
-                                    bot.send_video(uid, media_file_id, caption=caption)
-                                elif media_type == "document":
-                                    bot.send_document(uid, media_file_id, caption=caption)
-                                elif media_type == "video_note":
-                                    bot.send_video_note(uid, media_file_id)
-                                elif media_type == "sticker":
-                                    bot.send_sticker(uid, media_file_id)
-                            else:
-                                
-                                if text:
-                                    bot.send_message(uid, text)
+                if mode == "now":
+                    # لا يُستهلك رصيد المحادثة إذا رفض الحد العام (والعكس)
+                    if not rate_limits.allow_all(("broadcast_global", RateLimits.GLOBAL),
+                                                 ("broadcast", origin_chat_id)):
+                        bot.send_message(origin_chat_id, "⏳ تم إرسال عدة تذكيرات إلى الجميع مؤخراً، انتظر دقيقة ثم أعد المحاولة.", reply_markup=main_menu_kb())
+                        return
+                    # إرسال فوري عبر outbox: يُحفظ أولاً ثم يُفرَّغ في الخلفية ويُستأنف بعد إعادة التشغيل
+                    with db_connection() as conn_local:
+                        flags = get_registered_users_notification_flags(conn_local, 'manual_reminders')
+                        eligible = [uid for uid, enabled in flags if enabled]
+                        skipped = len(flags) - len(eligible)
+                        if media_type and media_file_id:
+                            ops = media_ops(text, media_type, media_file_id, caption)
                         else:
-                            
-                            job_id = f"manual_all_{uid}_{int(datetime.now().timestamp())}"
-                            try:
-                                if media_type and media_file_id:
-                                    callable_ref = "handlers:_job_send_media_to_user"
-                                    sch_mgr.scheduler.add_job(callable_ref, 'date', args=[uid, text or "", media_type, media_file_id, caption], run_date=when, id=job_id)
-                                else:
-                                    callable_ref = "handlers:_job_send_to_user"
-                                    sch_mgr.scheduler.add_job(callable_ref, 'date', args=[uid, text or ""], run_date=when, id=job_id)
-                            except Exception:
-                                logger.exception("Failed to schedule manual reminder job for user")
-                    except Exception:
-                        logger.exception(f"Failed to send manual message to {uid}")
-                        failures += 1
-                skipped_msg = f" (تم تخطي {skipped} مستخدم بسبب إعدادات الإشعارات)" if skipped > 0 else ""
-                bot.send_message(origin_chat_id, f"تم معالجة التذكير اليدوي (إلى الجميع). فشل الإرسال لعدد: {failures}{skipped_msg}", reply_markup=main_menu_kb())
+                            ops = [message_op(text)] if text else []
+                        job_key = f"manual_all_{origin_chat_id}_{uuid.uuid4().hex}"
+                        queued = outbox_submit(job_key, eligible, ops, conn=conn_local) if ops else 0
+                    skipped_msg = f" (تم تخطي {skipped} مستخدم بسبب إعدادات الإشعارات)" if skipped > 0 else ""
+                    bot.send_message(origin_chat_id, f"تمت إضافة التذكير اليدوي (إلى الجميع) إلى طابور الإرسال لعدد: {queued}{skipped_msg}", reply_markup=main_menu_kb())
+                    return
+
+                # job واحد للبث بدلاً من job لكل مستخدم؛ المستلمون يُحددون وقت التنفيذ
+                job_id = f"manual_all_{int(datetime.now().timestamp())}_{uuid.uuid4().hex[:8]}"
+                try:
+                    sch_mgr.add_date_job("handlers:_job_broadcast_manual", when,
+                                         [job_id, text or "", media_type, media_file_id, caption], job_id)
+                    bot.send_message(origin_chat_id, f"تمت جدولة التذكير اليدوي (إلى الجميع) بتاريخ {when:%Y-%m-%d %H:%M}.", reply_markup=main_menu_kb())
+                except Exception:
+                    logger.exception("Failed to schedule manual broadcast job")
+                    bot.send_message(origin_chat_id, "فشل جدولة التذكير اليدوي (إلى الجميع). راجع اللوغ.", reply_markup=main_menu_kb())
                 return
 
             
@@ -3225,38 +1379,18 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
                                 logger.info("_do_manual_send: user_id=%s disabled manual_reminders, skipping", uid)
                                 bot.send_message(origin_chat_id, f"المستخدم (ID:{uid}) أوقف تذكيرات الأدمين. لن يتم إرسال الرسالة.", reply_markup=main_menu_kb())
                                 return
-                        if media_type and media_file_id:
-                            
-                            if text:
-                                bot.send_message(uid, text)
-                            if media_type == "photo":
-                                bot.send_photo(uid, media_file_id, caption=caption)
-                            elif media_type == "audio":
-                                bot.send_audio(uid, media_file_id, caption=caption)
-                            elif media_type == "voice":
-                                bot.send_voice(uid, media_file_id, caption=caption)
-                            elif media_type == "video":
-                                bot.send_video(uid, media_file_id, caption=caption)
-                            elif media_type == "document":
-                                bot.send_document(uid, media_file_id, caption=caption)
-                            elif media_type == "video_note":
-                                bot.send_video_note(uid, media_file_id)
-                            elif media_type == "sticker":
-                                bot.send_sticker(uid, media_file_id)
-                        else:
-                            
-                            if text:
-                                bot.send_message(uid, text)
+                        _submit_manual_now(f"manual_user_{uid}_{uuid.uuid4().hex}", uid, text,
+                                           media_type, media_file_id, caption)
                     else:
                         
                         job_id = f"manual_user_{uid}_{int(datetime.now().timestamp())}"
                         try:
                             if media_type and media_file_id:
                                 callable_ref = "handlers:_job_send_media_to_user"
-                                sch_mgr.scheduler.add_job(callable_ref, 'date', args=[uid, text or "", media_type, media_file_id, caption], run_date=when, id=job_id)
+                                sch_mgr.add_date_job(callable_ref, when, [uid, text or "", media_type, media_file_id, caption, job_id], job_id)
                             else:
                                 callable_ref = "handlers:_job_send_to_user"
-                                sch_mgr.scheduler.add_job(callable_ref, 'date', args=[uid, text or ""], run_date=when, id=job_id)
+                                sch_mgr.add_date_job(callable_ref, when, [uid, text or "", job_id], job_id)
                         except Exception:
                             logger.exception("Failed to schedule manual reminder job for user")
                     bot.send_message(origin_chat_id, f"تمت معالجة التذكير لِـ user_id={uid}.", reply_markup=main_menu_kb())
@@ -3284,28 +1418,8 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
                 try:
                     if target_type == "chat":
                         if mode == "now":
-                            if media_type and media_file_id:
-                                
-                                if text:
-                                    bot.send_message(real_chat_id, text)
-                                if media_type == "photo":
-                                    bot.send_photo(real_chat_id, media_file_id, caption=caption)
-                                elif media_type == "audio":
-                                    bot.send_audio(real_chat_id, media_file_id, caption=caption)
-                                elif media_type == "voice":
-                                    bot.send_voice(real_chat_id, media_file_id, caption=caption)
-                                elif media_type == "video":
-                                    bot.send_video(real_chat_id, media_file_id, caption=caption)
-                                elif media_type == "document":
-                                    bot.send_document(real_chat_id, media_file_id, caption=caption)
-                                elif media_type == "video_note":
-                                    bot.send_video_note(real_chat_id, media_file_id)
-                                elif media_type == "sticker":
-                                    bot.send_sticker(real_chat_id, media_file_id)
-                            else:
-                                
-                                if text:
-                                    bot.send_message(real_chat_id, text)
+                            _submit_manual_now(f"manual_chat_{real_chat_id}_{uuid.uuid4().hex}", real_chat_id, text,
+                                               media_type, media_file_id, caption)
                             bot.send_message(origin_chat_id, f"تم الإرسال إلى المحادثة {real_chat_id}.", reply_markup=main_menu_kb())
                         else:
                             
@@ -3313,11 +1427,11 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
                             try:
                                 if media_type and media_file_id:
                                     callable_ref = "handlers:_job_send_media_to_chat"
-                                    sch_mgr.scheduler.add_job(callable_ref, 'date', args=[real_chat_id, text or "", media_type, media_file_id, caption, None], run_date=when, id=job_id)
+                                    sch_mgr.add_date_job(callable_ref, when, [real_chat_id, text or "", media_type, media_file_id, caption, None], job_id)
                                 else:
                                     callable_ref = "handlers:_job_send_to_chat"
-                                    sch_mgr.scheduler.add_job(callable_ref, 'date', args=[real_chat_id, text or "", None], run_date=when, id=job_id)
-                                bot.send_message(origin_chat_id, f"تم جدولة التذكير للمحادثة {real_chat_id} بتاريخ {when}.", reply_markup=main_menu_kb())
+                                    sch_mgr.add_date_job(callable_ref, when, [real_chat_id, text or "", None], job_id)
+                                bot.send_message(origin_chat_id, f"تم جدولة التذكير للمحادثة {real_chat_id} بتاريخ {when:%Y-%m-%d %H:%M}.", reply_markup=main_menu_kb())
                             except Exception:
                                 logger.exception("Failed to schedule manual reminder job for chat")
                                 bot.send_message(origin_chat_id, "فشل جدولة التذكير للمحادثة. راجع اللوغ.", reply_markup=main_menu_kb())
@@ -3328,28 +1442,8 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
                             bot.send_message(origin_chat_id, "لم يتم تحديد thread_id للموضوع. يجب أن تحدد thread_id أو ترد على رسالة داخل الـ topic.", reply_markup=main_menu_kb())
                             return
                         if mode == "now":
-                            if media_type and media_file_id:
-                                
-                                if text:
-                                    bot.send_message(real_chat_id, text, message_thread_id=real_thread)
-                                if media_type == "photo":
-                                    bot.send_photo(real_chat_id, media_file_id, caption=caption, message_thread_id=real_thread)
-                                elif media_type == "audio":
-                                    bot.send_audio(real_chat_id, media_file_id, caption=caption, message_thread_id=real_thread)
-                                elif media_type == "voice":
-                                    bot.send_voice(real_chat_id, media_file_id, caption=caption, message_thread_id=real_thread)
-                                elif media_type == "video":
-                                    bot.send_video(real_chat_id, media_file_id, caption=caption, message_thread_id=real_thread)
-                                elif media_type == "document":
-                                    bot.send_document(real_chat_id, media_file_id, caption=caption, message_thread_id=real_thread)
-                                elif media_type == "video_note":
-                                    bot.send_video_note(real_chat_id, media_file_id, message_thread_id=real_thread)
-                                elif media_type == "sticker":
-                                    bot.send_sticker(real_chat_id, media_file_id, message_thread_id=real_thread)
-                            else:
-                                
-                                if text:
-                                    bot.send_message(real_chat_id, text, message_thread_id=real_thread)
+                            _submit_manual_now(f"manual_chattopic_{real_chat_id}_{real_thread}_{uuid.uuid4().hex}",
+                                               real_chat_id, text, media_type, media_file_id, caption, real_thread)
                             bot.send_message(origin_chat_id, f"تم الإرسال داخل الموضوع (thread={real_thread}) بالمحادثة {real_chat_id}.", reply_markup=main_menu_kb())
                         else:
                             
@@ -3357,11 +1451,11 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
                             try:
                                 if media_type and media_file_id:
                                     callable_ref = "handlers:_job_send_media_to_chat"
-                                    sch_mgr.scheduler.add_job(callable_ref, 'date', args=[real_chat_id, text or "", media_type, media_file_id, caption, real_thread], run_date=when, id=job_id)
+                                    sch_mgr.add_date_job(callable_ref, when, [real_chat_id, text or "", media_type, media_file_id, caption, real_thread], job_id)
                                 else:
                                     callable_ref = "handlers:_job_send_to_chat"
-                                    sch_mgr.scheduler.add_job(callable_ref, 'date', args=[real_chat_id, text or "", real_thread], run_date=when, id=job_id)
-                                bot.send_message(origin_chat_id, f"تم جدولة التذكير داخل الموضوع (thread={real_thread}) بتاريخ {when}.", reply_markup=main_menu_kb())
+                                    sch_mgr.add_date_job(callable_ref, when, [real_chat_id, text or "", real_thread], job_id)
+                                bot.send_message(origin_chat_id, f"تم جدولة التذكير داخل الموضوع (thread={real_thread}) بتاريخ {when:%Y-%m-%d %H:%M}.", reply_markup=main_menu_kb())
                             except Exception:
                                 logger.exception("Failed to schedule manual reminder job for chat topic")
                                 bot.send_message(origin_chat_id, "فشل جدولة التذكير داخل الموضوع. راجع اللوغ.", reply_markup=main_menu_kb())
@@ -3379,8 +1473,7 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
     def _custom_reminder_step_text(msg, chat_id, user_id):
         text = (msg.text or "").strip()
         if is_cancel_text(text):
-            with _pending_lock:
-                _pending_manual.pop(chat_id, None)
+            pending_manual.pop(chat_id, None)
             bot.send_message(chat_id, "تم إلغاء إضافة التذكير المخصص.", reply_markup=main_menu_kb())
             return
         
@@ -3390,8 +1483,7 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
             bot.register_next_step_handler(m, _custom_reminder_step_text, chat_id, user_id)
             return
         
-        with _pending_lock:
-            _pending_manual[chat_id] = {"step": "custom_datetime", "type": "custom_reminder", "text": text}
+        pending_manual[chat_id] = {"step": "custom_datetime", "type": "custom_reminder", "text": text}
         
         m = bot.send_message(chat_id, "أرسل التاريخ والوقت للتذكير بصيغة YYYY-MM-DD HH:MM (أو 'إلغاء'):", reply_markup=cancel_inline_kb())
         bot.register_next_step_handler(m, _custom_reminder_step_datetime, chat_id, user_id, text)
@@ -3399,8 +1491,7 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
     def _custom_reminder_step_datetime(msg, chat_id, user_id, reminder_text):
         text = (msg.text or "").strip()
         if is_cancel_text(text):
-            with _pending_lock:
-                _pending_manual.pop(chat_id, None)
+            pending_manual.pop(chat_id, None)
             bot.send_message(chat_id, "تم إلغاء إضافة التذكير المخصص.", reply_markup=main_menu_kb())
             return
         
@@ -3414,20 +1505,20 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
         with db_connection() as conn_local:
             reminder_id = insert_custom_reminder(conn_local, user_id, reminder_text, dt_str)
         
-        with _pending_lock:
-            _pending_manual.pop(chat_id, None)
+        pending_manual.pop(chat_id, None)
         
         bot.send_message(chat_id, f"✅ تم إضافة التذكير المخصص (ID: {reminder_id}). سيتم إرسال التذكير في الوقت المحدد.", reply_markup=main_menu_kb())
         
         
         try:
-            from datetime import datetime
-            reminder_dt = datetime.strptime(dt_str, "%Y-%m-%d %H:%M")
-            if reminder_dt > datetime.now():
+            # نفس تمثيل bootstrap_all: epoch في APP_TIMEZONE بدل datetime بدون منطقة بتوقيت النظام
+            reminder_ts = to_epoch(dt_str)
+            if reminder_ts is not None and reminder_ts > time.time():
+                reminder_dt = from_epoch(reminder_ts)
                 job_id = f"custom_reminder-{reminder_id}"
                 
                 callable_ref = "handlers:_job_send_custom_reminder"
-                sch_mgr.scheduler.add_job(callable_ref, 'date', run_date=reminder_dt, args=[reminder_id, user_id], id=job_id, replace_existing=True)
+                sch_mgr.add_date_job(callable_ref, reminder_dt, [reminder_id, user_id], job_id)
                 logger.info("Scheduled custom reminder %s at %s", reminder_id, reminder_dt)
         except Exception:
             logger.exception("Failed to schedule custom reminder")
@@ -3435,8 +1526,7 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
     def faq_admin_add_step_question(msg, chat_id, user_id):
         text = (msg.text or "").strip()
         if is_cancel_text(text):
-            with _pending_faq_admin_lock:
-                _pending_faq_admin.pop(chat_id, None)
+            pending_faq_admin.pop(chat_id, None)
             bot.send_message(chat_id, "تم إلغاء إضافة السؤال.", reply_markup=main_menu_kb())
             return
         is_valid, error = validate_text_input(text, MAX_INPUT_LENGTH)
@@ -3444,16 +1534,14 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
             m = bot.send_message(chat_id, f"خطأ: {error}. أرسل السؤال مرة أخرى (أو 'إلغاء'):", reply_markup=cancel_inline_kb())
             bot.register_next_step_handler(m, faq_admin_add_step_question, chat_id, user_id)
             return
-        with _pending_faq_admin_lock:
-            _pending_faq_admin[chat_id] = {"action": "add", "step": "answer", "question": text}
+        pending_faq_admin[chat_id] = {"action": "add", "step": "answer", "question": text}
         m = bot.send_message(chat_id, "أرسل الإجابة (أو اكتب 'إلغاء'):", reply_markup=cancel_inline_kb())
         bot.register_next_step_handler(m, faq_admin_add_step_answer, chat_id, user_id)
 
     def faq_admin_add_step_answer(msg, chat_id, user_id):
         text = (msg.text or "").strip()
         if is_cancel_text(text):
-            with _pending_faq_admin_lock:
-                _pending_faq_admin.pop(chat_id, None)
+            pending_faq_admin.pop(chat_id, None)
             bot.send_message(chat_id, "تم إلغاء إضافة السؤال.", reply_markup=main_menu_kb())
             return
         is_valid, error = validate_text_input(text, MAX_DESCRIPTION_LENGTH)
@@ -3461,26 +1549,23 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
             m = bot.send_message(chat_id, f"خطأ: {error}. أرسل الإجابة مرة أخرى (أو 'إلغاء'):", reply_markup=cancel_inline_kb())
             bot.register_next_step_handler(m, faq_admin_add_step_answer, chat_id, user_id)
             return
-        with _pending_faq_admin_lock:
-            pending = _pending_faq_admin.get(chat_id)
-            if not pending or pending.get("action") != "add":
-                pending = None
-            else:
-                question = pending.get("question")
+        pending = pending_faq_admin.get(chat_id)
+        if not pending or pending.get("action") != "add":
+            pending = None
+        else:
+            question = pending.get("question")
         if not pending:
             bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
             return
         with db_connection() as conn_local:
             faq_id = insert_faq_entry(conn_local, question, text)
-        with _pending_faq_admin_lock:
-            _pending_faq_admin.pop(chat_id, None)
+        pending_faq_admin.pop(chat_id, None)
         bot.send_message(chat_id, f"✅ تم إضافة السؤال (ID:{faq_id}).", reply_markup=faq_admin_main_kb())
 
     def faq_admin_edit_step_question(msg, chat_id, user_id):
         text = (msg.text or "").strip()
         if is_cancel_text(text):
-            with _pending_faq_admin_lock:
-                _pending_faq_admin.pop(chat_id, None)
+            pending_faq_admin.pop(chat_id, None)
             bot.send_message(chat_id, "تم إلغاء تعديل السؤال.", reply_markup=main_menu_kb())
             return
         is_valid, error = validate_text_input(text, MAX_INPUT_LENGTH)
@@ -3488,21 +1573,20 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
             m = bot.send_message(chat_id, f"خطأ: {error}. أرسل السؤال مرة أخرى (أو 'إلغاء'):", reply_markup=cancel_inline_kb())
             bot.register_next_step_handler(m, faq_admin_edit_step_question, chat_id, user_id)
             return
-        with _pending_faq_admin_lock:
-            pending = _pending_faq_admin.get(chat_id)
-            if not pending or pending.get("action") != "edit":
-                bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
-                return
-            pending["question"] = text
-            pending["step"] = "answer"
+        pending = pending_faq_admin.get(chat_id)
+        if not pending or pending.get("action") != "edit":
+            bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
+            return
+        pending["question"] = text
+        pending["step"] = "answer"
+        pending_faq_admin[chat_id] = pending
         m = bot.send_message(chat_id, "أرسل الإجابة الجديدة (أو اكتب 'إلغاء'):", reply_markup=cancel_inline_kb())
         bot.register_next_step_handler(m, faq_admin_edit_step_answer, chat_id, user_id)
 
     def faq_admin_edit_step_answer(msg, chat_id, user_id):
         text = (msg.text or "").strip()
         if is_cancel_text(text):
-            with _pending_faq_admin_lock:
-                _pending_faq_admin.pop(chat_id, None)
+            pending_faq_admin.pop(chat_id, None)
             bot.send_message(chat_id, "تم إلغاء تعديل السؤال.", reply_markup=main_menu_kb())
             return
         is_valid, error = validate_text_input(text, MAX_DESCRIPTION_LENGTH)
@@ -3510,20 +1594,18 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
             m = bot.send_message(chat_id, f"خطأ: {error}. أرسل الإجابة مرة أخرى (أو 'إلغاء'):", reply_markup=cancel_inline_kb())
             bot.register_next_step_handler(m, faq_admin_edit_step_answer, chat_id, user_id)
             return
-        with _pending_faq_admin_lock:
-            pending = _pending_faq_admin.get(chat_id)
-            if not pending or pending.get("action") != "edit":
-                pending = None
-            else:
-                faq_id = pending.get("faq_id")
-                question = pending.get("question")
+        pending = pending_faq_admin.get(chat_id)
+        if not pending or pending.get("action") != "edit":
+            pending = None
+        else:
+            faq_id = pending.get("faq_id")
+            question = pending.get("question")
         if not pending:
             bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
             return
         with db_connection() as conn_local:
             updated = update_faq_entry(conn_local, faq_id, question, text)
-        with _pending_faq_admin_lock:
-            _pending_faq_admin.pop(chat_id, None)
+        pending_faq_admin.pop(chat_id, None)
         if updated:
             bot.send_message(chat_id, f"✅ تم تحديث السؤال (ID:{faq_id}).", reply_markup=faq_admin_main_kb())
         else:
@@ -3532,8 +1614,7 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
     def faq_admin_edit_step_answer_only(msg, chat_id, user_id):
         text = (msg.text or "").strip()
         if is_cancel_text(text):
-            with _pending_faq_admin_lock:
-                _pending_faq_admin.pop(chat_id, None)
+            pending_faq_admin.pop(chat_id, None)
             bot.send_message(chat_id, "تم إلغاء تعديل الإجابة.", reply_markup=main_menu_kb())
             return
         is_valid, error = validate_text_input(text, MAX_DESCRIPTION_LENGTH)
@@ -3541,20 +1622,18 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
             m = bot.send_message(chat_id, f"خطأ: {error}. أرسل الإجابة مرة أخرى (أو 'إلغاء'):", reply_markup=cancel_inline_kb())
             bot.register_next_step_handler(m, faq_admin_edit_step_answer_only, chat_id, user_id)
             return
-        with _pending_faq_admin_lock:
-            pending = _pending_faq_admin.get(chat_id)
-            if not pending or pending.get("action") != "edit_answer":
-                pending = None
-            else:
-                faq_id = pending.get("faq_id")
-                question = pending.get("current_question")
+        pending = pending_faq_admin.get(chat_id)
+        if not pending or pending.get("action") != "edit_answer":
+            pending = None
+        else:
+            faq_id = pending.get("faq_id")
+            question = pending.get("current_question")
         if not pending:
             bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
             return
         with db_connection() as conn_local:
             updated = update_faq_entry(conn_local, faq_id, question, text)
-        with _pending_faq_admin_lock:
-            _pending_faq_admin.pop(chat_id, None)
+        pending_faq_admin.pop(chat_id, None)
         if updated:
             bot.send_message(chat_id, f"✅ تم تحديث الإجابة (ID:{faq_id}).", reply_markup=faq_admin_main_kb())
         else:
@@ -3564,11 +1643,10 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
     def schedule_admin_add_step_time_start(msg, chat_id):
         """Step 1: Get time start."""
         
-        with _pending_schedule_admin_lock:
-            pm = _pending_schedule_admin.get(chat_id)
-            if not pm:
+        pm = pending_schedule_admin.get(chat_id)
+        if not pm:
                 
-                return
+            return
         
         
         if not hasattr(msg, 'text') or not msg.text:
@@ -3577,8 +1655,7 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
         
         text = msg.text.strip()
         if is_cancel_text(text):
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin.pop(chat_id, None)
+            pending_schedule_admin.pop(chat_id, None)
             bot.send_message(chat_id, "تم إلغاء إضافة الحصة.", reply_markup=main_menu_kb())
             return
         
@@ -3586,20 +1663,19 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
         import re
         if not re.match(r'^\d{1,2}:\d{2}$', text):
             
-            with _pending_schedule_admin_lock:
-                if chat_id not in _pending_schedule_admin:
-                    return
+            if chat_id not in pending_schedule_admin:
+                return
             m = bot.send_message(chat_id, "صيغة الوقت غير صحيحة. استخدم HH:MM (مثال: 08:00). أرسل مرة أخرى أو 'إلغاء':", reply_markup=cancel_inline_kb())
             bot.register_next_step_handler(m, schedule_admin_add_step_time_start, chat_id)
             return
         
-        with _pending_schedule_admin_lock:
-            pm = _pending_schedule_admin.get(chat_id)
-            if not pm:
-                bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
-                return
-            pm["time_start"] = text
-            pm["step"] = "time_end"
+        pm = pending_schedule_admin.get(chat_id)
+        if not pm:
+            bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
+            return
+        pm["time_start"] = text
+        pm["step"] = "time_end"
+        pending_schedule_admin[chat_id] = pm
         
         m = bot.send_message(chat_id, "أرسل وقت الانتهاء (مثال: 09:30) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
         bot.register_next_step_handler(m, schedule_admin_add_step_time_end, chat_id)
@@ -3607,10 +1683,9 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
     def schedule_admin_add_step_time_end(msg, chat_id):
         """Step 2: Get time end."""
         
-        with _pending_schedule_admin_lock:
-            pm = _pending_schedule_admin.get(chat_id)
-            if not pm:
-                return
+        pm = pending_schedule_admin.get(chat_id)
+        if not pm:
+            return
         
         
         if not hasattr(msg, 'text') or not msg.text:
@@ -3618,27 +1693,25 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
         
         text = msg.text.strip()
         if is_cancel_text(text):
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin.pop(chat_id, None)
+            pending_schedule_admin.pop(chat_id, None)
             bot.send_message(chat_id, "تم إلغاء إضافة الحصة.", reply_markup=main_menu_kb())
             return
         
         import re
         if not re.match(r'^\d{1,2}:\d{2}$', text):
-            with _pending_schedule_admin_lock:
-                if chat_id not in _pending_schedule_admin:
-                    return
+            if chat_id not in pending_schedule_admin:
+                return
             m = bot.send_message(chat_id, "صيغة الوقت غير صحيحة. استخدم HH:MM (مثال: 09:30). أرسل مرة أخرى أو 'إلغاء':", reply_markup=cancel_inline_kb())
             bot.register_next_step_handler(m, schedule_admin_add_step_time_end, chat_id)
             return
         
-        with _pending_schedule_admin_lock:
-            pm = _pending_schedule_admin.get(chat_id)
-            if not pm:
-                bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
-                return
-            pm["time_end"] = text
-            pm["step"] = "course"
+        pm = pending_schedule_admin.get(chat_id)
+        if not pm:
+            bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
+            return
+        pm["time_end"] = text
+        pm["step"] = "course"
+        pending_schedule_admin[chat_id] = pm
         
         m = bot.send_message(chat_id, "أرسل اسم المادة (مثال: Analysis1) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
         bot.register_next_step_handler(m, schedule_admin_add_step_course, chat_id)
@@ -3646,10 +1719,9 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
     def schedule_admin_add_step_course(msg, chat_id):
         """Step 3: Get course name."""
         
-        with _pending_schedule_admin_lock:
-            pm = _pending_schedule_admin.get(chat_id)
-            if not pm:
-                return
+        pm = pending_schedule_admin.get(chat_id)
+        if not pm:
+            return
         
         
         if not hasattr(msg, 'text') or not msg.text:
@@ -3657,26 +1729,24 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
         
         text = msg.text.strip()
         if is_cancel_text(text):
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin.pop(chat_id, None)
+            pending_schedule_admin.pop(chat_id, None)
             bot.send_message(chat_id, "تم إلغاء إضافة الحصة.", reply_markup=main_menu_kb())
             return
         
         if not text:
-            with _pending_schedule_admin_lock:
-                if chat_id not in _pending_schedule_admin:
-                    return
+            if chat_id not in pending_schedule_admin:
+                return
             m = bot.send_message(chat_id, "اسم المادة مطلوب. أرسل اسم المادة أو 'إلغاء':", reply_markup=cancel_inline_kb())
             bot.register_next_step_handler(m, schedule_admin_add_step_course, chat_id)
             return
         
-        with _pending_schedule_admin_lock:
-            pm = _pending_schedule_admin.get(chat_id)
-            if not pm:
-                bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
-                return
-            pm["course"] = text
-            pm["step"] = "location"
+        pm = pending_schedule_admin.get(chat_id)
+        if not pm:
+            bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
+            return
+        pm["course"] = text
+        pm["step"] = "location"
+        pending_schedule_admin[chat_id] = pm
         
         m = bot.send_message(chat_id, "أرسل المكان (مثال: Amphi H أو Room C206) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
         bot.register_next_step_handler(m, schedule_admin_add_step_location, chat_id)
@@ -3684,10 +1754,9 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
     def schedule_admin_add_step_location(msg, chat_id):
         """Step 4: Get location."""
         
-        with _pending_schedule_admin_lock:
-            pm = _pending_schedule_admin.get(chat_id)
-            if not pm:
-                return
+        pm = pending_schedule_admin.get(chat_id)
+        if not pm:
+            return
         
         
         if not hasattr(msg, 'text') or not msg.text:
@@ -3695,26 +1764,24 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
         
         text = msg.text.strip()
         if is_cancel_text(text):
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin.pop(chat_id, None)
+            pending_schedule_admin.pop(chat_id, None)
             bot.send_message(chat_id, "تم إلغاء إضافة الحصة.", reply_markup=main_menu_kb())
             return
         
         if not text:
-            with _pending_schedule_admin_lock:
-                if chat_id not in _pending_schedule_admin:
-                    return
+            if chat_id not in pending_schedule_admin:
+                return
             m = bot.send_message(chat_id, "المكان مطلوب. أرسل المكان أو 'إلغاء':", reply_markup=cancel_inline_kb())
             bot.register_next_step_handler(m, schedule_admin_add_step_location, chat_id)
             return
         
-        with _pending_schedule_admin_lock:
-            pm = _pending_schedule_admin.get(chat_id)
-            if not pm:
-                bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
-                return
-            pm["location"] = text
-            pm["step"] = "class_type"
+        pm = pending_schedule_admin.get(chat_id)
+        if not pm:
+            bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
+            return
+        pm["location"] = text
+        pm["step"] = "class_type"
+        pending_schedule_admin[chat_id] = pm
         
         kb = types.InlineKeyboardMarkup()
         kb.add(types.InlineKeyboardButton("Course", callback_data=f"schedule_type:Course"))
@@ -3728,10 +1795,9 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
     def schedule_admin_add_step_alternating(msg, chat_id):
         """Step 6: Ask if alternating."""
         
-        with _pending_schedule_admin_lock:
-            pm = _pending_schedule_admin.get(chat_id)
-            if not pm:
-                return
+        pm = pending_schedule_admin.get(chat_id)
+        if not pm:
+            return
         
         
         if not hasattr(msg, 'text') or not msg.text:
@@ -3739,34 +1805,33 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
         
         text = msg.text.strip().lower()
         if is_cancel_text(text):
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin.pop(chat_id, None)
+            pending_schedule_admin.pop(chat_id, None)
             bot.send_message(chat_id, "تم إلغاء إضافة الحصة.", reply_markup=main_menu_kb())
             return
         
         is_alternating = text in ["نعم", "yes", "y", "دورية"]
         
-        with _pending_schedule_admin_lock:
-            pm = _pending_schedule_admin.get(chat_id)
-            if not pm:
-                bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
-                return
-            pm["is_alternating"] = is_alternating
-            if is_alternating:
-                pm["step"] = "alternating_key"
-                m = bot.send_message(chat_id, "أرسل مفتاح الحصة الدورية (مثال: algorithm1 أو statistics1) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
-                bot.register_next_step_handler(m, schedule_admin_add_step_alternating_key, chat_id)
-            else:
+        pm = pending_schedule_admin.get(chat_id)
+        if not pm:
+            bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
+            return
+        pm["is_alternating"] = is_alternating
+        pending_schedule_admin[chat_id] = pm
+        if is_alternating:
+            pm["step"] = "alternating_key"
+            pending_schedule_admin[chat_id] = pm
+            m = bot.send_message(chat_id, "أرسل مفتاح الحصة الدورية (مثال: algorithm1 أو statistics1) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
+            bot.register_next_step_handler(m, schedule_admin_add_step_alternating_key, chat_id)
+        else:
                 
-                schedule_admin_finalize_add(chat_id)
+            schedule_admin_finalize_add(chat_id)
 
     def schedule_admin_add_step_alternating_key(msg, chat_id):
         """Step 7: Get alternating key if alternating."""
         
-        with _pending_schedule_admin_lock:
-            pm = _pending_schedule_admin.get(chat_id)
-            if not pm:
-                return
+        pm = pending_schedule_admin.get(chat_id)
+        if not pm:
+            return
         
         
         if not hasattr(msg, 'text') or not msg.text:
@@ -3774,58 +1839,55 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
         
         text = msg.text.strip()
         if is_cancel_text(text):
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin.pop(chat_id, None)
+            pending_schedule_admin.pop(chat_id, None)
             bot.send_message(chat_id, "تم إلغاء إضافة الحصة.", reply_markup=main_menu_kb())
             return
         
-        with _pending_schedule_admin_lock:
-            pm = _pending_schedule_admin.get(chat_id)
-            if not pm:
-                bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
-                return
-            pm["alternating_key"] = text
-            schedule_admin_finalize_add(chat_id)
+        pm = pending_schedule_admin.get(chat_id)
+        if not pm:
+            bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
+            return
+        pm["alternating_key"] = text
+        pending_schedule_admin[chat_id] = pm
+        schedule_admin_finalize_add(chat_id)
 
     def schedule_admin_finalize_add(chat_id):
         """Finalize adding schedule class."""
-        with _pending_schedule_admin_lock:
-            pm = _pending_schedule_admin.get(chat_id)
-            if not pm:
-                bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
-                return
+        pm = pending_schedule_admin.get(chat_id)
+        if not pm:
+            bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
+            return
             
-            try:
-                from db_schedule import insert_schedule_class
-                with db_connection() as conn:
-                    class_id = insert_schedule_class(
-                        conn,
-                        group_number=pm["group_number"],
-                        day_name=pm["day"],
-                        time_start=pm["time_start"],
-                        time_end=pm["time_end"],
-                        course=pm["course"],
-                        location=pm["location"],
-                        class_type=pm.get("class_type", "Course"),
-                        is_alternating=pm.get("is_alternating", False),
-                        alternating_key=pm.get("alternating_key"),
-                        display_order=pm.get("display_order", 0)
-                    )
-                    bot.send_message(chat_id, f"✅ تم إضافة الحصة (ID: {class_id}).", reply_markup=main_menu_kb())
-            except Exception as e:
-                logger.exception("Failed to add schedule class")
-                bot.send_message(chat_id, f"حدث خطأ في إضافة الحصة: {e}", reply_markup=main_menu_kb())
-            finally:
-                _pending_schedule_admin.pop(chat_id, None)
+        try:
+            from db_schedule import insert_schedule_class
+            with db_connection() as conn:
+                class_id = insert_schedule_class(
+                    conn,
+                    group_number=pm["group_number"],
+                    day_name=pm["day"],
+                    time_start=pm["time_start"],
+                    time_end=pm["time_end"],
+                    course=pm["course"],
+                    location=pm["location"],
+                    class_type=pm.get("class_type", "Course"),
+                    is_alternating=pm.get("is_alternating", False),
+                    alternating_key=pm.get("alternating_key"),
+                    display_order=pm.get("display_order", 0)
+                )
+                bot.send_message(chat_id, f"✅ تم إضافة الحصة (ID: {class_id}).", reply_markup=main_menu_kb())
+        except Exception as e:
+            logger.exception("Failed to add schedule class")
+            bot.send_message(chat_id, f"حدث خطأ في إضافة الحصة: {e}", reply_markup=main_menu_kb())
+        finally:
+            pending_schedule_admin.pop(chat_id, None)
 
     
     def schedule_admin_location_step_name(msg, chat_id):
         """Step 1: Get location name."""
         
-        with _pending_schedule_admin_lock:
-            pm = _pending_schedule_admin.get(chat_id)
-            if not pm or pm.get("action") != "add_location":
-                return
+        pm = pending_schedule_admin.get(chat_id)
+        if not pm or pm.get("action") != "add_location":
+            return
         
         
         if not hasattr(msg, 'text') or not msg.text:
@@ -3833,26 +1895,24 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
         
         text = msg.text.strip()
         if is_cancel_text(text):
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin.pop(chat_id, None)
+            pending_schedule_admin.pop(chat_id, None)
             bot.send_message(chat_id, "تم إلغاء إضافة الموقع.", reply_markup=main_menu_kb())
             return
         
         if not text:
-            with _pending_schedule_admin_lock:
-                if chat_id not in _pending_schedule_admin:
-                    return
+            if chat_id not in pending_schedule_admin:
+                return
             m = bot.send_message(chat_id, "اسم الموقع مطلوب. أرسل اسم الموقع أو 'إلغاء':", reply_markup=cancel_inline_kb())
             bot.register_next_step_handler(m, schedule_admin_location_step_name, chat_id)
             return
         
-        with _pending_schedule_admin_lock:
-            pm = _pending_schedule_admin.get(chat_id)
-            if not pm:
-                bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
-                return
-            pm["location_name"] = text
-            pm["step"] = "maps_url"
+        pm = pending_schedule_admin.get(chat_id)
+        if not pm:
+            bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
+            return
+        pm["location_name"] = text
+        pm["step"] = "maps_url"
+        pending_schedule_admin[chat_id] = pm
         
         m = bot.send_message(chat_id, f"أرسل رابط Google Maps للموقع '{text}' أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
         bot.register_next_step_handler(m, schedule_admin_location_step_url, chat_id, text)
@@ -3860,14 +1920,13 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
     def schedule_admin_location_step_url(msg, chat_id, location_name=None):
         """Step 2: Get maps URL."""
         
-        with _pending_schedule_admin_lock:
-            pm = _pending_schedule_admin.get(chat_id)
-            if not pm:
-                return
-            action = pm.get("action")
+        pm = pending_schedule_admin.get(chat_id)
+        if not pm:
+            return
+        action = pm.get("action")
             
-            if location_name is None:
-                location_name = pm.get("location_name")
+        if location_name is None:
+            location_name = pm.get("location_name")
         
         
         if not hasattr(msg, 'text') or not msg.text:
@@ -3875,22 +1934,19 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
         
         text = msg.text.strip()
         if is_cancel_text(text):
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin.pop(chat_id, None)
+            pending_schedule_admin.pop(chat_id, None)
             bot.send_message(chat_id, "تم إلغاء العملية.", reply_markup=main_menu_kb())
             return
         
         if not location_name:
             bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin.pop(chat_id, None)
+            pending_schedule_admin.pop(chat_id, None)
             return
         
         
         if not text.startswith(("http://", "https://")):
-            with _pending_schedule_admin_lock:
-                if chat_id not in _pending_schedule_admin:
-                    return
+            if chat_id not in pending_schedule_admin:
+                return
             m = bot.send_message(chat_id, "الرابط يجب أن يبدأ بـ http:// أو https://. أرسل الرابط مرة أخرى أو 'إلغاء':", reply_markup=cancel_inline_kb())
             bot.register_next_step_handler(m, schedule_admin_location_step_url, chat_id, location_name)
             return
@@ -3908,40 +1964,15 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
             logger.exception("Failed to save location")
             bot.send_message(chat_id, f"حدث خطأ في حفظ الموقع: {e}", reply_markup=main_menu_kb())
         finally:
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin.pop(chat_id, None)
-
-    
-    @bot.callback_query_handler(func=lambda c: c.data.startswith("schedule_type:"))
-    def schedule_admin_class_type_handler(c):
-        if not is_admin(c.from_user.id):
-            bot.answer_callback_query(c.id, "غير مصرح.", show_alert=True)
-            return
-        
-        class_type = c.data.split(":", 1)[1]
-        chat_id = c.message.chat.id
-        
-        with _pending_schedule_admin_lock:
-            pm = _pending_schedule_admin.get(chat_id)
-            if not pm:
-                bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
-                bot.answer_callback_query(c.id)
-                return
-            pm["class_type"] = class_type
-            pm["step"] = "alternating"
-        
-        msg = bot.send_message(chat_id, "هل هذه الحصة دورية (تظهر في أسبوع وتختفي في الأسبوع التالي)؟\nأرسل 'نعم' أو 'لا' أو 'إلغاء':", reply_markup=cancel_inline_kb())
-        bot.register_next_step_handler(msg, schedule_admin_add_step_alternating, chat_id)
-        bot.answer_callback_query(c.id)
+            pending_schedule_admin.pop(chat_id, None)
 
     
     def schedule_admin_edit_class_field_step(msg, chat_id):
         """Handle editing a class field."""
         
-        with _pending_schedule_admin_lock:
-            pm = _pending_schedule_admin.get(chat_id)
-            if not pm or pm.get("action") != "edit_class":
-                return
+        pm = pending_schedule_admin.get(chat_id)
+        if not pm or pm.get("action") != "edit_class":
+            return
         
         
         if not hasattr(msg, 'text') or not msg.text:
@@ -3949,8 +1980,7 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
         
         text = msg.text.strip()
         if is_cancel_text(text):
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin.pop(chat_id, None)
+            pending_schedule_admin.pop(chat_id, None)
             bot.send_message(chat_id, "تم إلغاء التعديل.", reply_markup=main_menu_kb())
             return
         
@@ -3959,8 +1989,7 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
         
         if not field or not class_id:
             bot.send_message(chat_id, "خطأ في البيانات.", reply_markup=main_menu_kb())
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin.pop(chat_id, None)
+            pending_schedule_admin.pop(chat_id, None)
             return
         
         try:
@@ -3971,9 +2000,8 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
             if field in ["time_start", "time_end"]:
                 
                 if not re.match(r'^\d{1,2}:\d{2}$', text):
-                    with _pending_schedule_admin_lock:
-                        if chat_id not in _pending_schedule_admin:
-                            return
+                    if chat_id not in pending_schedule_admin:
+                        return
                     m = bot.send_message(chat_id, "صيغة الوقت غير صحيحة. استخدم HH:MM (مثال: 08:00). أرسل مرة أخرى أو 'إلغاء':", reply_markup=cancel_inline_kb())
                     bot.register_next_step_handler(m, schedule_admin_edit_class_field_step, chat_id)
                     return
@@ -3994,15 +2022,13 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
                             bot.send_message(chat_id, f"✅ تم تفعيل الحالة الدورية.\n\n{text_display}", reply_markup=kb)
                         else:
                             bot.send_message(chat_id, "✅ تم تفعيل الحالة الدورية.", reply_markup=main_menu_kb())
-                    with _pending_schedule_admin_lock:
-                        _pending_schedule_admin.pop(chat_id, None)
+                    pending_schedule_admin.pop(chat_id, None)
                     return
             else:
                 
                 if not text:
-                    with _pending_schedule_admin_lock:
-                        if chat_id not in _pending_schedule_admin:
-                            return
+                    if chat_id not in pending_schedule_admin:
+                        return
                     m = bot.send_message(chat_id, "القيمة مطلوبة. أرسل القيمة مرة أخرى أو 'إلغاء':", reply_markup=cancel_inline_kb())
                     bot.register_next_step_handler(m, schedule_admin_edit_class_field_step, chat_id)
                     return
@@ -4025,17 +2051,15 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
             logger.exception("Failed to update class field")
             bot.send_message(chat_id, f"حدث خطأ في التحديث: {e}", reply_markup=main_menu_kb())
         finally:
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin.pop(chat_id, None)
+            pending_schedule_admin.pop(chat_id, None)
 
     
     def schedule_admin_edit_alternating_config_step(msg, chat_id):
         """Handle editing alternating config reference date."""
         
-        with _pending_schedule_admin_lock:
-            pm = _pending_schedule_admin.get(chat_id)
-            if not pm or pm.get("action") != "edit_alternating_config":
-                return
+        pm = pending_schedule_admin.get(chat_id)
+        if not pm or pm.get("action") != "edit_alternating_config":
+            return
         
         
         if not hasattr(msg, 'text') or not msg.text:
@@ -4043,8 +2067,7 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
         
         text = msg.text.strip()
         if is_cancel_text(text):
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin.pop(chat_id, None)
+            pending_schedule_admin.pop(chat_id, None)
             bot.send_message(chat_id, "تم إلغاء التعديل.", reply_markup=main_menu_kb())
             return
         
@@ -4053,16 +2076,14 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
         
         if not alternating_key or field != "reference_date":
             bot.send_message(chat_id, "خطأ في البيانات.", reply_markup=main_menu_kb())
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin.pop(chat_id, None)
+            pending_schedule_admin.pop(chat_id, None)
             return
         
         
         import re
         if not re.match(r'^\d{4}-\d{2}-\d{2}$', text):
-            with _pending_schedule_admin_lock:
-                if chat_id not in _pending_schedule_admin:
-                    return
+            if chat_id not in pending_schedule_admin:
+                return
             m = bot.send_message(chat_id, "صيغة التاريخ غير صحيحة. استخدم YYYY-MM-DD (مثال: 2024-11-11). أرسل مرة أخرى أو 'إلغاء':", reply_markup=cancel_inline_kb())
             bot.register_next_step_handler(m, schedule_admin_edit_alternating_config_step, chat_id)
             return
@@ -4096,16 +2117,14 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
             logger.exception("Failed to update alternating config")
             bot.send_message(chat_id, f"حدث خطأ في التحديث: {e}", reply_markup=main_menu_kb())
         finally:
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin.pop(chat_id, None)
+            pending_schedule_admin.pop(chat_id, None)
 
     def schedule_admin_add_alternating_config_step_key(msg, chat_id):
         """Step 1: Get alternating key."""
         
-        with _pending_schedule_admin_lock:
-            pm = _pending_schedule_admin.get(chat_id)
-            if not pm or pm.get("action") != "add_alternating_config":
-                return
+        pm = pending_schedule_admin.get(chat_id)
+        if not pm or pm.get("action") != "add_alternating_config":
+            return
         
         
         if not hasattr(msg, 'text') or not msg.text:
@@ -4113,26 +2132,24 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
         
         text = msg.text.strip()
         if is_cancel_text(text):
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin.pop(chat_id, None)
+            pending_schedule_admin.pop(chat_id, None)
             bot.send_message(chat_id, "تم إلغاء الإضافة.", reply_markup=main_menu_kb())
             return
         
         if not text:
-            with _pending_schedule_admin_lock:
-                if chat_id not in _pending_schedule_admin:
-                    return
+            if chat_id not in pending_schedule_admin:
+                return
             m = bot.send_message(chat_id, "مفتاح الحصة الدورية مطلوب. أرسل المفتاح أو 'إلغاء':", reply_markup=cancel_inline_kb())
             bot.register_next_step_handler(m, schedule_admin_add_alternating_config_step_key, chat_id)
             return
         
-        with _pending_schedule_admin_lock:
-            pm = _pending_schedule_admin.get(chat_id)
-            if not pm:
-                bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
-                return
-            pm["alternating_key"] = text
-            pm["step"] = "enter_reference_date"
+        pm = pending_schedule_admin.get(chat_id)
+        if not pm:
+            bot.send_message(chat_id, "انتهت الجلسة.", reply_markup=main_menu_kb())
+            return
+        pm["alternating_key"] = text
+        pm["step"] = "enter_reference_date"
+        pending_schedule_admin[chat_id] = pm
         
         m = bot.send_message(chat_id, f"أرسل تاريخ المرجع بصيغة YYYY-MM-DD (مثال: 2024-11-11) أو اكتب 'إلغاء':", reply_markup=cancel_inline_kb())
         bot.register_next_step_handler(m, schedule_admin_add_alternating_config_step_date, chat_id)
@@ -4140,10 +2157,9 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
     def schedule_admin_add_alternating_config_step_date(msg, chat_id):
         """Step 2: Get reference date."""
         
-        with _pending_schedule_admin_lock:
-            pm = _pending_schedule_admin.get(chat_id)
-            if not pm or pm.get("action") != "add_alternating_config":
-                return
+        pm = pending_schedule_admin.get(chat_id)
+        if not pm or pm.get("action") != "add_alternating_config":
+            return
         
         
         if not hasattr(msg, 'text') or not msg.text:
@@ -4151,17 +2167,15 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
         
         text = msg.text.strip()
         if is_cancel_text(text):
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin.pop(chat_id, None)
+            pending_schedule_admin.pop(chat_id, None)
             bot.send_message(chat_id, "تم إلغاء الإضافة.", reply_markup=main_menu_kb())
             return
         
         
         import re
         if not re.match(r'^\d{4}-\d{2}-\d{2}$', text):
-            with _pending_schedule_admin_lock:
-                if chat_id not in _pending_schedule_admin:
-                    return
+            if chat_id not in pending_schedule_admin:
+                return
             m = bot.send_message(chat_id, "صيغة التاريخ غير صحيحة. استخدم YYYY-MM-DD (مثال: 2024-11-11). أرسل مرة أخرى أو 'إلغاء':", reply_markup=cancel_inline_kb())
             bot.register_next_step_handler(m, schedule_admin_add_alternating_config_step_date, chat_id)
             return
@@ -4169,8 +2183,7 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
         alternating_key = pm.get("alternating_key")
         if not alternating_key:
             bot.send_message(chat_id, "خطأ في البيانات.", reply_markup=main_menu_kb())
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin.pop(chat_id, None)
+            pending_schedule_admin.pop(chat_id, None)
             return
         
         try:
@@ -4184,7 +2197,31 @@ def register_handlers(bot: telebot.TeleBot, sch_mgr):
             logger.exception("Failed to add alternating config")
             bot.send_message(chat_id, f"حدث خطأ في الإضافة: {e}", reply_markup=main_menu_kb())
         finally:
-            with _pending_schedule_admin_lock:
-                _pending_schedule_admin.pop(chat_id, None)
+            pending_schedule_admin.pop(chat_id, None)
 
     
+
+    # توجيه الـ callbacks عبر جدول (trie) بدل سلسلة if الطويلة؛ المعالجات مقسمة حسب الميزة
+    # في bot_handlers/callbacks، وخطوات next_step تبقى هنا وتُمرَّر عبر ctx.
+    from types import SimpleNamespace
+    from bot_handlers.callbacks import build_callback_router
+    ctx = SimpleNamespace(
+        bot=bot,
+        sch_mgr=sch_mgr,
+        send_faq_list=send_faq_list,
+        hw_add_step_subject=hw_add_step_subject,
+        hw_edit_handle_field=hw_edit_handle_field,
+        faq_admin_add_step_question=faq_admin_add_step_question,
+        faq_admin_edit_step_question=faq_admin_edit_step_question,
+        faq_admin_edit_step_answer_only=faq_admin_edit_step_answer_only,
+        _manual_next_step_handler=_manual_next_step_handler,
+        _custom_reminder_step_text=_custom_reminder_step_text,
+        schedule_admin_add_step_time_start=schedule_admin_add_step_time_start,
+        schedule_admin_add_step_alternating=schedule_admin_add_step_alternating,
+        schedule_admin_location_step_name=schedule_admin_location_step_name,
+        schedule_admin_location_step_url=schedule_admin_location_step_url,
+        schedule_admin_edit_class_field_step=schedule_admin_edit_class_field_step,
+        schedule_admin_edit_alternating_config_step=schedule_admin_edit_alternating_config_step,
+        schedule_admin_add_alternating_config_step_key=schedule_admin_add_alternating_config_step_key,
+    )
+    _callback_router = build_callback_router(ctx)
@@ -0,0 +1,366 @@
+"""
+Outbox — طابور رسائل صادرة دائم في قاعدة البيانات.
+
+كل إرسال جماعي يُسجَّل أولاً في جدولي outbox_jobs (المحتوى مرة واحدة) و outbox
+(صف لكل مستلم بمفتاح فريد (job_key, recipient))، ثم يقوم OutboxDispatcher بتفريغه
+عبر BroadcastEngine ويحدّث حالة كل صف فور الإرسال.
+عند إعادة تشغيل البوت تُستأنف الصفوف pending فقط، فلا يضيع المستلمون ولا يتكرر الإرسال
+(باستثناء رسالة واحدة على الأكثر لكل عامل إذا توقف البوت بين الإرسال وتحديث الحالة).
+كل صف يحفظ عدد العمليات المرسلة (ops_done) فتُستأنف المحاولة التالية من أول عملية لم تُرسل،
+وتؤجَّل إعادة المحاولة بـ exponential backoff عبر next_attempt_at.
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from db import get_conn, ensure_tables
+from db_adapter import close_conn
+from db_config import DB_TYPE
+from broadcast import get_broadcast_engine, is_unreachable, RecipientSkipped, BroadcastResult
+
+logger = logging.getLogger(__name__)
+
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE") or "200")
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS") or "3")
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS") or "5")
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS") or "7")
+# تأخير إعادة المحاولة: OUTBOX_BACKOFF_SECONDS * 2^(attempts - 1) بحد أقصى OUTBOX_BACKOFF_MAX_SECONDS
+OUTBOX_BACKOFF_SECONDS = float(os.getenv("OUTBOX_BACKOFF_SECONDS") or "30")
+OUTBOX_BACKOFF_MAX_SECONDS = float(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS") or "3600")
+
+STATUS_PENDING = "pending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+STATUS_SKIPPED = "skipped"
+
+# Telegram method -> اسم الوسيط الموضعي الثاني (بعد chat_id)
+_MEDIA_METHODS = {
+    "photo": "send_photo",
+    "audio": "send_audio",
+    "voice": "send_voice",
+    "video": "send_video",
+    "document": "send_document",
+    "video_note": "send_video_note",
+    "sticker": "send_sticker",
+}
+
+
+def _now_str() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def backoff_delay(attempts: int) -> float:
+    """Seconds to wait before retrying a row that has failed `attempts` times."""
+    return min(OUTBOX_BACKOFF_SECONDS * (2 ** max(attempts - 1, 0)), OUTBOX_BACKOFF_MAX_SECONDS)
+
+
+def message_op(text: str, optional: bool = False, **kwargs) -> dict:
+    """Build a send_message operation for an outbox payload."""
+    return {"method": "send_message", "args": [text], "kwargs": kwargs, "optional": optional}
+
+
+def media_ops(text: Optional[str], media_type: Optional[str], media_file_id: Optional[str],
+              caption: Optional[str] = None, message_thread_id: Optional[int] = None) -> List[dict]:
+    """
+    Build the operations for an optional text followed by one media file
+    (same dispatch as _job_send_media_to_user / _job_send_media_to_chat).
+    """
+    ops = []
+    thread_kwargs = {"message_thread_id": message_thread_id} if message_thread_id else {}
+    if text:
+        ops.append(message_op(text, **thread_kwargs))
+    method = _MEDIA_METHODS.get(media_type or "")
+    if method and media_file_id:
+        kwargs = dict(thread_kwargs)
+        if caption and media_type not in ("video_note", "sticker"):
+            kwargs["caption"] = caption
+        ops.append({"method": method, "args": [media_file_id], "kwargs": kwargs, "optional": False})
+    elif media_type:
+        logger.warning("outbox.media_ops: unknown media_type=%s", media_type)
+    return ops
+
+
+def enqueue(conn, job_key: str, recipients: Iterable[int], ops: List[dict]) -> int:
+    """
+    Store a broadcast in the outbox. Idempotent on (job_key, recipient): enqueuing the
+    same job twice (e.g. after a restart) never duplicates a recipient.
+
+    Returns:
+        Number of recipients still pending for this job.
+    """
+    placeholder = "%s" if DB_TYPE == "postgresql" else "?"
+    payload = json.dumps({"ops": ops}, ensure_ascii=False)
+    rows = [(job_key, int(r)) for r in dict.fromkeys(recipients) if r is not None]
+    cur = conn.cursor()
+
+    if DB_TYPE == "postgresql":
+        cur.execute(f"INSERT INTO outbox_jobs (job_key, payload) VALUES ({placeholder}, {placeholder}) "
+                    f"ON CONFLICT (job_key) DO NOTHING", (job_key, payload))
+        if rows:
+            cur.executemany(f"INSERT INTO outbox (job_key, recipient) VALUES ({placeholder}, {placeholder}) "
+                            f"ON CONFLICT (job_key, recipient) DO NOTHING", rows)
+    else:
+        cur.execute(f"INSERT OR IGNORE INTO outbox_jobs (job_key, payload) VALUES ({placeholder}, {placeholder})",
+                    (job_key, payload))
+        if rows:
+            cur.executemany(f"INSERT OR IGNORE INTO outbox (job_key, recipient) VALUES ({placeholder}, {placeholder})",
+                            rows)
+
+    cur.execute(f"SELECT COUNT(*) FROM outbox WHERE job_key = {placeholder} AND status = {placeholder}",
+                (job_key, STATUS_PENDING))
+    pending = cur.fetchone()[0]
+    conn.commit()
+    return pending
+
+
+def count_pending(conn) -> int:
+    cur = conn.cursor()
+    placeholder = "%s" if DB_TYPE == "postgresql" else "?"
+    cur.execute(f"SELECT COUNT(*) FROM outbox WHERE status = {placeholder}", (STATUS_PENDING,))
+    return cur.fetchone()[0]
+
+
+def fetch_pending(conn, limit: int = OUTBOX_BATCH_SIZE) -> List[tuple]:
+    """
+    Return up to `limit` pending rows that are due (next_attempt_at passed or unset)
+    as (id, job_key, recipient, attempts, ops_done, payload).
+    """
+    cur = conn.cursor()
+    placeholder = "%s" if DB_TYPE == "postgresql" else "?"
+    cur.execute(f"""
+        SELECT o.id, o.job_key, o.recipient, o.attempts, COALESCE(o.ops_done, 0), j.payload
+        FROM outbox o
+        JOIN outbox_jobs j ON j.job_key = o.job_key
+        WHERE o.status = {placeholder}
+          AND (o.next_attempt_at IS NULL OR o.next_attempt_at <= {placeholder})
+        ORDER BY o.id
+        LIMIT {placeholder}
+    """, (STATUS_PENDING, _now_str(), limit))
+    return [tuple(r) for r in cur.fetchall()]
+
+
+def mark(conn, row_id: int, status: str, error: Optional[str] = None,
+         next_attempt_at: Optional[datetime] = None):
+    """
+    Record the outcome of one delivery attempt (next_attempt_at: when a pending row may be retried).
+    `attempts` counts failed attempts only, so a successful delivery does not increment it.
+    """
+    cur = conn.cursor()
+    placeholder = "%s" if DB_TYPE == "postgresql" else "?"
+    retry_at = next_attempt_at.strftime("%Y-%m-%d %H:%M:%S") if next_attempt_at else None
+    failed = 0 if status == STATUS_SENT else 1
+    cur.execute(f"""
+        UPDATE outbox SET status = {placeholder}, attempts = attempts + {placeholder},
+               last_error = {placeholder}, updated_at = {placeholder}, next_attempt_at = {placeholder}
+        WHERE id = {placeholder}
+    """, (status, failed, error, _now_str(), retry_at, row_id))
+    conn.commit()
+
+
+def mark_progress(conn, row_id: int, ops_done: int):
+    """Record that the first `ops_done` operations of the payload reached this recipient."""
+    cur = conn.cursor()
+    placeholder = "%s" if DB_TYPE == "postgresql" else "?"
+    cur.execute(f"UPDATE outbox SET ops_done = {placeholder}, updated_at = {placeholder} WHERE id = {placeholder}",
+                (ops_done, _now_str(), row_id))
+    conn.commit()
+
+
+def purge(conn, older_than_days: int = OUTBOX_RETENTION_DAYS) -> int:
+    """Delete finished rows (and jobs with no rows left) older than the retention window."""
+    cur = conn.cursor()
+    placeholder = "%s" if DB_TYPE == "postgresql" else "?"
+    cutoff = (datetime.now() - timedelta(days=older_than_days)).strftime("%Y-%m-%d %H:%M:%S")
+    cur.execute(f"DELETE FROM outbox WHERE status != {placeholder} AND updated_at < {placeholder}",
+                (STATUS_PENDING, cutoff))
+    deleted = cur.rowcount or 0
+    cur.execute(f"""
+        DELETE FROM outbox_jobs
+        WHERE created_at < {placeholder}
+          AND NOT EXISTS (SELECT 1 FROM outbox o WHERE o.job_key = outbox_jobs.job_key)
+    """, (cutoff,))
+    conn.commit()
+    return deleted
+
+
+class OutboxDispatcher:
+    """Background worker that drains the outbox through the shared BroadcastEngine."""
+
+    def __init__(self, bot, db_path: Optional[str] = None):
+        self.bot = bot
+        self.db_path = db_path
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_purge: Optional[datetime] = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="outbox-dispatcher", daemon=True)
+        self._thread.start()
+        logger.info("OutboxDispatcher started")
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def notify(self):
+        """Wake the dispatcher after new rows were enqueued."""
+        self._wake.set()
+
+    def _run(self):
+        try:
+            conn = get_conn(self.db_path)
+            try:
+                ensure_tables(conn)
+                pending = count_pending(conn)
+            finally:
+                close_conn(conn)
+            if pending:
+                logger.info("OutboxDispatcher: resuming %d pending outbox messages", pending)
+        except Exception:
+            logger.exception("OutboxDispatcher: failed to count pending messages")
+
+        while not self._stop.is_set():
+            processed = 0
+            try:
+                self._maybe_purge()
+                processed = self.drain_once()
+            except Exception:
+                logger.exception("OutboxDispatcher: drain failed")
+            # ننام فقط إذا لم يبق صف مستحق؛ دفعة كلها متخطاة/مؤجلة لا توقف بقية الطابور
+            if not processed:
+                self._wake.wait(OUTBOX_POLL_SECONDS)
+                self._wake.clear()
+
+    def _maybe_purge(self):
+        now = datetime.now()
+        if self._last_purge and now - self._last_purge < timedelta(hours=1):
+            return
+        self._last_purge = now
+        conn = get_conn(self.db_path)
+        try:
+            deleted = purge(conn)
+            if deleted:
+                logger.info("OutboxDispatcher: purged %d finished outbox rows", deleted)
+        finally:
+            close_conn(conn)
+
+    def _mark(self, row_id: int, status: str, error: Optional[str] = None,
+              next_attempt_at: Optional[datetime] = None):
+        conn = get_conn(self.db_path)
+        try:
+            mark(conn, row_id, status, error, next_attempt_at)
+        finally:
+            close_conn(conn)
+
+    def _mark_progress(self, row_id: int, ops_done: int):
+        conn = get_conn(self.db_path)
+        try:
+            mark_progress(conn, row_id, ops_done)
+        finally:
+            close_conn(conn)
+
+    def drain_once(self) -> int:
+        """Deliver one batch of due pending rows. Returns the number of rows processed (0 = nothing due)."""
+        conn = get_conn(self.db_path)
+        try:
+            rows = fetch_pending(conn)
+        finally:
+            close_conn(conn)
+        if not rows:
+            return 0
+
+        engine = get_broadcast_engine(self.bot)
+        payloads: Dict[str, List[dict]] = {}
+        for _, job_key, _, _, _, payload in rows:
+            if job_key not in payloads:
+                try:
+                    payloads[job_key] = json.loads(payload).get("ops", [])
+                except Exception:
+                    logger.exception("OutboxDispatcher: invalid payload for job %s", job_key)
+                    payloads[job_key] = []
+
+        def deliver(row):
+            row_id, job_key, recipient, attempts, ops_done, _ = row
+            ops = payloads[job_key]
+            try:
+                # نستأنف من أول عملية لم تصل، حتى لا يتكرر نص أُرسل في محاولة سابقة
+                for index in range(ops_done, len(ops)):
+                    op = ops[index]
+                    method = getattr(self.bot, op["method"])
+                    try:
+                        engine.call(recipient, method, recipient, *op.get("args", []), **op.get("kwargs", {}))
+                    except Exception:
+                        if not op.get("optional"):
+                            raise
+                        logger.exception("OutboxDispatcher: optional %s failed for %s (%s)",
+                                         op["method"], recipient, job_key)
+                    if index + 1 < len(ops):
+                        self._mark_progress(row_id, index + 1)
+            except Exception as e:
+                if is_unreachable(e):
+                    self._mark(row_id, STATUS_SKIPPED, str(e))
+                    raise RecipientSkipped() from e
+                if attempts + 1 >= OUTBOX_MAX_ATTEMPTS:
+                    self._mark(row_id, STATUS_FAILED, str(e))
+                else:
+                    retry_at = datetime.now() + timedelta(seconds=backoff_delay(attempts + 1))
+                    self._mark(row_id, STATUS_PENDING, str(e), retry_at)
+                raise
+            self._mark(row_id, STATUS_SENT)
+
+        result: BroadcastResult = engine.broadcast(rows, deliver, label="outbox")
+        logger.debug("OutboxDispatcher: batch of %d rows -> %s", len(rows), result)
+        return len(rows)
+
+
+_dispatcher: Optional[OutboxDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def start_dispatcher(bot, db_path: Optional[str] = None) -> OutboxDispatcher:
+    """Start (once per process) the dispatcher that drains the outbox. Pending rows are resumed."""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None or _dispatcher.bot is not bot:
+            if _dispatcher is not None:
+                _dispatcher.stop(timeout=1)
+            _dispatcher = OutboxDispatcher(bot, db_path)
+        _dispatcher.start()
+        return _dispatcher
+
+
+def get_dispatcher() -> Optional[OutboxDispatcher]:
+    return _dispatcher
+
+
+def submit(job_key: str, recipients: Iterable[int], ops: List[dict], conn=None) -> int:
+    """
+    Enqueue a broadcast and wake the dispatcher.
+
+    Returns:
+        Number of recipients pending for `job_key`.
+    """
+    own = conn is None
+    if own:
+        conn = get_conn(_dispatcher.db_path if _dispatcher else None)
+    try:
+        pending = enqueue(conn, job_key, recipients, ops)
+    finally:
+        if own:
+            close_conn(conn)
+    if _dispatcher is not None:
+        _dispatcher.notify()
+    else:
+        logger.warning("outbox.submit: dispatcher not started, job %s will be sent once it starts", job_key)
+    return pending
@@ -4,31 +4,37 @@ Scheduler manager — يدير جدولة التذكيرات والنسخ الا
 أُضيف هنا معامل use_persistent_jobstore ليتوافق مع ما قد يمرره bot.py.
 """
 
+import gzip
 import os
+import re
 import shutil
 import sqlite3
 import logging
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Set
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.jobstores.base import JobLookupError
 from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.util import ref_to_obj
 
 # Import database adapter
-from db import get_conn
-from db_adapter import close_conn
+from db import get_conn, ensure_tables, get_homework_reminder_recipients
+from db_adapter import close_conn, from_epoch, to_epoch, get_app_timezone, APP_TIMEZONE
 from db_config import DB_TYPE
+from config import BACKUP_KEEP_DAILY, BACKUP_KEEP_WEEKLY
+from outbox import submit as outbox_submit, message_op, start_dispatcher as start_outbox_dispatcher
 
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.NullHandler())
 
-# استيراد pytz
-try:
-    from pytz import timezone as pytz_timezone
-    PYTZ_AVAILABLE = True
-except ImportError:
-    PYTZ_AVAILABLE = False
+# pytz اختياري: المنطقة الزمنية من db_adapter.get_app_timezone() (None بدون pytz)
+PYTZ_AVAILABLE = get_app_timezone() is not None
+if not PYTZ_AVAILABLE:
     logger.warning("pytz غير متاح - سيتم استخدام UTC")
 
 # جعل SQLAlchemyJobStore اختياري - إذا لم يكن متاحاً، سنستخدم MemoryJobStore
@@ -41,13 +47,11 @@ except ImportError:
 
 scheduler_bot = None  # سيعيّن عند تهيئة SchedulerManager
 
-# استيراد get_notification_setting في أعلى الملف لتجنب مشاكل الاستيراد داخل الدالة
-try:
-    from db import get_notification_setting
-    NOTIFICATION_SETTING_AVAILABLE = True
-except ImportError:
-    NOTIFICATION_SETTING_AVAILABLE = False
-    logger.warning("get_notification_setting غير متاح - سيتم إرسال التذكيرات بدون فحص الإعدادات")
+# نافذة السماح عند الإقلاع: واجبات انتهى موعدها خلال هذه المدة ما زالت تُرسل تذكير days_before=0
+BOOTSTRAP_GRACE_HOURS = int(os.getenv("BOOTSTRAP_GRACE_HOURS") or "24")
+
+# "apscheduler": job لكل تذكير (الافتراضي) | "next_due": جدول reminder_queue ومؤقت واحد لأقرب موعد
+DISPATCHER_MODE = (os.getenv("SCHEDULER_DISPATCHER_MODE") or "apscheduler").lower()
 
 def send_hw_reminder(hw_id: int, days_before: int, db_path: str):
     global scheduler_bot
@@ -95,87 +99,443 @@ def send_hw_reminder(hw_id: int, days_before: int, db_path: str):
                 f"الشروط: {conditions}\n"
                 f"ID: {hw_id}")
 
-        
-        
-        if target_user is not None:
-            recipients = [target_user]
-            logger.info("send_hw_reminder: sending to specific user_id=%s", target_user)
-        else:
-            
-            try:
-                cur.execute("SELECT user_id FROM users")
-                user_rows = cur.fetchall()
-                recipients = [r[0] if isinstance(r, tuple) else r['user_id'] for r in user_rows if (r[0] if isinstance(r, tuple) else r['user_id']) is not None]
-                if not recipients:
-                    
-                    logger.warning("send_hw_reminder: no registered users found, sending to chat_id=%s", target_chat)
-                    recipients = [target_chat]
-                else:
-                    logger.info("send_hw_reminder: sending to %d registered users (all users)", len(recipients))
-            except Exception as e:
-                logger.exception("send_hw_reminder: failed to get registered users, falling back to chat_id")
-                recipients = [target_chat]
+        if scheduler_bot is None:
+            logger.error("send_hw_reminder: scheduler_bot غير مضبوط — لا أستطيع الإرسال")
+            close_conn(conn)
+            return
 
-        for recip in recipients:
-            try:
-                if scheduler_bot is None:
-                    logger.error("send_hw_reminder: scheduler_bot غير مضبوط — لا أستطيع الإرسال")
-                    continue
-                
-                
-                
-                if isinstance(recip, int) and recip > 0:  
-                    placeholder = "%s" if DB_TYPE == "postgresql" else "?"
-                    cur.execute(f"SELECT 1 FROM homework_completions WHERE hw_id = {placeholder} AND user_id = {placeholder}", (hw_id, recip))
-                    if cur.fetchone() is not None:
-                        logger.info("send_hw_reminder: user_id=%s already completed hw_id=%s, skipping", recip, hw_id)
-                        continue
-                    
-                    # فحص إعدادات الإشعارات
-                    if NOTIFICATION_SETTING_AVAILABLE:
-                        try:
-                            if not get_notification_setting(conn, recip, 'homework_reminders'):
-                                logger.info("send_hw_reminder: user_id=%s disabled homework_reminders, skipping", recip)
-                                continue
-                        except Exception as notif_err:
-                            logger.warning("send_hw_reminder: failed to check notification settings for user_id=%s: %s", recip, notif_err)
-                            # في حالة الخطأ، نتابع الإرسال (افتراضياً مفعّل)
-                    else:
-                        logger.debug("send_hw_reminder: notification settings check unavailable, sending anyway")
-                        
-                
-                scheduler_bot.send_message(recip, text)
-                if pdf_type == "file_id" and pdf_value:
-                    try:
-                        scheduler_bot.send_document(recip, pdf_value)
-                    except Exception:
-                        logger.exception("Failed to send document file_id for hw_id=%s", hw_id)
-                elif pdf_type == "url" and pdf_value:
-                    try:
-                        from telebot import types as _types
-                        kb = _types.InlineKeyboardMarkup()
-                        kb.add(_types.InlineKeyboardButton("ملف الواجب (رابط)", url=pdf_value))
-                        scheduler_bot.send_message(recip, "ملف الواجب:", reply_markup=kb)
-                    except Exception:
-                        logger.exception("Failed to send pdf url for hw_id=%s", hw_id)
-                logger.info("send_hw_reminder: sent hw_id=%s to recip=%s", hw_id, recip)
-            except Exception as e:
-                logger.exception("send_hw_reminder: failed to send hw_id=%s to recip=%s — %s", hw_id, recip, e)
-        close_conn(conn)
+        # استعلام واحد يجمع المستخدمين مع homework_completions و notification_settings
+        # بدلاً من استعلامين لكل مستلم
+        filtered = 0
+        try:
+            rows = get_homework_reminder_recipients(conn, hw_id, target_user)
+            deliverable = [uid for uid, eligible in rows if eligible]
+            filtered = len(rows) - len(deliverable)
+            if target_user is not None:
+                logger.info("send_hw_reminder: sending to specific user_id=%s", target_user)
+            elif not rows:
+                logger.warning("send_hw_reminder: no registered users found, sending to chat_id=%s", target_chat)
+                deliverable = [target_chat]
+            else:
+                logger.info("send_hw_reminder: %d registered users, %d eligible (all users)", len(rows), len(deliverable))
+        except Exception:
+            logger.exception("send_hw_reminder: failed to resolve recipients, falling back to chat_id")
+            deliverable = [target_user if target_user is not None else target_chat]
+
+        # الإرسال عبر outbox: يُحفظ في قاعدة البيانات أولاً ثم يفرغه OutboxDispatcher،
+        # فإذا توقف البوت أثناء الإرسال يُستأنف من حيث توقف
+        ops = [message_op(text)]
+        if pdf_type == "file_id" and pdf_value:
+            ops.append({"method": "send_document", "args": [pdf_value], "kwargs": {}, "optional": True})
+        elif pdf_type == "url" and pdf_value:
+            from telebot import types as _types
+            url_kb = _types.InlineKeyboardMarkup()
+            url_kb.add(_types.InlineKeyboardButton("ملف الواجب (رابط)", url=pdf_value))
+            ops.append(message_op("ملف الواجب:", optional=True, reply_markup=url_kb.to_json()))
+
+        job_key = f"hw-{hw_id}-{days_before}-{due_at}"
+        try:
+            pending = outbox_submit(job_key, deliverable, ops, conn=conn)
+        finally:
+            close_conn(conn)
+        logger.info("send_hw_reminder: hw_id=%s days_before=%s queued %d recipients (%d filtered) as %s",
+                    hw_id, days_before, pending, filtered, job_key)
+        return pending
     except Exception:
         logger.exception("send_hw_reminder: unexpected error for hw_id=%s", hw_id)
 
 
-def backup_db_once(db_path: str, backup_dir: str):
+# النسخ الاحتياطي: عدد الصفحات لكل خطوة من sqlite3 backup API (الاحتفاظ: config.BACKUP_KEEP_DAILY/WEEKLY)
+BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP") or "256")
+BACKUP_STEP_PAUSE = float(os.getenv("BACKUP_STEP_PAUSE") or "0.01")
+# PostgreSQL: حجم كل جزء (قبل الضغط) من ملفات COPY المضغوطة
+BACKUP_CHUNK_BYTES = int(os.getenv("BACKUP_CHUNK_BYTES") or str(64 * 1024 * 1024))
+
+# reminders_backup_<ts>.db[.gz] (SQLite) أو مجلد pg_backup_<ts> (PostgreSQL)
+_BACKUP_NAME_RE = re.compile(r"^(?:reminders_backup_(\d{8}_\d{6})\.db(?:\.gz)?|pg_backup_(\d{8}_\d{6}))$")
+
+
+def backup_db_once(db_path: str, backup_dir: str) -> Optional[str]:
+    """
+    Take an online backup of a live (WAL-mode) SQLite database.
+
+    The snapshot is copied with the sqlite3 backup API in BACKUP_PAGES_PER_STEP
+    pages per step, pausing between steps so writers are not blocked. It is then
+    gzip-compressed, checked by verify_backup(), and old backups are rotated by
+    prune_backups(). Returns the path of the .db.gz file, or None on failure.
+    """
+    tmp_path = None
+    dest = None
     try:
         if not os.path.exists(backup_dir):
             os.makedirs(backup_dir, exist_ok=True)
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        dest = os.path.join(backup_dir, f"reminders_backup_{ts}.db")
-        shutil.copy2(db_path, dest)
-        logger.info("backup_db_once: Database backed up to %s", dest)
+        tmp_path = os.path.join(backup_dir, f".reminders_backup_{ts}.db.tmp")
+        dest = os.path.join(backup_dir, f"reminders_backup_{ts}.db.gz")
+
+        src = sqlite3.connect(db_path, timeout=30)
+        try:
+            dst = sqlite3.connect(tmp_path)
+            try:
+                src.backup(dst, pages=BACKUP_PAGES_PER_STEP,
+                           progress=lambda status, remaining, total: time.sleep(BACKUP_STEP_PAUSE))
+            finally:
+                dst.close()
+        finally:
+            src.close()
+
+        with open(tmp_path, "rb") as f_in, gzip.open(dest, "wb", compresslevel=6) as f_out:
+            shutil.copyfileobj(f_in, f_out)
+
+        if not verify_backup(dest):
+            logger.error("backup_db_once: integrity check failed for %s, discarding it", dest)
+            os.remove(dest)
+            return None
+        logger.info("backup_db_once: Database backed up to %s (%d bytes)", dest, os.path.getsize(dest))
+        prune_backups(backup_dir)
+        return dest
     except Exception:
         logger.exception("backup_db_once: failed to backup database")
+        if dest and os.path.exists(dest):
+            os.remove(dest)
+        return None
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def verify_backup(backup_path: str) -> bool:
+    """Restore a backup (.db or .db.gz) into a temporary file and run PRAGMA integrity_check on it."""
+    restored = f"{backup_path}.verify.tmp"
+    try:
+        if backup_path.endswith(".gz"):
+            with gzip.open(backup_path, "rb") as f_in, open(restored, "wb") as f_out:
+                shutil.copyfileobj(f_in, f_out)
+        else:
+            shutil.copyfile(backup_path, restored)
+        conn = sqlite3.connect(restored)
+        try:
+            result = [r[0] for r in conn.execute("PRAGMA integrity_check").fetchall()]
+        finally:
+            conn.close()
+        if result != ["ok"]:
+            logger.error("verify_backup: %s failed integrity_check: %s", backup_path, result[:5])
+            return False
+        return True
+    except Exception:
+        logger.exception("verify_backup: could not verify %s", backup_path)
+        return False
+    finally:
+        if os.path.exists(restored):
+            os.remove(restored)
+
+
+def prune_backups(backup_dir: str, keep_daily: int = BACKUP_KEEP_DAILY, keep_weekly: int = BACKUP_KEEP_WEEKLY) -> int:
+    """
+    Retention: keep the newest backup of each of the last `keep_daily` days and of
+    each of the last `keep_weekly` ISO weeks; delete the others (old uncompressed
+    .db backups and PostgreSQL backup directories included). Returns the number
+    of backups removed.
+    """
+    backups = []
+    for name in os.listdir(backup_dir):
+        match = _BACKUP_NAME_RE.match(name)
+        if match:
+            backups.append((datetime.strptime(match.group(1) or match.group(2), "%Y%m%d_%H%M%S"), name))
+    backups.sort(reverse=True)
+
+    keep = set()
+    days, weeks = set(), set()
+    for taken_at, name in backups:
+        day = taken_at.date()
+        week = taken_at.isocalendar()[:2]
+        if day not in days and len(days) < keep_daily:
+            days.add(day)
+            keep.add(name)
+        if week not in weeks and len(weeks) < keep_weekly:
+            weeks.add(week)
+            keep.add(name)
+
+    removed = 0
+    for _, name in backups:
+        if name not in keep:
+            path = os.path.join(backup_dir, name)
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+                removed += 1
+            except OSError:
+                logger.warning("prune_backups: could not remove %s", name)
+    if removed:
+        logger.info("prune_backups: removed %d old backups from %s", removed, backup_dir)
+    return removed
+
+
+class _ChunkedGzipWriter:
+    """File-like sink for COPY ... TO STDOUT: gzip output split into files of ~chunk_bytes (uncompressed)."""
+
+    def __init__(self, directory: str, prefix: str, chunk_bytes: int = BACKUP_CHUNK_BYTES):
+        self.directory = directory
+        self.prefix = prefix
+        self.chunk_bytes = chunk_bytes
+        self.files = []
+        self.total_bytes = 0
+        self._current = None
+        self._current_bytes = 0
+
+    def _open_next(self):
+        self.close()
+        name = f"{self.prefix}.{len(self.files):04d}.csv.gz"
+        self._current = gzip.open(os.path.join(self.directory, name), "wb", compresslevel=6)
+        self._current_bytes = 0
+        self.files.append(name)
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if self._current is None or self._current_bytes >= self.chunk_bytes:
+            self._open_next()
+        self._current.write(data)
+        self._current_bytes += len(data)
+        self.total_bytes += len(data)
+        return len(data)
+
+    def close(self):
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+
+
+def pg_backup_once(backup_dir: str) -> Optional[str]:
+    """
+    Logical backup of the PostgreSQL database into backup_dir/pg_backup_<ts>/.
+
+    Every table in the public schema is streamed with COPY ... TO STDOUT (CSV)
+    into gzip chunks of BACKUP_CHUNK_BYTES, so tables are never held in memory.
+    All tables are read in one REPEATABLE READ, READ ONLY transaction on a pooled
+    connection, so they form one consistent snapshot. manifest.json lists the
+    columns and chunk files of each table. To restore, recreate the schema
+    (ensure_tables) and load each table's chunks in order with
+    COPY <table> (<columns>) FROM STDIN WITH (FORMAT csv).
+    Returns the backup directory, or None on failure.
+    """
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    final_dir = os.path.join(backup_dir, f"pg_backup_{ts}")
+    tmp_dir = os.path.join(backup_dir, f".pg_backup_{ts}.tmp")
+    conn = None
+    try:
+        os.makedirs(tmp_dir, exist_ok=True)
+        conn = get_conn()
+        cur = conn.cursor()
+        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        cur.execute("SELECT tablename FROM pg_tables WHERE schemaname = 'public' ORDER BY tablename")
+        tables = [r[0] for r in cur.fetchall()]
+
+        manifest = {"created_at": datetime.now().isoformat(), "format": "csv", "tables": {}}
+        for table in tables:
+            cur.execute("""
+                SELECT column_name FROM information_schema.columns
+                WHERE table_schema = 'public' AND table_name = %s ORDER BY ordinal_position
+            """, (table,))
+            columns = [r[0] for r in cur.fetchall()]
+            quoted = '"' + table.replace('"', '""') + '"'
+            writer = _ChunkedGzipWriter(tmp_dir, table)
+            try:
+                cur.copy_expert(f"COPY {quoted} TO STDOUT WITH (FORMAT csv)", writer, size=65536)
+            finally:
+                writer.close()
+            manifest["tables"][table] = {"columns": columns, "files": writer.files, "bytes": writer.total_bytes}
+        conn.rollback()
+
+        with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.rename(tmp_dir, final_dir)
+        logger.info("pg_backup_once: %d tables backed up to %s", len(tables), final_dir)
+        prune_backups(backup_dir)
+        return final_dir
+    except Exception:
+        logger.exception("pg_backup_once: failed to backup database")
+        if conn is not None:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+        return None
+    finally:
+        if conn is not None:
+            close_conn(conn)
+        if os.path.isdir(tmp_dir):
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+class NextDueDispatcher:
+    """
+    Alternative to one APScheduler date job per reminder.
+
+    Reminders live only in the reminder_queue table (indexed on run_at); a single thread
+    sleeps until MIN(run_at), pops the due rows and runs their callables on a small pool.
+    Memory and startup cost stay flat no matter how many reminders are pending.
+    """
+
+    def __init__(self, db_path: str, timezone=None, max_workers: int = 5,
+                 batch_size: int = 500, max_sleep: float = 300, grace_hours: int = BOOTSTRAP_GRACE_HOURS):
+        self.db_path = db_path
+        self.timezone = timezone
+        self.batch_size = batch_size
+        self.max_sleep = max_sleep
+        self.grace_hours = grace_hours
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="next-due")
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _placeholder(self) -> str:
+        return "%s" if DB_TYPE == "postgresql" else "?"
+
+    def _fmt(self, dt: datetime) -> str:
+        """Store run_at as naive wall-clock time in the scheduler timezone."""
+        if dt.tzinfo is not None and self.timezone is not None:
+            dt = dt.astimezone(self.timezone)
+        return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+    def _now(self) -> datetime:
+        return datetime.now(self.timezone) if self.timezone is not None else datetime.now()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        conn = get_conn(self.db_path)
+        try:
+            ensure_tables(conn)
+        finally:
+            close_conn(conn)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="next-due-dispatcher", daemon=True)
+        self._thread.start()
+        logger.info("NextDueDispatcher started")
+
+    def shutdown(self, wait: bool = True):
+        self._stop.set()
+        self._wake.set()
+        if self._thread and wait:
+            self._thread.join(10)
+        self._executor.shutdown(wait=wait)
+
+    def add(self, job_id: str, callable_ref: str, run_date: datetime, args: list):
+        """Insert or replace a reminder; wakes the timer so an earlier deadline is honoured."""
+        ph = self._placeholder()
+        conn = get_conn(self.db_path)
+        try:
+            cur = conn.cursor()
+            values = (job_id, self._fmt(run_date), callable_ref, json.dumps(list(args), ensure_ascii=False))
+            if DB_TYPE == "postgresql":
+                cur.execute(f"""
+                    INSERT INTO reminder_queue (job_id, run_at, callable_ref, args) VALUES ({ph}, {ph}, {ph}, {ph})
+                    ON CONFLICT (job_id) DO UPDATE SET run_at = EXCLUDED.run_at,
+                        callable_ref = EXCLUDED.callable_ref, args = EXCLUDED.args
+                """, values)
+            else:
+                cur.execute(f"INSERT OR REPLACE INTO reminder_queue (job_id, run_at, callable_ref, args) VALUES ({ph}, {ph}, {ph}, {ph})", values)
+            conn.commit()
+        finally:
+            close_conn(conn)
+        self._wake.set()
+
+    def remove(self, job_id: str) -> bool:
+        conn = get_conn(self.db_path)
+        try:
+            cur = conn.cursor()
+            cur.execute(f"DELETE FROM reminder_queue WHERE job_id = {self._placeholder()}", (job_id,))
+            conn.commit()
+            return (cur.rowcount or 0) > 0
+        finally:
+            close_conn(conn)
+
+    def remove_prefix(self, prefix: str, keep: Optional[Set[str]] = None) -> int:
+        """Delete every reminder whose job_id starts with `prefix`, except ids in `keep`."""
+        ph = self._placeholder()
+        keep = list(keep or [])
+        sql = f"DELETE FROM reminder_queue WHERE job_id LIKE {ph}"
+        if keep:
+            sql += f" AND job_id NOT IN ({', '.join([ph] * len(keep))})"
+        conn = get_conn(self.db_path)
+        try:
+            cur = conn.cursor()
+            cur.execute(sql, (prefix + "%", *keep))
+            conn.commit()
+            return cur.rowcount or 0
+        finally:
+            close_conn(conn)
+
+    def count(self) -> int:
+        conn = get_conn(self.db_path)
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT COUNT(*) FROM reminder_queue")
+            return cur.fetchone()[0]
+        finally:
+            close_conn(conn)
+
+    def _next_run_at(self) -> Optional[datetime]:
+        conn = get_conn(self.db_path)
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT MIN(run_at) FROM reminder_queue")
+            row = cur.fetchone()
+        finally:
+            close_conn(conn)
+        if not row or row[0] is None:
+            return None
+        return datetime.strptime(str(row[0])[:19], "%Y-%m-%d %H:%M:%S")
+
+    def _pop_due(self, now: datetime) -> list:
+        """Atomically take the reminders due at `now` out of the queue (at-most-once execution)."""
+        ph = self._placeholder()
+        conn = get_conn(self.db_path)
+        try:
+            cur = conn.cursor()
+            cur.execute(f"SELECT job_id, run_at, callable_ref, args FROM reminder_queue WHERE run_at <= {ph} ORDER BY run_at LIMIT {ph}",
+                        (self._fmt(now), self.batch_size))
+            rows = [tuple(r) for r in cur.fetchall()]
+            if rows:
+                ids = [r[0] for r in rows]
+                cur.execute(f"DELETE FROM reminder_queue WHERE job_id IN ({', '.join([ph] * len(ids))})", ids)
+            conn.commit()
+            return rows
+        finally:
+            close_conn(conn)
+
+    def _execute(self, job_id: str, callable_ref: str, args: list):
+        try:
+            ref_to_obj(callable_ref)(*args)
+        except Exception:
+            logger.exception("NextDueDispatcher: job %s (%s) failed", job_id, callable_ref)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                now = self._now()
+                next_at = self._next_run_at()
+                naive_now = datetime.strptime(self._fmt(now), "%Y-%m-%d %H:%M:%S")
+                if next_at is None or next_at > naive_now:
+                    timeout = self.max_sleep if next_at is None else min(self.max_sleep, (next_at - naive_now).total_seconds())
+                    self._wake.wait(max(timeout, 0.05))
+                    self._wake.clear()
+                    continue
+
+                oldest_allowed = naive_now - timedelta(hours=self.grace_hours)
+                for job_id, run_at, callable_ref, args in self._pop_due(now):
+                    run_at_dt = datetime.strptime(str(run_at)[:19], "%Y-%m-%d %H:%M:%S")
+                    if run_at_dt < oldest_allowed:
+                        logger.warning("NextDueDispatcher: dropping %s, missed by more than %d hours", job_id, self.grace_hours)
+                        continue
+                    self._executor.submit(self._execute, job_id, callable_ref, json.loads(args))
+            except Exception:
+                logger.exception("NextDueDispatcher: loop error")
+                self._wake.wait(5)
+                self._wake.clear()
 
 
 class SchedulerManager:
@@ -184,10 +544,12 @@ class SchedulerManager:
                  db_path: str = "reminders.db",
                  backup_dir: str = "backups",
                  jobs_db: str = "jobs.sqlite",
-                 use_persistent_jobstore: bool = True):
+                 use_persistent_jobstore: bool = True,
+                 dispatcher_mode: Optional[str] = None):
         """
         bot: telebot.TeleBot instance
         use_persistent_jobstore: إذا True يحاول استخدام SQLAlchemyJobStore
+        dispatcher_mode: "apscheduler" أو "next_due" (الافتراضي من SCHEDULER_DISPATCHER_MODE)
         """
         global scheduler_bot
         scheduler_bot = bot
@@ -201,12 +563,9 @@ class SchedulerManager:
         # Timezone Setup
         # ============================================
         if PYTZ_AVAILABLE:
-            try:
-                self.timezone = pytz_timezone('Africa/Algiers')
-                logger.info("✅ Timezone set to: Africa/Algiers")
-            except Exception as e:
-                logger.warning(f"Failed to set Algeria timezone: {e}, using UTC")
-                self.timezone = pytz_timezone('UTC')
+            # نفس المنطقة التي تُحسب بها due_ts / reminder_ts (db_adapter.APP_TIMEZONE)
+            self.timezone = get_app_timezone()
+            logger.info("✅ Timezone set to: %s", self.timezone or APP_TIMEZONE)
         else:
             self.timezone = None
             logger.warning("⚠️ pytz not available - scheduler will use system timezone")
@@ -247,112 +606,145 @@ class SchedulerManager:
         self.scheduler.start()
         logger.info("Scheduler started.")
 
-    def remove_hw_jobs(self, hw_id: int):
-        for days in range(0, 366):
-            jid = f"hw-{hw_id}-{days}"
+        # فهرس hw_id -> معرفات jobs المجدولة فعلاً، حتى لا نجرب حذف 366 معرف عند كل تعديل/حذف
+        self._hw_jobs: Dict[int, Set[str]] = {}
+        self._hw_jobs_lock = threading.Lock()
+        self._index_existing_hw_jobs()
+
+        # وضع next_due: التذكيرات في reminder_queue ومؤقت واحد لأقرب موعد بدلاً من job لكل تذكير
+        self.dispatcher_mode = (dispatcher_mode or DISPATCHER_MODE).lower()
+        self.next_due: Optional[NextDueDispatcher] = None
+        if self.dispatcher_mode == "next_due":
+            self.next_due = NextDueDispatcher(self.db_path, timezone=self.timezone)
+            self.next_due.start()
+            logger.info("SchedulerManager: reminders dispatched from reminder_queue (next_due mode)")
+
+        # عامل تفريغ outbox — يستأنف أي إرسال لم يكتمل قبل إعادة التشغيل
+        self.outbox = start_outbox_dispatcher(bot, self.db_path)
+
+    def _index_existing_hw_jobs(self):
+        """Rebuild the hw_id -> job ids index from the jobstore (persistent jobstores keep jobs across restarts)."""
+        for job in self.scheduler.get_jobs():
+            parts = job.id.split("-")
+            if len(parts) == 3 and parts[0] == "hw" and parts[1].isdigit() and parts[2].isdigit():
+                self._hw_jobs.setdefault(int(parts[1]), set()).add(job.id)
+
+    def add_date_job(self, callable_ref: str, run_date: datetime, args: list, job_id: str):
+        """Schedule a one-off reminder job on the active backend (APScheduler or reminder_queue)."""
+        if self.next_due is not None:
+            self.next_due.add(job_id, callable_ref, run_date, args)
+        else:
+            self.scheduler.add_job(callable_ref, 'date', run_date=run_date, args=args, id=job_id, replace_existing=True)
+
+    def remove_date_job(self, job_id: str):
+        """Remove a one-off reminder job from the active backend (no error if it does not exist)."""
+        if self.next_due is not None:
+            self.next_due.remove(job_id)
+            return
+        try:
+            self.scheduler.remove_job(job_id)
+        except JobLookupError:
+            pass
+
+    def remove_hw_jobs(self, hw_id: int, keep: Optional[set] = None):
+        """Remove the scheduled reminder jobs of hw_id (except ids in `keep`) using the job index."""
+        if self.next_due is not None:
+            self.next_due.remove_prefix(f"hw-{hw_id}-", keep=keep)
+            return
+        with self._hw_jobs_lock:
+            job_ids = self._hw_jobs.get(hw_id, set())
+            to_remove = job_ids - (keep or set())
+            remaining = job_ids & (keep or set())
+            if remaining:
+                self._hw_jobs[hw_id] = remaining
+            else:
+                self._hw_jobs.pop(hw_id, None)
+        for jid in to_remove:
             try:
                 self.scheduler.remove_job(jid)
             except JobLookupError:
+                # date jobs تُحذف تلقائياً بعد تنفيذها
                 continue
             except Exception:
                 logger.exception("remove_hw_jobs: failed removing job %s", jid)
 
-    def schedule_homework_reminders(self, hw_row):
+    def _now(self) -> datetime:
+        if PYTZ_AVAILABLE and getattr(self, 'timezone', None):
+            return datetime.now(self.timezone)
+        return datetime.now()
+
+    @staticmethod
+    def _parse_reminder_offsets(hw_id, remind_spec) -> list:
+        """Parse the comma separated `reminders` column into day offsets (default 3,2,1)."""
+        if isinstance(remind_spec, str):
+            remind_spec = remind_spec.strip()
+            if remind_spec.lower() in ('none', 'null', ''):
+                remind_spec = None
+        if not remind_spec:
+            remind_spec = "3,2,1"
+
+        offsets = []
+        for part in str(remind_spec).split(","):
+            p = part.strip()
+            if not p:
+                continue
+            try:
+                v = int(p)
+                if 0 <= v <= 3650:
+                    offsets.append(v)
+            except Exception:
+                logger.warning("schedule_homework_reminders: failed to parse reminder offset '%s' for hw_id=%s", p, hw_id)
+        return offsets or [3, 2, 1]
+
+    def schedule_homework_reminders(self, hw_row, now: Optional[datetime] = None, verbose: bool = True) -> int:
+        """
+        Schedule (or reschedule) the reminder jobs of one homework.
+
+        now: reference time (bootstrap passes one value for every row)
+        verbose: log each job at INFO; bootstrap uses False and logs one summary line
+
+        Returns:
+            Number of jobs scheduled.
+        """
+        log = logger.info if verbose else logger.debug
         try:
             hw_id = hw_row['id']
         except Exception:
             logger.error("schedule_homework_reminders: invalid hw_row, missing id")
-            return
+            return 0
 
         try:
             if hw_row['done'] == 1:
                 self.remove_hw_jobs(hw_id)
-                logger.info("schedule_homework_reminders: hw_id=%s already done -> removed jobs", hw_id)
-                return
+                log("schedule_homework_reminders: hw_id=%s already done -> removed jobs", hw_id)
+                return 0
         except Exception:
             pass
 
-        try:
-            # قراءة due_at من قاعدة البيانات
-            due_naive = datetime.strptime(hw_row['due_at'], "%Y-%m-%d %H:%M")
-            
-            # إضافة timezone إذا كان متاحاً
-            if PYTZ_AVAILABLE and hasattr(self, 'timezone') and self.timezone:
-                # إذا كان scheduler له timezone، استخدمه لـ localize naive datetime
-                try:
-                    due = self.timezone.localize(due_naive)
-                    logger.debug("schedule_homework_reminders: localized due_at to timezone %s: %s", self.timezone, due)
-                except Exception as tz_err:
-                    # إذا فشل localize، استخدم naive datetime
-                    logger.warning("schedule_homework_reminders: failed to localize due_at: %s, using naive datetime", tz_err)
-                    due = due_naive
-            else:
-                # بدون timezone - naive datetime
-                due = due_naive
-                logger.debug("schedule_homework_reminders: using naive datetime (no timezone available)")
-        except Exception:
-            logger.exception("schedule_homework_reminders: invalid due_at for hw_id=%s", hw_id)
-            return
+        # دعم sqlite3.Row و dict - استخدام safe_get من db_utils
+        from db_utils import safe_get
+        # due_ts (epoch) يُكتب مع due_at في db.py؛ نرجع إلى due_at إذا غاب (صفوف قديمة أو dict بدون due_ts)
+        due_ts = safe_get(hw_row, 'due_ts', None)
+        if due_ts is None:
+            due_ts = to_epoch(safe_get(hw_row, 'due_at', None))
+        if due_ts is None:
+            logger.error("schedule_homework_reminders: invalid due_at/due_ts for hw_id=%s", hw_id)
+            return 0
+        due = from_epoch(due_ts, self.timezone)
 
-        remind_spec = None
         try:
-            # دعم sqlite3.Row و dict - استخدام safe_get من db_utils
-            from db_utils import safe_get
             remind_spec = safe_get(hw_row, 'reminders', None)
-            
-            # معالجة حالات None و 'None' (string) و ''
-            if remind_spec is None:
-                remind_spec = None
-            elif isinstance(remind_spec, str):
-                remind_spec = remind_spec.strip()
-                if remind_spec.lower() in ('none', 'null', ''):
-                    remind_spec = None
         except Exception as e:
             logger.warning("schedule_homework_reminders: failed to get reminders for hw_id=%s: %s", hw_id, e)
             remind_spec = None
-        
-        # تسجيل تفصيلي للتشخيص
-        logger.debug("schedule_homework_reminders: hw_id=%s, remind_spec raw=%s, type=%s", 
-                    hw_id, repr(remind_spec), type(remind_spec).__name__)
+        offsets = self._parse_reminder_offsets(hw_id, remind_spec)
+        log("schedule_homework_reminders: hw_id=%s, remind_spec='%s', offsets=%s", hw_id, remind_spec, offsets)
 
-        logger.info("schedule_homework_reminders: hw_id=%s, remind_spec='%s'", hw_id, remind_spec)
+        # الوقت الحالي بنفس timezone الخاص بـ due
+        if now is None:
+            now = self._now()
 
-        if not remind_spec:
-            remind_spec = "3,2,1"
-            logger.debug("schedule_homework_reminders: using default reminders for hw_id=%s", hw_id)
-
-        offsets = []
-        for part in str(remind_spec).split(","):
-            p = part.strip()
-            if not p:
-                continue
-            try:
-                v = int(p)
-                if 0 <= v <= 3650:
-                    offsets.append(v)
-                    logger.debug("schedule_homework_reminders: added offset %s for hw_id=%s", v, hw_id)
-            except Exception:
-                logger.warning("schedule_homework_reminders: failed to parse reminder offset '%s' for hw_id=%s", p, hw_id)
-                continue
-        if not offsets:
-            offsets = [3, 2, 1]
-            logger.debug("schedule_homework_reminders: no valid offsets, using default [3,2,1] for hw_id=%s", hw_id)
-        
-        logger.info("schedule_homework_reminders: hw_id=%s, final offsets=%s", hw_id, offsets)
-
-        # الحصول على الوقت الحالي مع نفس timezone الخاص بـ due
-        if PYTZ_AVAILABLE and hasattr(self, 'timezone') and self.timezone:
-            # إذا كان due timezone-aware، استخدم نفس timezone للوقت الحالي
-            now = datetime.now(self.timezone)
-            logger.info("Current Time (Algiers): %s", now)
-            logger.debug("schedule_homework_reminders: using timezone-aware datetime for now: %s", now)
-        else:
-            # بدون timezone - naive datetime
-            now = datetime.now()
-            logger.debug("schedule_homework_reminders: using naive datetime for now: %s", now)
-        
-        logger.debug("schedule_homework_reminders: hw_id=%s, due=%s, now=%s", hw_id, due, now)
-        
+        scheduled = set()
         for days_before in offsets:
             try:
                 run_dt = due - timedelta(days=days_before)
@@ -362,58 +754,53 @@ class SchedulerManager:
 
             # التعامل مع التذكيرات الفورية (days_before=0) والتذكيرات في الماضي
             time_diff = (run_dt - now).total_seconds()
-            
-            logger.debug("schedule_homework_reminders: hw_id=%s, days_before=%s, run_dt=%s, time_diff=%s seconds", 
-                        hw_id, days_before, run_dt, time_diff)
-            
+
             if days_before == 0:
                 # للتذكيرات الفورية (0 أيام): أرسل فوراً إذا كان الموعد في الماضي أو الآن
                 if time_diff <= 0:
-                    logger.info("schedule_homework_reminders: sending immediate reminder (days_before=0) for hw_id=%s (due was %s, now is %s, diff=%s seconds)", 
-                               hw_id, due, now, time_diff)
-                    # إرسال التذكير مباشرة بدلاً من جدولته
-                    logger.debug("schedule_homework_reminders: calling send_hw_reminder directly for hw_id=%s", hw_id)
+                    log("schedule_homework_reminders: sending immediate reminder (days_before=0) for hw_id=%s (due was %s, now is %s)",
+                        hw_id, due, now)
                     try:
-                        # التحقق من أن scheduler_bot مضبوط
                         if scheduler_bot is None:
                             logger.error("schedule_homework_reminders: scheduler_bot is None, cannot send immediate reminder for hw_id=%s", hw_id)
                         else:
-                            logger.debug("schedule_homework_reminders: scheduler_bot is set, calling send_hw_reminder for hw_id=%s", hw_id)
                             send_hw_reminder(hw_id, days_before, self.db_path)
-                            logger.info("schedule_homework_reminders: successfully sent immediate reminder for hw_id=%s", hw_id)
                     except Exception as e:
                         logger.exception("schedule_homework_reminders: failed to send immediate reminder for hw_id=%s: %s", hw_id, e)
                     # لا نحتاج لجدولة التذكير لأنه تم إرساله فوراً
                     continue
                 # إذا كان الموعد في المستقبل، استمر في جدولة التذكير في وقت الموعد
-            else:
+            elif time_diff < 0:
                 # للتذكيرات الأخرى (days_before > 0): تخطّ إذا كانت في الماضي
-                if time_diff < 0:
-                    logger.debug("schedule_homework_reminders: skipping past reminder for hw_id=%s days_before=%s (run_dt=%s, diff=%s seconds)", 
-                                hw_id, days_before, run_dt, time_diff)
-                    continue
+                logger.debug("schedule_homework_reminders: skipping past reminder for hw_id=%s days_before=%s (run_dt=%s)",
+                             hw_id, days_before, run_dt)
+                continue
 
             # جدولة التذكير في وقت run_dt
             job_id = f"hw-{hw_id}-{days_before}"
-            try:
-                self.scheduler.remove_job(job_id)
-            except JobLookupError:
-                pass
-            except Exception:
-                pass
-
             try:
                 callable_ref = f"{__name__}:send_hw_reminder"
-                self.scheduler.add_job(callable_ref, 'date', run_date=run_dt, args=[hw_id, days_before, self.db_path], id=job_id, replace_existing=True)
-                logger.info("Scheduled job %s at %s", job_id, run_dt)
+                self.add_date_job(callable_ref, run_dt, [hw_id, days_before, self.db_path], job_id)
+                scheduled.add(job_id)
+                log("Scheduled job %s at %s", job_id, run_dt)
             except Exception:
                 logger.exception("Failed to add scheduler job %s", job_id)
 
+        # حذف jobs قديمة لم تعد ضمن التذكيرات (بعد تعديل reminders أو due_at) ثم تحديث الفهرس
+        self.remove_hw_jobs(hw_id, keep=scheduled)
+        if scheduled and self.next_due is None:
+            with self._hw_jobs_lock:
+                self._hw_jobs.setdefault(hw_id, set()).update(scheduled)
+        return len(scheduled)
+
     def schedule_daily_backup(self, hour: int = 3, minute: int = 0):
         try:
             job_id = "backup_db_daily"
-            callable_ref = f"{__name__}:backup_db_once"
-            self.scheduler.add_job(callable_ref, 'cron', hour=hour, minute=minute, args=[self.db_path, self.backup_dir], id=job_id, replace_existing=True)
+            if DB_TYPE == "postgresql":
+                callable_ref, args = f"{__name__}:pg_backup_once", [self.backup_dir]
+            else:
+                callable_ref, args = f"{__name__}:backup_db_once", [self.db_path, self.backup_dir]
+            self.scheduler.add_job(callable_ref, 'cron', hour=hour, minute=minute, args=args, id=job_id, replace_existing=True)
             logger.info("Scheduled daily backup (cron) at %02d:%02d", hour, minute)
             return True
         except Exception:
@@ -422,60 +809,86 @@ class SchedulerManager:
 
     def backup_db_once(self):
         try:
-            backup_db_once(self.db_path, self.backup_dir)
+            if DB_TYPE == "postgresql":
+                pg_backup_once(self.backup_dir)
+            else:
+                backup_db_once(self.db_path, self.backup_dir)
         except Exception:
             logger.exception("backup_db_once wrapper failed")
 
     def bootstrap_all(self):
+        """
+        Register jobs for existing reminders at startup.
+
+        Only future-relevant rows are loaded (SQL date predicates), jobs are added while the
+        scheduler is paused so it wakes up once, and a single summary line is logged.
+        """
+        started = time.monotonic()
         try:
             conn = get_conn(self.db_path)
-            cur = conn.cursor()
             
             placeholder = "%s" if DB_TYPE == "postgresql" else "?"
+            now = self._now()
+            # مقارنات رقمية على أعمدة epoch المفهرسة (due_ts / reminder_ts)؛
+            # نحتفظ بنافذة سماح للتذكيرات الفورية (days_before=0) التي فاتت أثناء توقف البوت
+            now_ts = int(now.timestamp())
+            hw_cutoff = now_ts - BOOTSTRAP_GRACE_HOURS * 3600
+            cr_cutoff = now_ts
             
             # For PostgreSQL, set up row factory
             if DB_TYPE == "postgresql":
                 import psycopg2.extras
                 cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-                cur.execute("SELECT * FROM homeworks WHERE done = 0")
             else:
                 conn.row_factory = sqlite3.Row
                 cur = conn.cursor()
-                cur.execute("SELECT * FROM homeworks WHERE done = 0")
-            
-            rows = cur.fetchall()
-            for r in rows:
-                try:
-                    self.schedule_homework_reminders(r)
-                except Exception:
-                    logger.exception("schedule error for row id %s", r['id'] if 'id' in r.keys() else "<unknown>")
-            
             
+            hw_jobs = 0
+            cr_jobs = 0
+            hw_rows = []
+            custom_reminders = []
+            queued = self.next_due.count() if self.next_due is not None else 0
             try:
-                cur.execute("SELECT * FROM custom_reminders")
+                # حتى في وضع next_due نعيد تحميل كل الصفوف: reminder_queue قد ينقصه بعض التذكيرات
+                # (تشغيل سابق بوضع apscheduler، ملء جزئي، أو صفوف أضافها سكريبت)؛ add هو upsert
+                cur.execute(f"SELECT * FROM homeworks WHERE done = 0 AND due_ts >= {placeholder}", (hw_cutoff,))
+                hw_rows = cur.fetchall()
+                cur.execute(f"SELECT id, user_id, reminder_ts FROM custom_reminders WHERE reminder_ts > {placeholder}", (cr_cutoff,))
                 custom_reminders = cur.fetchall()
-                from datetime import datetime
-                now = datetime.now()
+            finally:
+                close_conn(conn)
+
+            # إضافة الـ jobs دفعة واحدة: أثناء الإيقاف المؤقت لا يستيقظ الـ scheduler مع كل add_job
+            self.scheduler.pause()
+            try:
+                for r in hw_rows:
+                    try:
+                        hw_jobs += self.schedule_homework_reminders(r, now=now, verbose=False)
+                    except Exception:
+                        logger.exception("schedule error for row id %s", r['id'] if 'id' in r.keys() else "<unknown>")
+
+                callable_ref = "handlers:_job_send_custom_reminder"
                 for cr in custom_reminders:
                     try:
-                        reminder_dt = datetime.strptime(cr['reminder_datetime'], "%Y-%m-%d %H:%M")
-                        if reminder_dt > now:
-                            reminder_id = cr['id']
-                            user_id = cr['user_id']
-                            job_id = f"custom_reminder-{reminder_id}"
-                            callable_ref = "handlers:_job_send_custom_reminder"
-                            self.scheduler.add_job(callable_ref, 'date', run_date=reminder_dt, args=[reminder_id, user_id], id=job_id, replace_existing=True)
-                            logger.info("Bootstrap: scheduled custom reminder %s at %s", reminder_id, reminder_dt)
+                        reminder_dt = from_epoch(cr['reminder_ts'], self.timezone)
+                        reminder_id = cr['id']
+                        job_id = f"custom_reminder-{reminder_id}"
+                        self.add_date_job(callable_ref, reminder_dt, [reminder_id, cr['user_id']], job_id)
+                        cr_jobs += 1
                     except Exception:
-                        logger.exception("Failed to bootstrap custom reminder id %s", cr.get('id', '<unknown>'))
-            except Exception:
-                logger.exception("Failed to bootstrap custom reminders")
+                        logger.exception("Failed to bootstrap custom reminder id %s", cr['id'])
+            finally:
+                self.scheduler.resume()
             
-            close_conn(conn)
-            # Only backup SQLite databases
             if DB_TYPE == "sqlite":
                 backup_db_once(self.db_path, self.backup_dir)
-                self.schedule_daily_backup(hour=3, minute=0)
-            logger.info("Bootstrap completed — scheduled existing reminders and backups.")
+            else:
+                # نسخة PostgreSQL قد تطول: في الخلفية حتى لا تؤخر بدء البوت
+                threading.Thread(target=pg_backup_once, args=(self.backup_dir,),
+                                 name="pg-backup", daemon=True).start()
+            self.schedule_daily_backup(hour=3, minute=0)
+            logger.info("Bootstrap completed in %.0f ms — %d homework jobs for %d homeworks, %d custom reminder jobs%s.",
+                        (time.monotonic() - started) * 1000, hw_jobs, len(hw_rows), cr_jobs,
+                        f", {queued} reminders were already queued (next_due)" if queued else "")
         except Exception:
             logger.exception("Failed during bootstrap_all")
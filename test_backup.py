@@ -0,0 +1,76 @@
+"""
+اختبار النسخ الاحتياطي: نسخة مضغوطة عبر sqlite3 backup API، التحقق من السلامة، وسياسة الاحتفاظ
+"""
+import gzip
+import os
+import sqlite3
+import tempfile
+
+from scheduler import backup_db_once, verify_backup, prune_backups, _ChunkedGzipWriter
+
+
+def test_backup_is_compressed_and_verified():
+    tmp = tempfile.mkdtemp()
+    db_path = os.path.join(tmp, "live.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)")
+    conn.executemany("INSERT INTO t (v) VALUES (?)", [("x" * 100,)] * 500)
+    conn.commit()  # البيانات ما زالت في ملف -wal والاتصال مفتوح
+
+    backup_dir = os.path.join(tmp, "backups")
+    dest = backup_db_once(db_path, backup_dir)
+    conn.close()
+    assert dest and dest.endswith(".db.gz")
+    assert os.listdir(backup_dir) == [os.path.basename(dest)]
+    assert verify_backup(dest)
+
+    restored = os.path.join(tmp, "restored.db")
+    with gzip.open(dest, "rb") as f_in, open(restored, "wb") as f_out:
+        f_out.write(f_in.read())
+    assert sqlite3.connect(restored).execute("SELECT COUNT(*) FROM t").fetchone()[0] == 500
+
+    broken = os.path.join(tmp, "reminders_backup_20240101_000000.db.gz")
+    with gzip.open(broken, "wb") as f:
+        f.write(b"not a database")
+    assert not verify_backup(broken)
+
+
+def test_prune_keeps_daily_and_weekly():
+    backup_dir = tempfile.mkdtemp()
+    # نسختان يومياً لمدة 30 يوماً (مارس 2024)
+    for day in range(1, 31):
+        for hour in ("03", "15"):
+            open(os.path.join(backup_dir, f"reminders_backup_202403{day:02d}_{hour}0000.db.gz"), "wb").close()
+    open(os.path.join(backup_dir, "unrelated.txt"), "wb").close()
+
+    prune_backups(backup_dir, keep_daily=3, keep_weekly=3)
+    kept = sorted(os.listdir(backup_dir))
+    print(f"[BACKUP] kept: {kept}")
+    assert kept == [
+        "reminders_backup_20240317_150000.db.gz",  # آخر نسخة في الأسبوع 11
+        "reminders_backup_20240324_150000.db.gz",  # آخر نسخة في الأسبوع 12
+        "reminders_backup_20240328_150000.db.gz",
+        "reminders_backup_20240329_150000.db.gz",
+        "reminders_backup_20240330_150000.db.gz",  # آخر 3 أيام (الأسبوع 13)
+        "unrelated.txt",
+    ]
+
+
+def test_chunked_gzip_writer_splits_copy_stream():
+    out_dir = tempfile.mkdtemp()
+    writer = _ChunkedGzipWriter(out_dir, "homeworks", chunk_bytes=1000)
+    rows = [f"{i},subject {i},2024-01-01 10:00\n" for i in range(200)]
+    for row in rows:  # copy_expert يكتب على دفعات
+        writer.write(row)
+    writer.close()
+    assert len(writer.files) > 1 and writer.files[0] == "homeworks.0000.csv.gz"
+    restored = b"".join(gzip.open(os.path.join(out_dir, name)).read() for name in writer.files)
+    assert restored.decode() == "".join(rows)
+
+
+if __name__ == "__main__":
+    test_backup_is_compressed_and_verified()
+    test_prune_keeps_daily_and_weekly()
+    test_chunked_gzip_writer_splits_copy_stream()
+    print("✅ OK")
@@ -0,0 +1,50 @@
+"""
+اختبار محرك الإرسال الجماعي (BroadcastEngine)
+"""
+from telebot.apihelper import ApiTelegramException
+
+from broadcast import BroadcastEngine
+
+
+class MockBot:
+    def __init__(self, blocked=(), flood_once=()):
+        self.sent = []
+        self.blocked = set(blocked)
+        self.flood_once = set(flood_once)
+
+    def send_message(self, chat_id, text, **kwargs):
+        if chat_id in self.blocked:
+            raise ApiTelegramException("sendMessage", None,
+                                       {"error_code": 403, "description": "Forbidden: bot was blocked by the user"})
+        if chat_id in self.flood_once:
+            self.flood_once.discard(chat_id)
+            raise ApiTelegramException("sendMessage", None,
+                                       {"error_code": 429, "description": "Too Many Requests",
+                                        "parameters": {"retry_after": 0.01}})
+        self.sent.append(chat_id)
+        return True
+
+
+def test_broadcast_counts_sent_failed_skipped():
+    bot = MockBot(blocked={3}, flood_once={2})
+    engine = BroadcastEngine(bot, max_workers=4, global_rate=1000, per_chat_rate=1000)
+
+    def deliver(chat_id):
+        if chat_id == 4:
+            raise RuntimeError("boom")
+        engine.call(chat_id, bot.send_message, chat_id, "hello")
+
+    result = engine.broadcast([1, 2, 3, 4, 5], deliver, label="test")
+
+    assert result.sent == 3
+    assert result.skipped == 1
+    assert result.failed == 1
+    # 429 أعيدت محاولته بعد retry_after
+    assert sorted(bot.sent) == [1, 2, 5]
+
+    # نفس مجموعة العمّال تُستعمل في كل دفعة
+    pool = engine._pool
+    engine.broadcast([6], deliver, label="test")
+    assert engine._pool is pool
+    engine.shutdown()
+    assert engine._pool is None
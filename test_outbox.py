@@ -0,0 +1,102 @@
+"""
+اختبار طابور الرسائل الصادرة (outbox): عدم التكرار واستئناف الإرسال
+"""
+from db import get_conn, ensure_tables
+from db_adapter import close_conn
+from outbox import (OutboxDispatcher, enqueue, message_op, media_ops, count_pending, backoff_delay,
+                    OUTBOX_BACKOFF_MAX_SECONDS)
+
+
+class MockBot:
+    def __init__(self, fail_for=()):
+        self.sent = []
+        self.fail_for = set(fail_for)
+
+    def send_message(self, chat_id, text, **kwargs):
+        if chat_id in self.fail_for:
+            raise RuntimeError("network down")
+        self.sent.append((chat_id, text))
+        return True
+
+    def send_document(self, chat_id, file_id, **kwargs):
+        if file_id in self.fail_for:
+            raise RuntimeError("upload failed")
+        self.sent.append((chat_id, file_id))
+        return True
+
+
+def test_outbox_is_idempotent_and_resumes(tmp_db):
+    db_path = tmp_db
+    conn = get_conn(db_path)
+    ensure_tables(conn)
+    try:
+        assert enqueue(conn, "job-1", [1, 2, 3], [message_op("hello")]) == 3
+        # نفس المفتاح مرة أخرى (مثلاً بعد إعادة التشغيل) لا يضيف مستلمين مكررين
+        assert enqueue(conn, "job-1", [1, 2, 3, 3], [message_op("hello")]) == 3
+    finally:
+        close_conn(conn)
+
+    # أول تشغيل: المستلم 2 يفشل ويبقى pending
+    bot = MockBot(fail_for={2})
+    dispatcher = OutboxDispatcher(bot, db_path)
+    assert dispatcher.drain_once() == 3  # 3 صفوف عولجت: اثنان أُرسلا وواحد أُجّل
+    assert sorted(bot.sent) == [(1, "hello"), (3, "hello")]
+
+    conn = get_conn(db_path)
+    try:
+        # انتهاء مهلة backoff للمستلم 2
+        conn.execute("UPDATE outbox SET next_attempt_at = '2000-01-01 00:00:00' WHERE next_attempt_at IS NOT NULL")
+        conn.commit()
+    finally:
+        close_conn(conn)
+
+    # "إعادة تشغيل": dispatcher جديد يكمل المتبقي فقط
+    bot2 = MockBot()
+    dispatcher2 = OutboxDispatcher(bot2, db_path)
+    assert dispatcher2.drain_once() == 1
+    assert bot2.sent == [(2, "hello")]
+
+    conn = get_conn(db_path)
+    try:
+        assert count_pending(conn) == 0
+        # attempts يعد المحاولات الفاشلة فقط
+        cur = conn.cursor()
+        cur.execute("SELECT recipient, attempts FROM outbox ORDER BY recipient")
+        assert [tuple(r) for r in cur.fetchall()] == [(1, 0), (2, 1), (3, 0)]
+    finally:
+        close_conn(conn)
+
+
+def test_outbox_retry_resumes_after_last_sent_op_with_backoff(tmp_db):
+    db_path = tmp_db
+    conn = get_conn(db_path)
+    ensure_tables(conn)
+    try:
+        enqueue(conn, "job-media", [7], media_ops("caption text", "document", "FILE"))
+    finally:
+        close_conn(conn)
+
+    bot = MockBot(fail_for={"FILE"})
+    dispatcher = OutboxDispatcher(bot, db_path)
+    assert dispatcher.drain_once() == 1
+    assert bot.sent == [(7, "caption text")]
+    # الصف مؤجل (backoff): لا يُعاد فوراً
+    assert dispatcher.drain_once() == 0 and bot.sent == [(7, "caption text")]
+
+    conn = get_conn(db_path)
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT ops_done, next_attempt_at FROM outbox WHERE job_key = 'job-media'")
+        ops_done, next_attempt_at = cur.fetchone()
+        assert ops_done == 1 and next_attempt_at is not None
+        cur.execute("UPDATE outbox SET next_attempt_at = '2000-01-01 00:00:00'")
+        conn.commit()
+    finally:
+        close_conn(conn)
+
+    # إعادة المحاولة تكمل من الملف ولا تكرر النص
+    bot.fail_for.clear()
+    assert dispatcher.drain_once() == 1
+    assert bot.sent == [(7, "caption text"), (7, "FILE")]
+    assert backoff_delay(1) < backoff_delay(2) <= OUTBOX_BACKOFF_MAX_SECONDS
+
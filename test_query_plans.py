@@ -0,0 +1,45 @@
+"""
+اختبار خطط الاستعلامات (EXPLAIN QUERY PLAN): الاستعلامات المتكررة تستخدم الفهارس بدل المسح الكامل
+"""
+import os
+import tempfile
+
+from db import get_conn, ensure_tables
+from db_adapter import close_conn
+
+# (الاستعلام، المعاملات، الفهرس المتوقع)
+HOT_QUERIES = [
+    ("SELECT * FROM custom_reminders WHERE user_id = ? ORDER BY reminder_datetime", (1,),
+     "idx_custom_reminders_user_datetime"),
+    ("SELECT * FROM homeworks WHERE done = 0 AND due_ts >= ?", (1700000000,),
+     "idx_homeworks_done_due_ts"),
+    ("SELECT id, user_id, reminder_ts FROM custom_reminders WHERE reminder_ts > ?", (1700000000,),
+     "idx_custom_reminders_ts"),
+    ("SELECT * FROM homeworks ORDER BY due_at", (),
+     "idx_homeworks_due_at"),
+    ("SELECT * FROM weekly_schedule_classes WHERE group_number = ? AND day_name = ? ORDER BY display_order, time_start",
+     ("01", "sunday"), "idx_weekly_schedule_group_day"),
+    ("SELECT user_id FROM users WHERE group_number = ? AND user_id > ? ORDER BY user_id LIMIT 26", ("01", 0),
+     "idx_users_group_number"),
+]
+
+
+def test_hot_queries_use_indexes():
+    db_path = os.path.join(tempfile.mkdtemp(), "plans_test.db")
+    conn = get_conn(db_path)
+    ensure_tables(conn)
+    try:
+        cur = conn.cursor()
+        for sql, params, index in HOT_QUERIES:
+            cur.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plan = " | ".join(str(row[3]) for row in cur.fetchall())
+            print(f"[PLAN] {plan}")
+            assert index in plan, f"{sql!r} does not use {index}: {plan}"
+            assert "TEMP B-TREE" not in plan, f"{sql!r} sorts in memory: {plan}"
+    finally:
+        close_conn(conn)
+
+
+if __name__ == "__main__":
+    test_hot_queries_use_indexes()
+    print("✅ OK")
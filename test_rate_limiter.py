@@ -0,0 +1,51 @@
+"""
+اختبار RateLimiter: token bucket لكل مفتاح، حذف المفاتيح الخاملة، وحدود مسماة
+"""
+import time
+
+from bot_handlers.base import RateLimiter, RateLimits
+
+
+def test_rate_limiter_bucket_and_bounded_keys():
+    limiter = RateLimiter(max_calls=2, period=0.1, max_keys=3)
+    assert limiter.is_allowed(1) and limiter.is_allowed(1)
+    assert not limiter.is_allowed(1)
+    assert limiter.is_allowed(2)  # مفاتيح مستقلة
+
+    for key in range(10, 20):
+        limiter.is_allowed(key)
+    assert len(limiter) == 3  # لا يتجاوز max_keys
+
+    time.sleep(0.12)
+    assert limiter.is_allowed(1)  # امتلأ الـ bucket من جديد
+    # بعد مرور period تُحذف المفاتيح الخاملة ولا يبقى إلا المفتاح الحالي
+    assert len(limiter) == 1
+
+
+def test_named_limits():
+    limits = RateLimits()
+    limits.add("callback", max_calls=1, period=60)
+    limits.add("broadcast_global", max_calls=2, period=60)
+    assert limits.is_allowed("callback", 5)
+    assert not limits.is_allowed("callback", 5)
+    assert limits.is_allowed("callback", 6)
+    assert limits.is_allowed("broadcast_global") and limits.is_allowed("broadcast_global")
+    assert not limits.is_allowed("broadcast_global")
+
+
+def test_allow_all_does_not_consume_on_rejection():
+    limits = RateLimits()
+    limits.add("broadcast", max_calls=2, period=60)
+    limits.add("broadcast_global", max_calls=1, period=60)
+    checks = (("broadcast_global", RateLimits.GLOBAL), ("broadcast", 5))
+    assert limits.allow_all(*checks)
+    assert not limits.allow_all(*checks)  # الحد العام يرفض
+    # رصيد المحادثة 5 لم يُستهلك بالمحاولة المرفوضة
+    assert limits.is_allowed("broadcast", 5) and not limits.is_allowed("broadcast", 5)
+
+
+if __name__ == "__main__":
+    test_rate_limiter_bucket_and_bounded_keys()
+    test_named_limits()
+    test_allow_all_does_not_consume_on_rejection()
+    print("✅ OK")
@@ -0,0 +1,33 @@
+"""
+اختبار الترقيات: قاعدة بيانات جديدة تصل إلى نفس المخطط الموصوف في get_create_table_sql()
+"""
+import sqlite3
+
+from db import get_conn, ensure_tables
+from db_adapter import close_conn
+from db_sql import get_create_table_sql, get_schema_migrations
+
+
+def _columns(db):
+    tables = [r[0] for r in db.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                                       "AND name NOT LIKE 'sqlite_%' AND name != 'schema_version'")]
+    return {t: sorted(tuple(r)[1:5] for r in db.execute(f"PRAGMA table_info({t})")) for t in tables}
+
+
+def test_fresh_database_matches_current_schema(tmp_path):
+    db_path = str(tmp_path / "fresh.db")
+    conn = get_conn(db_path)
+    ensure_tables(conn)
+    close_conn(conn)
+
+    reference = sqlite3.connect(":memory:")
+    for sql in get_create_table_sql().values():
+        reference.execute(sql)
+    migrated = sqlite3.connect(db_path)
+    try:
+        assert _columns(migrated) == _columns(reference)
+        versions = [r[0] for r in migrated.execute("SELECT version FROM schema_version ORDER BY version")]
+        assert versions == [v for v, _, _ in get_schema_migrations()]
+    finally:
+        migrated.close()
+        reference.close()
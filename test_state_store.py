@@ -0,0 +1,44 @@
+"""
+اختبار مخزن حالات المحادثات: انتهاء الصلاحية، الحد الأقصى للحجم، والحفظ في قاعدة البيانات
+"""
+import json
+import time
+
+from bot_handlers.base import ExpiringStateStore
+from db import get_conn, ensure_tables, save_conversation_state, load_conversation_states, delete_conversation_state
+from db_adapter import close_conn
+
+
+def test_state_store_expiry_and_eviction():
+    store = ExpiringStateStore("test", ttl=0.05, max_size=2)
+    store[1] = {"step": "name"}
+    store[2] = {"step": "group"}
+    assert store.get(1) == {"step": "name"}  # القراءة تجدد الصلاحية وتجعل 1 الأحدث استخداماً
+    store[3] = {"step": "name"}
+    # 2 هو الأقدم استخداماً فيُطرد
+    assert 2 not in store and 1 in store and 3 in store
+
+    time.sleep(0.06)
+    assert store.get(1) is None
+    assert store.sweep() == 1  # 3 انتهت صلاحيته ولم يُقرأ منذ ذلك
+    assert len(store) == 0
+    assert store.pop(3, "gone") == "gone"
+
+
+def test_conversation_state_rows_round_trip(tmp_db):
+    conn = get_conn(tmp_db)
+    ensure_tables(conn)
+    try:
+        now = time.time()
+        save_conversation_state(conn, "manual", 10, json.dumps({"step": "enter_content"}), now + 60)
+        save_conversation_state(conn, "manual", 11, json.dumps({"step": "old"}), now - 1)
+        save_conversation_state(conn, "manual", 10, json.dumps({"step": "enter_datetime"}), now + 60)
+
+        rows = load_conversation_states(conn, "manual", now)
+        assert [(r[0], json.loads(r[1])) for r in rows] == [(10, {"step": "enter_datetime"})]
+
+        delete_conversation_state(conn, "manual", 10)
+        assert load_conversation_states(conn, "manual", now) == []
+    finally:
+        close_conn(conn)
+
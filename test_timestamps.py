@@ -0,0 +1,70 @@
+"""
+اختبار أعمدة epoch: التحويل، الكتابة عند الإدراج، وملء الصفوف القديمة عبر الترقية 5
+"""
+import sqlite3
+from datetime import datetime, timedelta
+
+from db import get_conn, ensure_tables, insert_homework, insert_custom_reminder, update_field
+from db_adapter import close_conn, to_epoch, from_epoch
+from scheduler import SchedulerManager
+
+
+def test_epoch_round_trip():
+    ts = to_epoch("2024-03-10 18:30")
+    assert isinstance(ts, int)
+    assert to_epoch("2024-03-10 18:30:00") == ts
+    assert from_epoch(ts).strftime("%Y-%m-%d %H:%M") == "2024-03-10 18:30"
+    assert to_epoch("not a date") is None and to_epoch(None) is None
+
+
+def test_epoch_written_on_insert_and_update(tmp_db):
+    conn = get_conn(tmp_db)
+    ensure_tables(conn)
+    try:
+        hw_id = insert_homework(conn, "Math", "", "2024-03-10 18:30", None, None, None, 1, 1, "")
+        update_field(conn, hw_id, "due_at", "2024-03-11 08:00")
+        cr_id = insert_custom_reminder(conn, 1, "x", "2024-03-10 09:00")
+        cur = conn.cursor()
+        cur.execute("SELECT due_ts FROM homeworks WHERE id = ?", (hw_id,))
+        assert cur.fetchone()[0] == to_epoch("2024-03-11 08:00")
+        cur.execute("SELECT reminder_ts FROM custom_reminders WHERE id = ?", (cr_id,))
+        assert cur.fetchone()[0] == to_epoch("2024-03-10 09:00")
+    finally:
+        close_conn(conn)
+
+
+def test_migration_backfills_legacy_rows(tmp_path):
+    db_path = str(tmp_path / "legacy.db")
+    legacy = sqlite3.connect(db_path)
+    legacy.execute("CREATE TABLE homeworks (id INTEGER PRIMARY KEY AUTOINCREMENT, subject TEXT, description TEXT, "
+                   "due_at TEXT, pdf_type TEXT, pdf_value TEXT, conditions TEXT, created_by INTEGER, chat_id INTEGER, "
+                   "reminders TEXT, done INTEGER DEFAULT 0, target_user_id INTEGER)")
+    legacy.execute("INSERT INTO homeworks (subject, due_at) VALUES ('Old', '2024-01-05 10:00')")
+    legacy.commit()
+    legacy.close()
+
+    conn = get_conn(db_path)
+    ensure_tables(conn)
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT due_ts FROM homeworks WHERE subject = 'Old'")
+        assert cur.fetchone()[0] == to_epoch("2024-01-05 10:00")
+    finally:
+        close_conn(conn)
+
+
+def test_schedule_falls_back_to_due_at(tmp_path, tmp_db):
+    sch = SchedulerManager(bot=object(), db_path=tmp_db,
+                           backup_dir=str(tmp_path / "backups"), use_persistent_jobstore=False)
+    try:
+        # صف بدون due_ts (dict قديم أو صف لم تملأه الترقية 5)
+        due = (datetime.now() + timedelta(days=5)).strftime("%Y-%m-%d %H:%M")
+        for hw_row in ({"id": 1, "done": 0, "due_at": due, "reminders": "2,1"},
+                       {"id": 2, "done": 0, "due_at": due, "due_ts": None, "reminders": "2,1"}):
+            assert sch.schedule_homework_reminders(hw_row) == 2
+        assert {job.id for job in sch.scheduler.get_jobs()} == {"hw-1-2", "hw-1-1", "hw-2-2", "hw-2-1"}
+        assert sch.schedule_homework_reminders({"id": 3, "done": 0, "due_at": "bad", "reminders": "1"}) == 0
+    finally:
+        sch.scheduler.shutdown(wait=False)
+        sch.outbox.stop(timeout=1)
+
@@ -1,5 +1,6 @@
 
 """Weekly schedule data and utilities for groups."""
+import threading
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple, Any
 
@@ -211,84 +212,112 @@ def debug_group_schedule(group_number: str, day: str) -> str:
         return f"❌ Error: {e}"
 
 
+# لقطة أسبوع كامل لكل مجموعة: group_number -> (generation, {day_name: [class dicts]})
+# تُبنى باستعلام واحد وتُبطَل تلقائيًا عند تغيّر db_schedule.get_schedule_generation()
+_group_snapshots: Dict[str, Tuple[int, Dict[str, List[Dict]]]] = {}
+_group_snapshots_lock = threading.Lock()
+
+
+def get_group_snapshot(group_number: str) -> Dict[str, List[Dict]]:
+    """Return the cached week of a group ({day_name: [class rows as dicts]}), rebuilding it if stale."""
+    from db_schedule import get_schedule_generation, get_group_schedule_rows
+    from db_utils import db_connection
+
+    generation = get_schedule_generation()
+    with _group_snapshots_lock:
+        cached = _group_snapshots.get(group_number)
+    if cached and cached[0] == generation:
+        return cached[1]
+
+    with db_connection() as conn:
+        rows = get_group_schedule_rows(conn, group_number)
+    days: Dict[str, List[Dict]] = {}
+    for row in rows:
+        cls_dict = dict(row)
+        days.setdefault(cls_dict['day_name'], []).append(cls_dict)
+    with _group_snapshots_lock:
+        _group_snapshots[group_number] = (generation, days)
+    return days
+
+
+def invalidate_schedule_cache(group_number: Optional[str] = None):
+    """Drop cached snapshots (normally not needed: schedule writes bump the generation)."""
+    with _group_snapshots_lock:
+        if group_number is None:
+            _group_snapshots.clear()
+        else:
+            _group_snapshots.pop(group_number, None)
+
+
 def get_group_schedule(group_number: str, day: str) -> List[Dict]:
     """
     Get schedule for a specific group and day.
     Handles alternating weeks for laboratory sessions.
-    Reads from database if available, falls back to hardcoded data.
+    Reads from the cached group snapshot (database) if available, falls back to hardcoded data.
     """
     try:
-        
-        from db_schedule import get_schedule_classes, get_alternating_week_config
-        from db_utils import db_connection
-        from datetime import datetime, timedelta
         import logging
         
-        with db_connection() as conn:
-            db_classes = get_schedule_classes(conn, group_number, day.lower())
-            logging.debug(f"get_group_schedule: group={group_number}, day={day}, db_classes={len(list(db_classes)) if db_classes else 0} items")
+        db_classes = get_group_snapshot(group_number).get(day.lower(), [])
+        logging.debug(f"get_group_schedule: group={group_number}, day={day}, db_classes={len(db_classes)} items")
+        
+        if db_classes:
             
-            if db_classes:
-                
-                filtered_schedule = []
-                for cls in db_classes:
-                    try:
-                        cls_dict = dict(cls)
-                        
-                        # Check if alternating
-                        if cls_dict.get('is_alternating', 0):
-                            alternating_key = cls_dict.get('alternating_key')
-                            if alternating_key:
-                                try:
-                                    # Get alternating week config
-                                    config = get_alternating_week_config(conn, alternating_key)
-                                    if config:
-                                        ref_date = datetime.strptime(config['reference_date'], "%Y-%m-%d")
-                                        today = datetime.now()
-                                        days_diff = (today - ref_date).days
-                                        # Calculate week number (0 or 1) based on reference date
-                                        # Reference date (Nov 15) = Week 0
-                                        # Handle negative days_diff: if before reference date and not same week, go to previous week
-                                        if days_diff < 0:
-                                            # Before reference date: calculate from reference week backwards
-                                            week_number = ((days_diff // 7) - 1) % 2
-                                        else:
-                                            week_number = (days_diff // 7) % 2
-                                        
-                                        # Alternating week logic:
-                                        # Group 02 & 04 (even): Normal logic - show lab in Week 0 only
-                                        # Group 01 & 03 (odd): Reversed logic - show lab in Week 1 only
-                                        if group_number in ["02", "04"]:
-                                            # Group 02 & 04: Show alternating class only in Week 0
-                                            if week_number != 0:
-                                                continue  # Skip this class (not in Week 0)
-                                        else:
-                                            # Group 01 & 03: Show alternating class only in Week 1
-                                            if week_number != 1:
-                                                continue  # Skip this class (not in Week 1)
-                                except Exception as alt_error:
-                                    # إذا فشل التحقق من الحصة الدورية، نتخطاها
-                                    import logging
-                                    logging.warning(f"Failed to check alternating for class: {alt_error}")
-                                    continue
-                        
-                        # Convert to format expected by rest of code
-                        entry = {
-                            "time": f"{cls_dict['time_start']}-{cls_dict['time_end']}",
-                            "course": cls_dict['course'],
-                            "location": cls_dict['location'],
-                            "type": cls_dict['class_type'],
-                            "alternating": bool(cls_dict.get('is_alternating', 0)),
-                            "alternating_key": cls_dict.get('alternating_key')
-                        }
-                        filtered_schedule.append(entry)
-                    except Exception as cls_error:
-                        # إذا فشل معالجة حصة واحدة، نتخطاها ونكمل
-                        import logging
-                        logging.warning(f"Failed to process class entry: {cls_error}")
-                        continue
-                
-                return filtered_schedule
+            filtered_schedule = []
+            for cls_dict in db_classes:
+                try:
+                    # Check if alternating
+                    if cls_dict.get('is_alternating', 0):
+                        alternating_key = cls_dict.get('alternating_key')
+                        if alternating_key:
+                            try:
+                                # reference_date من إعداد الأسبوع الدوري (مضمّن في اللقطة)
+                                reference_date = cls_dict.get('alt_reference_date')
+                                if reference_date:
+                                    ref_date = datetime.strptime(reference_date, "%Y-%m-%d")
+                                    today = datetime.now()
+                                    days_diff = (today - ref_date).days
+                                    # Calculate week number (0 or 1) based on reference date
+                                    # Reference date (Nov 15) = Week 0
+                                    # Handle negative days_diff: if before reference date and not same week, go to previous week
+                                    if days_diff < 0:
+                                        # Before reference date: calculate from reference week backwards
+                                        week_number = ((days_diff // 7) - 1) % 2
+                                    else:
+                                        week_number = (days_diff // 7) % 2
+                                    
+                                    # Alternating week logic:
+                                    # Group 02 & 04 (even): Normal logic - show lab in Week 0 only
+                                    # Group 01 & 03 (odd): Reversed logic - show lab in Week 1 only
+                                    if group_number in ["02", "04"]:
+                                        # Group 02 & 04: Show alternating class only in Week 0
+                                        if week_number != 0:
+                                            continue  # Skip this class (not in Week 0)
+                                    else:
+                                        # Group 01 & 03: Show alternating class only in Week 1
+                                        if week_number != 1:
+                                            continue  # Skip this class (not in Week 1)
+                            except Exception as alt_error:
+                                # إذا فشل التحقق من الحصة الدورية، نتخطاها
+                                logging.warning(f"Failed to check alternating for class: {alt_error}")
+                                continue
+                    
+                    # Convert to format expected by rest of code
+                    entry = {
+                        "time": f"{cls_dict['time_start']}-{cls_dict['time_end']}",
+                        "course": cls_dict['course'],
+                        "location": cls_dict['location'],
+                        "type": cls_dict['class_type'],
+                        "alternating": bool(cls_dict.get('is_alternating', 0)),
+                        "alternating_key": cls_dict.get('alternating_key')
+                    }
+                    filtered_schedule.append(entry)
+                except Exception as cls_error:
+                    # إذا فشل معالجة حصة واحدة، نتخطاها ونكمل
+                    logging.warning(f"Failed to process class entry: {cls_error}")
+                    continue
+            
+            return filtered_schedule
     except Exception as db_error:
         # Fallback to hardcoded data
         import logging
@@ -368,42 +397,50 @@ def get_tomorrow_schedule_entries(group_number: str) -> List[Dict]:
     return get_day_schedule_entries(group_number, tomorrow_day)
 
 
-def has_location_map(location: str) -> bool:
-    """Check if location has a Google Maps URL (not online)."""
-    
-    if "Online" in location or "Google Meet" in location:
-        return False
-    
-    
+# روابط الأماكن: LOCATION_MAPS مدموجة مع جدول schedule_locations (قيم قاعدة البيانات لها الأولوية)
+# (generation, {location_name: maps_url}) — تُحدَّث تلقائيًا بعد أي تعديل إداري
+_location_urls: Optional[Tuple[int, Dict[str, str]]] = None
+_location_urls_lock = threading.Lock()
+
+
+def get_location_urls() -> Dict[str, str]:
+    """Return every known location -> Google Maps URL, loading schedule_locations once per generation."""
+    global _location_urls
     try:
-        from db_schedule import get_schedule_location
+        from db_schedule import get_schedule_generation, get_schedule_locations
         from db_utils import db_connection
+
+        generation = get_schedule_generation()
+        with _location_urls_lock:
+            cached = _location_urls
+        if cached and cached[0] == generation:
+            return cached[1]
+
         with db_connection() as conn:
-            url = get_schedule_location(conn, location)
-            if url:
-                return True
+            db_urls = get_schedule_locations(conn)
+        urls = dict(LOCATION_MAPS)
+        urls.update({name: url for name, url in db_urls.items() if url})
+        with _location_urls_lock:
+            _location_urls = (generation, urls)
+        return urls
     except Exception:
-        pass
+        import logging
+        logging.warning("Failed to load schedule locations, using hardcoded LOCATION_MAPS", exc_info=True)
+        return LOCATION_MAPS
+
+
+def has_location_map(location: str) -> bool:
+    """Check if location has a Google Maps URL (not online)."""
     
+    if "Online" in location or "Google Meet" in location:
+        return False
     
-    return location in LOCATION_MAPS
+    return location in get_location_urls()
 
 
 def get_location_map_url(location: str) -> Optional[str]:
     """Get Google Maps URL for a location."""
-    
-    try:
-        from db_schedule import get_schedule_location
-        from db_utils import db_connection
-        with db_connection() as conn:
-            url = get_schedule_location(conn, location)
-            if url:
-                return url
-    except Exception:
-        pass
-    
-    
-    return LOCATION_MAPS.get(location, None)
+    return get_location_urls().get(location)
 
 
 def format_single_class_message(entry: Dict, day_ar: str = None) -> str:
@@ -433,6 +470,21 @@ def format_single_class_message(entry: Dict, day_ar: str = None) -> str:
     return text
 
 
+def format_day_schedule_message(entries: List[Dict], title: str, group_number: str = "") -> str:
+    """Format a whole day (entries from get_day_schedule_entries) as one compact message."""
+    day_ar = entries[0].get("day_ar", "") if entries else ""
+    header = f"📅 {title}"
+    if day_ar:
+        header += f" - {day_ar}"
+    if group_number:
+        header += f" (Group {group_number})"
+    if not entries:
+        return f"{header}\n\nلا توجد حصص في هذا اليوم."
+    lines = [header, ""]
+    lines.extend(format_class_entry(entry) for entry in entries)
+    return "\n".join(lines)
+
+
 def format_weekly_schedule(group_number: str) -> str:
     """Format full weekly schedule."""
     try: